@@ -0,0 +1,158 @@
+"""
+Benchmark: /api/maps/nearby strategies on synthetic Vietnamese coordinates
+- brute force: Haversine over every location (the old get_nearby_locations)
+- grid: SpatialGrid.within() / nearest() (utils/spatial_index.py)
+- arrays: PointArrays.within() / nearest(), vectorized with NumPy (utils/geo_vector.py)
+- database (--database): geohash-prefix + bounding box SQL prefilter on SQLite
+
+Points are clustered around the big cities plus a uniform background over
+the country's bounding box.
+
+Usage (from backend/):
+    python benchmarks/nearby_benchmark.py --points 1000000
+    python benchmarks/nearby_benchmark.py --points 200000 --database
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import main  # noqa: F401  (imports every model so relationships resolve)
+from models import db
+from models.location import Location
+from utils.geo import geohash_encode, haversine_km
+from utils.geo_vector import HAS_NUMPY, PointArrays
+from utils.spatial_index import SpatialGrid, nearby_from_database
+
+# (lat, lng, spread in degrees, share of the points)
+CITIES = [
+    (21.0285, 105.8542, 0.15, 0.25),  # Hà Nội
+    (10.7769, 106.7009, 0.2, 0.3),  # TP. Hồ Chí Minh
+    (16.0544, 108.2022, 0.1, 0.1),  # Đà Nẵng
+    (16.4637, 107.5909, 0.08, 0.05),  # Huế
+    (20.9101, 107.1839, 0.1, 0.05),  # Hạ Long
+    (11.9404, 108.4583, 0.08, 0.05),  # Đà Lạt
+]
+VIETNAM_BOX = (8.4, 102.1, 23.4, 109.5)
+CATEGORIES = ['restaurant', 'attraction', 'hotel', 'transport', 'shopping', 'entertainment']
+
+QUERIES = [
+    ('Hoàn Kiếm, 2 km', 21.0285, 105.8522, 2),
+    ('Quận 1, 5 km', 10.7769, 106.7009, 5),
+    ('Hội An, 10 km', 15.8801, 108.3380, 10),
+    ('Sa Pa, 25 km', 22.3364, 103.8438, 25),
+]
+
+
+def synthetic_points(count, seed=42):
+    rng = random.Random(seed)
+    points = []
+    for point_id in range(1, count + 1):
+        roll = rng.random()
+        for lat, lng, spread, share in CITIES:
+            if roll < share:
+                points.append((point_id, rng.gauss(lat, spread), rng.gauss(lng, spread), rng.choice(CATEGORIES)))
+                break
+            roll -= share
+        else:
+            points.append((point_id, rng.uniform(VIETNAM_BOX[0], VIETNAM_BOX[2]),
+                           rng.uniform(VIETNAM_BOX[1], VIETNAM_BOX[3]), rng.choice(CATEGORIES)))
+    return points
+
+
+def brute_force(points, lat, lng, radius):
+    hits = []
+    for point_id, point_lat, point_lng, _ in points:
+        distance = haversine_km(lat, lng, point_lat, point_lng)
+        if distance <= radius:
+            hits.append((distance, point_id))
+    hits.sort()
+    return hits
+
+
+def timed(fn, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def seed_database(points):
+    rows = [
+        {'id': point_id, 'name': f'Địa điểm {point_id}', 'latitude': lat, 'longitude': lng,
+         'geohash': geohash_encode(lat, lng), 'category': category}
+        for point_id, lat, lng, category in points
+    ]
+    for start in range(0, len(rows), 10000):
+        db.session.execute(Location.__table__.insert(), rows[start:start + 10000])
+    db.session.commit()
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1000000, help='number of locations (default 1000000)')
+    parser.add_argument('--cell', type=float, default=0.1, help='grid cell size in degrees (default 0.1)')
+    parser.add_argument('--k', type=int, default=20, help='k for the k-nearest query (default 20)')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per indexed query (default 20)')
+    parser.add_argument('--database', action='store_true', help='also time the geohash SQL prefilter on SQLite')
+    args = parser.parse_args()
+
+    print(f"Generating {args.points} points...")
+    points = synthetic_points(args.points)
+
+    grid = SpatialGrid(cell_degrees=args.cell)
+    build_ms, _ = timed(lambda: grid.build(points))
+    print(f"Grid build:     {build_ms:10.1f} ms")
+    arrays = None
+    if HAS_NUMPY:
+        arrays = PointArrays()
+        build_ms, _ = timed(lambda: arrays.build(points))
+        print(f"Arrays build:   {build_ms:10.1f} ms")
+    print()
+
+    app = None
+    if args.database:
+        app = Flask(__name__)
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='viego-nearby-bench-'), 'bench.db')}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        )
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            seed_ms, _ = timed(lambda: seed_database(points))
+            print(f"SQLite seed:    {seed_ms:10.1f} ms\n")
+
+    header = f"{'query':<18} {'hits':>7} {'brute ms':>10} {'grid ms':>9} {f'k={args.k} ms':>9}"
+    if arrays is not None:
+        header += f" {'arrays ms':>9} {f'k={args.k} ms':>9}"
+    print(header + (f" {'sql ms':>9}" if args.database else ''))
+    for label, lat, lng, radius in QUERIES:
+        brute_ms, expected = timed(lambda: brute_force(points, lat, lng, radius))
+        grid_ms, hits = timed(lambda: grid.within(lat, lng, radius), args.repeat)
+        assert hits == expected, f'grid result differs from brute force for {label}'
+        knn_ms, nearest = timed(lambda: grid.nearest(lat, lng, args.k), args.repeat)
+        assert nearest == brute_force(points, lat, lng, nearest[-1][0])[:args.k]
+        line = f"{label:<18} {len(hits):>7} {brute_ms:10.1f} {grid_ms:9.2f} {knn_ms:9.2f}"
+        if arrays is not None:
+            arrays_ms, array_hits = timed(lambda: arrays.within(lat, lng, radius), args.repeat)
+            assert [i for _, i in array_hits] == [i for _, i in expected], f'arrays result differs for {label}'
+            arrays_knn_ms, array_nearest = timed(lambda: arrays.nearest(lat, lng, args.k), args.repeat)
+            assert [i for _, i in array_nearest] == [i for _, i in nearest]
+            line += f" {arrays_ms:9.2f} {arrays_knn_ms:9.2f}"
+        if args.database:
+            with app.app_context():
+                sql_ms, sql_hits = timed(lambda: nearby_from_database(lat, lng, radius), max(args.repeat // 4, 1))
+            assert sql_hits == expected, f'database result differs from brute force for {label}'
+            line += f" {sql_ms:9.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,134 @@
+"""
+Benchmark: in-process BM25 index vs the LIKE search path
+Seeds a SQLite file with synthetic Vietnamese posts, then times
+- GET /api/posts/?search=... style LIKE scans (utils/search.py fallback)
+- SearchIndex.search() on the same queries
+- building the index from the database and loading it from a snapshot
+
+Usage (from backend/):
+    python benchmarks/search_index_benchmark.py --posts 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import main  # noqa: F401  (imports every model so relationships resolve)
+from models import db
+from models.user import User
+from models.post import Post
+from utils.search import apply_search
+from utils.search_index import SearchIndex
+
+PLACES = (
+    'vịnh hạ long phố cổ hội an đà lạt sa pa phú quốc huế nha trang mũi né '
+    'côn đảo ninh bình tràng an cát bà mộc châu hà giang đồng văn biển núi '
+    'thác chợ nổi ẩm thực phở bún chả bánh mì cà phê trứng du thuyền homestay '
+    'trekking ruộng bậc thang hang động chùa đền lăng mùa hoa săn mây cầu vàng'
+).split()
+SYLLABLES = 'ba bo ca cu da do ga ha ho ke la lo ma mi na no pha qua ra sa ta tho tra va xa'.split()
+
+# Accented queries are what the LIKE path needs; the index also accepts them unaccented
+QUERIES = ['Hạ Long', 'hội an', 'phở', 'ruộng bậc thang', 'cà phê trứng', 'mộc châu mùa hoa']
+
+
+def vocabulary(rng, size=20000):
+    """Filler words; place and food words are mixed in at about 1 word in 10"""
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(size)]
+
+
+def sentence(rng, words, length):
+    return ' '.join(rng.choice(PLACES) if rng.random() < 0.1 else rng.choice(words) for _ in range(length))
+
+
+def seed(count, seed_value=42):
+    rng = random.Random(seed_value)
+    words = vocabulary(rng)
+    author = User(username='bench', email='bench@example.com', password='password123')
+    db.session.add(author)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        rows.append({
+            'title': sentence(rng, words, 6).capitalize(),
+            'slug': f'bench-{i}',
+            'excerpt': sentence(rng, words, 20),
+            'content': sentence(rng, words, 200),
+            'author_id': author.id,
+            'status': 'published',
+            'content_type': 'blog',
+            'created_at': now,
+            'updated_at': now,
+            'published_at': now,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Post.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Post.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=100000, help='number of posts to seed (default 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per query (default 3)')
+    parser.add_argument('--limit', type=int, default=20, help='results per query (default 20)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='viego-search-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SEARCH_BACKEND='like',
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {args.posts} posts into {workdir}...")
+        started = time.perf_counter()
+        seed(args.posts)
+        print(f"   done in {time.perf_counter() - started:.1f}s\n")
+
+        index = SearchIndex()
+        build_ms, _ = timed(index.build, 1)
+        snapshot = os.path.join(workdir, 'search_index.bin')
+        index.save(snapshot)
+        load_ms, _ = timed(lambda: SearchIndex.load(snapshot), 1)
+        stats = index.stats()['post']
+        print(f"Index build:    {build_ms:10.1f} ms  ({stats['documents']} docs, {stats['terms']} terms)")
+        print(f"Snapshot load:  {load_ms:10.1f} ms  ({os.path.getsize(snapshot) / 1024:.0f} KiB on disk)\n")
+
+        print(f"{'query':<20} {'LIKE ms':>10} {'index ms':>10} {'speedup':>9}")
+        for query in QUERIES:
+            like_query = apply_search(Post.query.filter_by(status='published'), 'post', query)
+            # Same work as GET /api/posts/?search=: total count plus the first page
+            like_ms, _ = timed(
+                lambda: (like_query.count(),
+                         like_query.order_by(Post.published_at.desc(), Post.id.desc()).limit(args.limit).all()),
+                args.repeat
+            )
+            index_ms, _ = timed(lambda: index.search(query, entities=['post'], limit=args.limit), args.repeat)
+            print(f"{query:<20} {like_ms:10.2f} {index_ms:10.2f} {like_ms / max(index_ms, 1e-6):8.1f}x")
+
+
+if __name__ == '__main__':
+    run()
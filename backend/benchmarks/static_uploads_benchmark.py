@@ -0,0 +1,106 @@
+"""
+Benchmark: serving /uploads/ from Flask vs. handing it to the front server
+- bare: the old send_from_directory route (default headers)
+- flask: routes/media.py sending the bytes itself (ETag, immutable, Range)
+- offload: routes/media.py with UPLOADS_OFFLOAD=x-accel, answering with an
+  empty X-Accel-Redirect response that nginx completes
+Each file is fetched in full, revalidated (If-None-Match -> 304) and, for
+the video, seeked (Range). Requests go through the WSGI test client, so the
+numbers are the per-request cost inside the Flask worker: what a page with
+dozens of avatars and thumbnails costs the worker on every load.
+
+Usage (from backend/):
+    python benchmarks/static_uploads_benchmark.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, send_from_directory
+
+import main  # noqa: F401  (imports every model so relationships resolve)
+from routes.media import media_bp
+
+DIGEST = '5e' * 32
+FILES = [
+    # (label, path relative to UPLOAD_FOLDER, size in bytes)
+    ('avatar 96px', f'5e/5e/{DIGEST}_small.webp', 4 * 1024),
+    ('thumb 320px', f'5e/5e/{DIGEST}_thumb.webp', 24 * 1024),
+    ('image 1600px', f'5e/5e/{DIGEST}_large.jpg', 400 * 1024),
+    ('video', f'5e/5e/{DIGEST}.mp4', 20 * 1024 * 1024),
+]
+
+
+def make_uploads():
+    folder = tempfile.mkdtemp(prefix='viego-static-bench-')
+    for _, relative, size in FILES:
+        path = os.path.join(folder, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            out.write(os.urandom(size))
+    return folder
+
+
+def bare_app(folder):
+    app = Flask(__name__)
+
+    @app.route('/uploads/<path:filename>')
+    def serve_uploads(filename):
+        return send_from_directory(folder, filename)
+
+    return app
+
+
+def media_app(folder, offload=''):
+    app = Flask(__name__)
+    app.config.update(UPLOAD_FOLDER=folder, UPLOADS_OFFLOAD=offload)
+    app.register_blueprint(media_bp)
+    return app
+
+
+def per_request_us(client, url, count, headers=None):
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, headers=headers)
+        response.get_data()  # consume the body like a server would
+        response.close()
+    return (time.perf_counter() - started) / count * 1e6, response
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per measurement (default 2000)')
+    args = parser.parse_args()
+
+    folder = make_uploads()
+    clients = {
+        'bare': bare_app(folder).test_client(),
+        'flask': media_app(folder).test_client(),
+        'offload': media_app(folder, 'x-accel').test_client(),
+    }
+
+    print(f"{'file':<14} {'request':<12} {'bare us':>10} {'flask us':>10} {'offload us':>11}  cache-control (flask)")
+    for label, relative, size in FILES:
+        url = f'/uploads/{relative}'
+        count = max(args.requests * 4096 // max(size, 4096), 20)
+        etag = clients['flask'].get(url).headers['ETag']
+        cases = [('full', None), ('304', {'If-None-Match': etag})]
+        if label == 'video':
+            cases.append(('range 1MB', {'Range': 'bytes=5242880-6291455'}))
+        for request_label, headers in cases:
+            timings = {}
+            for name, client in clients.items():
+                timings[name], response = per_request_us(client, url, count, headers)
+                if name == 'flask':
+                    cache_control = response.headers.get('Cache-Control', '')
+                    status = response.status_code
+            print(f"{label:<14} {request_label:<12} {timings['bare']:10.1f} {timings['flask']:10.1f} "
+                  f"{timings['offload']:11.1f}  {status} {cache_control}")
+
+
+if __name__ == '__main__':
+    run()
@@ -1,6 +1,6 @@
 import os
 import sys
-from flask import Flask, jsonify, request, session, send_from_directory
+from flask import Flask, jsonify, request, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 # from flask_socketio import SocketIO  # Disabled for now
@@ -49,7 +49,13 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 
 # File upload configuration
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
+# Limits request.form/request.files bodies; /api/upload streams with its own per-type limits
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))
+# /uploads/ serving: x-accel (nginx) or x-sendfile hands the bytes to the front server;
+# max-age of uploads that are not content-addressed (those are immutable)
+app.config['UPLOADS_OFFLOAD'] = os.getenv('UPLOADS_OFFLOAD', '')
+app.config['UPLOADS_ACCEL_PREFIX'] = os.getenv('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+app.config['UPLOADS_MAX_AGE'] = int(os.getenv('UPLOADS_MAX_AGE', 86400))
 
 # Initialize extensions
 # Initialize db through models package to avoid circular imports
@@ -63,16 +69,62 @@ print("ℹ️ SocketIO disabled - using standard Flask server")
 # Configure CORS with simple settings
 CORS(app, 
      origins=["http://localhost:3000", "http://127.0.0.1:3000"],
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+     allow_headers=["Content-Type", "Authorization", "Upload-Offset", "Upload-Length", "Upload-Checksum"],
+     expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires"],
+     methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
      supports_credentials=True,
      max_age=3600)
 
 babel = Babel(app)
 
+# Buffered view counters (flushed periodically and on shutdown)
+from utils.view_counter import init_view_counter
+app.config['VIEW_COUNTER_FLUSH_INTERVAL'] = int(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', 10))
+app.config['VIEW_COUNTER_MAX_PENDING'] = int(os.getenv('VIEW_COUNTER_MAX_PENDING', 500))
+view_counter = init_view_counter(app)
+
+# Trending posts (/api/posts/trending): seconds between post_scores snapshots (0 = off, scores stay in memory)
+from utils.trending import init_trending
+app.config['TRENDING_SNAPSHOT_INTERVAL'] = int(os.getenv('TRENDING_SNAPSHOT_INTERVAL', 60))
+init_trending(app)
+
 # Import cache utilities
+app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# Seconds between reads of the cache evictions made by other workers (cache_invalidations table)
+app.config['CACHE_INVALIDATION_POLL_INTERVAL'] = float(os.getenv('CACHE_INVALIDATION_POLL_INTERVAL', 2))
+# Cache-Control for public detail pages (post, tour, location) behind a CDN
+app.config['DETAIL_CACHE_SHARED_MAX_AGE'] = int(os.getenv('DETAIL_CACHE_SHARED_MAX_AGE', 60))
+app.config['DETAIL_CACHE_STALE_WHILE_REVALIDATE'] = int(os.getenv('DETAIL_CACHE_STALE_WHILE_REVALIDATE', 300))
+# In-process search index (/api/search): snapshot file and how often to catch up with other workers
+app.config['SEARCH_INDEX_SNAPSHOT'] = os.getenv('SEARCH_INDEX_SNAPSHOT', os.path.join(app.instance_path, 'search_index.bin'))
+app.config['SEARCH_INDEX_REFRESH_INTERVAL'] = int(os.getenv('SEARCH_INDEX_REFRESH_INTERVAL', 300))
+# Autocomplete (/api/search/suggest): background refresh of popularity, tags and provinces
+app.config['SUGGEST_REFRESH_INTERVAL'] = int(os.getenv('SUGGEST_REFRESH_INTERVAL', 300))
+# /api/maps/nearby: in-memory index ('grid') or geohash-prefiltered SQL ('database')
+app.config['NEARBY_BACKEND'] = os.getenv('NEARBY_BACKEND', 'grid')
+# In-memory index: NumPy arrays ('arrays'), Python grid ('grid') or arrays when NumPy is installed ('auto')
+app.config['NEARBY_INDEX'] = os.getenv('NEARBY_INDEX', 'auto')
+app.config['NEARBY_GRID_CELL_DEGREES'] = float(os.getenv('NEARBY_GRID_CELL_DEGREES', 0.1))
+# /api/maps/clusters: deepest precomputed zoom level (deeper zooms are clustered per request)
+app.config['CLUSTER_MAX_ZOOM'] = int(os.getenv('CLUSTER_MAX_ZOOM', 12))
+# Upload post-processing (image variants): worker processes (0 = inline), queue bound and retries
+app.config['UPLOAD_JOB_WORKERS'] = int(os.getenv('UPLOAD_JOB_WORKERS', 2))
+app.config['UPLOAD_JOB_MAX_PENDING'] = int(os.getenv('UPLOAD_JOB_MAX_PENDING', 100))
+app.config['UPLOAD_JOB_MAX_RETRIES'] = int(os.getenv('UPLOAD_JOB_MAX_RETRIES', 2))
+# Resumable video uploads: hours an idle session is kept, largest PATCH chunk in bytes
+app.config['RESUMABLE_UPLOAD_TTL'] = int(os.getenv('RESUMABLE_UPLOAD_TTL', 24))
+app.config['RESUMABLE_MAX_CHUNK'] = int(os.getenv('RESUMABLE_MAX_CHUNK', 8388608))
+# Home timeline (/api/social/timeline): authors above the follower limit are read on demand instead of fanned out
+app.config['TIMELINE_FANOUT_LIMIT'] = int(os.getenv('TIMELINE_FANOUT_LIMIT', 5000))
+app.config['TIMELINE_MAX_ENTRIES'] = int(os.getenv('TIMELINE_MAX_ENTRIES', 800))
+app.config['TIMELINE_BACKFILL'] = int(os.getenv('TIMELINE_BACKFILL', 20))
 try:
     from utils.cache import cache, cached_route
+    from utils.cache_invalidation import init_cache_invalidation
+    # Register the write hooks now: a worker shares its evictions even before it caches anything itself
+    init_cache_invalidation()
     print("✅ Cache system initialized")
 except ImportError:
     print("⚠️  Cache system not available")
@@ -126,6 +178,8 @@ try:
     from routes.locations import locations_bp
     from routes.users import users_bp
     from routes.stories import stories_bp
+    from routes.search import search_bp
+    from routes.media import media_bp
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -143,6 +197,8 @@ try:
     app.register_blueprint(locations_bp)  # NEW: locations routes
     app.register_blueprint(users_bp)      # NEW: users routes
     app.register_blueprint(stories_bp)    # NEW: stories routes
+    app.register_blueprint(search_bp)     # search_bp already has /api/search prefix
+    app.register_blueprint(media_bp)      # serves /uploads/
     print("✅ Routes registered successfully (auth, posts, test, admin, tours, maps, nfts, comments, social, upload, locations, users, stories)")
 except ImportError as e:
     print(f"⚠️  Some routes not found: {e}")
@@ -152,6 +208,27 @@ if socketio:
     from socket_handlers import register_socket_handlers
     register_socket_handlers(socketio)
 
+# Content-addressed uploads: reference counts follow the URL columns, `flask --app main uploads-gc` deletes the rest
+from utils.blob_store import register_reference_hooks, uploads_gc_command
+register_reference_hooks()
+app.cli.add_command(uploads_gc_command)
+
+# Home timelines: published posts fan out to followers and each list keeps its newest TIMELINE_MAX_ENTRIES posts
+from utils.timeline import register_timeline_hooks, timeline_trim_command
+register_timeline_hooks()
+app.cli.add_command(timeline_trim_command)
+
+# Per-user follower/following/post/comment counts follow every write, `flask --app main counters-reconcile` repairs drift
+from utils.counters import counters_reconcile_command, register_user_counter_hooks
+register_user_counter_hooks()
+app.cli.add_command(counters_reconcile_command)
+
+# Search index and autocomplete: loaded and refreshed by background threads, never by a request
+from utils.search_index import init_search_index
+from utils.suggest import init_suggest_index
+init_search_index(app)
+init_suggest_index(app)
+
 # Health check endpoint
 @app.route('/api/health')
 def health_check():
@@ -183,13 +260,6 @@ def invalid_token_callback(error):
 def missing_token_callback(error):
     return jsonify({'error': 'Authorization token is required'}), 401
 
-# Serve uploaded files
-@app.route('/uploads/<path:filename>')
-def serve_uploads(filename):
-    """Serve uploaded files"""
-    upload_folder = app.config['UPLOAD_FOLDER']
-    return send_from_directory(upload_folder, filename)
-
 # Create tables
 def create_tables():
     """Create database tables if they don't exist"""
@@ -12,7 +12,11 @@ def init_db(app):
 # Import models so they are registered with SQLAlchemy when package is imported
 try:
     from .user import User  # noqa: F401
+    from .social import PostLike, PostBookmark, UserFollow, TimelineEntry  # noqa: F401
     from .tour import Tour  # noqa: F401
     from .booking import Booking  # noqa: F401
+    from .upload import UploadBlob  # noqa: F401
+    from .post_score import PostScore  # noqa: F401
+    from .cache_invalidation import CacheInvalidation  # noqa: F401
 except Exception:
     pass
\ No newline at end of file
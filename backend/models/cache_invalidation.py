@@ -0,0 +1,22 @@
+from datetime import datetime
+
+# Import db from models package
+from . import db
+
+
+class CacheInvalidation(db.Model):
+    """A cache tag evicted by one worker, read by the others (see utils/cache_invalidation.py)"""
+    __tablename__ = 'cache_invalidations'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    tag = db.Column(db.String(100), nullable=False)
+    # Worker that evicted it already ("<host>-<pid>")
+    origin = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_cache_invalidations_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<CacheInvalidation {self.tag} from {self.origin}>'
@@ -36,6 +36,11 @@ class Comment(db.Model):
     # Legacy compatibility: map old `user_id` column if present in DB so inserts include it
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     
+    # Thread order for keyset pagination: WHERE post_id = ... AND parent_id IS NULL ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        db.Index('idx_comments_thread', 'post_id', 'parent_id', 'created_at', 'id'),
+    )
+    
     # Self-referential relationship for replies
     parent = db.relationship('Comment', remote_side=[id], backref='replies')
     
@@ -65,8 +70,9 @@ class Comment(db.Model):
             level=self.level + 1
         )
         
-        # Update replies count
-        self.replies_count += 1
+        # Update replies count atomically
+        from utils.counters import increment_counter
+        increment_counter('comment', self.id, 'replies_count')
         
         return reply
     
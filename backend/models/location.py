@@ -1,7 +1,10 @@
 from datetime import datetime
 
+from sqlalchemy import event
+
 # Import db from models package
 from . import db
+from utils.geo import geohash_encode
 
 class Location(db.Model):
     __tablename__ = 'locations'
@@ -13,6 +16,7 @@ class Location(db.Model):
     # Geographic data
     latitude = db.Column(db.Float, nullable=False, index=True)
     longitude = db.Column(db.Float, nullable=False, index=True)
+    geohash = db.Column(db.String(12), index=True)  # kept in sync with latitude/longitude
     address = db.Column(db.String(500))
     city = db.Column(db.String(100))
     province = db.Column(db.String(100))
@@ -103,6 +107,11 @@ class Location(db.Model):
         import json
         self.languages_spoken = json.dumps(links_dict)  # Reusing field
     
+    def update_geohash(self):
+        """Recompute the geohash used to prefilter nearby searches"""
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+
     def increment_views(self):
         """Increment view count - disabled until views_count added to schema"""
         pass  # self.views_count = (self.views_count or 0) + 1
@@ -136,4 +145,10 @@ class Location(db.Model):
         }
     
     def __repr__(self):
-        return f'<Location {self.name}>'
\ No newline at end of file
+        return f'<Location {self.name}>'
+
+
+@event.listens_for(Location, 'before_insert')
+@event.listens_for(Location, 'before_update')
+def _set_geohash(mapper, connection, target):
+    target.update_geohash()
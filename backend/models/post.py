@@ -3,6 +3,7 @@ import json
 
 # Import db from models package
 from . import db
+from utils.text import fold_vietnamese
 
 class Post(db.Model):
     __tablename__ = 'posts'
@@ -66,6 +67,11 @@ class Post(db.Model):
     # Foreign Keys
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
+    # Feed order for keyset pagination: WHERE status = ... ORDER BY published_at DESC, id DESC
+    __table_args__ = (
+        db.Index('idx_posts_feed', 'status', 'published_at', 'id'),
+    )
+    
     # Relationships
     # comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     
@@ -78,15 +84,8 @@ class Post(db.Model):
     def generate_slug(self, title):
         """Generate URL-friendly slug from title"""
         import re
-        slug = title.lower()
-        # Remove Vietnamese accents and special characters
-        slug = re.sub(r'[àáạảãâầấậẩẫăằắặẳẵ]', 'a', slug)
-        slug = re.sub(r'[èéẹẻẽêềếệểễ]', 'e', slug)
-        slug = re.sub(r'[ìíịỉĩ]', 'i', slug)
-        slug = re.sub(r'[òóọỏõôồốộổỗơờớợởỡ]', 'o', slug)
-        slug = re.sub(r'[ùúụủũưừứựửữ]', 'u', slug)
-        slug = re.sub(r'[ỳýỵỷỹ]', 'y', slug)
-        slug = re.sub(r'[đ]', 'd', slug)
+        # Remove Vietnamese accents (shared with the search index) and special characters
+        slug = fold_vietnamese(title)
         slug = re.sub(r'[^a-z0-9]+', '-', slug)
         slug = slug.strip('-')
         
@@ -158,13 +157,20 @@ class Post(db.Model):
         """Increment view count"""
         self.views_count += 1
     
-    def increment_likes(self):
-        """Increment likes count"""
-        self.likes_count += 1
+    def increment_likes(self, amount=1):
+        """Increment likes count atomically in SQL (refreshed on next access after commit)"""
+        from utils.counters import increment_counter
+        increment_counter('post', self.id, 'likes_count', amount)
+    
+    def decrement_likes(self, amount=1):
+        """Decrement likes count atomically in SQL, never below 0"""
+        from utils.counters import decrement_counter
+        decrement_counter('post', self.id, 'likes_count', amount)
     
-    def increment_shares(self):
-        """Increment shares count"""
-        self.shares_count += 1
+    def increment_shares(self, amount=1):
+        """Increment shares count atomically in SQL"""
+        from utils.counters import increment_counter
+        increment_counter('post', self.id, 'shares_count', amount)
     
     def publish(self):
         """Publish the post"""
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+# Import db from models package
+from . import db
+
+
+class PostScore(db.Model):
+    """Snapshot of a post's time-decayed trending score for one window (see utils/trending.py)"""
+    __tablename__ = 'post_scores'
+
+    period = db.Column(db.String(8), primary_key=True)  # '24h' or '7d'
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    # Decayed score as of updated_at; halves every quarter of the window after that
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_post_scores_post', 'post_id'),
+    )
+
+    def __repr__(self):
+        return f'<PostScore {self.period} post={self.post_id} score={self.score:.2f}>'
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+# Import db from models package
+from . import db
+
+
+class PostLike(db.Model):
+    """One row per (user, post) like"""
+    __tablename__ = 'post_likes'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Reverse index for "who liked this post"
+    __table_args__ = (
+        db.Index('idx_post_likes_post', 'post_id', 'user_id'),
+    )
+
+    @classmethod
+    def user_ids_for_post(cls, post_id):
+        """IDs of users who liked a post"""
+        rows = db.session.query(cls.user_id).filter(cls.post_id == post_id).all()
+        return [row.user_id for row in rows]
+
+    def __repr__(self):
+        return f'<PostLike user={self.user_id} post={self.post_id}>'
+
+
+class PostBookmark(db.Model):
+    """One row per (user, post) bookmark"""
+    __tablename__ = 'post_bookmarks'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_post_bookmarks_post', 'post_id', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<PostBookmark user={self.user_id} post={self.post_id}>'
+
+
+class UserFollow(db.Model):
+    """One row per follow edge (follower -> followed)"""
+    __tablename__ = 'user_follows'
+
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    followed_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Reverse index for follower lists
+    __table_args__ = (
+        db.Index('idx_user_follows_followed', 'followed_id', 'follower_id'),
+    )
+
+    def __repr__(self):
+        return f'<UserFollow {self.follower_id} -> {self.followed_id}>'
+
+
+class TimelineEntry(db.Model):
+    """One post in a follower's home timeline (written when the post is published)"""
+    __tablename__ = 'timeline_entries'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    published_at = db.Column(db.DateTime, nullable=False)
+
+    # Timeline pages: WHERE user_id = ? ORDER BY published_at DESC, post_id DESC
+    __table_args__ = (
+        db.Index('idx_timeline_entries_feed', 'user_id', 'published_at', 'post_id'),
+        db.Index('idx_timeline_entries_author', 'user_id', 'author_id'),
+        db.Index('idx_timeline_entries_post', 'post_id'),
+    )
+
+    def __repr__(self):
+        return f'<TimelineEntry user={self.user_id} post={self.post_id}>'
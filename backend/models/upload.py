@@ -0,0 +1,46 @@
+from datetime import datetime
+
+# Import db from models package
+from . import db
+
+
+class UploadBlob(db.Model):
+    """One stored upload file, addressed by the SHA-256 of the uploaded bytes"""
+    __tablename__ = 'upload_blobs'
+
+    digest = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(10), nullable=False)
+    kind = db.Column(db.Enum('image', 'video'), nullable=False, default='image')
+    size = db.Column(db.BigInteger, nullable=False, default=0)
+    # Rows (posts, users, tours, ...) whose URL columns point at this blob or its variants
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Last time the blob was uploaded again or lost a reference; GC grace starts here
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Garbage collection scans unreferenced blobs oldest first
+    __table_args__ = (
+        db.Index('idx_upload_blobs_unreferenced', 'ref_count', 'updated_at'),
+    )
+
+    @property
+    def path(self):
+        """Path relative to UPLOAD_FOLDER: ab/cd/<digest>.<ext>"""
+        return f'{self.digest[:2]}/{self.digest[2:4]}/{self.digest}.{self.ext}'
+
+    @property
+    def url(self):
+        return f'/uploads/{self.path}'
+
+    def to_dict(self):
+        return {
+            'digest': self.digest,
+            'url': self.url,
+            'kind': self.kind,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadBlob {self.digest[:12]} refs={self.ref_count}>'
@@ -4,6 +4,7 @@ import json
 
 # Import db from models package
 from . import db
+from .social import PostLike, PostBookmark, UserFollow
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -30,6 +31,13 @@ class User(db.Model):
     level = db.Column(db.Integer, default=1, nullable=False, server_default='1')
     badges = db.Column(db.Text)  # JSON string of earned badges
     
+    # Denormalized counts, kept in step by utils/counters.py on follow, post
+    # and comment writes (`flask --app main counters-reconcile` repairs drift)
+    followers_count = db.Column(db.Integer, default=0, nullable=False, server_default='0', index=True)
+    following_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    posts_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # published posts
+    comments_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # approved comments
+    
     # Location and preferences
     location = db.Column(db.String(255))
     language = db.Column(db.String(10), default='vi')
@@ -38,7 +46,9 @@ class User(db.Model):
     # Social media links
     social_links = db.Column(db.Text)  # JSON string
     
-    # Social features
+    # Legacy social JSON columns - superseded by the post_likes, post_bookmarks
+    # and user_follows tables (see database/migrate_social_tables.py), kept
+    # only so old rows can still be backfilled
     bookmarks = db.Column(db.Text)  # JSON array of bookmarked post IDs
     liked_posts = db.Column(db.Text)  # JSON array of liked post IDs
     following = db.Column(db.Text)  # JSON array of user IDs being followed
@@ -129,31 +139,26 @@ class User(db.Model):
     
     def get_bookmarks(self):
         """Get user's bookmarked post IDs"""
-        if self.bookmarks:
-            return json.loads(self.bookmarks)
-        return []
+        rows = db.session.query(PostBookmark.post_id).filter(
+            PostBookmark.user_id == self.id
+        ).order_by(PostBookmark.created_at).all()
+        return [row.post_id for row in rows]
     
-    def set_bookmarks(self, bookmark_ids):
-        """Set bookmarked post IDs"""
-        self.bookmarks = json.dumps(bookmark_ids)
+    def has_bookmarked(self, post_id):
+        """Check if a post is bookmarked (primary key lookup)"""
+        return db.session.get(PostBookmark, (self.id, post_id)) is not None
     
     def add_bookmark(self, post_id):
         """Add a post to bookmarks"""
-        bookmarks = self.get_bookmarks()
-        if post_id not in bookmarks:
-            bookmarks.append(post_id)
-            self.set_bookmarks(bookmarks)
-            return True
-        return False
+        if self.has_bookmarked(post_id):
+            return False
+        db.session.add(PostBookmark(user_id=self.id, post_id=post_id))
+        return True
     
     def remove_bookmark(self, post_id):
         """Remove a post from bookmarks"""
-        bookmarks = self.get_bookmarks()
-        if post_id in bookmarks:
-            bookmarks.remove(post_id)
-            self.set_bookmarks(bookmarks)
-            return True
-        return False
+        deleted = PostBookmark.query.filter_by(user_id=self.id, post_id=post_id).delete()
+        return deleted > 0
     
     # ==================== 
     # Likes Methods
@@ -161,31 +166,26 @@ class User(db.Model):
     
     def get_liked_posts(self):
         """Get user's liked post IDs"""
-        if self.liked_posts:
-            return json.loads(self.liked_posts)
-        return []
+        rows = db.session.query(PostLike.post_id).filter(
+            PostLike.user_id == self.id
+        ).order_by(PostLike.created_at).all()
+        return [row.post_id for row in rows]
     
-    def set_liked_posts(self, post_ids):
-        """Set liked post IDs"""
-        self.liked_posts = json.dumps(post_ids)
+    def has_liked(self, post_id):
+        """Check if a post is liked (primary key lookup)"""
+        return db.session.get(PostLike, (self.id, post_id)) is not None
     
     def like_post(self, post_id):
         """Like a post"""
-        liked = self.get_liked_posts()
-        if post_id not in liked:
-            liked.append(post_id)
-            self.set_liked_posts(liked)
-            return True
-        return False
+        if self.has_liked(post_id):
+            return False
+        db.session.add(PostLike(user_id=self.id, post_id=post_id))
+        return True
     
     def unlike_post(self, post_id):
         """Unlike a post"""
-        liked = self.get_liked_posts()
-        if post_id in liked:
-            liked.remove(post_id)
-            self.set_liked_posts(liked)
-            return True
-        return False
+        deleted = PostLike.query.filter_by(user_id=self.id, post_id=post_id).delete()
+        return deleted > 0
     
     # ==================== 
     # Follow/Following Methods
@@ -193,47 +193,45 @@ class User(db.Model):
     
     def get_following(self):
         """Get list of user IDs this user is following"""
-        if self.following:
-            return json.loads(self.following)
-        return []
-    
-    def set_following(self, user_ids):
-        """Set following user IDs"""
-        self.following = json.dumps(user_ids)
+        rows = db.session.query(UserFollow.followed_id).filter(
+            UserFollow.follower_id == self.id
+        ).order_by(UserFollow.created_at).all()
+        return [row.followed_id for row in rows]
     
     def get_followers(self):
         """Get list of user IDs following this user"""
-        if self.followers:
-            return json.loads(self.followers)
-        return []
+        rows = db.session.query(UserFollow.follower_id).filter(
+            UserFollow.followed_id == self.id
+        ).order_by(UserFollow.created_at).all()
+        return [row.follower_id for row in rows]
     
-    def set_followers(self, user_ids):
-        """Set follower user IDs"""
-        self.followers = json.dumps(user_ids)
+    def is_following(self, user_id):
+        """Check if this user follows another user (primary key lookup)"""
+        return db.session.get(UserFollow, (self.id, user_id)) is not None
     
     def follow(self, user_id):
         """Follow another user"""
-        following = self.get_following()
-        if user_id not in following:
-            following.append(user_id)
-            self.set_following(following)
-            return True
-        return False
+        if self.is_following(user_id):
+            return False
+        db.session.add(UserFollow(follower_id=self.id, followed_id=user_id))
+        return True
     
     def unfollow(self, user_id):
         """Unfollow a user"""
-        following = self.get_following()
-        if user_id in following:
-            following.remove(user_id)
-            self.set_following(following)
-            return True
-        return False
+        # ORM delete so session hooks (timeline cleanup) see the removed edge
+        follow = db.session.get(UserFollow, (self.id, user_id))
+        if follow is None:
+            return False
+        db.session.delete(follow)
+        return True
     
     def get_stats(self):
         """Get user statistics"""
         return {
-            'posts_count': 0,  # self.posts.count(),
-            'comments_count': 0,  # self.comments.count(), 
+            'posts_count': self.posts_count or 0,
+            'comments_count': self.comments_count or 0,
+            'followers_count': self.followers_count or 0,
+            'following_count': self.following_count or 0,
             'nfts_count': 0,  # self.nfts.count(),
             'points': self.points,
             'level': self.level,
@@ -16,6 +16,11 @@ from models.user import User
 from models.post import Post
 from models.comment import Comment
 from models.report import Report, ActivityLog
+from utils.hydration import load_authors
+from utils.view_counter import get_view_counter
+from utils.cache import get_response_cache
+from utils.pagination import InvalidCursor, keyset_paginate, wants_cursor
+from utils.search import apply_search
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -111,6 +116,24 @@ def get_dashboard_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/stats/view-counters', methods=['GET'])
+@admin_required
+def get_view_counter_stats():
+    """Get buffered view counter metrics (pending views, flush lag)"""
+    try:
+        return jsonify(get_view_counter().stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/stats/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get response cache metrics (size, hits, misses, evictions)"""
+    try:
+        return jsonify(get_response_cache().stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/activity/recent', methods=['GET'])
 @admin_required
 def get_recent_activity():
@@ -429,10 +452,12 @@ def get_posts():
         # Paginate
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
+        # Load authors for the whole page in one query
+        authors = load_authors(pagination.items)
+        
         posts = []
         for post in pagination.items:
-            # Get author info
-            author = User.query.get(post.author_id)
+            author = authors.get(post.author_id)
             
             posts.append({
                 'id': post.id,
@@ -536,11 +561,30 @@ def get_comments():
         if post_id:
             query = query.filter(Comment.post_id == post_id)
         
-        # Order by creation date
-        query = query.order_by(desc(Comment.created_at))
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Cursor mode (?cursor=): keyset on (created_at, id), no COUNT/OFFSET
+        if wants_cursor(request.args):
+            try:
+                pagination = keyset_paginate(query, Comment.created_at, Comment.id,
+                                             request.args.get('cursor'), per_page)
+            except InvalidCursor:
+                return jsonify({'error': 'Cursor không hợp lệ'}), 400
+            pagination_data = {
+                'perPage': per_page,
+                'nextCursor': pagination.next_cursor,
+                'hasNext': pagination.has_next
+            }
+        else:
+            # Order by creation date
+            query = query.order_by(desc(Comment.created_at), desc(Comment.id))
+            
+            # Paginate
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination_data = {
+                'currentPage': page,
+                'perPage': per_page,
+                'totalPages': pagination.pages,
+                'totalItems': pagination.total
+            }
         
         comments = []
         for comment in pagination.items:
@@ -565,12 +609,7 @@ def get_comments():
         
         return jsonify({
             'comments': comments,
-            'pagination': {
-                'currentPage': page,
-                'perPage': per_page,
-                'totalPages': pagination.pages,
-                'totalItems': pagination.total
-            }
+            'pagination': pagination_data
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -708,26 +747,13 @@ def global_search():
             return jsonify({'error': 'Search query required'}), 400
         
         # Search users
-        users = User.query.filter(
-            or_(
-                User.username.like(f'%{query}%'),
-                User.email.like(f'%{query}%'),
-                User.full_name.like(f'%{query}%')
-            )
-        ).limit(10).all()
+        users = apply_search(User.query, 'user', query).limit(10).all()
         
-        # Search posts
-        posts = Post.query.filter(
-            or_(
-                Post.title.like(f'%{query}%'),
-                Post.content.like(f'%{query}%')
-            )
-        ).limit(10).all()
+        # Search posts (FULLTEXT on MySQL, best matches first)
+        posts = apply_search(Post.query, 'post', query, mode=request.args.get('search_mode')).limit(10).all()
         
         # Search comments
-        comments = Comment.query.filter(
-            Comment.content.like(f'%{query}%')
-        ).limit(10).all()
+        comments = apply_search(Comment.query, 'comment', query).limit(10).all()
         
         results = {
             'users': [{
@@ -1093,11 +1119,30 @@ def get_activity_logs():
         if user_id:
             query = query.filter(ActivityLog.user_id == user_id)
         
-        # Order by creation date
-        query = query.order_by(desc(ActivityLog.created_at))
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Cursor mode (?cursor=): keyset on (created_at, id), no COUNT/OFFSET
+        if wants_cursor(request.args):
+            try:
+                pagination = keyset_paginate(query, ActivityLog.created_at, ActivityLog.id,
+                                             request.args.get('cursor'), per_page)
+            except InvalidCursor:
+                return jsonify({'error': 'Cursor không hợp lệ'}), 400
+            pagination_data = {
+                'perPage': per_page,
+                'nextCursor': pagination.next_cursor,
+                'hasNext': pagination.has_next
+            }
+        else:
+            # Order by creation date
+            query = query.order_by(desc(ActivityLog.created_at), desc(ActivityLog.id))
+            
+            # Paginate
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination_data = {
+                'currentPage': page,
+                'perPage': per_page,
+                'totalPages': pagination.pages,
+                'totalItems': pagination.total
+            }
         
         logs = []
         for log in pagination.items:
@@ -1121,12 +1166,7 @@ def get_activity_logs():
         
         return jsonify({
             'logs': logs,
-            'pagination': {
-                'currentPage': page,
-                'perPage': per_page,
-                'totalPages': pagination.pages,
-                'totalItems': pagination.total
-            }
+            'pagination': pagination_data
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -12,6 +12,9 @@ from models import db
 from models.user import User
 from models.post import Post
 from models.comment import Comment
+from utils.jwt_utils import get_current_user_id
+from utils.counters import batched_counters, increment_counter, decrement_counter
+from utils.pagination import InvalidCursor, keyset_paginate, wants_cursor
 
 comments_bp = Blueprint('comments', __name__, url_prefix='/api/comments')
 
@@ -79,12 +82,13 @@ def create_comment():
         
         db.session.add(comment)
         
-        # Update parent comment reply count
-        if parent_comment:
-            parent_comment.replies_count += 1
-        
-        # Update post comment count
-        post.comments_count += 1
+        with batched_counters():
+            # Update parent comment reply count
+            if parent_comment:
+                increment_counter('comment', parent_comment.id, 'replies_count')
+            
+            # Update post comment count
+            increment_counter('post', post.id, 'comments_count')
         
         db.session.commit()
         
@@ -129,15 +133,36 @@ def get_post_comments(post_id):
             post_id=post_id,
             parent_id=None,
             status='approved'
-        ).order_by(desc(Comment.created_at))
-        
-        comments_pagination = query.paginate(
-            page=page, per_page=per_page, error_out=False
         )
         
+        # Cursor mode (?cursor=): keyset on (created_at, id), no COUNT/OFFSET
+        if wants_cursor(request.args):
+            try:
+                comments_page = keyset_paginate(query, Comment.created_at, Comment.id,
+                                                request.args.get('cursor'), per_page)
+            except InvalidCursor:
+                return jsonify({'error': 'Cursor không hợp lệ'}), 400
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': comments_page.next_cursor,
+                'has_next': comments_page.has_next
+            }
+        else:
+            comments_page = query.order_by(desc(Comment.created_at), desc(Comment.id)).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            pagination = {
+                'page': comments_page.page,
+                'pages': comments_page.pages,
+                'per_page': comments_page.per_page,
+                'total': comments_page.total,
+                'has_next': comments_page.has_next,
+                'has_prev': comments_page.has_prev
+            }
+        
         # Format response with author info
         comments_data = []
-        for comment in comments_pagination.items:
+        for comment in comments_page.items:
             comment_dict = comment.to_dict(include_replies=False)
             
             # Include author info
@@ -153,14 +178,7 @@ def get_post_comments(post_id):
         
         return jsonify({
             'comments': comments_data,
-            'pagination': {
-                'page': comments_pagination.page,
-                'pages': comments_pagination.pages,
-                'per_page': comments_pagination.per_page,
-                'total': comments_pagination.total,
-                'has_next': comments_pagination.has_next,
-                'has_prev': comments_pagination.has_prev
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -249,7 +267,7 @@ def update_comment(comment_id):
 def delete_comment(comment_id):
     """Delete comment (soft delete - change status)"""
     try:
-        user_id = get_jwt_identity()
+        user_id = get_current_user_id()
         user = User.query.get(user_id)
         comment = Comment.query.get(comment_id)
         
@@ -263,16 +281,13 @@ def delete_comment(comment_id):
         # Soft delete - change status instead of deleting
         comment.status = 'rejected'
         
-        # Update post comment count
-        post = Post.query.get(comment.post_id)
-        if post and post.comments_count > 0:
-            post.comments_count -= 1
-        
-        # Update parent reply count if this is a reply
-        if comment.parent_id:
-            parent = Comment.query.get(comment.parent_id)
-            if parent and parent.replies_count > 0:
-                parent.replies_count -= 1
+        with batched_counters():
+            # Update post comment count (clamped at 0 in SQL)
+            decrement_counter('post', comment.post_id, 'comments_count')
+            
+            # Update parent reply count if this is a reply
+            if comment.parent_id:
+                decrement_counter('comment', comment.parent_id, 'replies_count')
         
         db.session.commit()
         
@@ -302,7 +317,7 @@ def like_comment(comment_id):
         
         # TODO: Implement proper like tracking with a likes table
         # For now, just increment the count
-        comment.likes_count += 1
+        increment_counter('comment', comment.id, 'likes_count')
         db.session.commit()
         
         return jsonify({
@@ -332,10 +347,9 @@ def unlike_comment(comment_id):
         if not comment:
             return jsonify({'error': 'Bình luận không tồn tại'}), 404
         
-        # Decrement like count
-        if comment.likes_count > 0:
-            comment.likes_count -= 1
-            db.session.commit()
+        # Decrement like count (clamped at 0 in SQL)
+        decrement_counter('comment', comment.id, 'likes_count')
+        db.session.commit()
         
         return jsonify({
             'message': 'Đã bỏ thích bình luận',
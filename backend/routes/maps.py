@@ -3,7 +3,7 @@ Maps and Locations Routes for VieGo Blog
 Handles location management and map-related features
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import or_, desc, func
 from datetime import datetime
@@ -12,6 +12,12 @@ import json
 from models import db
 from models.user import User
 from models.location import Location
+from utils.cache import cached_route
+from utils.http_cache import conditional_json
+from utils.search import apply_search
+from utils.geo import haversine_km
+from utils.spatial_index import get_spatial_index, nearby_from_database
+from utils.clusters import get_cluster_index
 
 maps_bp = Blueprint('maps', __name__, url_prefix='/api/maps')
 
@@ -51,12 +57,8 @@ def get_locations():
             query = query.filter(Location.rating >= min_rating)
         
         if search:
-            search_filter = or_(
-                Location.name.contains(search),
-                Location.description.contains(search),
-                Location.address.contains(search)
-            )
-            query = query.filter(search_filter)
+            # FULLTEXT MATCH ... AGAINST on MySQL (ranked by relevance), LIKE elsewhere
+            query = apply_search(query, 'location', search, mode=request.args.get('search_mode'))
         
         # Bounding box filter for map viewport
         if all([sw_lat, sw_lng, ne_lat, ne_lng]):
@@ -99,7 +101,10 @@ def get_location(location_id):
         location.increment_views()
         db.session.commit()
         
-        return jsonify(location.to_dict()), 200
+        return conditional_json(
+            location.to_dict,
+            [location.id, location.updated_at, location.rating, location.reviews_count]
+        )
         
     except Exception as e:
         return jsonify({'error': f'Lỗi lấy thông tin địa điểm: {str(e)}'}), 500
@@ -279,47 +284,83 @@ def rate_location(location_id):
 
 @maps_bp.route('/nearby', methods=['GET'])
 def get_nearby_locations():
-    """Get locations near a specific point"""
+    """Get locations near a specific point (?radius= km, or ?k= for the k nearest)"""
     try:
         lat = request.args.get('lat', type=float)
         lng = request.args.get('lng', type=float)
-        radius = request.args.get('radius', 10, type=float)  # km
+        k = request.args.get('k', type=int)
+        # k-nearest searches are unbounded unless a radius is given
+        radius = request.args.get('radius', None if k else 10, type=float)  # km
         category = request.args.get('category')
         limit = min(request.args.get('limit', 20, type=int), 50)
         
         if lat is None or lng is None:
             return jsonify({'error': 'Thiếu tọa độ (lat, lng)'}), 400
         
-        # Simple distance calculation using Haversine formula
-        # Note: For production, consider using PostGIS or similar
-        query = Location.query
-        
-        if category:
-            query = query.filter_by(category=category)
+        # Only points in the radius box (or its geohash prefixes) are measured
+        if k:
+            hits = get_spatial_index().nearest(lat, lng, min(k, 50), max_radius_km=radius, category=category)
+        elif current_app.config.get('NEARBY_BACKEND', 'grid') == 'database':
+            hits = nearby_from_database(lat, lng, radius, category)
+        else:
+            hits = get_spatial_index().within(lat, lng, radius, category)
         
-        locations = query.all()
+        page = hits if k else hits[:limit]
+        locations = {loc.id: loc for loc in Location.query.filter(Location.id.in_([i for _, i in page]))}
         
-        # Calculate distance and filter
         nearby = []
-        for loc in locations:
-            distance = calculate_distance(lat, lng, loc.latitude, loc.longitude)
-            if distance <= radius:
-                loc_dict = loc.to_dict()
+        for distance, location_id in page:
+            location = locations.get(location_id)
+            if location is not None:
+                loc_dict = location.to_dict()
                 loc_dict['distance'] = round(distance, 2)
                 nearby.append(loc_dict)
         
-        # Sort by distance
-        nearby.sort(key=lambda x: x['distance'])
-        
         return jsonify({
-            'locations': nearby[:limit],
-            'count': len(nearby)
+            'locations': nearby,
+            'count': len(hits)
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Lỗi tìm địa điểm gần: {str(e)}'}), 500
 
+@maps_bp.route('/clusters', methods=['GET'])
+def get_location_clusters():
+    """Get location markers clustered for a map viewport (?bbox=west,south,east,north&zoom=)"""
+    try:
+        zoom = request.args.get('zoom', type=int)
+        bbox = request.args.get('bbox')
+        
+        if bbox:
+            try:
+                west, south, east, north = (float(value) for value in bbox.split(','))
+            except ValueError:
+                return jsonify({'error': 'bbox không hợp lệ (west,south,east,north)'}), 400
+        else:
+            south = request.args.get('sw_lat', -90, type=float)
+            west = request.args.get('sw_lng', -180, type=float)
+            north = request.args.get('ne_lat', 90, type=float)
+            east = request.args.get('ne_lng', 180, type=float)
+        
+        if zoom is None or not 0 <= zoom <= 22:
+            return jsonify({'error': 'Thiếu hoặc sai mức zoom (0-22)'}), 400
+        
+        clusters = get_cluster_index().clusters((south, west, north, east), zoom)
+        
+        response = jsonify({
+            'zoom': zoom,
+            'clusters': clusters,
+            'count': sum(cluster['count'] for cluster in clusters)
+        })
+        response.cache_control.public = True
+        response.cache_control.max_age = 30
+        return response, 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi gom nhóm địa điểm: {str(e)}'}), 500
+
 @maps_bp.route('/categories', methods=['GET'])
+@cached_route(ttl=3600)
 def get_categories():
     """Get available location categories"""
     return jsonify({
@@ -334,6 +375,7 @@ def get_categories():
     }), 200
 
 @maps_bp.route('/statistics', methods=['GET'])
+@cached_route(ttl=3600, tags=['location:*'])
 def get_statistics():
     """Get map statistics"""
     try:
@@ -362,15 +404,4 @@ def get_statistics():
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points using Haversine formula"""
-    from math import radians, sin, cos, sqrt, atan2
-    
-    R = 6371  # Earth radius in km
-    
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    
-    return R * c
+    return haversine_km(lat1, lon1, lat2, lon2)
@@ -0,0 +1,96 @@
+"""
+Media Routes for VieGo Blog
+Serves UPLOAD_FOLDER under /uploads/ with cache headers that fit the files:
+- content-addressed files (ab/cd/<sha256>[_<variant>].<ext>, see
+  utils/blob_store.py) never change, so they are `immutable` for a year and
+  their ETag is the digest itself
+- older uploads (images/, avatars/, videos/) are cached for UPLOADS_MAX_AGE
+  and revalidated with an mtime/size ETag
+Range requests are answered with 206 so video seeking works. Behind nginx
+(UPLOADS_OFFLOAD=x-accel) or Apache/lighttpd (x-sendfile) the route only
+checks the path and sets the headers; the front server sends the bytes:
+
+    location /protected-uploads/ {
+        internal;
+        alias /path/to/backend/uploads/;
+    }
+"""
+
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+media_bp = Blueprint('media', __name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_MAX_AGE = 24 * 3600
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64}(?:_[a-z]+)?)\.[a-z0-9]+$')
+# Work-in-progress files that are not uploads yet
+PRIVATE_PREFIXES = ('tmp/', 'videos/resumable/')
+
+
+def upload_cache_policy(filename, stat):
+    """(strong ETag, max-age, immutable) for a file under UPLOAD_FOLDER"""
+    match = CONTENT_ADDRESSED.match(filename)
+    if match:
+        return match.group(1), IMMUTABLE_MAX_AGE, True
+    max_age = current_app.config.get('UPLOADS_MAX_AGE', DEFAULT_MAX_AGE)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}', max_age, False
+
+
+def offload_response(filename, path, etag, max_age, immutable):
+    """Empty response telling the front server which file to send"""
+    mode = current_app.config.get('UPLOADS_OFFLOAD')
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.set_etag(etag)
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+    elif mode == 'x-accel':
+        prefix = current_app.config.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + filename
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable or None
+    return response
+
+
+@media_bp.route('/uploads/<path:filename>')
+def serve_upload(filename):
+    """Serve an uploaded file with long-lived cache headers and Range support"""
+    # Only canonical paths: "videos//resumable", "./tmp" and the like would
+    # otherwise slip past the prefix check and still resolve to the file
+    segments = filename.split('/')
+    if any(segment in ('', '.', '..') for segment in segments):
+        abort(404)
+    # Lowercased for case-insensitive filesystems (WAMP on Windows)
+    if '/'.join(segments).lower().startswith(PRIVATE_PREFIXES):
+        abort(404)
+
+    # Relative folders resolve against the app root, as send_from_directory did
+    path = safe_join(os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER']), filename)
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(path):
+        abort(404)
+
+    etag, max_age, immutable = upload_cache_policy(filename, stat)
+
+    if current_app.config.get('UPLOADS_OFFLOAD') in ('x-accel', 'x-sendfile'):
+        response = offload_response(filename, path, etag, max_age, immutable)
+    else:
+        # conditional: 304 on If-None-Match, 206 on Range (video seeking)
+        response = send_file(path, conditional=True, etag=etag,
+                             last_modified=stat.st_mtime, max_age=max_age)
+        response.cache_control.immutable = immutable or None
+
+    # User uploads are never interpreted as anything but their declared type
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
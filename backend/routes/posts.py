@@ -7,10 +7,20 @@ import json
 from models.user import User, db
 from models.post import Post
 from models.comment import Comment
+from utils.hydration import serialize_posts
+from utils.viewer import get_viewer
+from utils.view_counter import record_view
+from utils.trending import MAX_LIMIT as MAX_TRENDING, WINDOWS, record_engagement, trending_posts
+from utils.cache import cached_route, add_cache_tags
+from utils.http_cache import conditional_json
+from utils.pagination import InvalidCursor, keyset_paginate, wants_cursor
+from utils.search import apply_search
+from utils.spatial_index import get_spatial_index
 
 posts_bp = Blueprint('posts', __name__)
 
 @posts_bp.route('/', methods=['GET'])
+@cached_route(ttl=600, tags=['posts:list'])
 def get_posts():
     """Get posts with filtering and pagination"""
     try:
@@ -44,72 +54,50 @@ def get_posts():
             query = query.filter(Post.tags.contains(f'"{tag}"'))
         
         if search:
-            search_filter = or_(
-                Post.title.contains(search),
-                Post.content.contains(search),
-                Post.excerpt.contains(search)
+            # FULLTEXT MATCH ... AGAINST on MySQL (ranked by relevance), LIKE elsewhere
+            query = apply_search(query, 'post', search, mode=request.args.get('search_mode'),
+                                 rank=not wants_cursor(request.args))
+        
+        # Cursor mode (?cursor=): keyset on (published_at, id), no COUNT/OFFSET
+        if wants_cursor(request.args):
+            try:
+                posts_page = keyset_paginate(query, Post.published_at, Post.id,
+                                             request.args.get('cursor'), per_page)
+            except InvalidCursor:
+                return jsonify({'error': 'Cursor không hợp lệ'}), 400
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': posts_page.next_cursor,
+                'has_next': posts_page.has_next
+            }
+        else:
+            # Order by published date
+            query = query.order_by(desc(Post.published_at), desc(Post.id))
+            
+            # Paginate
+            posts_page = query.paginate(
+                page=page, per_page=per_page, error_out=False
             )
-            query = query.filter(search_filter)
+            pagination = {
+                'page': posts_page.page,
+                'pages': posts_page.pages,
+                'per_page': posts_page.per_page,
+                'total': posts_page.total,
+                'has_next': posts_page.has_next,
+                'has_prev': posts_page.has_prev
+            }
         
-        # Order by published date
-        query = query.order_by(desc(Post.published_at))
+        # Format response (authors for the whole page are loaded in one query)
+        posts_data = serialize_posts(posts_page.items)
+        add_cache_tags(*(f"post:{post['id']}" for post in posts_data),
+                       *(f"author:{post['author_id']}" for post in posts_data))
         
-        # Paginate
-        posts_pagination = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        # Get current user if authenticated
-        current_user_id = None
-        try:
-            from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-            verify_jwt_in_request(optional=True)
-            current_user_id = get_jwt_identity()
-            if isinstance(current_user_id, str):
-                current_user_id = int(current_user_id)
-        except:
-            pass
-        
-        # Format response
-        posts_data = []
-        for post in posts_pagination.items:
-            post_dict = post.to_dict(include_content=False)
-            
-            # Include author ID for authorization checks
-            post_dict['author_id'] = post.author_id
-            
-            # Include author info
-            author = User.query.get(post.author_id)
-            post_dict['author'] = {
-                'id': author.id,
-                'username': author.username,
-                'full_name': author.full_name,
-                'avatar_url': author.avatar_url
-            } if author else None
-            
-            # Check if current user liked/bookmarked this post
-            if current_user_id:
-                current_user = User.query.get(current_user_id)
-                if current_user:
-                    # Check if post ID is in user's liked/bookmarked lists
-                    liked_post_ids = current_user.get_liked_posts()
-                    bookmarked_post_ids = current_user.get_bookmarks()
-                    
-                    post_dict['is_liked'] = post.id in liked_post_ids
-                    post_dict['is_bookmarked'] = post.id in bookmarked_post_ids
-            
-            posts_data.append(post_dict)
+        # Flag posts the current user liked/bookmarked (viewer is loaded once per request)
+        get_viewer().annotate_all(posts_data)
         
         return jsonify({
             'posts': posts_data,
-            'pagination': {
-                'page': posts_pagination.page,
-                'pages': posts_pagination.pages,
-                'per_page': posts_pagination.per_page,
-                'total': posts_pagination.total,
-                'has_next': posts_pagination.has_next,
-                'has_prev': posts_pagination.has_prev
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -124,9 +112,9 @@ def get_post(post_id):
         if post.status != 'published':
             return jsonify({'error': 'Bài viết không tồn tại hoặc chưa được xuất bản'}), 404
         
-        # Increment view count
-        post.increment_views()
-        db.session.commit()
+        # Buffer the view; counters are written back in batches
+        record_view('post', post.id)
+        record_engagement(post.id, 'view', category=post.category)
         
         # Get post data
         post_data = post.to_dict(include_content=True)
@@ -383,7 +371,35 @@ def share_post(post_id):
         db.session.rollback()
         return jsonify({'error': f'Lỗi: {str(e)}'}), 500
 
+@posts_bp.route('/trending', methods=['GET'])
+def get_trending_posts():
+    """Posts with the most recent engagement (time-decayed views, likes, comments, shares)"""
+    try:
+        window = request.args.get('window', '24h')
+        category = request.args.get('category') or None
+        limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_TRENDING)
+        
+        if window not in WINDOWS:
+            return jsonify({'error': f"window phải là một trong: {', '.join(WINDOWS)}"}), 400
+        
+        # Top-k from the in-memory ranking; only those posts are loaded
+        ranked = trending_posts(window, limit, category)
+        posts_data = serialize_posts([post for post, _ in ranked])
+        for post_data, (_, score) in zip(posts_data, ranked):
+            post_data['trending_score'] = round(score, 3)
+        get_viewer().annotate_all(posts_data)
+        
+        return jsonify({
+            'posts': posts_data,
+            'window': window,
+            'category': category
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi lấy bài viết thịnh hành: {str(e)}'}), 500
+
 @posts_bp.route('/featured', methods=['GET'])
+@cached_route(ttl=600, tags=['posts:list'])
 def get_featured_posts():
     """Get featured posts"""
     try:
@@ -394,17 +410,9 @@ def get_featured_posts():
             featured=True
         ).order_by(desc(Post.published_at)).limit(limit).all()
         
-        posts_data = []
-        for post in posts:
-            post_dict = post.to_dict(include_content=False)
-            # Include author info
-            author = User.query.get(post.author_id)
-            post_dict['author'] = {
-                'username': author.username,
-                'full_name': author.full_name,
-                'avatar_url': author.avatar_url
-            } if author else None
-            posts_data.append(post_dict)
+        posts_data = get_viewer().annotate_all(serialize_posts(posts))
+        add_cache_tags(*(f"post:{post['id']}" for post in posts_data),
+                       *(f"author:{post['author_id']}" for post in posts_data))
         
         return jsonify({'featured_posts': posts_data}), 200
         
@@ -412,6 +420,7 @@ def get_featured_posts():
         return jsonify({'error': f'Lỗi lấy bài viết nổi bật: {str(e)}'}), 500
 
 @posts_bp.route('/categories', methods=['GET'])
+@cached_route(ttl=3600)
 def get_categories():
     """Get available post categories"""
     categories = [
@@ -426,6 +435,7 @@ def get_categories():
     return jsonify({'categories': categories}), 200
 
 @posts_bp.route('/tags/popular', methods=['GET'])
+@cached_route(ttl=3600, tags=['posts:list'])
 def get_popular_tags():
     """Get popular tags"""
     try:
@@ -451,6 +461,42 @@ def get_popular_tags():
     except Exception as e:
         return jsonify({'error': f'Lỗi lấy tags phổ biến: {str(e)}'}), 500
 
+@posts_bp.route('/nearby', methods=['GET'])
+def get_nearby_posts():
+    """Get published posts geotagged near a point (?radius= km, or ?k= for the k nearest)"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        k = request.args.get('k', type=int)
+        radius = request.args.get('radius', None if k else 10, type=float)  # km
+        category = request.args.get('category')
+        limit = min(request.args.get('limit', 20, type=int), 50)
+        
+        if lat is None or lng is None:
+            return jsonify({'error': 'Thiếu tọa độ (lat, lng)'}), 400
+        
+        if k:
+            hits = get_spatial_index('post').nearest(lat, lng, min(k, 50), max_radius_km=radius, category=category)
+        else:
+            hits = get_spatial_index('post').within(lat, lng, radius, category)
+        
+        page = hits if k else hits[:limit]
+        posts = {post.id: post for post in Post.query.filter(Post.id.in_([i for _, i in page]))}
+        distances = {post_id: distance for distance, post_id in page}
+        ordered = [posts[post_id] for _, post_id in page if post_id in posts]
+        
+        posts_data = get_viewer().annotate_all(serialize_posts(ordered))
+        for post_dict in posts_data:
+            post_dict['distance'] = round(distances[post_dict['id']], 2)
+        
+        return jsonify({
+            'posts': posts_data,
+            'count': len(hits)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi tìm bài viết gần: {str(e)}'}), 500
+
 
 # ============ SLUG-BASED ROUTES ============
 
@@ -458,62 +504,67 @@ def get_popular_tags():
 def get_post_by_slug(slug):
     """Get post by slug"""
     try:
-        # Get optional user_id from JWT if available
-        user_id = None
-        try:
-            from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-            verify_jwt_in_request(optional=True)
-            user_id = get_jwt_identity()
-            if isinstance(user_id, str):
-                user_id = int(user_id)
-        except:
-            pass
+        # Get optional viewer from JWT if available
+        viewer = get_viewer()
+        user_id = viewer.user_id
 
         # Find post by slug
         post = Post.query.filter_by(slug=slug).first_or_404()
+        author = post.author
         
-        # Increment views only if not author viewing own post
+        # Count views only if not author viewing own post (buffered, no write here)
         if not user_id or user_id != post.author_id:
-            post.views_count = (post.views_count or 0) + 1
-            db.session.commit()
-        
-        # Get post data with author info
-        post_data = post.to_dict()
-        
-        # Add author information
-        if post.author:
-            post_data['author'] = {
-                'id': post.author.id,
-                'username': post.author.username,
-                'full_name': post.author.full_name,
-                'avatar_url': post.author.avatar_url,
-                'bio': post.author.bio
-            }
+            record_view('post', post.id)
+            record_engagement(post.id, 'view', category=post.category)
         
-        # Add engagement stats (use numeric columns to avoid missing relationships)
-        try:
-            post_data['likes_count'] = int(post.likes_count or 0)
-        except Exception:
-            post_data['likes_count'] = 0
+        def build_payload():
+            # Get post data with author info
+            post_data = post.to_dict()
+            
+            # Add author information
+            if author:
+                post_data['author'] = {
+                    'id': author.id,
+                    'username': author.username,
+                    'full_name': author.full_name,
+                    'avatar_url': author.avatar_url,
+                    'bio': author.bio
+                }
+            
+            # Add engagement stats (use numeric columns to avoid missing relationships)
+            try:
+                post_data['likes_count'] = int(post.likes_count or 0)
+            except Exception:
+                post_data['likes_count'] = 0
 
-        # Use stored comments_count if available, otherwise fallback to counting
-        try:
-            post_data['comments_count'] = int(post.comments_count or 0)
-        except Exception:
-            post_data['comments_count'] = Comment.query.filter_by(
-                post_id=post.id,
-                status='approved',
-                parent_id=None
-            ).count()
-        
-        # Check if current user liked/bookmarked
-        if user_id:
-            user = User.query.get(user_id)
-            if user:
-                post_data['is_liked'] = post in user.liked_posts
-                post_data['is_bookmarked'] = post in user.bookmarked_posts
+            # Use stored comments_count if available, otherwise fallback to counting
+            try:
+                post_data['comments_count'] = int(post.comments_count or 0)
+            except Exception:
+                post_data['comments_count'] = Comment.query.filter_by(
+                    post_id=post.id,
+                    status='approved',
+                    parent_id=None
+                ).count()
+            
+            # Check if current user liked/bookmarked
+            viewer.annotate(post_data)
+            
+            return {'post': post_data}
         
-        return jsonify({'post': post_data}), 200
+        # Revalidation is answered with a 304 before the body is built.
+        # View counts are left out of the ETag on purpose (weak validator).
+        etag_parts = [
+            post.id, post.updated_at, post.likes_count, post.comments_count, post.shares_count,
+            author.updated_at if author else None
+        ]
+        if viewer.is_authenticated:
+            etag_parts += [viewer.user_id, viewer.has_liked(post.id), viewer.has_bookmarked(post.id)]
+        # No Last-Modified: likes, comments and the viewer's flags change without touching updated_at
+        return conditional_json(
+            build_payload, etag_parts,
+            public=post.status == 'published' and not viewer.is_authenticated
+        )
         
     except Exception as e:
         return jsonify({'error': f'Lỗi lấy bài viết: {str(e)}'}), 500
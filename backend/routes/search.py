@@ -0,0 +1,106 @@
+"""
+Search Routes for VieGo Blog
+Accent-insensitive search over posts, locations and tours using the
+in-process BM25 index (utils/search_index.py), and search-as-you-type
+suggestions (utils/suggest.py)
+"""
+
+from flask import Blueprint, request, jsonify
+
+from models.post import Post
+from models.location import Location
+from models.tour import Tour
+from utils.hydration import serialize_posts
+from utils.search import apply_search
+from utils.search_index import get_search_index, INDEXED_MODELS
+from utils.suggest import get_suggest_index, SUGGESTION_TYPES, MAX_LIMIT
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+
+def _hydrate(entity, ids):
+    """Load and serialize rows by ID, returns {id: dict}"""
+    if not ids:
+        return {}
+    if entity == 'post':
+        posts = Post.query.filter(Post.id.in_(ids)).all()
+        return {item['id']: item for item in serialize_posts(posts)}
+    if entity == 'location':
+        return {location.id: location.to_dict() for location in Location.query.filter(Location.id.in_(ids))}
+    return {tour.id: tour.to_dict(include_sensitive=False) for tour in Tour.query.filter(Tour.id.in_(ids))}
+
+
+def _database_hits(query, types, limit):
+    """(entity, id, score) from SQL while the search index is still loading"""
+    hits = []
+    for entity in types:
+        model, fields_for = INDEXED_MODELS[entity]
+        rows = apply_search(model.query, entity, query).order_by(model.id.desc()).limit(limit).all()
+        hits.extend((entity, row.id, 0.0) for row in rows if fields_for(row) is not None)
+    return hits[:limit]
+
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """Search posts, locations and tours (?q=ha long&type=post,location&limit=20)"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        types = [t for t in request.args.get('type', '').split(',') if t] or list(INDEXED_MODELS)
+
+        unknown = [t for t in types if t not in INDEXED_MODELS]
+        if unknown:
+            return jsonify({'error': f'Loại tìm kiếm không hợp lệ: {", ".join(unknown)}'}), 400
+
+        if not query:
+            return jsonify({'query': query, 'results': [], 'total': 0}), 200
+
+        index = get_search_index()
+        if index.ready:
+            hits = index.search(query, entities=types, limit=limit)
+        else:
+            hits = _database_hits(query, types, limit)
+
+        # One IN query per entity type, then keep the ranking order
+        rows = {
+            entity: _hydrate(entity, [doc_id for hit_entity, doc_id, _ in hits if hit_entity == entity])
+            for entity in types
+        }
+        results = []
+        for entity, doc_id, score in hits:
+            item = rows[entity].get(doc_id)
+            if item is not None:
+                results.append({'type': entity, 'score': score, 'item': item})
+
+        return jsonify({
+            'query': query,
+            'results': results,
+            'total': len(results)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Lỗi tìm kiếm: {str(e)}'}), 500
+
+
+@search_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Autocomplete for the search box (?q=ha lo&type=post,province&limit=8), answered from memory"""
+    try:
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', 8, type=int), MAX_LIMIT))
+        types = [t for t in request.args.get('type', '').split(',') if t]
+
+        unknown = [t for t in types if t not in SUGGESTION_TYPES]
+        if unknown:
+            return jsonify({'error': f'Loại gợi ý không hợp lệ: {", ".join(unknown)}'}), 400
+
+        suggestions = get_suggest_index().suggest(query, limit=limit, kinds=types or None)
+
+        response = jsonify({'query': query, 'suggestions': suggestions})
+        # Browsers may reuse a suggestion list briefly while the user keeps typing
+        response.cache_control.public = True
+        response.cache_control.max_age = 30
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': f'Lỗi gợi ý tìm kiếm: {str(e)}'}), 500
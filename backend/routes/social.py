@@ -11,9 +11,31 @@ from datetime import datetime
 from models import db
 from models.user import User
 from models.post import Post
+from models.social import PostLike, PostBookmark, UserFollow
+from utils.counters import read_counter
+from utils.hydration import serialize_posts
+from utils.jwt_utils import get_current_user_id
+from utils.pagination import InvalidCursor
+from utils.timeline import timeline_page
+from utils.viewer import get_viewer
 
 social_bp = Blueprint('social', __name__, url_prefix='/api/social')
 
+# Most IDs of each kind one /state request may ask about (a few pages of cards)
+MAX_STATE_IDS = 200
+MAX_ID = 2 ** 31 - 1
+
+
+def count_following(user_id):
+    """Number of users a user follows (denormalized on users)"""
+    return read_counter('user', user_id, 'following_count')
+
+
+def count_followers(user_id):
+    """Number of users following a user (denormalized on users)"""
+    return read_counter('user', user_id, 'followers_count')
+
+
 # ====================
 # BOOKMARKS
 # ====================
@@ -29,22 +51,15 @@ def get_bookmarks():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Get bookmarked post IDs from user
-        bookmarked_ids = user.get_bookmarks()
-        
-        if not bookmarked_ids:
-            return jsonify({
-                'bookmarks': [],
-                'total': 0
-            }), 200
-        
         # Pagination
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 12, type=int), 50)
         
-        # Get bookmarked posts
-        query = Post.query.filter(
-            Post.id.in_(bookmarked_ids),
+        # Get bookmarked posts through the post_bookmarks table
+        query = Post.query.join(
+            PostBookmark, PostBookmark.post_id == Post.id
+        ).filter(
+            PostBookmark.user_id == user.id,
             Post.status == 'published'
         ).order_by(desc(Post.created_at))
         
@@ -53,20 +68,7 @@ def get_bookmarks():
         )
         
         # Format response with author info
-        posts_data = []
-        for post in posts_pagination.items:
-            post_dict = post.to_dict(include_content=False)
-            
-            # Include author info
-            author = User.query.get(post.author_id)
-            post_dict['author'] = {
-                'id': author.id,
-                'username': author.username,
-                'full_name': author.full_name,
-                'avatar_url': author.avatar_url
-            } if author else None
-            
-            posts_data.append(post_dict)
+        posts_data = serialize_posts(posts_pagination.items)
         
         return jsonify({
             'bookmarks': posts_data,
@@ -104,11 +106,8 @@ def add_bookmark(post_identifier):
         
         post_id = post.id
         
-        # Add bookmark
-        bookmarks = user.get_bookmarks()
-        if post_id not in bookmarks:
-            bookmarks.append(post_id)
-            user.set_bookmarks(bookmarks)
+        # Add bookmark (single-row insert)
+        if user.add_bookmark(post_id):
             db.session.commit()
             
             return jsonify({'message': 'Đã lưu bài viết'}), 200
@@ -142,11 +141,8 @@ def remove_bookmark(post_identifier):
         
         post_id = post.id
         
-        # Remove bookmark
-        bookmarks = user.get_bookmarks()
-        if post_id in bookmarks:
-            bookmarks.remove(post_id)
-            user.set_bookmarks(bookmarks)
+        # Remove bookmark (single-row delete)
+        if user.remove_bookmark(post_id):
             db.session.commit()
         
         return jsonify({'message': 'Đã xóa bookmark'}), 200
@@ -178,8 +174,7 @@ def check_bookmark(post_identifier):
         
         post_id = post.id
         
-        bookmarks = user.get_bookmarks()
-        is_bookmarked = post_id in bookmarks
+        is_bookmarked = user.has_bookmarked(post_id)
         
         return jsonify({'is_bookmarked': is_bookmarked}), 200
         
@@ -213,14 +208,10 @@ def like_post(post_identifier):
         
         post_id = post.id
         
-        # Add like
-        liked_posts = user.get_liked_posts()
-        if post_id not in liked_posts:
-            liked_posts.append(post_id)
-            user.set_liked_posts(liked_posts)
-            
-            # Increment post like count
-            post.likes_count += 1
+        # Add like (single-row insert)
+        if user.like_post(post_id):
+            # Increment post like count in SQL
+            post.increment_likes()
             
             db.session.commit()
             
@@ -261,15 +252,10 @@ def unlike_post(post_identifier):
         
         post_id = post.id
         
-        # Remove like
-        liked_posts = user.get_liked_posts()
-        if post_id in liked_posts:
-            liked_posts.remove(post_id)
-            user.set_liked_posts(liked_posts)
-            
-            # Decrement post like count
-            if post.likes_count > 0:
-                post.likes_count -= 1
+        # Remove like (single-row delete)
+        if user.unlike_post(post_id):
+            # Decrement post like count in SQL (clamped at 0)
+            post.decrement_likes()
             
             db.session.commit()
         
@@ -304,8 +290,7 @@ def check_like(post_identifier):
             return jsonify({'error': 'Bài viết không tồn tại'}), 404
         
         post_id = post.id
-        liked_posts = user.get_liked_posts()
-        is_liked = post_id in liked_posts
+        is_liked = user.has_liked(post_id)
         
         return jsonify({'is_liked': is_liked}), 200
         
@@ -324,22 +309,15 @@ def get_liked_posts():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Get liked post IDs from user
-        liked_ids = user.get_liked_posts()
-        
-        if not liked_ids:
-            return jsonify({
-                'liked_posts': [],
-                'total': 0
-            }), 200
-        
         # Pagination
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 12, type=int), 50)
         
-        # Get liked posts
-        query = Post.query.filter(
-            Post.id.in_(liked_ids),
+        # Get liked posts through the post_likes table
+        query = Post.query.join(
+            PostLike, PostLike.post_id == Post.id
+        ).filter(
+            PostLike.user_id == user.id,
             Post.status == 'published'
         ).order_by(desc(Post.created_at))
         
@@ -348,20 +326,7 @@ def get_liked_posts():
         )
         
         # Format response with author info
-        posts_data = []
-        for post in posts_pagination.items:
-            post_dict = post.to_dict(include_content=False)
-            
-            # Include author info
-            author = User.query.get(post.author_id)
-            post_dict['author'] = {
-                'id': author.id,
-                'username': author.username,
-                'full_name': author.full_name,
-                'avatar_url': author.avatar_url
-            } if author else None
-            
-            posts_data.append(post_dict)
+        posts_data = serialize_posts(posts_pagination.items)
         
         return jsonify({
             'liked_posts': posts_data,
@@ -386,7 +351,7 @@ def get_liked_posts():
 def follow_user(target_user_id):
     """Follow another user"""
     try:
-        user_id = get_jwt_identity()
+        user_id = get_current_user_id()
         
         # Can't follow yourself
         if user_id == target_user_id:
@@ -398,29 +363,19 @@ def follow_user(target_user_id):
         if not user or not target_user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Add to following list
-        following = user.get_following()
-        if target_user_id not in following:
-            following.append(target_user_id)
-            user.set_following(following)
-            
-            # Add to target's followers list
-            followers = target_user.get_followers()
-            if user_id not in followers:
-                followers.append(user_id)
-                target_user.set_followers(followers)
-            
+        # One user_follows row serves both the following and followers lists
+        if user.follow(target_user_id):
             db.session.commit()
             
             return jsonify({
                 'message': f'Đã follow {target_user.username}',
-                'following_count': len(following),
-                'followers_count': len(followers)
+                'following_count': count_following(user.id),
+                'followers_count': count_followers(target_user_id)
             }), 200
         else:
             return jsonify({
                 'message': 'Đã follow người dùng này trước đó',
-                'following_count': len(following)
+                'following_count': count_following(user.id)
             }), 200
         
     except Exception as e:
@@ -441,23 +396,13 @@ def unfollow_user(target_user_id):
         if not user or not target_user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Remove from following list
-        following = user.get_following()
-        if target_user_id in following:
-            following.remove(target_user_id)
-            user.set_following(following)
-            
-            # Remove from target's followers list
-            followers = target_user.get_followers()
-            if user_id in followers:
-                followers.remove(user_id)
-                target_user.set_followers(followers)
-            
+        # Remove the follow edge (single-row delete)
+        if user.unfollow(target_user_id):
             db.session.commit()
         
         return jsonify({
             'message': f'Đã unfollow {target_user.username}',
-            'following_count': len(following)
+            'following_count': count_following(user.id)
         }), 200
         
     except Exception as e:
@@ -465,6 +410,35 @@ def unfollow_user(target_user_id):
         return jsonify({'error': f'Lỗi unfollow: {str(e)}'}), 500
 
 
+@social_bp.route('/timeline', methods=['GET'])
+@jwt_required()
+def get_timeline():
+    """Home timeline: newest posts from the accounts the current user follows"""
+    try:
+        user_id = get_current_user_id()
+        per_page = min(request.args.get('per_page', 12, type=int), 50)
+        
+        # Fanned-out entries plus large accounts read on demand, keyset on (published_at, id)
+        try:
+            timeline = timeline_page(user_id, request.args.get('cursor'), per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Cursor không hợp lệ'}), 400
+        
+        posts_data = get_viewer().annotate_all(serialize_posts(timeline.items))
+        
+        return jsonify({
+            'posts': posts_data,
+            'pagination': {
+                'per_page': per_page,
+                'next_cursor': timeline.next_cursor,
+                'has_next': timeline.has_next
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi lấy timeline: {str(e)}'}), 500
+
+
 @social_bp.route('/following', methods=['GET'])
 @jwt_required()
 def get_following():
@@ -476,16 +450,10 @@ def get_following():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        following_ids = user.get_following()
-        
-        if not following_ids:
-            return jsonify({
-                'following': [],
-                'total': 0
-            }), 200
-        
-        # Get user details
-        following_users = User.query.filter(User.id.in_(following_ids)).all()
+        # Get user details through the user_follows table
+        following_users = User.query.join(
+            UserFollow, UserFollow.followed_id == User.id
+        ).filter(UserFollow.follower_id == user.id).order_by(UserFollow.created_at).all()
         
         following_data = [{
             'id': u.id,
@@ -493,7 +461,7 @@ def get_following():
             'full_name': u.full_name,
             'avatar_url': u.avatar_url,
             'bio': u.bio,
-            'posts_count': len(u.posts) if hasattr(u, 'posts') else 0
+            'posts_count': u.posts_count or 0
         } for u in following_users]
         
         return jsonify({
@@ -516,16 +484,10 @@ def get_followers():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        follower_ids = user.get_followers()
-        
-        if not follower_ids:
-            return jsonify({
-                'followers': [],
-                'total': 0
-            }), 200
-        
-        # Get user details
-        follower_users = User.query.filter(User.id.in_(follower_ids)).all()
+        # Get user details through the user_follows table (indexed on followed_id)
+        follower_users = User.query.join(
+            UserFollow, UserFollow.follower_id == User.id
+        ).filter(UserFollow.followed_id == user.id).order_by(UserFollow.created_at).all()
         
         followers_data = [{
             'id': u.id,
@@ -533,7 +495,7 @@ def get_followers():
             'full_name': u.full_name,
             'avatar_url': u.avatar_url,
             'bio': u.bio,
-            'posts_count': len(u.posts) if hasattr(u, 'posts') else 0
+            'posts_count': u.posts_count or 0
         } for u in follower_users]
         
         return jsonify({
@@ -556,10 +518,64 @@ def check_following(target_user_id):
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        following = user.get_following()
-        is_following = target_user_id in following
+        is_following = user.is_following(target_user_id)
         
         return jsonify({'is_following': is_following}), 200
         
     except Exception as e:
         return jsonify({'error': f'Lỗi: {str(e)}'}), 500
+
+
+# ====================
+# BATCH STATE
+# ====================
+
+def parse_id_list(data, key):
+    """List of integer IDs from a JSON body field; None when it is not one"""
+    values = data.get(key, [])
+    if not isinstance(values, list) or len(values) > MAX_STATE_IDS:
+        return None
+    ids = []
+    for value in values:
+        if isinstance(value, str) and value.isascii() and value.isdecimal():
+            value = int(value)
+        # bool is an int subclass; the range is what an INT primary key can hold
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_ID:
+            return None
+        ids.append(value)
+    return list(dict.fromkeys(ids))
+
+
+@social_bp.route('/state', methods=['POST'])
+@jwt_required()
+def get_social_state():
+    """Like/bookmark flags for many posts and follow flags for many users in one request"""
+    try:
+        data = request.get_json(silent=True) or {}
+        post_ids = parse_id_list(data, 'post_ids')
+        user_ids = parse_id_list(data, 'user_ids')
+        if post_ids is None or user_ids is None:
+            return jsonify({'error': f'post_ids và user_ids phải là mảng tối đa {MAX_STATE_IDS} ID'}), 400
+        
+        viewer = get_viewer()
+        if not viewer.is_authenticated:
+            return jsonify({'error': 'Không tìm thấy người dùng'}), 404
+        
+        # One indexed query per kind of flag, however many IDs were sent
+        viewer.load(post_ids)
+        viewer.load_follows(user_ids)
+        
+        return jsonify({
+            'posts': {
+                str(post_id): {
+                    'is_liked': viewer.has_liked(post_id),
+                    'is_bookmarked': viewer.has_bookmarked(post_id)
+                } for post_id in post_ids
+            },
+            'users': {
+                str(user_id): {'is_following': viewer.is_following(user_id)} for user_id in user_ids
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi: {str(e)}'}), 500
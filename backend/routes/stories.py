@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from models import db
 from models.story import Story
 from models.user import User
+from utils.view_counter import record_view
 from sqlalchemy import desc, and_
 from datetime import datetime
 
@@ -112,17 +113,15 @@ def view_story(story_id):
                 'error': 'Không tìm thấy story'
             }), 404
         
-        # Increment view count
-        story.view_count += 1
-        db.session.commit()
+        # Buffer the view; counters are written back in batches
+        pending_views = record_view('story', story.id)
         
         return jsonify({
             'success': True,
-            'view_count': story.view_count
+            'view_count': (story.view_count or 0) + pending_views
         }), 200
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             'success': False,
             'error': f'Lỗi tăng view count: {str(e)}'
@@ -13,6 +13,13 @@ from models import db
 from models.user import User
 from models.tour import Tour
 from models.booking import Booking
+from models.location import Location
+from utils.view_counter import record_view
+from utils.cache import cached_route
+from utils.http_cache import conditional_json
+from utils.search import apply_search
+from utils.geo_vector import haversine_many, path_legs
+from utils.spatial_index import get_spatial_index
 
 tours_bp = Blueprint('tours', __name__, url_prefix='/api/tours')
 
@@ -46,12 +53,8 @@ def get_tours():
             query = query.filter(Tour.price_per_person <= max_price)
         
         if search:
-            search_filter = or_(
-                Tour.title.contains(search),
-                Tour.description.contains(search),
-                Tour.starting_location.contains(search)
-            )
-            query = query.filter(search_filter)
+            # FULLTEXT MATCH ... AGAINST on MySQL (ranked by relevance), LIKE elsewhere
+            query = apply_search(query, 'tour', search, mode=request.args.get('search_mode'))
         
         # Order by rating and views
         query = query.order_by(desc(Tour.rating), desc(Tour.views_count))
@@ -99,28 +102,76 @@ def get_tour(tour_id):
         if tour.status != 'published':
             return jsonify({'error': 'Tour không tồn tại hoặc chưa được xuất bản'}), 404
         
-        # Increment view count
-        tour.increment_views()
-        db.session.commit()
-        
-        # Get tour data
-        tour_dict = tour.to_dict(include_sensitive=False)
+        # Buffer the view; counters are written back in batches
+        record_view('tour', tour.id)
         
-        # Include seller info
         seller = User.query.get(tour.seller_id)
-        tour_dict['seller'] = {
-            'id': seller.id,
-            'username': seller.username,
-            'full_name': seller.full_name,
-            'bio': seller.bio,
-            'avatar_url': seller.avatar_url
-        } if seller else None
         
-        return jsonify(tour_dict), 200
+        def build_payload():
+            # Get tour data
+            tour_dict = tour.to_dict(include_sensitive=False)
+            
+            # Include seller info
+            tour_dict['seller'] = {
+                'id': seller.id,
+                'username': seller.username,
+                'full_name': seller.full_name,
+                'bio': seller.bio,
+                'avatar_url': seller.avatar_url
+            } if seller else None
+            
+            return tour_dict
+        
+        etag_parts = [
+            tour.id, tour.updated_at, tour.rating, tour.reviews_count, tour.bookings_count,
+            seller.updated_at if seller else None
+        ]
+        # No Last-Modified: ratings and counters change without touching updated_at
+        return conditional_json(build_payload, etag_parts)
         
     except Exception as e:
         return jsonify({'error': f'Lỗi lấy thông tin tour: {str(e)}'}), 500
 
+@tours_bp.route('/<int:tour_id>/locations', methods=['GET'])
+def get_tour_locations(tour_id):
+    """Locations covered by a tour in order, with leg distances (and ?lat=&lng= distances)"""
+    try:
+        tour = Tour.query.get_or_404(tour_id)
+        
+        if tour.status != 'published':
+            return jsonify({'error': 'Tour không tồn tại hoặc chưa được xuất bản'}), 404
+        
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        
+        location_ids = [i for i in tour.get_locations_covered() if isinstance(i, int)]
+        coordinates = get_spatial_index().coordinates(location_ids)
+        route = [i for i in location_ids if i in coordinates]
+        locations = {loc.id: loc for loc in Location.query.filter(Location.id.in_(route))}
+        route = [i for i in route if i in locations]
+        
+        # Every leg (and every distance from the given point) in one vectorized pass
+        lats = [coordinates[i][0] for i in route]
+        lngs = [coordinates[i][1] for i in route]
+        legs = path_legs(lats, lngs)
+        from_point = haversine_many(lat, lng, lats, lngs) if route and lat is not None and lng is not None else None
+        
+        stops = []
+        for position, location_id in enumerate(route):
+            loc_dict = locations[location_id].to_dict()
+            loc_dict['distance_from_previous'] = round(legs[position], 2)
+            if from_point is not None:
+                loc_dict['distance'] = round(float(from_point[position]), 2)
+            stops.append(loc_dict)
+        
+        return jsonify({
+            'locations': stops,
+            'total_distance_km': round(sum(legs), 2)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Lỗi lấy địa điểm của tour: {str(e)}'}), 500
+
 @tours_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_tour():
@@ -349,6 +400,7 @@ def book_tour(tour_id):
         return jsonify({'error': f'Lỗi đặt tour: {str(e)}'}), 500
 
 @tours_bp.route('/categories', methods=['GET'])
+@cached_route(ttl=3600)
 def get_categories():
     """Get available tour categories"""
     return jsonify({
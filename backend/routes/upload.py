@@ -1,17 +1,31 @@
 """
 Upload Routes for VieGo Blog
 Handles file uploads (images, videos) with validation and optimization
+Images are stored without EXIF at once; their resized and WebP variants are
+built by the upload job pool (utils/images.py, utils/jobs.py)
+Every upload lands in the content-addressed store (utils/blob_store.py), so
+the same bytes uploaded twice are stored once
+Request bodies are streamed to disk (utils/upload_stream.py) instead of
+request.files, so limits are per file type rather than MAX_CONTENT_LENGTH
+Large videos can also be sent in resumable chunks (utils/resumable.py)
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, current_app, jsonify, request, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import http_date
 from werkzeug.utils import secure_filename
-import os
-import uuid
-from datetime import datetime
+from werkzeug.wsgi import get_input_stream
+from PIL import UnidentifiedImageError
 
 from models import db
 from models.user import User
+from utils.blob_store import blob_folder, blob_url_prefix, register_blob
+from utils.images import IMAGE_VARIANTS, build_variants, image_variants, store_original
+from utils.jobs import JobQueueFull, get_job_queue
+from utils.resumable import (DEFAULT_MAX_CHUNK, UploadSessionError, append_chunk, create_session, delete_session,
+                             expires_at, finalize_session, get_session)
+from utils.upload_stream import allowed_file, receive_files
 
 upload_bp = Blueprint('upload', __name__, url_prefix='/api/upload')
 
@@ -19,26 +33,64 @@ upload_bp = Blueprint('upload', __name__, url_prefix='/api/upload')
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov', 'avi'}
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_AVATAR_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_VIDEO_SIZE = 100 * 1024 * 1024  # 100MB
 
 
-def allowed_file(filename, allowed_extensions):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in allowed_extensions
+def queue_full_response(retry_after=5):
+    """429 telling the client to retry once the job queue has drained"""
+    response = jsonify({'error': 'Hệ thống đang xử lý nhiều ảnh, vui lòng thử lại sau'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
 
 
-def generate_unique_filename(original_filename):
-    """Generate unique filename using UUID"""
-    ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
-    unique_name = f"{uuid.uuid4().hex}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    return f"{unique_name}.{ext}" if ext else unique_name
+def store_image(data, user_id, variants=IMAGE_VARIANTS, digest=None):
+    """
+    Store an uploaded image and queue the job building its variants
+    Returns the upload payload: the original URL at once, plus the variants
+    when they already exist (or were built inline) and the job ID otherwise.
+    """
+    original = store_original(data, digest)
+    register_blob(original['digest'], original['ext'], original['size'], 'image')
+    
+    # Same bytes uploaded before (by anyone): reuse its variants
+    manifest = image_variants(original['url'])
+    if manifest is not None:
+        return {**manifest, 'status': 'done', 'job_id': None}
+    
+    digest = original['digest']
+    job = get_job_queue().submit('image_variants', build_variants, blob_folder(digest), blob_url_prefix(digest),
+                                 original['filename'], variants, owner=user_id)
+    if job.status == 'done':
+        return {**job.result, 'status': 'done', 'job_id': job.id}
+    return {**original, 'variants': None, 'status': job.to_dict()['status'], 'job_id': job.id}
+
+
+def file_error_response(streamed, allowed_extensions, too_large_message):
+    """400 for a missing or refused upload, in the words the forms already show"""
+    if streamed is None:
+        return jsonify({'error': 'Không có file được upload'}), 400
+    if streamed.error == 'empty':
+        return jsonify({'error': 'Không có file được chọn'}), 400
+    if streamed.error == 'extension':
+        return jsonify({
+            'error': f'Định dạng file không hợp lệ. Chỉ chấp nhận: {", ".join(allowed_extensions)}'
+        }), 400
+    if streamed.error == 'size':
+        return jsonify({'error': too_large_message}), 400
+    return jsonify({'error': 'File tải lên không đầy đủ'}), 400
+
+
+def too_large_response(message):
+    return jsonify({'error': message}), 413
 
 
 @upload_bp.route('/image', methods=['POST'])
 @jwt_required()
 def upload_image():
     """Upload image file"""
+    too_large = f'File quá lớn. Kích thước tối đa: {MAX_IMAGE_SIZE / (1024*1024)}MB'
+    streamed = None
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -46,61 +98,43 @@ def upload_image():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Check if file is in request
-        if 'file' not in request.files:
-            return jsonify({'error': 'Không có file được upload'}), 400
-        
-        file = request.files['file']
-        
-        # Check if file is selected
-        if file.filename == '':
-            return jsonify({'error': 'Không có file được chọn'}), 400
-        
-        # Validate file type
-        if not allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
-            return jsonify({
-                'error': f'Định dạng file không hợp lệ. Chỉ chấp nhận: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'
-            }), 400
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if file_size > MAX_IMAGE_SIZE:
-            return jsonify({'error': f'File quá lớn. Kích thước tối đa: {MAX_IMAGE_SIZE / (1024*1024)}MB'}), 400
+        # Refuse before reading the body when no job slot is free
+        if get_job_queue().free_slots() < 1:
+            return queue_full_response()
         
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = generate_unique_filename(filename)
+        # Streamed to a temporary file, size and type checked while it arrives
+        files, _ = receive_files('file', MAX_IMAGE_SIZE, ALLOWED_IMAGE_EXTENSIONS)
+        streamed = files[0] if files else None
+        if streamed is None or streamed.error:
+            return file_error_response(streamed, ALLOWED_IMAGE_EXTENSIONS, too_large)
         
-        # Create upload directory if not exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        images_folder = os.path.join(upload_folder, 'images')
-        os.makedirs(images_folder, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(images_folder, unique_filename)
-        file.save(file_path)
-        
-        # Generate URL
-        file_url = f"/uploads/images/{unique_filename}"
+        # Original (without EXIF) now, resized JPEG/PNG and WebP variants from the job
+        image = store_image(streamed.read(), user.id, digest=streamed.writer.digest)
         
         return jsonify({
             'message': 'Upload ảnh thành công!',
-            'url': file_url,
-            'filename': unique_filename,
-            'size': file_size
-        }), 201
-        
+            **image
+        }), 201 if image['status'] == 'done' else 202
+        
+    except RequestEntityTooLarge:
+        return too_large_response(too_large)
+    except JobQueueFull:
+        return queue_full_response()
+    except UnidentifiedImageError:
+        return jsonify({'error': 'File ảnh không hợp lệ'}), 400
     except Exception as e:
         return jsonify({'error': f'Lỗi upload ảnh: {str(e)}'}), 500
+    finally:
+        if streamed is not None:
+            streamed.discard()
 
 
 @upload_bp.route('/images', methods=['POST'])
 @jwt_required()
 def upload_multiple_images():
     """Upload multiple image files"""
+    max_files = 10
+    files = []
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -108,66 +142,46 @@ def upload_multiple_images():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Check if files are in request
-        if 'files' not in request.files:
-            return jsonify({'error': 'Không có file được upload'}), 400
-        
-        files = request.files.getlist('files')
+        # Nothing could be processed: refuse early. Files that miss a slot
+        # later are reported one by one (JobQueueFull below).
+        if get_job_queue().free_slots() < 1:
+            return queue_full_response()
         
-        if not files or len(files) == 0:
-            return jsonify({'error': 'Không có file được chọn'}), 400
+        # Files past the first max_files are not read
+        files, _ = receive_files('files', MAX_IMAGE_SIZE, ALLOWED_IMAGE_EXTENSIONS, max_files=max_files)
         
-        # Limit number of files
-        max_files = 10
-        if len(files) > max_files:
-            return jsonify({'error': f'Chỉ được upload tối đa {max_files} ảnh cùng lúc'}), 400
+        if not files:
+            return jsonify({'error': 'Không có file được upload'}), 400
         
         uploaded_files = []
         errors = []
-        
-        # Create upload directory
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        images_folder = os.path.join(upload_folder, 'images')
-        os.makedirs(images_folder, exist_ok=True)
-        
-        for file in files:
+        messages = {
+            'empty': 'Tên file không hợp lệ',
+            'extension': 'Định dạng không hợp lệ',
+            'size': 'File quá lớn',
+            'incomplete': 'File tải lên không đầy đủ'
+        }
+        
+        for streamed in files:
             try:
-                # Validate file
-                if not file.filename:
-                    errors.append({'filename': 'unknown', 'error': 'Tên file không hợp lệ'})
-                    continue
-                
-                if not allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
-                    errors.append({'filename': file.filename, 'error': 'Định dạng không hợp lệ'})
+                if streamed.error:
+                    errors.append({'filename': streamed.filename or 'unknown', 'error': messages[streamed.error]})
                     continue
                 
-                # Check file size
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                file.seek(0)
-                
-                if file_size > MAX_IMAGE_SIZE:
-                    errors.append({'filename': file.filename, 'error': 'File quá lớn'})
-                    continue
-                
-                # Generate unique filename
-                filename = secure_filename(file.filename)
-                unique_filename = generate_unique_filename(filename)
-                
-                # Save file
-                file_path = os.path.join(images_folder, unique_filename)
-                file.save(file_path)
+                image = store_image(streamed.read(), user.id, digest=streamed.writer.digest)
                 
                 # Add to uploaded list
                 uploaded_files.append({
-                    'url': f"/uploads/images/{unique_filename}",
-                    'filename': unique_filename,
-                    'original_name': filename,
-                    'size': file_size
+                    **image,
+                    'original_name': secure_filename(streamed.filename)
                 })
                 
+            except UnidentifiedImageError:
+                errors.append({'filename': streamed.filename, 'error': 'File ảnh không hợp lệ'})
+            except JobQueueFull:
+                errors.append({'filename': streamed.filename, 'error': 'Hàng đợi xử lý ảnh đã đầy'})
             except Exception as e:
-                errors.append({'filename': file.filename, 'error': str(e)})
+                errors.append({'filename': streamed.filename, 'error': str(e)})
         
         return jsonify({
             'message': f'Upload thành công {len(uploaded_files)}/{len(files)} ảnh',
@@ -175,14 +189,22 @@ def upload_multiple_images():
             'errors': errors if errors else None
         }), 201
         
+    except RequestEntityTooLarge:
+        return too_large_response(f'Chỉ được upload tối đa {max_files} ảnh, mỗi ảnh tối đa '
+                                  f'{MAX_IMAGE_SIZE / (1024*1024)}MB')
     except Exception as e:
         return jsonify({'error': f'Lỗi upload ảnh: {str(e)}'}), 500
+    finally:
+        for streamed in files:
+            streamed.discard()
 
 
 @upload_bp.route('/video', methods=['POST'])
 @jwt_required()
 def upload_video():
     """Upload video file"""
+    too_large = f'Video quá lớn. Kích thước tối đa: {MAX_VIDEO_SIZE / (1024*1024)}MB'
+    streamed = None
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -190,61 +212,40 @@ def upload_video():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Check if file is in request
-        if 'file' not in request.files:
-            return jsonify({'error': 'Không có file được upload'}), 400
-        
-        file = request.files['file']
-        
-        # Check if file is selected
-        if file.filename == '':
-            return jsonify({'error': 'Không có file được chọn'}), 400
-        
-        # Validate file type
-        if not allowed_file(file.filename, ALLOWED_VIDEO_EXTENSIONS):
-            return jsonify({
-                'error': f'Định dạng file không hợp lệ. Chỉ chấp nhận: {", ".join(ALLOWED_VIDEO_EXTENSIONS)}'
-            }), 400
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
+        # Written chunk by chunk and hashed on the way: memory use does not grow with the video
+        files, _ = receive_files('file', MAX_VIDEO_SIZE, ALLOWED_VIDEO_EXTENSIONS)
+        streamed = files[0] if files else None
+        if streamed is None or streamed.error:
+            return file_error_response(streamed, ALLOWED_VIDEO_EXTENSIONS, too_large)
         
-        if file_size > MAX_VIDEO_SIZE:
-            return jsonify({'error': f'Video quá lớn. Kích thước tối đa: {MAX_VIDEO_SIZE / (1024*1024)}MB'}), 400
-        
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = generate_unique_filename(filename)
-        
-        # Create upload directory if not exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        videos_folder = os.path.join(upload_folder, 'videos')
-        os.makedirs(videos_folder, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(videos_folder, unique_filename)
-        file.save(file_path)
-        
-        # Generate URL
-        file_url = f"/uploads/videos/{unique_filename}"
+        # A video uploaded before is not stored twice
+        file_size = streamed.size
+        digest, relative_path = streamed.commit()
+        register_blob(digest, streamed.ext, file_size, 'video')
         
         return jsonify({
             'message': 'Upload video thành công!',
-            'url': file_url,
-            'filename': unique_filename,
+            'url': f'/uploads/{relative_path}',
+            'filename': relative_path.rsplit('/', 1)[1],
             'size': file_size
         }), 201
         
+    except RequestEntityTooLarge:
+        return too_large_response(too_large)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Lỗi upload video: {str(e)}'}), 500
+    finally:
+        if streamed is not None:
+            streamed.discard()
 
 
 @upload_bp.route('/avatar', methods=['POST'])
 @jwt_required()
 def upload_avatar():
     """Upload user avatar"""
+    too_large = f'Avatar quá lớn. Kích thước tối đa: {MAX_AVATAR_SIZE // (1024*1024)}MB'
+    streamed = None
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -252,55 +253,188 @@ def upload_avatar():
         if not user:
             return jsonify({'error': 'Không tìm thấy người dùng'}), 404
         
-        # Check if file is in request
-        if 'file' not in request.files:
-            return jsonify({'error': 'Không có file được upload'}), 400
+        if get_job_queue().free_slots() < 1:
+            return queue_full_response()
         
-        file = request.files['file']
+        files, _ = receive_files('file', MAX_AVATAR_SIZE, ALLOWED_IMAGE_EXTENSIONS)
+        streamed = files[0] if files else None
+        if streamed is None or streamed.error:
+            return file_error_response(streamed, ALLOWED_IMAGE_EXTENSIONS, too_large)
         
-        # Check if file is selected
-        if file.filename == '':
-            return jsonify({'error': 'Không có file được chọn'}), 400
+        # Listings show the small variant of the avatar once the job has built it
+        image = store_image(streamed.read(), user.id, digest=streamed.writer.digest)
+        user.avatar_url = image['url']
+        db.session.commit()
         
-        # Validate file type
-        if not allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
+        return jsonify({
+            'message': 'Upload avatar thành công!',
+            **image
+        }), 201 if image['status'] == 'done' else 202
+        
+    except RequestEntityTooLarge:
+        return too_large_response(too_large)
+    except JobQueueFull:
+        return queue_full_response()
+    except UnidentifiedImageError:
+        return jsonify({'error': 'File ảnh không hợp lệ'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Lỗi upload avatar: {str(e)}'}), 500
+    finally:
+        if streamed is not None:
+            streamed.discard()
+
+
+# ============ RESUMABLE VIDEO UPLOADS ============
+
+def resumable_headers(session):
+    """tus-style progress headers of an upload session"""
+    return {
+        'Upload-Offset': str(session['offset']),
+        'Upload-Length': str(session['size']),
+        'Upload-Expires': http_date(expires_at(session)),
+        'Cache-Control': 'no-store'
+    }
+
+
+def upload_session_error(error):
+    response = jsonify({'error': str(error)})
+    if error.offset is not None:
+        response.headers['Upload-Offset'] = str(error.offset)
+    return response, error.status
+
+
+@upload_bp.route('/resumable', methods=['POST'])
+@jwt_required()
+def create_resumable_upload():
+    """Start a resumable video upload: {filename, size} -> upload_id"""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'Không tìm thấy người dùng'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get('filename') or '')
+        
+        if not allowed_file(filename, ALLOWED_VIDEO_EXTENSIONS):
             return jsonify({
-                'error': f'Định dạng file không hợp lệ. Chỉ chấp nhận: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'
+                'error': f'Định dạng file không hợp lệ. Chỉ chấp nhận: {", ".join(ALLOWED_VIDEO_EXTENSIONS)}'
             }), 400
         
-        # Check file size (max 5MB for avatar)
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
+        try:
+            size = int(data.get('size') or request.headers.get('Upload-Length', ''))
+        except ValueError:
+            return jsonify({'error': 'Kích thước file không hợp lệ'}), 400
         
-        max_avatar_size = 5 * 1024 * 1024  # 5MB
-        if file_size > max_avatar_size:
-            return jsonify({'error': 'Avatar quá lớn. Kích thước tối đa: 5MB'}), 400
+        if size <= 0:
+            return jsonify({'error': 'Kích thước file không hợp lệ'}), 400
         
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = generate_unique_filename(filename)
+        if size > MAX_VIDEO_SIZE:
+            return jsonify({'error': f'Video quá lớn. Kích thước tối đa: {MAX_VIDEO_SIZE / (1024*1024)}MB'}), 413
         
-        # Create upload directory if not exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        avatars_folder = os.path.join(upload_folder, 'avatars')
-        os.makedirs(avatars_folder, exist_ok=True)
+        session = create_session(user.id, filename, filename.rsplit('.', 1)[1].lower(), size)
         
-        # Save file
-        file_path = os.path.join(avatars_folder, unique_filename)
-        file.save(file_path)
+        response = jsonify({
+            'message': 'Đã tạo phiên upload',
+            'upload_id': session['id'],
+            'offset': 0,
+            'size': size,
+            'chunk_size': current_app.config.get('RESUMABLE_MAX_CHUNK', DEFAULT_MAX_CHUNK),
+            'expires_at': expires_at(session)
+        })
+        response.headers.update(resumable_headers(session))
+        response.headers['Location'] = url_for('upload.resumable_upload', upload_id=session['id'])
+        return response, 201
         
-        # Update user avatar URL
-        avatar_url = f"/uploads/avatars/{unique_filename}"
-        user.avatar_url = avatar_url
-        db.session.commit()
+    except Exception as e:
+        return jsonify({'error': f'Lỗi tạo phiên upload: {str(e)}'}), 500
+
+
+@upload_bp.route('/resumable/<upload_id>', methods=['GET', 'PATCH', 'DELETE'])
+@jwt_required()
+def resumable_upload(upload_id):
+    """GET/HEAD: progress, PATCH: next chunk at Upload-Offset, DELETE: abandon the upload"""
+    try:
+        session = get_session(upload_id, get_jwt_identity())
+        
+        if session is None:
+            return jsonify({'error': 'Không tìm thấy phiên upload'}), 404
+        
+        if request.method == 'DELETE':
+            delete_session(upload_id)
+            return '', 204
+        
+        if request.method in ('GET', 'HEAD'):
+            response = jsonify({'upload': {
+                'upload_id': session['id'],
+                'filename': session['filename'],
+                'offset': session['offset'],
+                'size': session['size'],
+                'expires_at': expires_at(session)
+            }})
+            response.headers.update(resumable_headers(session))
+            return response, 200
+        
+        if request.mimetype not in ('application/offset+octet-stream', 'application/octet-stream'):
+            return jsonify({'error': 'Content-Type phải là application/offset+octet-stream'}), 415
+        
+        if request.content_length is None:
+            return jsonify({'error': 'Thiếu Content-Length'}), 411
+        
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Thiếu hoặc sai Upload-Offset'}), 400
+        
+        # Read straight from the socket: a chunk is never buffered whole
+        session = append_chunk(session, offset, get_input_stream(request.environ), request.content_length,
+                               request.headers.get('Upload-Checksum'))
+        
+        return '', 204, resumable_headers(session)
+        
+    except UploadSessionError as e:
+        return upload_session_error(e)
+    except Exception as e:
+        return jsonify({'error': f'Lỗi upload video: {str(e)}'}), 500
+
+
+@upload_bp.route('/resumable/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_resumable_upload(upload_id):
+    """Turn a complete resumable upload into a video URL"""
+    try:
+        session = get_session(upload_id, get_jwt_identity())
+        
+        if session is None:
+            return jsonify({'error': 'Không tìm thấy phiên upload'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        digest, relative_path, file_size = finalize_session(session, data.get('checksum'))
+        register_blob(digest, session['ext'], file_size, 'video')
         
         return jsonify({
-            'message': 'Upload avatar thành công!',
-            'url': avatar_url,
-            'filename': unique_filename
+            'message': 'Upload video thành công!',
+            'url': f'/uploads/{relative_path}',
+            'filename': relative_path.rsplit('/', 1)[1],
+            'size': file_size
         }), 201
         
+    except UploadSessionError as e:
+        return upload_session_error(e)
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Lỗi upload avatar: {str(e)}'}), 500
+        return jsonify({'error': f'Lỗi upload video: {str(e)}'}), 500
+
+
+@upload_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_upload_job(job_id):
+    """Status of an upload post-processing job (variants in `result` once done)"""
+    job = get_job_queue().get(job_id)
+    
+    if job is None or str(job.owner) != get_jwt_identity():
+        return jsonify({'error': 'Không tìm thấy tác vụ'}), 404
+    
+    return jsonify({'job': job.to_dict()}), 200
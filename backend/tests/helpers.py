@@ -0,0 +1,144 @@
+"""
+Shared test helpers
+Builds a throwaway Flask app bound to in-memory SQLite with all blueprints
+registered, so route tests never touch the MySQL dev database.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from functools import partial
+
+# Ensure local backend directory is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+
+import main
+from models import db
+from models.user import User
+from models.post import Post
+import models.user
+
+# Cheap password hashing keeps fixtures with many users fast
+models.user.bcrypt.gensalt = partial(bcrypt.gensalt, rounds=4)
+
+# Blueprints that main.py registers with an explicit url_prefix
+URL_PREFIXES = {
+    'auth': '/api/auth',
+    'posts': '/api/posts',
+    'test': '/api/test',
+}
+
+
+def create_test_app(database_uri='sqlite://'):
+    """Create a Flask app using SQLite (in-memory by default) and the real blueprints"""
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='test-secret',
+        JWT_SECRET_KEY='test-jwt-secret-with-enough-length-for-hs256',
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        UPLOAD_FOLDER=tempfile.mkdtemp(prefix='viego-uploads-'),
+        # Flush view counters explicitly in tests instead of from a thread
+        VIEW_COUNTER_FLUSH_INTERVAL=0,
+        # Build the search index inline from the test database, never from a snapshot file or a thread
+        SEARCH_INDEX_SNAPSHOT=None,
+        SEARCH_INDEX_REFRESH_INTERVAL=0,
+        SUGGEST_REFRESH_INTERVAL=0,
+        # Build image variants inline instead of in worker processes
+        UPLOAD_JOB_WORKERS=0,
+        # Snapshot trending scores explicitly in tests instead of from a thread
+        TRENDING_SNAPSHOT_INTERVAL=0,
+        # One process: read other workers' cache evictions only in the tests that simulate them
+        CACHE_INVALIDATION_POLL_INTERVAL=3600,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    for name, blueprint in main.app.blueprints.items():
+        app.register_blueprint(blueprint, url_prefix=URL_PREFIXES.get(name))
+    return app
+
+
+def create_user(username, role='user'):
+    user = User(username=username, email=f'{username}@example.com', password='password123')
+    user.role = role
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def create_post(author, title='Hạ Long Bay', status='published', **fields):
+    post = Post(title=title, content=fields.pop('content', 'Nội dung bài viết'), author_id=author.id)
+    post.status = status
+    if status == 'published':
+        post.published_at = fields.pop('published_at', datetime.utcnow())
+    for field, value in fields.items():
+        setattr(post, field, value)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def auth_headers(user):
+    token = create_access_token(identity=str(user.id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+class QueryCounter:
+    """Context manager counting SQL statements sent to the engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+class AppTestCase(unittest.TestCase):
+    """Base test case with a fresh SQLite app per test
+
+    Requests run in their own app context like in production, so use
+    `with self.app.app_context():` to touch the database from a test.
+    Set `database_uri` to a file-backed SQLite URI for tests that need
+    several connections (e.g. concurrent requests from threads).
+    """
+
+    database_uri = 'sqlite://'
+
+    def setUp(self):
+        self.app = create_test_app(self.database_uri)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            self.engine = db.engine
+            self.seed()
+
+    def tearDown(self):
+        # Write buffered views while the tables still exist
+        view_counter = self.app.extensions.get('view_counter')
+        if view_counter is not None:
+            view_counter.shutdown()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def seed(self):
+        """Hook for subclasses to create fixtures inside the app context"""
+
+    def count_queries(self):
+        return QueryCounter(self.engine)
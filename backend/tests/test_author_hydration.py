@@ -0,0 +1,57 @@
+import unittest
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+
+
+class AuthorHydrationTest(AppTestCase):
+    def seed_posts(self, count, start=0):
+        with self.app.app_context():
+            for i in range(start, start + count):
+                author = create_user(f'author{i}')
+                create_post(author, title=f'Post {i}', featured=True)
+
+    def get_counting_queries(self, url, **kwargs):
+        with self.count_queries() as counter:
+            response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return counter.count, response.get_json()
+
+    def test_feed_query_count_constant_in_page_size(self):
+        self.seed_posts(5)
+        small, data = self.get_counting_queries('/api/posts/?per_page=5')
+        self.assertEqual(len(data['posts']), 5)
+
+        self.seed_posts(40, start=5)
+        large, data = self.get_counting_queries('/api/posts/?per_page=45')
+        self.assertEqual(len(data['posts']), 45)
+
+        self.assertEqual(small, large)
+        for post in data['posts']:
+            self.assertEqual(post['author']['id'], post['author_id'])
+
+    def test_featured_query_count_constant_in_limit(self):
+        self.seed_posts(3)
+        small, _ = self.get_counting_queries('/api/posts/featured?limit=3')
+        self.seed_posts(20, start=3)
+        large, data = self.get_counting_queries('/api/posts/featured?limit=23')
+        self.assertEqual(len(data['featured_posts']), 23)
+        self.assertEqual(small, large)
+
+    def test_bookmarks_include_authors(self):
+        with self.app.app_context():
+            author = create_user('writer')
+            posts = [create_post(author, title=f'Saved {i}') for i in range(3)]
+            reader = create_user('reader')
+            for post in posts:
+                reader.add_bookmark(post.id)
+            db.session.commit()
+            headers = auth_headers(reader)
+
+        _, data = self.get_counting_queries('/api/social/bookmarks', headers=headers)
+        self.assertEqual(len(data['bookmarks']), 3)
+        self.assertTrue(all(p['author']['username'] == 'writer' for p in data['bookmarks']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import random
+import unittest
+from unittest import mock
+
+from helpers import AppTestCase
+from models import db
+from models.location import Location
+from utils.clusters import CLUSTER_MAX_ZOOM, MAX_ENUMERATED_CELLS, MAX_VIEWPORT_TILES, ClusterIndex
+
+VIETNAM = (8.4, 102.1, 23.4, 109.5)  # south, west, north, east
+HANOI = (20.95, 105.75, 21.1, 105.95)
+HOAN_KIEM = (21.015, 105.83, 21.035, 105.86)
+
+PLACES = [
+    ('Hồ Hoàn Kiếm', 21.0287, 105.8524, 'attraction'),
+    ('Văn Miếu', 21.0277, 105.8355, 'attraction'),
+    ('Phở Thìn', 21.0189, 105.8554, 'restaurant'),
+    ('Vịnh Hạ Long', 20.9101, 107.1839, 'attraction'),
+    ('Chợ Bến Thành', 10.7725, 106.6980, 'shopping'),
+]
+
+
+def random_points(count, seed=5):
+    rng = random.Random(seed)
+    return [(i, rng.uniform(VIETNAM[0], VIETNAM[2]), rng.uniform(VIETNAM[1], VIETNAM[3]),
+             rng.choice(['hotel', 'restaurant', 'attraction'])) for i in range(1, count + 1)]
+
+
+def normalized(clusters):
+    return sorted((c['count'], c['lat'], c['lng'], c['category'], c.get('id')) for c in clusters)
+
+
+class ClusterIndexTest(unittest.TestCase):
+    def test_every_point_is_counted_once_per_zoom(self):
+        index = ClusterIndex()
+        index.build(random_points(2000))
+        previous = None
+        for zoom in range(0, CLUSTER_MAX_ZOOM + 1):
+            clusters = index.clusters(VIETNAM, zoom)
+            self.assertEqual(sum(cluster['count'] for cluster in clusters), 2000)
+            if previous is not None:
+                self.assertGreaterEqual(len(clusters), previous)
+            previous = len(clusters)
+        self.assertEqual(len(index.clusters(VIETNAM, 0)), 1)
+        # Past the precomputed levels a viewport-sized box still counts each point once
+        viewport = south, west, north, east = (20.7, 105.7, 21.3, 106.3)
+        inside = sum(south <= lat <= north and west <= lng <= east for _, lat, lng, _ in random_points(2000))
+        self.assertGreater(inside, 0)
+        for zoom in (CLUSTER_MAX_ZOOM, CLUSTER_MAX_ZOOM + 1, CLUSTER_MAX_ZOOM + 2):
+            self.assertEqual(sum(cluster['count'] for cluster in index.clusters(viewport, zoom)), inside)
+
+    def test_incremental_updates_match_a_rebuild(self):
+        points = random_points(500)
+        index = ClusterIndex()
+        index.build(points[:300])
+        for point in points[300:]:
+            index.add(*point)
+        for point_id in range(1, 101):
+            index.remove(point_id)
+        index.add(200, 21.0287, 105.8524, 'hotel')
+
+        rebuilt = ClusterIndex()
+        rebuilt.build([point for point in points[100:] if point[0] != 200] + [(200, 21.0287, 105.8524, 'hotel')])
+        for zoom in (3, 8, 12, 16):
+            self.assertEqual(normalized(index.clusters(VIETNAM, zoom)), normalized(rebuilt.clusters(VIETNAM, zoom)))
+
+    def test_centroid_category_and_single_member_id(self):
+        index = ClusterIndex()
+        index.build([(i + 1, lat, lng, category) for i, (_, lat, lng, category) in enumerate(PLACES)])
+        hanoi = index.clusters(HANOI, 8)
+        self.assertEqual(len(hanoi), 1)
+        self.assertEqual(hanoi[0]['count'], 3)
+        self.assertEqual(hanoi[0]['category'], 'attraction')
+        self.assertAlmostEqual(hanoi[0]['lat'], (21.0287 + 21.0277 + 21.0189) / 3, places=4)
+        # Zoomed past the precomputed levels every place is its own marker
+        self.assertEqual(sorted(cluster['id'] for cluster in index.clusters(HOAN_KIEM, 17)), [1, 2, 3])
+
+    def test_deep_zoom_over_the_whole_world_stays_small(self):
+        index = ClusterIndex(max_zoom=14)
+        index.build([(1, 0.0001, 0.0001, 'hotel'), (2, 21.0287, 105.8524, 'attraction')])
+        world = (-90.0, -180.0, 90.0, 180.0)
+        south, west, north, east = index._viewport(22, world)
+        self.assertLessEqual(east - west, 360.0 * MAX_VIEWPORT_TILES / (1 << 22))
+        xs, ys = index._cell_range(14, (south, west, north, east))
+        self.assertLessEqual(len(xs) * len(ys), MAX_ENUMERATED_CELLS)
+        # Only the point at the centre of the world is inside the cut-down viewport
+        self.assertEqual([cluster['id'] for cluster in index.clusters(world, 22)], [1])
+
+    def test_scanning_members_matches_enumerating_cells(self):
+        index = ClusterIndex()
+        index.build(random_points(500))
+        enumerated = normalized(index.clusters(HANOI, 16))
+        with mock.patch('utils.clusters.MAX_ENUMERATED_CELLS', 0):
+            self.assertEqual(normalized(index.clusters(HANOI, 16)), enumerated)
+
+
+class ClusterRouteTest(AppTestCase):
+    def seed(self):
+        for name, lat, lng, category in PLACES:
+            db.session.add(Location(name=name, latitude=lat, longitude=lng, category=category))
+        db.session.commit()
+
+    def clusters(self, bbox, zoom):
+        response = self.client.get('/api/maps/clusters', query_string={'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_zoomed_out_view_is_a_handful_of_clusters(self):
+        data = self.clusters('102.1,8.4,109.5,23.4', 4)
+        self.assertEqual(data['count'], 5)
+        self.assertEqual([cluster['count'] for cluster in data['clusters']], [3, 1, 1])
+        self.assertEqual(self.client.get('/api/maps/clusters?bbox=1,2,3&zoom=4').status_code, 400)
+        self.assertEqual(self.client.get('/api/maps/clusters?bbox=102,8,109,23').status_code, 400)
+
+    def test_deepest_zoom_over_the_whole_world(self):
+        data = self.clusters('-180,-90,180,90', 22)
+        self.assertEqual(data['count'], 0)
+        data = self.clusters('105.85,21.0286,105.855,21.0288', 22)
+        self.assertEqual(data['count'], 1)
+
+    def test_commits_update_the_clusters(self):
+        self.clusters('102.1,8.4,109.5,23.4', 4)
+        with self.app.app_context():
+            db.session.delete(Location.query.filter_by(name='Vịnh Hạ Long').one())
+            db.session.add(Location(name='Dinh Độc Lập', latitude=10.7770, longitude=106.6953, category='attraction'))
+            db.session.commit()
+        data = self.clusters('102.1,8.4,109.5,23.4', 4)
+        self.assertEqual([cluster['count'] for cluster in data['clusters']], [3, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime, timedelta
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.location import Location
+
+
+class ConditionalGetTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        post = create_post(author, title='Phố cổ Hội An', content='Nội dung rất dài ' * 200)
+        self.slug = post.slug
+        self.post_id = post.id
+
+        location = Location(name='Chợ Bến Thành', latitude=10.77, longitude=106.69, category='shopping')
+        db.session.add(location)
+        db.session.commit()
+        self.location_id = location.id
+        self.reader_headers = auth_headers(create_user('reader'))
+
+    def revalidate(self, url, **headers):
+        first = self.client.get(url, headers=headers)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.headers['ETag'].startswith('W/'))
+        second = self.client.get(url, headers={**headers, 'If-None-Match': first.headers['ETag']})
+        return first, second
+
+    def test_post_detail_revalidates_with_304(self):
+        first, second = self.revalidate(f'/api/posts/{self.slug}')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertIn('public', first.headers['Cache-Control'])
+        self.assertIn('s-maxage=60', first.headers['Cache-Control'])
+        self.assertIn('Authorization', first.headers['Vary'])
+
+    def test_like_changes_post_etag(self):
+        first = self.client.get(f'/api/posts/{self.slug}')
+        self.client.post(f'/api/social/likes/post/{self.post_id}', headers=self.reader_headers)
+        second = self.client.get(f'/api/posts/{self.slug}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_json()['post']['likes_count'], 1)
+
+    def test_view_does_not_change_post_etag(self):
+        first = self.client.get(f'/api/posts/{self.slug}')
+        self.app.extensions['view_counter'].flush()
+        second = self.client.get(f'/api/posts/{self.slug}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+    def test_logged_in_detail_is_private_and_viewer_specific(self):
+        anonymous = self.client.get(f'/api/posts/{self.slug}')
+        first, second = self.revalidate(f'/api/posts/{self.slug}', **self.reader_headers)
+        self.assertEqual(second.status_code, 304)
+        self.assertNotEqual(anonymous.headers['ETag'], first.headers['ETag'])
+        self.assertIn('private', first.headers['Cache-Control'])
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+
+    def test_if_modified_since_never_hides_a_like(self):
+        first = self.client.get(f'/api/posts/{self.slug}')
+        # A like leaves updated_at alone, so a date validator would answer 304 with stale counts
+        self.assertNotIn('Last-Modified', first.headers)
+        since = (datetime.utcnow() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        self.client.post(f'/api/social/likes/post/{self.post_id}', headers=self.reader_headers)
+        for headers in ({}, self.reader_headers):
+            response = self.client.get(f'/api/posts/{self.slug}', headers={**headers, 'If-Modified-Since': since})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['post']['likes_count'], 1)
+        self.assertTrue(response.get_json()['post']['is_liked'])
+
+    def test_location_detail_revalidates(self):
+        first, second = self.revalidate(f'/api/maps/locations/{self.location_id}')
+        self.assertEqual(second.status_code, 304)
+
+        with self.app.app_context():
+            db.session.get(Location, self.location_id).rating = 4.5
+            db.session.commit()
+        response = self.client.get(f'/api/maps/locations/{self.location_id}',
+                                   headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['rating'], 4.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
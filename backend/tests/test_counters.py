@@ -0,0 +1,191 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.post import Post
+from models.comment import Comment
+from models.social import UserFollow
+from models.user import User
+from utils.counters import (batched_counters, increment_counter, decrement_counter, read_counter,
+                            reconcile_user_counters)
+
+
+class CounterTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        post = create_post(author, title='Counted post')
+        self.author_headers = auth_headers(author)
+        self.author_id = author.id
+        self.post_id = post.id
+
+    def test_decrement_is_clamped_at_zero(self):
+        with self.app.app_context():
+            decrement_counter('post', self.post_id, 'likes_count')
+            db.session.commit()
+            self.assertEqual(read_counter('post', self.post_id, 'likes_count'), 0)
+
+    def test_counter_update_keeps_updated_at(self):
+        with self.app.app_context():
+            before = db.session.get(Post, self.post_id).updated_at
+            increment_counter('post', self.post_id, 'shares_count')
+            db.session.commit()
+            post = db.session.get(Post, self.post_id)
+            self.assertEqual(post.shares_count, 1)
+            self.assertEqual(post.updated_at, before)
+
+    def test_batch_writes_one_update_per_row(self):
+        with self.app.app_context():
+            with self.count_queries() as counter:
+                with batched_counters():
+                    increment_counter('post', self.post_id, 'likes_count')
+                    increment_counter('post', self.post_id, 'likes_count')
+                    increment_counter('post', self.post_id, 'shares_count')
+                    self.assertEqual(counter.count, 0)
+            self.assertEqual(counter.count, 1)
+            db.session.commit()
+            post = db.session.get(Post, self.post_id)
+            self.assertEqual((post.likes_count, post.shares_count), (2, 1))
+
+    def test_unknown_column_is_rejected(self):
+        with self.app.app_context():
+            with self.assertRaises(ValueError):
+                increment_counter('post', self.post_id, 'title')
+
+    def test_reply_and_delete_keep_counts_in_sync(self):
+        response = self.client.post('/api/comments/', json={'content': 'Đẹp quá', 'post_id': self.post_id},
+                                    headers=self.author_headers)
+        self.assertEqual(response.status_code, 201)
+        parent_id = response.get_json()['comment']['id']
+        response = self.client.post('/api/comments/', json={'content': 'Đồng ý', 'post_id': self.post_id,
+                                                            'parent_id': parent_id},
+                                    headers=self.author_headers)
+        reply_id = response.get_json()['comment']['id']
+
+        with self.app.app_context():
+            self.assertEqual(read_counter('post', self.post_id, 'comments_count'), 2)
+            self.assertEqual(db.session.get(Comment, parent_id).replies_count, 1)
+
+        self.client.delete(f'/api/comments/{reply_id}', headers=self.author_headers)
+        with self.app.app_context():
+            self.assertEqual(read_counter('post', self.post_id, 'comments_count'), 1)
+            self.assertEqual(db.session.get(Comment, parent_id).replies_count, 0)
+
+
+class ConcurrentLikeTest(AppTestCase):
+    """Parallel likes against a file-backed database so every thread has its own connection"""
+
+    likers = 16
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='viego-counters-')
+        self.database_uri = 'sqlite:///' + os.path.join(self.tmpdir, 'counters.db')
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def seed(self):
+        author = create_user('author')
+        self.post_id = create_post(author, title='Trending post').id
+        self.headers = [auth_headers(create_user(f'fan{i}')) for i in range(self.likers)]
+
+    def run_in_parallel(self, method, url, headers_list):
+        barrier = threading.Barrier(len(headers_list))
+        statuses = []
+
+        def worker(headers):
+            client = self.app.test_client()
+            barrier.wait()
+            statuses.append(getattr(client, method)(url, headers=headers).status_code)
+
+        threads = [threading.Thread(target=worker, args=(headers,)) for headers in headers_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_parallel_likes_are_not_lost(self):
+        statuses = self.run_in_parallel('post', f'/api/social/likes/post/{self.post_id}', self.headers)
+        self.assertEqual(statuses, [200] * self.likers)
+        with self.app.app_context():
+            self.assertEqual(read_counter('post', self.post_id, 'likes_count'), self.likers)
+
+        # Half of the fans change their mind at the same time
+        half = self.headers[:self.likers // 2]
+        statuses = self.run_in_parallel('delete', f'/api/social/likes/post/{self.post_id}', half)
+        self.assertEqual(statuses, [200] * len(half))
+        with self.app.app_context():
+            self.assertEqual(read_counter('post', self.post_id, 'likes_count'), self.likers - len(half))
+
+    def test_parallel_shares_are_not_lost(self):
+        statuses = self.run_in_parallel('post', f'/api/posts/{self.post_id}/share', self.headers)
+        self.assertEqual(statuses, [200] * self.likers)
+        with self.app.app_context():
+            self.assertEqual(read_counter('post', self.post_id, 'shares_count'), self.likers)
+
+
+class UserCounterTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        reader = create_user('reader')
+        self.author_id = author.id
+        self.reader_id = reader.id
+        self.post_id = create_post(author, title='Đà Lạt mùa hoa').id
+        create_post(author, title='Bản nháp', status='draft')
+        self.author_headers = auth_headers(author)
+        self.reader_headers = auth_headers(reader)
+
+    def counts(self, user_id):
+        with self.app.app_context():
+            stats = db.session.get(User, user_id).get_stats()
+            return {key: stats[key] for key in ('followers_count', 'following_count', 'posts_count', 'comments_count')}
+
+    def test_writes_keep_user_counts_in_sync(self):
+        self.assertEqual(self.counts(self.author_id)['posts_count'], 1)  # drafts are not counted
+
+        response = self.client.post(f'/api/social/follow/{self.author_id}', headers=self.reader_headers)
+        self.assertEqual(response.get_json()['followers_count'], 1)
+        response = self.client.post('/api/comments/', json={'content': 'Tuyệt vời', 'post_id': self.post_id},
+                                    headers=self.reader_headers)
+        comment_id = response.get_json()['comment']['id']
+        self.assertEqual(self.counts(self.reader_id), {
+            'followers_count': 0, 'following_count': 1, 'posts_count': 0, 'comments_count': 1})
+
+        followers = self.client.get('/api/social/following', headers=self.reader_headers).get_json()
+        self.assertEqual([u['posts_count'] for u in followers['following']], [1])
+
+        self.client.delete(f'/api/comments/{comment_id}', headers=self.reader_headers)  # soft delete
+        self.client.post(f'/api/social/unfollow/{self.author_id}', headers=self.reader_headers)
+        with self.app.app_context():
+            db.session.get(Post, self.post_id).archive()
+            db.session.commit()
+        self.assertEqual(self.counts(self.reader_id)['comments_count'], 0)
+        self.assertEqual(self.counts(self.author_id), {
+            'followers_count': 0, 'following_count': 0, 'posts_count': 0, 'comments_count': 0})
+
+    def test_reconcile_repairs_drift(self):
+        with self.app.app_context():
+            db.session.add(UserFollow(follower_id=self.reader_id, followed_id=self.author_id))
+            db.session.commit()
+            # Writes that bypass the session hooks
+            db.session.execute(UserFollow.__table__.delete())
+            db.session.execute(User.__table__.update().where(User.id == self.author_id).values(posts_count=7))
+            db.session.commit()
+
+            self.assertEqual(reconcile_user_counters(batch_size=1), 2)
+            self.assertEqual(reconcile_user_counters(), 0)
+        self.assertEqual(self.counts(self.author_id)['posts_count'], 1)
+        self.assertEqual(self.counts(self.author_id)['followers_count'], 0)
+        self.assertEqual(self.counts(self.reader_id)['following_count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
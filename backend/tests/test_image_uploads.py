@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import threading
+import unittest
+
+from PIL import Image, PngImagePlugin
+
+from helpers import AppTestCase, auth_headers, create_post, create_user
+from models import db
+from models.user import User
+from utils.blob_store import blob_folder, blob_url_prefix
+from utils.images import build_variants, store_original
+
+
+def jpeg_bytes(size=(2400, 1600), color=(200, 80, 40), orientation=None):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class ImageUploadTest(AppTestCase):
+    def seed(self):
+        self.user_id = create_user('photographer').id
+
+    def headers(self):
+        with self.app.app_context():
+            return auth_headers(db.session.get(User, self.user_id))
+
+    def upload(self, data, filename='photo.jpg', path='/api/upload/image', field='file'):
+        return self.client.post(path, headers=self.headers(), content_type='multipart/form-data',
+                                data={field: (io.BytesIO(data), filename)})
+
+    def disk_path(self, url):
+        return os.path.join(self.app.config['UPLOAD_FOLDER'], url[len('/uploads/'):])
+
+    def test_variants_webp_and_no_exif(self):
+        response = self.upload(jpeg_bytes())
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+
+        self.assertEqual((data['width'], data['height']), (2400, 1600))
+        self.assertEqual({name: variant['width'] for name, variant in data['variants'].items()},
+                         {'large': 1600, 'medium': 800, 'thumb': 320, 'small': 96})
+        for variant in data['variants'].values():
+            with Image.open(self.disk_path(variant['webp'])) as webp:
+                self.assertEqual(webp.format, 'WEBP')
+            self.assertLess(variant['size'], data['size'])
+        with Image.open(self.disk_path(data['url'])) as original:
+            self.assertEqual(len(original.getexif()), 0)
+            self.assertEqual(original.size, (2400, 1600))
+        self.assertTrue(data['srcset'].startswith(data['variants']['small']['url'] + ' 96w, '))
+        self.assertTrue(data['webp_srcset'].endswith(data['variants']['large']['webp'] + ' 1600w'))
+
+    def test_same_bytes_give_the_same_files(self):
+        payload = jpeg_bytes(size=(500, 300))
+        first = self.upload(payload).get_json()
+        second = self.upload(payload, filename='again.jpg').get_json()
+        self.assertEqual(first['url'], second['url'])
+        # Smaller than medium: only the thumbnail and small variants are produced
+        self.assertEqual(sorted(first['variants']), ['small', 'thumb'])
+
+    def test_concurrent_jobs_for_one_digest_do_not_share_temp_files(self):
+        with self.app.app_context():
+            stored = store_original(jpeg_bytes(size=(900, 600)))
+            folder = blob_folder(stored['digest'])
+            prefix = blob_url_prefix(stored['digest'])
+        results, errors = [], []
+
+        def job():
+            try:
+                results.append(build_variants(folder, prefix, stored['filename']))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=job) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len({json.dumps(result, sort_keys=True) for result in results}), 1)
+        self.assertEqual([name for name in os.listdir(folder) if name.endswith('.tmp')], [])
+
+    def test_exif_orientation_is_kept_alone(self):
+        data = self.upload(jpeg_bytes(size=(600, 400), orientation=6)).get_json()
+        self.assertEqual((data['width'], data['height']), (400, 600))
+        self.assertEqual((data['variants']['thumb']['width'], data['variants']['thumb']['height']), (213, 320))
+        with Image.open(self.disk_path(data['url'])) as original:
+            # The camera maker is gone, only the orientation the browser needs is left
+            self.assertEqual(dict(original.getexif()), {0x0112: 6})
+
+    def test_png_text_chunks_are_dropped(self):
+        image = Image.new('RGBA', (400, 400), (0, 120, 200, 128))
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'toạ độ nhà riêng')
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', pnginfo=info)
+        data = self.upload(buffer.getvalue(), filename='map.png').get_json()
+        with Image.open(self.disk_path(data['url'])) as original:
+            self.assertEqual(original.text, {})
+        self.assertTrue(data['variants']['thumb']['url'].endswith('.png'))
+
+    def test_not_an_image(self):
+        self.assertEqual(self.upload(b'not really a jpeg').status_code, 400)
+
+    def test_multiple_images_report_per_file_errors(self):
+        response = self.client.post('/api/upload/images', headers=self.headers(), content_type='multipart/form-data',
+                                    data={'files': [(io.BytesIO(jpeg_bytes((900, 900))), 'a.jpg'),
+                                                    (io.BytesIO(b'nope'), 'b.png')]})
+        data = response.get_json()
+        self.assertEqual(len(data['uploaded']), 1)
+        self.assertEqual(data['uploaded'][0]['original_name'], 'a.jpg')
+        self.assertEqual(data['errors'][0]['filename'], 'b.png')
+
+    def test_listings_use_the_small_avatar(self):
+        data = self.upload(jpeg_bytes((1000, 1000)), path='/api/upload/avatar').get_json()
+        with self.app.app_context():
+            author = db.session.get(User, self.user_id)
+            self.assertEqual(author.avatar_url, data['url'])
+            create_post(author, 'Bài viết')
+        post = self.client.get('/api/posts/').get_json()['posts'][0]
+        self.assertEqual(post['author']['avatar_url'], data['variants']['small']['url'])
+
+    def test_post_lists_carry_the_srcset(self):
+        image = self.upload(jpeg_bytes()).get_json()
+        with self.app.app_context():
+            author = db.session.get(User, self.user_id)
+            create_post(author, 'Có ảnh', featured_image=image['url'])
+            create_post(author, 'Ảnh ngoài', featured_image='https://example.com/a.jpg')
+        posts = {post['title']: post for post in self.client.get('/api/posts/').get_json()['posts']}
+        variants = posts['Có ảnh']['featured_image_variants']
+        self.assertEqual(variants['thumb'], image['variants']['thumb']['webp'])
+        self.assertEqual(variants['srcset'], image['srcset'])
+        self.assertIsNone(posts['Ảnh ngoài']['featured_image_variants'])
+
+
+if __name__ == '__main__':
+    unittest.main()
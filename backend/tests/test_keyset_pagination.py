@@ -0,0 +1,104 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.comment import Comment
+from models.report import ActivityLog
+from utils.pagination import decode_cursor, encode_cursor, InvalidCursor
+
+
+class CursorCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        moment = datetime(2024, 5, 1, 8, 30, 15, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(moment, 42)), (moment, 42))
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+
+    def test_garbage_is_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor('yesterday', 1), encode_cursor(None, 'x')):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+class KeysetPaginationTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        base = datetime(2024, 1, 1)
+        # Pairs of posts share a timestamp so the id tie-breaker matters
+        for i in range(15):
+            create_post(author, title=f'Post {i}', published_at=base + timedelta(hours=i // 2))
+        post = create_post(author, title='Commented post', published_at=base - timedelta(days=1))
+        self.post_id = post.id
+        for i in range(11):
+            comment = Comment(content=f'Comment {i}', author_id=author.id, post_id=post.id)
+            comment.status = 'approved'
+            comment.created_at = base + timedelta(minutes=i // 3)
+            db.session.add(comment)
+            log = ActivityLog('system_event', f'Event {i}')
+            log.created_at = base + timedelta(minutes=i // 4)
+            db.session.add(log)
+        db.session.commit()
+        self.admin_headers = auth_headers(create_user('admin', role='admin'))
+
+    def walk(self, url, items_key, cursor_key='next_cursor', **kwargs):
+        ids, cursor, pages = [], '', 0
+        while cursor is not None:
+            response = self.client.get(f'{url}&cursor={cursor}', **kwargs)
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            ids.extend(item['id'] for item in data[items_key])
+            cursor = data['pagination'][cursor_key]
+            pages += 1
+        return ids, pages
+
+    def offset_ids(self, url, items_key, **kwargs):
+        data = self.client.get(url, **kwargs).get_json()
+        return [item['id'] for item in data[items_key]]
+
+    def test_post_feed_cursor_matches_offset_order(self):
+        ids, pages = self.walk('/api/posts/?per_page=4', 'posts')
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(ids), 16)
+        self.assertEqual(len(set(ids)), 16)
+        self.assertEqual(ids, self.offset_ids('/api/posts/?per_page=50', 'posts'))
+
+    def test_cursor_pages_skip_count(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, *args):
+            statements.append((statement.lower(), parameters))
+
+        event.listen(self.engine, 'before_cursor_execute', record)
+        try:
+            self.walk('/api/posts/?per_page=5', 'posts')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', record)
+        self.assertFalse([s for s, _ in statements if 'count(' in s])
+        # SQLite always renders OFFSET; it must stay 0 on every page
+        self.assertFalse([p for s, p in statements if s.endswith('offset ?') and p[-1] != 0])
+
+    def test_comment_cursor(self):
+        ids, _ = self.walk(f'/api/comments/post/{self.post_id}?per_page=3', 'comments')
+        self.assertEqual(ids, self.offset_ids(f'/api/comments/post/{self.post_id}?per_page=50', 'comments'))
+        self.assertEqual(len(ids), 11)
+
+    def test_admin_lists_cursor(self):
+        ids, _ = self.walk('/api/admin/comments?per_page=4', 'comments', cursor_key='nextCursor',
+                           headers=self.admin_headers)
+        self.assertEqual(len(ids), 11)
+        self.assertEqual(ids, self.offset_ids('/api/admin/comments?per_page=50', 'comments',
+                                              headers=self.admin_headers))
+
+        ids, _ = self.walk('/api/admin/activity-logs?per_page=4', 'logs', cursor_key='nextCursor',
+                           headers=self.admin_headers)
+        self.assertEqual(len(ids), 11)
+
+    def test_invalid_cursor_is_400(self):
+        response = self.client.get('/api/posts/?cursor=bogus')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
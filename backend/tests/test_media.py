@@ -0,0 +1,80 @@
+import os
+import unittest
+
+from helpers import AppTestCase
+
+DIGEST = 'ab' * 32
+
+
+class MediaServingTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = self.app.config['UPLOAD_FOLDER']
+        self.video = bytes(range(256)) * 400
+        self.write(f'ab/ab/{DIGEST}.mp4', self.video)
+        self.write(f'ab/ab/{DIGEST}_thumb.webp', b'RIFF....WEBP')
+        self.write('avatars/old-avatar.jpg', b'\xff\xd8legacy')
+        self.write('tmp/upload.part', b'half')
+
+    def write(self, relative, data):
+        path = os.path.join(self.folder, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            out.write(data)
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.client.get(f'/uploads/ab/ab/{DIGEST}_thumb.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{DIGEST}_thumb"')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', response.headers['Cache-Control'])
+        self.assertEqual(response.headers['X-Content-Type-Options'], 'nosniff')
+
+        response = self.client.get(f'/uploads/ab/ab/{DIGEST}_thumb.webp',
+                                   headers={'If-None-Match': f'"{DIGEST}_thumb"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_legacy_uploads_revalidate(self):
+        response = self.client.get('/uploads/avatars/old-avatar.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response.headers['Cache-Control'])
+        etag = response.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertEqual(self.client.get('/uploads/avatars/old-avatar.jpg',
+                                         headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_range_requests_for_video_seeking(self):
+        response = self.client.get(f'/uploads/ab/ab/{DIGEST}.mp4', headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 1000-1999/{len(self.video)}')
+        self.assertEqual(response.data, self.video[1000:2000])
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+
+    def test_offload_to_the_front_server(self):
+        self.app.config['UPLOADS_OFFLOAD'] = 'x-accel'
+        response = self.client.get(f'/uploads/ab/ab/{DIGEST}.mp4')
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-uploads/ab/ab/{DIGEST}.mp4')
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.mimetype, 'video/mp4')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        self.app.config['UPLOADS_OFFLOAD'] = 'x-sendfile'
+        response = self.client.get('/uploads/avatars/old-avatar.jpg')
+        self.assertEqual(response.headers['X-Sendfile'],
+                         os.path.abspath(os.path.join(self.folder, 'avatars/old-avatar.jpg')))
+
+    def test_private_and_missing_paths(self):
+        for path in ('/uploads/tmp/upload.part', '/uploads/avatars/missing.jpg', '/uploads/../main.py'):
+            self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_private_prefixes_cannot_be_dodged(self):
+        self.write('videos/resumable/session.json', b'{"user_id": 1}')
+        for path in ('./videos/resumable/session.json', 'videos//resumable/session.json',
+                     'videos/./resumable/session.json', 'videos/resumable//session.json',
+                     './tmp/upload.part', 'tmp/./upload.part', 'avatars/../tmp/upload.part',
+                     'TMP/upload.part'):
+            self.assertEqual(self.client.get(f'/uploads/{path}').status_code, 404, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import random
+import unittest
+
+from helpers import AppTestCase, create_post, create_user
+from models import db
+from models.location import Location
+from models.post import Post
+from models.tour import Tour
+from utils.geo import bounding_box, geohash_cover, geohash_encode, haversine_km
+from utils.geo_vector import HAS_NUMPY, PointArrays, haversine_many, path_legs
+from utils.spatial_index import SpatialGrid
+
+HOAN_KIEM = (21.0285, 105.8522)
+
+PLACES = [
+    ('Hồ Hoàn Kiếm', 21.0287, 105.8524, 'attraction'),
+    ('Văn Miếu', 21.0277, 105.8355, 'attraction'),
+    ('Phở Thìn', 21.0189, 105.8554, 'restaurant'),
+    ('Lăng Bác', 21.0368, 105.8346, 'attraction'),
+    ('Nội Bài', 21.2187, 105.8042, 'transport'),
+    ('Vịnh Hạ Long', 20.9101, 107.1839, 'attraction'),
+]
+
+
+class GeoTest(unittest.TestCase):
+    def test_geohash_matches_reference_values(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash_encode(21.0285, 105.8522, 5), 'w7er8')
+
+    def test_geohash_cover_contains_every_point_in_the_box(self):
+        rng = random.Random(3)
+        box = bounding_box(*HOAN_KIEM, 7)
+        prefixes = geohash_cover(box)
+        self.assertLessEqual(len(prefixes), 16 + 3)
+        for _ in range(500):
+            lat = rng.uniform(box[0], box[2])
+            lng = rng.uniform(box[1], box[3])
+            self.assertTrue(geohash_encode(lat, lng).startswith(tuple(prefixes)))
+
+
+class SpatialGridTest(unittest.TestCase):
+    def test_radius_and_k_nearest_match_brute_force(self):
+        rng = random.Random(7)
+        points = {i: (rng.uniform(8.5, 23.4), rng.uniform(102.1, 109.5)) for i in range(3000)}
+        grid = SpatialGrid(cell_degrees=0.25)
+        for point_id, (lat, lng) in points.items():
+            grid.add(point_id, lat, lng)
+
+        for _ in range(20):
+            lat, lng = rng.uniform(9, 23), rng.uniform(103, 109)
+            expected = sorted((haversine_km(lat, lng, *point), i) for i, point in points.items())
+            self.assertEqual(grid.within(lat, lng, 40), [hit for hit in expected if hit[0] <= 40])
+            self.assertEqual(grid.nearest(lat, lng, 5), expected[:5])
+            self.assertEqual(grid.nearest(lat, lng, 5, max_radius_km=15),
+                             [hit for hit in expected[:5] if hit[0] <= 15])
+
+    def test_points_on_the_radius_edge_are_kept(self):
+        grid = SpatialGrid()
+        # 4.999 km due north: inside the radius, right at the bounding box edge
+        grid.add(1, HOAN_KIEM[0] + 4.999 / haversine_km(0, 0, 1, 0), HOAN_KIEM[1])
+        self.assertEqual([point_id for _, point_id in grid.within(*HOAN_KIEM, 5)], [1])
+
+    def test_moving_and_removing_points(self):
+        grid = SpatialGrid()
+        grid.add(1, *HOAN_KIEM)
+        grid.add(1, 20.9101, 107.1839)
+        self.assertEqual(grid.within(*HOAN_KIEM, 10), [])
+        grid.remove(1)
+        self.assertEqual(len(grid), 0)
+        self.assertEqual(grid.nearest(*HOAN_KIEM, 3), [])
+
+
+@unittest.skipUnless(HAS_NUMPY, 'numpy is not installed')
+class PointArraysTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(11)
+        points = [(i, rng.uniform(8.5, 23.4), rng.uniform(102.1, 109.5), rng.choice(['a', 'b'])) for i in range(3000)]
+        arrays = PointArrays(capacity=16)
+        arrays.build(points[:1000])
+        for point in points[1000:]:
+            arrays.add(*point)
+
+        for _ in range(20):
+            lat, lng = rng.uniform(9, 23), rng.uniform(103, 109)
+            expected = sorted((haversine_km(lat, lng, p_lat, p_lng), i, c) for i, p_lat, p_lng, c in points)
+            hits = arrays.within(lat, lng, 40)
+            self.assertEqual([i for _, i in hits], [i for d, i, _ in expected if d <= 40])
+            for (distance, _), (exact, _, _) in zip(hits, expected):
+                self.assertAlmostEqual(distance, exact, places=6)
+            self.assertEqual([i for _, i in arrays.nearest(lat, lng, 5)], [i for _, i, _ in expected[:5]])
+            self.assertEqual([i for _, i in arrays.within(lat, lng, 40, 'b')],
+                             [i for d, i, c in expected if d <= 40 and c == 'b'])
+            self.assertEqual([i for _, i in arrays.nearest(lat, lng, 7, max_radius_km=60, category='a')],
+                             [i for d, i, c in expected if d <= 60 and c == 'a'][:7])
+        # Sparse: fewer points than k anywhere near, found in the same single pass
+        self.assertEqual(len(arrays.nearest(0.0, 0.0, 4000)), 3000)
+        self.assertEqual(arrays.nearest(0.0, 0.0, 5, max_radius_km=100), [])
+
+    def test_remove_moves_the_last_row_into_the_gap(self):
+        arrays = PointArrays()
+        arrays.build([(1, *HOAN_KIEM, None), (2, 21.0189, 105.8554, None), (3, 21.0277, 105.8355, None)])
+        arrays.remove(1)
+        arrays.add(2, 20.9101, 107.1839)
+        self.assertEqual(len(arrays), 2)
+        self.assertEqual([i for _, i in arrays.within(*HOAN_KIEM, 5)], [3])
+        self.assertEqual(arrays.coordinates([1, 2, 3]), {2: (20.9101, 107.1839), 3: (21.0277, 105.8355)})
+
+    def test_path_legs(self):
+        legs = path_legs([place[1] for place in PLACES], [place[2] for place in PLACES])
+        self.assertEqual(legs[0], 0)
+        for leg, a, b in zip(legs[1:], PLACES, PLACES[1:]):
+            self.assertAlmostEqual(leg, haversine_km(a[1], a[2], b[1], b[2]), places=6)
+        self.assertEqual(path_legs([21.0], [105.8]), [0.0])
+        distances = haversine_many(HOAN_KIEM[0], HOAN_KIEM[1], [p[1] for p in PLACES], [p[2] for p in PLACES])
+        self.assertAlmostEqual(distances[-1], haversine_km(*HOAN_KIEM, PLACES[-1][1], PLACES[-1][2]), places=6)
+
+
+class NearbyRouteTest(AppTestCase):
+    def seed(self):
+        for name, lat, lng, category in PLACES:
+            db.session.add(Location(name=name, latitude=lat, longitude=lng, category=category))
+        db.session.commit()
+
+    def nearby(self, **params):
+        response = self.client.get('/api/maps/nearby', query_string={'lat': HOAN_KIEM[0], 'lng': HOAN_KIEM[1], **params})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        return [location['name'] for location in data['locations']], data['count']
+
+    def test_radius_search_sorted_by_distance(self):
+        self.assertEqual(self.nearby(radius=3), (['Hồ Hoàn Kiếm', 'Phở Thìn', 'Văn Miếu', 'Lăng Bác'], 4))
+        self.assertEqual(self.nearby(radius=3, category='restaurant'), (['Phở Thìn'], 1))
+        self.assertEqual(self.nearby(radius=3, limit=2), (['Hồ Hoàn Kiếm', 'Phở Thìn'], 4))
+        self.assertEqual(self.client.get('/api/maps/nearby?lat=21').status_code, 400)
+
+    def test_k_nearest(self):
+        self.assertEqual(self.nearby(k=2)[0], ['Hồ Hoàn Kiếm', 'Phở Thìn'])
+        # Without a radius the k nearest can be far away
+        self.assertEqual(self.nearby(k=6)[0][-1], 'Vịnh Hạ Long')
+        self.assertEqual(self.nearby(k=6, radius=25)[0][-1], 'Nội Bài')
+
+    def test_database_backend_uses_geohash_prefilter(self):
+        with self.app.app_context():
+            self.assertEqual(Location.query.filter_by(name='Phở Thìn').one().geohash, geohash_encode(21.0189, 105.8554))
+        self.app.config['NEARBY_BACKEND'] = 'database'
+        self.assertEqual(self.nearby(radius=3), (['Hồ Hoàn Kiếm', 'Phở Thìn', 'Văn Miếu', 'Lăng Bác'], 4))
+
+    def test_commits_update_the_grid(self):
+        self.nearby(radius=3)
+        with self.app.app_context():
+            db.session.add(Location(name='Nhà hát Lớn', latitude=21.0243, longitude=105.8576, category='entertainment'))
+            moved = Location.query.filter_by(name='Văn Miếu').one()
+            moved.latitude, moved.longitude = 16.4637, 107.5909
+            db.session.delete(Location.query.filter_by(name='Phở Thìn').one())
+            db.session.commit()
+        self.assertEqual(self.nearby(radius=3), (['Hồ Hoàn Kiếm', 'Nhà hát Lớn', 'Lăng Bác'], 3))
+
+    def test_grid_and_arrays_give_the_same_results(self):
+        results = []
+        for index in ('grid', 'arrays') if HAS_NUMPY else ('grid',):
+            self.app.config['NEARBY_INDEX'] = index
+            self.app.extensions.pop('spatial_index', None)
+            results.append([self.nearby(radius=3), self.nearby(k=6), self.nearby(radius=50, category='attraction')])
+        self.assertEqual(results[0], results[-1])
+
+
+class PostsNearbyRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('traveller')
+        create_post(author, 'Dạo Hồ Gươm', location_lat=21.0287, location_lng=105.8524)
+        create_post(author, 'Phở sáng', category='food', location_lat=21.0189, location_lng=105.8554)
+        create_post(author, 'Bản nháp', status='draft', location_lat=21.0285, location_lng=105.8522)
+        create_post(author, 'Không vị trí')
+        create_post(author, 'Vịnh Hạ Long', location_lat=20.9101, location_lng=107.1839)
+
+    def nearby(self, **params):
+        response = self.client.get('/api/posts/nearby', query_string={'lat': HOAN_KIEM[0], 'lng': HOAN_KIEM[1], **params})
+        self.assertEqual(response.status_code, 200)
+        return [post['title'] for post in response.get_json()['posts']]
+
+    def test_only_published_geotagged_posts(self):
+        self.assertEqual(self.nearby(radius=5), ['Dạo Hồ Gươm', 'Phở sáng'])
+        self.assertEqual(self.nearby(radius=5, category='food'), ['Phở sáng'])
+        self.assertEqual(self.nearby(k=3), ['Dạo Hồ Gươm', 'Phở sáng', 'Vịnh Hạ Long'])
+
+    def test_publishing_and_moving_posts_update_the_index(self):
+        self.nearby(radius=5)
+        with self.app.app_context():
+            Post.query.filter_by(title='Bản nháp').one().status = 'published'
+            Post.query.filter_by(title='Phở sáng').one().location_lat = None
+            db.session.commit()
+        self.assertEqual(self.nearby(radius=5), ['Bản nháp', 'Dạo Hồ Gươm'])
+
+
+class TourLocationsRouteTest(AppTestCase):
+    def test_unpublished_tour_is_hidden(self):
+        with self.app.app_context():
+            seller = create_user('seller', role='seller')
+            tour = Tour(title='Hà Nội một ngày', description='x', seller_id=seller.id)
+            tour.duration_days = 1
+            tour.starting_location = 'Hà Nội'
+            tour.price_per_person = 500000
+            tour.category = 'cultural'
+            tour.status = 'draft'
+            tour.set_locations_covered([1, 2])
+            db.session.add(tour)
+            db.session.commit()
+            tour_id = tour.id
+        self.assertEqual(self.client.get(f'/api/tours/{tour_id}/locations').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
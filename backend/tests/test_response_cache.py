@@ -0,0 +1,244 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.cache_invalidation import CacheInvalidation
+from models.location import Location
+from models.post import Post
+from models.user import User
+from utils.cache import SimpleCache
+from utils.cache_invalidation import worker_origin
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used_entry(self):
+        cache = SimpleCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_cap(self):
+        cache = SimpleCache(max_bytes=20)
+        cache.set('a', b'x' * 10)
+        cache.set('b', b'x' * 10)
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertLessEqual(cache.stats()['bytes'], 20)
+        cache.set('huge', b'x' * 100)
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(cache.get('b'), b'x' * 10)
+
+    def test_expired_entries_are_misses(self):
+        cache = SimpleCache(default_ttl=10)
+        with mock.patch('utils.cache.time.time', return_value=1000):
+            cache.set('a', 1)
+        with mock.patch('utils.cache.time.time', return_value=1011):
+            self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['expirations'], stats['entries']), (1, 1, 0))
+
+    def test_single_flight_rebuilds_once(self):
+        cache = SimpleCache()
+        calls = []
+        barrier = threading.Barrier(8)
+        results = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        def worker():
+            barrier.wait()
+            results.append(cache.get_or_set('key', build))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(cache.stats()['coalesced'], 7)
+
+    def test_uncacheable_values_are_not_stored(self):
+        cache = SimpleCache()
+        cache.get_or_set('key', lambda: 'error', cacheable=lambda value: False)
+        self.assertIsNone(cache.get('key'))
+
+    def test_invalidate_by_tag(self):
+        cache = SimpleCache()
+        cache.set('feed', 1, tags=['posts:list', 'author:1'])
+        cache.set('stats', 2, tags=['location:*'])
+        cache.set('other', 3, tags=['author:2'])
+
+        self.assertEqual(cache.invalidate_tags('author:1'), 1)
+        self.assertIsNone(cache.get('feed'))
+        # A specific location also invalidates entries depending on all locations
+        self.assertEqual(cache.invalidate_tags('location:7'), 1)
+        self.assertIsNone(cache.get('stats'))
+        self.assertEqual(cache.get('other'), 3)
+        self.assertEqual(cache.stats()['tags'], 1)
+
+    def test_rebuild_racing_an_invalidation_is_not_stored(self):
+        cache = SimpleCache()
+
+        def build():
+            cache.invalidate_tags('posts:list')
+            return 'stale'
+
+        self.assertEqual(cache.get_or_set('feed', build, tags=lambda: ['posts:list']), 'stale')
+        self.assertIsNone(cache.get('feed'))
+
+
+class CachedRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        create_post(author, title='Cached post', featured=True, tags='["hue"]')
+        self.headers = auth_headers(author)
+
+    def test_anonymous_listing_is_served_from_cache(self):
+        first = self.client.get('/api/posts/?per_page=5')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        with self.count_queries() as counter:
+            second = self.client.get('/api/posts/?per_page=5')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(first.get_json(), second.get_json())
+
+        # Different query string is a different entry
+        self.assertEqual(self.client.get('/api/posts/?per_page=6').headers['X-Cache'], 'MISS')
+
+    def test_public_endpoints_are_cached(self):
+        for url in ('/api/posts/featured', '/api/posts/tags/popular', '/api/posts/categories',
+                    '/api/maps/statistics', '/api/maps/categories', '/api/tours/categories'):
+            self.assertEqual(self.client.get(url).headers['X-Cache'], 'MISS', url)
+            self.assertEqual(self.client.get(url).headers['X-Cache'], 'HIT', url)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get('/api/posts/')
+        response = self.client.get('/api/posts/', headers=self.headers)
+        self.assertNotIn('X-Cache', response.headers)
+        self.assertIn('is_liked', response.get_json()['posts'][0])
+
+
+class CacheInvalidationTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        self.post_id = create_post(author, title='First post').id
+        self.author_id = author.id
+        self.headers = auth_headers(author)
+        self.reader_headers = auth_headers(create_user('reader'))
+
+    def assertCached(self, url):
+        self.client.get(url)
+        self.assertEqual(self.client.get(url).headers['X-Cache'], 'HIT')
+
+    def test_create_post_refreshes_feed(self):
+        self.assertCached('/api/posts/')
+        response = self.client.post('/api/posts/', json={'title': 'Second post', 'content': 'Nội dung',
+                                                          'status': 'published'}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(len(response.get_json()['posts']), 2)
+
+    def test_like_evicts_pages_showing_the_post(self):
+        self.assertCached('/api/posts/')
+        self.assertCached('/api/posts/categories')
+        self.client.post(f'/api/social/likes/post/{self.post_id}', headers=self.reader_headers)
+
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(response.get_json()['posts'][0]['likes_count'], 1)
+        self.assertEqual(self.client.get('/api/posts/categories').headers['X-Cache'], 'HIT')
+
+    def test_profile_edit_evicts_author_pages(self):
+        self.assertCached('/api/posts/')
+        with self.app.app_context():
+            db.session.get(User, self.author_id).full_name = 'Tác giả mới'
+            db.session.commit()
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.get_json()['posts'][0]['author']['full_name'], 'Tác giả mới')
+
+    def test_new_location_refreshes_statistics(self):
+        self.assertCached('/api/maps/statistics')
+        with self.app.app_context():
+            db.session.add(Location(name='Hồ Gươm', latitude=21.03, longitude=105.85, category='attraction'))
+            db.session.commit()
+        response = self.client.get('/api/maps/statistics')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(response.get_json()['total_locations'], 1)
+
+    def test_rolled_back_writes_keep_cache(self):
+        self.assertCached('/api/posts/')
+        with self.app.app_context():
+            db.session.get(User, self.author_id).full_name = 'Không lưu'
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.client.get('/api/posts/').headers['X-Cache'], 'HIT')
+
+
+class SharedInvalidationTest(AppTestCase):
+    """Another worker's write reaches this worker's cache through cache_invalidations"""
+
+    def seed(self):
+        self.post_id = create_post(create_user('author'), title='Bản cũ').id
+        self.app.config['CACHE_INVALIDATION_POLL_INTERVAL'] = 0
+
+    def write_from_another_worker(self, title, tags=('posts:list',)):
+        with self.app.app_context():
+            posts = Post.__table__
+            db.session.execute(posts.update().where(posts.c.id == self.post_id).values(title=title))
+            for tag in tags:
+                db.session.add(CacheInvalidation(tag=tag, origin='other-host-1'))
+            db.session.commit()
+
+    def test_tags_recorded_by_another_worker_are_evicted(self):
+        self.client.get('/api/posts/')
+        self.write_from_another_worker('Bản mới')
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(response.get_json()['posts'][0]['title'], 'Bản mới')
+        # Each row is applied once
+        self.assertEqual(self.client.get('/api/posts/').headers['X-Cache'], 'HIT')
+
+    def test_other_workers_wait_for_the_poll_interval(self):
+        self.app.config['CACHE_INVALIDATION_POLL_INTERVAL'] = 60
+        self.client.get('/api/posts/')
+        self.write_from_another_worker('Bản mới')
+        self.assertEqual(self.client.get('/api/posts/').headers['X-Cache'], 'HIT')
+        with self.app.app_context():
+            self.assertEqual(self.app.extensions['cache_invalidation_feed'].poll(force=True), 1)
+        self.assertEqual(self.client.get('/api/posts/').headers['X-Cache'], 'MISS')
+
+    def test_writes_record_their_tags_with_the_commit(self):
+        with self.app.app_context():
+            CacheInvalidation.query.delete()
+            db.session.commit()
+            db.session.get(Post, self.post_id).title = 'Không lưu'
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(CacheInvalidation.query.count(), 0)
+
+            db.session.get(Post, self.post_id).title = 'Đã lưu'
+            db.session.commit()
+            rows = CacheInvalidation.query.all()
+            self.assertEqual({row.tag for row in rows}, {f'post:{self.post_id}', 'posts:list', 'author:1'})
+            self.assertEqual({row.origin for row in rows}, {worker_origin()})
+
+        # This worker evicted them on commit already: its own rows are not applied again
+        self.client.get('/api/posts/')
+        self.assertEqual(self.client.get('/api/posts/').headers['X-Cache'], 'HIT')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import os
+import time
+import unittest
+
+from helpers import AppTestCase, auth_headers, create_user
+from models import db
+from models.upload import UploadBlob
+from models.user import User
+from utils.resumable import expire_sessions, sessions_folder
+
+
+def sha256_header(chunk):
+    return 'sha256 ' + base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+
+
+class ResumableUploadTest(AppTestCase):
+    def seed(self):
+        self.owner_id = create_user('traveller').id
+        self.other_id = create_user('stranger').id
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['RESUMABLE_MAX_CHUNK'] = 64 * 1024
+        self.video = os.urandom(150 * 1024)
+
+    def headers(self, user_id=None, **extra):
+        with self.app.app_context():
+            headers = auth_headers(db.session.get(User, user_id or self.owner_id))
+        headers.update(extra)
+        return headers
+
+    def create(self, size=None):
+        response = self.client.post('/api/upload/resumable', headers=self.headers(),
+                                    json={'filename': 'Hạ Long.mp4', 'size': size or len(self.video)})
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def patch(self, location, offset, chunk, checksum=None, user_id=None):
+        headers = self.headers(user_id, **{'Upload-Offset': str(offset)})
+        if checksum:
+            headers['Upload-Checksum'] = checksum
+        return self.client.patch(location, headers=headers, data=chunk,
+                                 content_type='application/offset+octet-stream')
+
+    def test_chunks_resume_and_finalize_without_copying(self):
+        location = self.create().headers['Location']
+        first, rest = self.video[:64 * 1024], self.video[64 * 1024:]
+
+        response = self.patch(location, 0, first, sha256_header(first))
+        self.assertEqual((response.status_code, response.headers['Upload-Offset']), (204, str(len(first))))
+
+        # A connection drop: ask where to continue
+        response = self.client.head(location, headers=self.headers())
+        self.assertEqual(response.headers['Upload-Offset'], str(len(first)))
+        self.assertEqual(response.headers['Upload-Length'], str(len(self.video)))
+
+        # A retried chunk at a stale offset is refused with the real one
+        response = self.patch(location, 0, first)
+        self.assertEqual((response.status_code, response.headers['Upload-Offset']), (409, str(len(first))))
+
+        offset = len(first)
+        while offset < len(self.video):
+            chunk = rest[offset - len(first):offset - len(first) + 64 * 1024]
+            self.assertEqual(self.patch(location, offset, chunk, sha256_header(chunk)).status_code, 204)
+            offset += len(chunk)
+
+        part_path = os.path.join(self.app.config['UPLOAD_FOLDER'], 'videos', 'resumable',
+                                 location.rsplit('/', 1)[1] + '.part')
+        inode = os.stat(part_path).st_ino
+        response = self.client.post(f'{location}/finalize', headers=self.headers(),
+                                    json={'checksum': hashlib.sha256(self.video).hexdigest()})
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        path = os.path.join(self.app.config['UPLOAD_FOLDER'], data['url'][len('/uploads/'):])
+        self.assertEqual(os.stat(path).st_ino, inode)  # renamed, not copied
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), self.video)
+        with self.app.app_context():
+            self.assertEqual(db.session.get(UploadBlob, hashlib.sha256(self.video).hexdigest()).kind, 'video')
+        self.assertEqual(self.client.head(location, headers=self.headers()).status_code, 404)
+
+    def test_checksum_mismatch_drops_the_chunk(self):
+        location = self.create().headers['Location']
+        chunk = self.video[:1000]
+        response = self.patch(location, 0, chunk, sha256_header(b'something else'))
+        self.assertEqual((response.status_code, response.headers['Upload-Offset']), (460, '0'))
+        self.assertEqual(self.patch(location, 0, chunk, sha256_header(chunk)).status_code, 204)
+
+    def test_limits_and_ownership(self):
+        location = self.create().headers['Location']
+        self.assertEqual(self.patch(location, 0, self.video[:100 * 1024]).status_code, 413)  # over the chunk size
+        self.assertEqual(self.patch(location, 0, b'x', user_id=self.other_id).status_code, 404)
+        self.assertEqual(self.client.post(f'{location}/finalize', headers=self.headers()).status_code, 409)
+        response = self.client.post('/api/upload/resumable', headers=self.headers(),
+                                    json={'filename': 'notes.txt', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/upload/resumable', headers=self.headers(),
+                                    json={'filename': 'huge.mp4', 'size': 10 ** 10})
+        self.assertEqual(response.status_code, 413)
+
+    def test_stale_sessions_expire(self):
+        location = self.create().headers['Location']
+        upload_id = location.rsplit('/', 1)[1]
+        with self.app.app_context():
+            folder = sessions_folder()
+            stale = time.time() - 25 * 3600
+            for name in os.listdir(folder):
+                os.utime(os.path.join(folder, name), (stale, stale))
+            self.assertEqual(expire_sessions(), 1)
+            self.assertFalse(any(name.startswith(upload_id) for name in os.listdir(folder)))
+        self.assertEqual(self.client.head(location, headers=self.headers()).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
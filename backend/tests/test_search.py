@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy.dialects import mysql
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.location import Location
+from utils.search import apply_search, build_search, resolve_mode
+
+
+def compile_mysql(clause):
+    return str(clause.compile(dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+class SearchClauseTest(AppTestCase):
+    def test_sqlite_falls_back_to_like(self):
+        with self.app.app_context():
+            clause = build_search('post', 'Hạ Long')
+        self.assertFalse(clause.ranked)
+        self.assertEqual(clause.mode, 'like')
+
+    def test_fulltext_natural_language_mode(self):
+        self.app.config['SEARCH_BACKEND'] = 'fulltext'
+        with self.app.app_context():
+            clause = build_search('post', 'vịnh Hạ Long')
+        sql = compile_mysql(clause.criterion)
+        self.assertIn('MATCH (posts.title, posts.content, posts.excerpt)', sql)
+        self.assertIn('IN NATURAL LANGUAGE MODE', sql)
+        self.assertTrue(clause.ranked)
+
+    def test_boolean_mode_is_detected_or_requested(self):
+        self.assertEqual(resolve_mode('+phở -bún'), 'boolean')
+        self.assertEqual(resolve_mode('"phố cổ"'), 'boolean')
+        self.assertEqual(resolve_mode('hội an'), 'natural')
+        self.assertEqual(resolve_mode('hội an', 'boolean'), 'boolean')
+
+        self.app.config['SEARCH_BACKEND'] = 'fulltext'
+        with self.app.app_context():
+            clause = build_search('tour', '+trekking sapa*')
+        sql = compile_mysql(clause.criterion)
+        self.assertIn('MATCH (tours.title, tours.description, tours.starting_location)', sql)
+        self.assertIn('IN BOOLEAN MODE', sql)
+
+    def test_short_terms_and_unindexed_entities_use_like(self):
+        self.app.config['SEARCH_BACKEND'] = 'fulltext'
+        with self.app.app_context():
+            # Two-letter syllables are below InnoDB's default min token size
+            self.assertFalse(build_search('location', 'Hà Lý').ranked)
+            self.assertFalse(build_search('user', 'minh').ranked)
+
+    def test_fulltext_keeps_every_column_like_searched(self):
+        # Addresses and starting points matched with LIKE; the indexes cover them too
+        self.app.config['SEARCH_BACKEND'] = 'fulltext'
+        with self.app.app_context():
+            location_sql = compile_mysql(build_search('location', 'Hoàn Kiếm').criterion)
+            tour_sql = compile_mysql(build_search('tour', 'Sài Gòn').criterion)
+        self.assertIn('MATCH (locations.name, locations.description, locations.address)', location_sql)
+        self.assertIn('MATCH (tours.title, tours.description, tours.starting_location)', tour_sql)
+
+
+class SearchRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        create_post(author, title='Vịnh Hạ Long mùa thu')
+        create_post(author, title='Phở Hà Nội', content='Giảm 50% cho khách sớm')
+        create_post(author, title='Bánh mì Sài Gòn')
+        location = Location(name='Hồ Hoàn Kiếm', latitude=21.03, longitude=105.85, category='attraction')
+        location.address = 'Hoàn Kiếm, Hà Nội'
+        db.session.add(location)
+        db.session.commit()
+        self.admin_headers = auth_headers(create_user('admin', role='admin'))
+
+    def titles(self, url, key='posts', **kwargs):
+        response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return [item.get('title') or item.get('name') for item in response.get_json()[key]]
+
+    def test_post_search(self):
+        self.assertEqual(self.titles('/api/posts/?search=Hạ Long'), ['Vịnh Hạ Long mùa thu'])
+
+    def test_like_wildcards_are_escaped(self):
+        self.assertEqual(self.titles('/api/posts/?search=50%'), ['Phở Hà Nội'])
+        self.assertEqual(self.titles('/api/posts/?search=%25%25'), [])
+
+    def test_location_search(self):
+        self.assertEqual(self.titles('/api/maps/locations?search=Hà Nội', key='locations'), ['Hồ Hoàn Kiếm'])
+
+    def test_admin_global_search(self):
+        data = self.client.get('/api/admin/search?q=Bánh mì', headers=self.admin_headers).get_json()
+        self.assertEqual([p['title'] for p in data['posts']], ['Bánh mì Sài Gòn'])
+        data = self.client.get('/api/admin/search?q=admin', headers=self.admin_headers).get_json()
+        self.assertEqual([u['username'] for u in data['users']], ['admin'])
+
+    def test_admin_search_reads_search_mode_like_the_other_routes(self):
+        with mock.patch('routes.admin.apply_search', wraps=apply_search) as spy:
+            self.client.get('/api/admin/search?q=phở&search_mode=boolean', headers=self.admin_headers)
+        modes = {call.args[1]: call.kwargs.get('mode') for call in spy.call_args_list}
+        self.assertEqual(modes['post'], 'boolean')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from helpers import AppTestCase, create_user, create_post
+from models import db
+from models.location import Location
+from models.post import Post
+from models.user import User
+from utils.search_index import SearchIndex, SearchIndexRefresher, get_search_index, tokenize
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_folds_vietnamese_accents(self):
+        self.assertEqual(tokenize('Vịnh HẠ LONG, Đà Lạt!'), ['vinh', 'ha', 'long', 'da', 'lat'])
+        # Non-ASCII separators still split words
+        self.assertEqual(tokenize('Hà Nội–Sài Gòn'), ['ha', 'noi', 'sai', 'gon'])
+        self.assertEqual(tokenize('Đà Lạt—mùa hoa 2×3 “đẹp”'), ['da', 'lat', 'mua', 'hoa', '2', '3', 'dep'])
+
+    def test_slug_uses_the_same_folding(self):
+        self.assertTrue(Post(title='Phố cổ Hội An', content='x', author_id=1).slug.startswith('pho-co-hoi-an-'))
+        self.assertTrue(Post(title='Hà Nội–Sài Gòn', content='x', author_id=1).slug.startswith('ha-noi-sai-gon-'))
+        self.assertTrue(Post(title='Đà Lạt—mùa hoa', content='x', author_id=1).slug.startswith('da-lat-mua-hoa-'))
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add('post', 1, {'title': 'Vịnh Hạ Long', 'body': 'Du thuyền qua đêm'})
+        self.index.add('post', 2, {'title': 'Phở Hà Nội', 'body': 'Bữa sáng ở Hạ Long cũng ngon'})
+        self.index.add('post', 3, {'title': 'Đà Lạt mùa hoa', 'body': 'Săn mây'})
+        self.index.add('location', 7, {'title': 'Phố cổ Hội An', 'body': 'Thả đèn hoa đăng'})
+
+    def ids(self, query, **kwargs):
+        return [(entity, doc_id) for entity, doc_id, _ in self.index.search(query, **kwargs)]
+
+    def test_unaccented_query_matches_and_title_ranks_first(self):
+        self.assertEqual(self.ids('ha long'), [('post', 1), ('post', 2)])
+        self.assertEqual(self.ids('hoi an'), [('location', 7)])
+        self.assertEqual(self.ids('hoi an', entities=['post']), [])
+
+    def test_reindex_and_remove(self):
+        self.index.add('post', 3, {'title': 'Đà Nẵng', 'body': ''})
+        self.assertEqual(self.ids('lat'), [])
+        self.assertEqual(self.ids('da nang'), [('post', 3)])
+        self.index.remove('post', 3)
+        self.assertEqual(self.ids('da nang'), [])
+        self.assertEqual(self.index.stats()['post'], {'documents': 2, 'terms': 14})
+
+    def test_removed_postings_are_tombstoned_then_compacted(self):
+        for _ in range(3):
+            self.index.add('post', 2, {'title': 'Phở Hà Nội', 'body': 'Bữa sáng ở Hạ Long cũng ngon'})
+        posts = self.index.entities['post']
+        ha = posts.term_ids['ha']
+        self.assertEqual(posts.dead[ha], 3)
+        self.assertEqual(posts.frequency(ha), 2)
+        self.assertEqual(self.ids('ha long'), [('post', 1), ('post', 2)])
+
+        posts.compact()
+        self.assertEqual(posts.dead[ha], 0)
+        self.assertEqual(list(posts.posting_ids[ha]), [1, 2])
+        # Positions were moved with the postings: removal still hits the right entries
+        self.index.remove('post', 2)
+        self.assertEqual(list(posts.posting_ids[ha]), [1, -1])
+        self.assertEqual(self.ids('ha long'), [('post', 1)])
+
+    def test_snapshot_round_trip(self):
+        path = os.path.join(tempfile.mkdtemp(), 'index.bin')
+        self.index.remove('post', 3)
+        self.index.save(path)
+        loaded = SearchIndex.load(path)
+        loaded.add('post', 1, {'title': 'Vịnh Lan Hạ'})
+        self.assertEqual(loaded.search('long')[0][:2], ('post', 2))
+        loaded = SearchIndex.load(path)
+        self.assertEqual(loaded.search('ha long'), self.index.search('ha long'))
+        self.assertEqual(loaded.stats(), self.index.stats())
+
+
+class SearchIndexSyncTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        self.author_id = author.id
+        create_post(author, title='Vịnh Hạ Long mùa thu')
+        create_post(author, title='Hạ Long bản nháp', status='draft')
+        location = Location(name='Hồ Hoàn Kiếm', latitude=21.03, longitude=105.85, category='attraction')
+        db.session.add(location)
+        db.session.commit()
+
+    def titles(self, query, **params):
+        response = self.client.get('/api/search', query_string={'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [r['item'].get('title') or r['item'].get('name') for r in response.get_json()['results']]
+
+    def test_search_route_builds_index_from_database(self):
+        self.assertEqual(self.titles('ha long'), ['Vịnh Hạ Long mùa thu'])
+        self.assertEqual(self.titles('hoan kiem', type='location'), ['Hồ Hoàn Kiếm'])
+        self.assertEqual(self.client.get('/api/search?q=x&type=story').status_code, 400)
+
+    def test_commits_update_the_index(self):
+        self.assertEqual(self.titles('sapa'), [])
+        with self.app.app_context():
+            author = db.session.get(User, self.author_id)
+            post = create_post(author, title='Trekking Sa Pa', content='Ruộng bậc thang')
+            post_id = post.id
+        self.assertEqual(self.titles('ruong bac thang'), ['Trekking Sa Pa'])
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(Post, post_id))
+            db.session.rollback()
+        self.assertEqual(self.titles('sa pa'), ['Trekking Sa Pa'])
+
+        with self.app.app_context():
+            db.session.get(Post, post_id).status = 'archived'
+            db.session.commit()
+        self.assertEqual(self.titles('sa pa'), [])
+
+    def test_refresh_picks_up_changes_from_other_processes(self):
+        with self.app.app_context():
+            index = get_search_index()
+            # Simulate a write committed by another worker: bypass the session hooks
+            db.session.execute(db.update(Post).where(Post.title.like('Vịnh%')).values(title='Vịnh Lan Hạ'))
+            db.session.execute(db.delete(Location))
+            db.session.commit()
+            index.refresh()
+            self.assertEqual([doc_id for _, doc_id, _ in index.search('lan ha')], [1])
+            self.assertEqual(index.search('hoan kiem'), [])
+
+    def test_index_loads_on_a_thread_and_search_reads_the_database_meanwhile(self):
+        index = SearchIndex()
+        self.app.extensions['search_index'] = index
+        # Not ready yet: LIKE over the database, drafts still left out
+        self.assertEqual(self.titles('Long'), ['Vịnh Hạ Long mùa thu'])
+
+        refresher = SearchIndexRefresher(self.app, index, None, interval=3600)
+        refresher.start()
+        try:
+            refresher._thread.join(0.1)
+            for _ in range(50):
+                if index.ready:
+                    break
+                refresher._thread.join(0.1)
+            self.assertTrue(index.ready)
+        finally:
+            refresher.shutdown()
+        self.assertEqual(self.titles('ha long'), ['Vịnh Hạ Long mùa thu'])
+
+    def test_commits_during_a_refresh_win_over_rows_it_read(self):
+        with self.app.app_context():
+            index = get_search_index()
+            post_id = Post.query.filter_by(status='published').one().id
+
+            applied = []
+
+            def commit_elsewhere(*args):
+                # Another request's commit hook, landing while refresh reads the rows
+                if not applied:
+                    applied.append(True)
+                    index.apply([('post', post_id, {'title': 'Vịnh Lan Hạ'})])
+
+            event.listen(db.engine, 'before_cursor_execute', commit_elsewhere)
+            try:
+                index.refresh()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', commit_elsewhere)
+            self.assertEqual([doc_id for _, doc_id, _ in index.search('lan ha')], [post_id])
+            self.assertEqual(index.search('mua thu'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+from models.post import Post
+from models.social import PostLike, UserFollow
+
+
+class SocialTablesTest(AppTestCase):
+    def seed(self):
+        self.author = create_user('author')
+        self.post_id = create_post(self.author, title='Phở Hà Nội').id
+        self.reader = create_user('reader')
+        self.author_id = self.author.id
+        self.reader_id = self.reader.id
+        self.headers = auth_headers(self.reader)
+        self.author_headers = auth_headers(self.author)
+
+    def test_like_toggle_is_single_row(self):
+        url = f'/api/social/likes/post/{self.post_id}'
+        self.assertEqual(self.client.post(url, headers=self.headers).get_json()['likes_count'], 1)
+        # Liking twice is a no-op
+        self.assertEqual(self.client.post(url, headers=self.headers).get_json()['likes_count'], 1)
+        with self.app.app_context():
+            self.assertEqual(PostLike.user_ids_for_post(self.post_id), [self.reader_id])
+
+        check = self.client.get(f'/api/social/likes/check/{self.post_id}', headers=self.headers)
+        self.assertTrue(check.get_json()['is_liked'])
+
+        self.assertEqual(self.client.delete(url, headers=self.headers).get_json()['likes_count'], 0)
+        with self.app.app_context():
+            self.assertEqual(PostLike.query.count(), 0)
+            self.assertEqual(db.session.get(Post, self.post_id).likes_count, 0)
+
+    def test_bookmarks_listing(self):
+        self.client.post(f'/api/social/bookmarks/{self.post_id}', headers=self.headers)
+        data = self.client.get('/api/social/bookmarks', headers=self.headers).get_json()
+        self.assertEqual([p['id'] for p in data['bookmarks']], [self.post_id])
+
+        self.client.delete(f'/api/social/bookmarks/{self.post_id}', headers=self.headers)
+        data = self.client.get('/api/social/bookmarks', headers=self.headers).get_json()
+        self.assertEqual(data['bookmarks'], [])
+
+    def test_follow_edges(self):
+        response = self.client.post(f'/api/social/follow/{self.author_id}', headers=self.headers)
+        self.assertEqual(response.get_json()['followers_count'], 1)
+
+        followers = self.client.get('/api/social/followers', headers=self.author_headers)
+        self.assertEqual([u['id'] for u in followers.get_json()['followers']], [self.reader_id])
+        following = self.client.get('/api/social/following', headers=self.headers)
+        self.assertEqual([u['id'] for u in following.get_json()['following']], [self.author_id])
+
+        self.client.post(f'/api/social/unfollow/{self.author_id}', headers=self.headers)
+        with self.app.app_context():
+            self.assertEqual(UserFollow.query.count(), 0)
+
+    def test_cannot_follow_self(self):
+        response = self.client.post(f'/api/social/follow/{self.reader_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+import unittest
+
+from helpers import AppTestCase, create_user, create_post
+from models import db
+from models.location import Location
+from models.post import Post
+from models.user import User
+from utils.suggest import SuggestIndex, SuggestRefresher, Suggestion, get_suggest_index
+
+
+class SuggestIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SuggestIndex()
+        self.index.replace_all([
+            Suggestion('post', 1, 'Vịnh Hạ Long mùa thu', 10, slug='vinh-ha-long'),
+            Suggestion('post', 2, 'Hà Nội phố cổ', 500),
+            Suggestion('province', 'quang ninh', 'Quảng Ninh', 50),
+            Suggestion('tag', 'ha giang', 'Hà Giang', 100),
+        ])
+
+    def texts(self, query, **kwargs):
+        return [s['text'] for s in self.index.suggest(query, **kwargs)]
+
+    def test_accent_insensitive_prefix_ranked_by_popularity(self):
+        self.assertEqual(self.texts('ha'), ['Hà Nội phố cổ', 'Hà Giang', 'Vịnh Hạ Long mùa thu'])
+        self.assertEqual(self.texts('HẠ LO'), ['Vịnh Hạ Long mùa thu'])
+        self.assertEqual(self.texts('quang'), ['Quảng Ninh'])
+        self.assertEqual(self.texts('ha', kinds=['tag'], limit=1), ['Hà Giang'])
+        self.assertEqual(self.texts('   '), [])
+
+    def test_incremental_updates_refresh_cached_prefixes(self):
+        self.assertEqual(self.texts('ha', limit=1), ['Hà Nội phố cổ'])
+        self.index.put(Suggestion('post', 1, 'Vịnh Hạ Long mùa thu', 10000))
+        self.assertEqual(self.texts('ha', limit=1), ['Vịnh Hạ Long mùa thu'])
+        self.index.put(Suggestion('post', 1, 'Đà Lạt', 10000))
+        self.assertEqual(self.texts('ha lo'), [])
+        self.assertEqual(self.texts('da'), ['Đà Lạt'])
+        self.index.discard('post', 2)
+        self.assertEqual(self.texts('ha'), ['Hà Giang'])
+
+    def test_lookup_is_fast_on_a_large_index(self):
+        self.index.replace_all(
+            Suggestion('post', i, f'Hành trình số {i} khám phá Hạ Long', i) for i in range(20000)
+        )
+        self.index.suggest('h')
+        started = time.perf_counter()
+        for query in ('h', 'ha', 'ha l', 'kham pha', 'hanh trinh so 1999'):
+            self.index.suggest(query)
+        self.assertLess((time.perf_counter() - started) / 5, 0.005)
+
+
+class SuggestRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        self.author_id = author.id
+        create_post(author, title='Vịnh Hạ Long mùa thu', tags='["Hạ Long", "du thuyền"]', views_count=50)
+        create_post(author, title='Hà Nội phố cổ', tags='["ha long"]', views_count=5)
+        create_post(author, title='Hà Giang bản nháp', status='draft')
+        location = Location(name='Hồ Hoàn Kiếm', latitude=21.03, longitude=105.85, category='attraction')
+        location.province = 'Hà Nội'
+        db.session.add(location)
+        db.session.commit()
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/search/suggest', query_string={'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(s['type'], s['text']) for s in response.get_json()['suggestions']]
+
+    def test_suggestions_cover_every_type(self):
+        self.assertEqual(self.suggest('ha', type='post'), [('post', 'Vịnh Hạ Long mùa thu'), ('post', 'Hà Nội phố cổ')])
+        self.assertEqual(self.suggest('ha long', type='tag'), [('tag', 'Hạ Long')])
+        self.assertEqual(self.suggest('ha noi', type='province'), [('province', 'Hà Nội')])
+        self.assertEqual(self.suggest('hoan', type='location'), [('location', 'Hồ Hoàn Kiếm')])
+        self.assertEqual(self.client.get('/api/search/suggest?q=a&type=user').status_code, 400)
+
+    def test_no_database_queries_once_built_and_commits_apply(self):
+        self.suggest('ha')
+        with self.count_queries() as counter:
+            self.suggest('ha gi')
+        self.assertEqual(counter.count, 0)
+
+        with self.app.app_context():
+            create_post(db.session.get(User, self.author_id), title='Hà Giang mùa tam giác mạch')
+        self.assertEqual(self.suggest('ha gi', type='post'), [('post', 'Hà Giang mùa tam giác mạch')])
+
+        with self.app.app_context():
+            post = Post.query.filter_by(title='Hà Nội phố cổ').first()
+            db.session.delete(post)
+            db.session.commit()
+        self.assertEqual(self.suggest('ha noi', type='post'), [])
+
+    def test_concurrent_first_requests_share_one_index(self):
+        indexes = []
+
+        def first_request():
+            with self.app.app_context():
+                indexes.append(get_suggest_index())
+
+        threads = [threading.Thread(target=first_request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(index) for index in indexes}), 1)
+        self.assertEqual(self.suggest('hoan', type='location'), [('location', 'Hồ Hoàn Kiếm')])
+
+    def test_rebuild_and_commits_agree_on_active_locations(self):
+        with self.app.app_context():
+            index = get_suggest_index()
+            for name, status in (('Chùa Một Cột', None), ('Nhà hát Lớn', 'inactive')):
+                location = Location(name=name, latitude=21.03, longitude=105.83, category='attraction')
+                location.province = 'Hà Nội'
+                db.session.add(location)
+                db.session.flush()
+                location.status = status
+            db.session.commit()
+
+            def locations():
+                return [s['text'] for query in ('chua mot', 'nha hat')
+                        for s in index.suggest(query, kinds=['location'])]
+
+            self.assertEqual(locations(), ['Chùa Một Cột'])
+            index.sync()
+            self.assertEqual(locations(), ['Chùa Một Cột'])
+            # Hồ Hoàn Kiếm and Chùa Một Cột: the inactive location does not count
+            self.assertEqual(index.suggest('ha noi', kinds=['province'])[0]['score'], round(math.log1p(5 * 2), 3))
+
+    def test_startup_load_includes_popularity_and_aggregates(self):
+        with self.app.app_context():
+            index = SuggestIndex()
+            refresher = SuggestRefresher(self.app, index, interval=3600)
+            refresher.start()
+            try:
+                self.assertEqual([s['text'] for s in index.suggest('ha long', kinds=['tag'])], ['Hạ Long'])
+                self.assertEqual([s['text'] for s in index.suggest('ha', kinds=['post'])],
+                                 ['Vịnh Hạ Long mùa thu', 'Hà Nội phố cổ'])
+                self.assertEqual(len(index.suggest('ha noi', kinds=['province'])), 1)
+            finally:
+                refresher.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
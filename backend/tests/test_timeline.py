@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime, timedelta
+
+from helpers import AppTestCase, auth_headers, create_post, create_user
+from models import db
+from models.post import Post
+from models.social import TimelineEntry, UserFollow
+from models.user import User
+from utils.timeline import trim_timelines
+
+
+class TimelineTest(AppTestCase):
+    def seed(self):
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.author_id = self.author.id
+        self.reader_id = self.reader.id
+        self.headers = auth_headers(self.reader)
+        self.author_headers = auth_headers(self.author)
+        self.start = datetime(2026, 1, 1)
+
+    def follow(self, follower_id, followed_id):
+        db.session.add(UserFollow(follower_id=follower_id, followed_id=followed_id))
+        db.session.commit()
+
+    def timeline(self, **params):
+        response = self.client.get('/api/social/timeline', headers=self.headers, query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def entries(self, user_id):
+        rows = TimelineEntry.query.filter_by(user_id=user_id).order_by(TimelineEntry.post_id)
+        return [row.post_id for row in rows]
+
+    def test_publish_fans_out_to_followers(self):
+        self.client.post(f'/api/social/follow/{self.author_id}', headers=self.headers)
+        response = self.client.post('/api/posts', headers=self.author_headers, json={
+            'title': 'Phố cổ Hội An', 'content': 'Đèn lồng', 'status': 'published'})
+        post_id = response.get_json()['post']['id']
+        draft_id = self.client.post('/api/posts', headers=self.author_headers, json={
+            'title': 'Bản nháp', 'content': 'Chưa xong', 'status': 'draft'}).get_json()['post']['id']
+
+        with self.app.app_context():
+            self.assertEqual(self.entries(self.reader_id), [post_id])
+            self.assertEqual(self.entries(self.author_id), [])
+        self.assertEqual([post['id'] for post in self.timeline()['posts']], [post_id])
+
+        # Publishing the draft later fans it out too; archiving takes it back
+        with self.app.app_context():
+            db.session.get(Post, draft_id).publish()
+            db.session.get(Post, post_id).archive()
+            db.session.commit()
+            self.assertEqual(self.entries(self.reader_id), [draft_id])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        with self.app.app_context():
+            author = db.session.get(User, self.author_id)
+            post_ids = [create_post(author, title=f'Bài {i}', published_at=self.start + timedelta(hours=i)).id
+                        for i in range(3)]
+        self.client.post(f'/api/social/follow/{self.author_id}', headers=self.headers)
+        self.assertEqual([post['id'] for post in self.timeline()['posts']], post_ids[::-1])
+
+        self.client.post(f'/api/social/unfollow/{self.author_id}', headers=self.headers)
+        with self.app.app_context():
+            self.assertEqual(self.entries(self.reader_id), [])
+        self.assertEqual(self.timeline()['posts'], [])
+
+    def test_large_accounts_are_read_on_demand(self):
+        self.app.config['TIMELINE_FANOUT_LIMIT'] = 2
+        with self.app.app_context():
+            star = create_user('star')
+            for name in ('fan1', 'fan2'):
+                self.follow(create_user(name).id, star.id)
+            self.follow(self.reader_id, star.id)
+            self.follow(self.reader_id, self.author_id)
+            author = db.session.get(User, self.author_id)
+            expected = []
+            for hour in range(5):
+                owner = star if hour % 2 else author
+                expected.append(create_post(owner, title=f'Giờ {hour}',
+                                            published_at=self.start + timedelta(hours=hour)).id)
+            # The star's posts were not copied to its three followers
+            self.assertEqual(TimelineEntry.query.filter_by(author_id=star.id).count(), 0)
+
+        seen, cursor = [], ''
+        while cursor is not None:
+            data = self.timeline(cursor=cursor, per_page=2)
+            seen.extend(post['id'] for post in data['posts'])
+            cursor = data['pagination']['next_cursor']
+        self.assertEqual(seen, expected[::-1])
+
+    def test_trim_keeps_newest_entries(self):
+        with self.app.app_context():
+            self.follow(self.reader_id, self.author_id)
+            author = db.session.get(User, self.author_id)
+            post_ids = [create_post(author, title=f'Bài {i}', published_at=self.start + timedelta(hours=i)).id
+                        for i in range(5)]
+            self.assertEqual(trim_timelines(3), 2)
+            self.assertEqual(self.entries(self.reader_id), post_ids[2:])
+
+        response = self.client.get('/api/social/timeline?cursor=not-a-cursor', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_publishing_keeps_timelines_bounded(self):
+        self.app.config['TIMELINE_MAX_ENTRIES'] = 3
+        with self.app.app_context():
+            other_id = create_user('other').id
+            self.follow(self.reader_id, self.author_id)
+            self.follow(other_id, self.author_id)
+            author = db.session.get(User, self.author_id)
+            post_ids = [create_post(author, title=f'Bài {i}', published_at=self.start + timedelta(hours=i)).id
+                        for i in range(5)]
+            self.assertEqual(self.entries(self.reader_id), post_ids[2:])
+            self.assertEqual(self.entries(other_id), post_ids[2:])
+
+            # A post older than a full timeline does not push anything out
+            create_post(author, title='Bài cũ', published_at=self.start - timedelta(days=1))
+            self.assertEqual(self.entries(self.reader_id), post_ids[2:])
+
+            # Backfilling a new follow trims too
+            self.follow(self.author_id, other_id)
+            create_post(db.session.get(User, other_id), title='Bài khác', published_at=self.start)
+            for i in range(2):
+                create_post(db.session.get(User, other_id), title=f'Bài mới {i}',
+                            published_at=self.start + timedelta(days=1, hours=i))
+            self.follow(self.reader_id, other_id)
+            self.assertEqual(len(self.entries(self.reader_id)), 3)
+            self.assertEqual(trim_timelines(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
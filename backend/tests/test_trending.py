@@ -0,0 +1,107 @@
+import time
+import unittest
+
+from helpers import AppTestCase, auth_headers, create_post, create_user
+from models import db
+from models.post import Post
+from models.post_score import PostScore
+from utils.trending import EVENT_WEIGHTS, REBASE_AFTER, TrendingEngine, get_trending
+
+HOUR = 3600
+
+
+class TrendingEngineTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        self.old_id = create_post(author, title='Sapa mùa lúa', category='adventure').id
+        self.new_id = create_post(author, title='Phở Hà Nội', category='food').id
+
+    def test_recent_engagement_wins_the_short_window(self):
+        now = time.time()
+        engine = TrendingEngine()
+        engine.loaded = True
+        engine.record(self.old_id, 'like', 10, at=now - 48 * HOUR)
+        engine.record(self.new_id, 'like', 3, at=now)
+
+        day = engine.top('24h', 10)
+        self.assertEqual([post_id for post_id, _ in day], [self.new_id, self.old_id])
+        self.assertAlmostEqual(day[0][1], 3 * EVENT_WEIGHTS['like'], places=2)
+        # Two days is barely more than one half-life of the 7d window
+        self.assertEqual([post_id for post_id, _ in engine.top('7d', 10)], [self.old_id, self.new_id])
+
+    def test_rebase_keeps_order_and_values(self):
+        engine = TrendingEngine()
+        engine.loaded = True
+        ranking = engine.rankings['24h']
+        start = ranking.epoch
+        engine.record(self.old_id, 'share', at=start)
+        engine.record(self.new_id, 'view', at=start)
+        later = start + (REBASE_AFTER + 1) * ranking.half_life
+        engine.record(self.new_id, 'view', at=later)
+        self.assertEqual(ranking.epoch, later)
+        top = dict(ranking.top(10))
+        self.assertAlmostEqual(ranking.decayed(top[self.new_id], later), 1.0, places=6)
+        self.assertLess(ranking.decayed(top[self.old_id], later), 1e-6)
+
+    def test_snapshots_add_up_across_workers(self):
+        with self.app.app_context():
+            first, second = TrendingEngine(), TrendingEngine()
+            first.record(self.new_id, 'comment')
+            second.record(self.new_id, 'comment')
+            second.record(self.old_id, 'view', category='adventure')
+            self.assertEqual(first.snapshot(), 1)
+            self.assertEqual(second.snapshot(), 2)
+
+            row = db.session.get(PostScore, ('24h', self.new_id))
+            self.assertAlmostEqual(row.score, 2 * EVENT_WEIGHTS['comment'], places=2)
+
+            # A restarted worker starts from the table; unpublished posts are dropped
+            db.session.get(Post, self.old_id).archive()
+            db.session.commit()
+            restarted = TrendingEngine()
+            top = restarted.top('7d', 10)
+            self.assertEqual([post_id for post_id, _ in top], [self.new_id])
+            self.assertAlmostEqual(top[0][1], 2 * EVENT_WEIGHTS['comment'], places=2)
+            self.assertEqual(restarted.top('24h', 10, category='food')[0][0], self.new_id)
+            self.assertIsNone(db.session.get(PostScore, ('24h', self.old_id)))
+
+
+class TrendingRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        reader = create_user('reader')
+        self.headers = auth_headers(reader)
+        self.ids = [create_post(author, title=f'Bài {i}', category=category).id
+                    for i, category in enumerate(('travel', 'food', 'food'))]
+
+    def test_engagement_events_rank_posts(self):
+        travel, food, other_food = self.ids
+        self.client.get(f'/api/posts/{food}')  # view: 1
+        self.client.post(f'/api/social/likes/post/{travel}', headers=self.headers)  # like: 3
+        self.client.post('/api/comments/', json={'content': 'Ngon quá', 'post_id': other_food},
+                         headers=self.headers)  # comment: 5
+
+        data = self.client.get('/api/posts/trending?window=24h').get_json()
+        self.assertEqual([post['id'] for post in data['posts']], [other_food, travel, food])
+        self.assertAlmostEqual(data['posts'][0]['trending_score'], EVENT_WEIGHTS['comment'], places=1)
+
+        data = self.client.get('/api/posts/trending?window=7d&category=food&limit=1').get_json()
+        self.assertEqual([post['id'] for post in data['posts']], [other_food])
+
+        # Unliking takes the like back
+        self.client.delete(f'/api/social/likes/post/{travel}', headers=self.headers)
+        data = self.client.get('/api/posts/trending').get_json()
+        self.assertEqual([post['id'] for post in data['posts']][:2], [other_food, food])
+
+        with self.app.app_context():
+            self.assertEqual(get_trending().snapshot(), 3)
+            # The like and unlike cancel out: nothing left to keep for that post
+            self.assertEqual(sorted(row.post_id for row in PostScore.query.filter_by(period='7d')),
+                             [food, other_food])
+
+        response = self.client.get('/api/posts/trending?window=30d')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
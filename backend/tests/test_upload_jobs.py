@@ -0,0 +1,160 @@
+import io
+import os
+import time
+import unittest
+
+from PIL import Image
+
+from helpers import AppTestCase, auth_headers, create_user
+from models import db
+from models.user import User
+from utils.jobs import JobQueue, JobQueueFull
+
+
+def slow_square(value, delay=0.2):
+    time.sleep(delay)
+    return value * value
+
+
+class Flaky:
+    """Fails the first `failures` calls"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError('disk busy')
+        return 'ok'
+
+
+class ShutDownExecutor:
+    """Refuses every job like a pool that was already shut down"""
+
+    def __init__(self):
+        self.discarded = False
+
+    def submit(self, fn, *args):
+        raise RuntimeError('cannot schedule new futures after shutdown')
+
+    def shutdown(self, wait=True):
+        self.discarded = True
+
+
+def wait_for(job, timeout=10):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.02)
+    return job
+
+
+class JobQueueTest(unittest.TestCase):
+    def test_failures_are_retried_then_reported(self):
+        queue = JobQueue(workers=0, max_retries=2)
+        job = queue.submit('flaky', Flaky(2))
+        self.assertEqual((job.status, job.attempts, job.result), ('done', 3, 'ok'))
+
+        job = queue.submit('flaky', Flaky(3))
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertEqual(job.error, 'OSError: disk busy')
+        self.assertEqual(queue.stats()['pending'], 0)
+
+    def test_process_pool_with_backpressure(self):
+        queue = JobQueue(workers=1, max_pending=2)
+        try:
+            jobs = [queue.submit('square', slow_square, 3), queue.submit('square', slow_square, 4)]
+            with self.assertRaises(JobQueueFull):
+                queue.submit('square', slow_square, 5)
+            self.assertEqual([wait_for(job).result for job in jobs], [9, 16])
+            self.assertEqual(queue.free_slots(), 2)
+        finally:
+            queue.shutdown()
+
+    def test_a_refused_submit_fails_the_job_and_frees_its_slot(self):
+        for retry_delay in (0, 0.01):  # retried inline, then from a timer thread
+            queue = JobQueue(workers=1, max_pending=1, max_retries=1, retry_delay=retry_delay)
+            executors = []
+            queue._get_executor = lambda: executors.append(ShutDownExecutor()) or executors[-1]
+            job = wait_for(queue.submit('square', slow_square, 3))
+            self.assertEqual((job.status, job.attempts), ('failed', 2))
+            self.assertEqual(job.error, 'RuntimeError: cannot schedule new futures after shutdown')
+            self.assertEqual(queue.free_slots(), 1)
+            self.assertTrue(all(executor.discarded for executor in executors))
+
+
+class UploadJobRouteTest(AppTestCase):
+    def seed(self):
+        self.owner_id = create_user('owner').id
+        self.other_id = create_user('other').id
+
+    def headers(self, user_id):
+        with self.app.app_context():
+            return auth_headers(db.session.get(User, user_id))
+
+    def jpeg(self, color=(10, 120, 60)):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 900), color).save(buffer, 'JPEG')
+        return io.BytesIO(buffer.getvalue())
+
+    def upload(self):
+        return self.client.post('/api/upload/image', headers=self.headers(self.owner_id),
+                                content_type='multipart/form-data',
+                                data={'file': (self.jpeg(), 'photo.jpg')})
+
+    def upload_many(self, count):
+        files = [(self.jpeg((10 * i, 120, 60)), f'photo{i}.jpg') for i in range(count)]
+        return self.client.post('/api/upload/images', headers=self.headers(self.owner_id),
+                                content_type='multipart/form-data', data={'files': files})
+
+    def test_job_status_is_visible_to_its_owner_only(self):
+        data = self.upload().get_json()
+        response = self.client.get(f"/api/upload/jobs/{data['job_id']}", headers=self.headers(self.owner_id))
+        self.assertEqual(response.status_code, 200)
+        job = response.get_json()['job']
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['variants']['medium']['width'], 800)
+        self.assertEqual(self.client.get(f"/api/upload/jobs/{data['job_id']}",
+                                         headers=self.headers(self.other_id)).status_code, 404)
+
+    def test_upload_returns_before_the_variants_exist(self):
+        queue = self.app.extensions['job_queue'] = JobQueue(workers=1)
+        try:
+            response = self.upload()
+            self.assertEqual(response.status_code, 202)
+            data = response.get_json()
+            self.assertIsNone(data['variants'])
+            self.assertTrue(os.path.exists(os.path.join(self.app.config['UPLOAD_FOLDER'], data['url'][len('/uploads/'):])))
+            job = wait_for(queue.get(data['job_id']))
+            self.assertEqual(job.status, 'done')
+            self.assertEqual(sorted(job.result['variants']), ['medium', 'small', 'thumb'])
+        finally:
+            queue.shutdown()
+
+    def test_full_queue_answers_429(self):
+        self.app.extensions['job_queue'] = JobQueue(workers=0, max_pending=0)
+        response = self.upload()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '5')
+        self.assertEqual(self.upload_many(1).status_code, 429)
+
+    def test_batch_needs_one_free_slot_and_reports_the_rest_per_file(self):
+        queue = self.app.extensions['job_queue'] = JobQueue(workers=1, max_pending=1)
+        try:
+            response = self.upload_many(1)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.get_json()['uploaded']), 1)
+            wait_for(queue.get(response.get_json()['uploaded'][0]['job_id']))
+
+            response = self.upload_many(3)
+            self.assertEqual(response.status_code, 201)
+            data = response.get_json()
+            self.assertGreaterEqual(len(data['uploaded']), 1)
+            self.assertEqual(len(data['uploaded']) + len(data['errors'] or []), 3)
+        finally:
+            queue.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
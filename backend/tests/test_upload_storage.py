@@ -0,0 +1,109 @@
+import io
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+from helpers import AppTestCase, auth_headers, create_post, create_user
+from models import db
+from models.post import Post
+from models.upload import UploadBlob
+from models.user import User
+from utils.blob_store import collect_garbage
+
+
+def png_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class UploadStorageTest(AppTestCase):
+    def seed(self):
+        self.user_id = create_user('uploader').id
+
+    def headers(self):
+        with self.app.app_context():
+            return auth_headers(db.session.get(User, self.user_id))
+
+    def upload(self, data, filename='photo.png', path='/api/upload/image'):
+        return self.client.post(path, headers=self.headers(), content_type='multipart/form-data',
+                                data={'file': (io.BytesIO(data), filename)})
+
+    def disk_path(self, url):
+        return os.path.join(self.app.config['UPLOAD_FOLDER'], url[len('/uploads/'):])
+
+    def blob(self, url):
+        with self.app.app_context():
+            return db.session.get(UploadBlob, url.rsplit('/', 1)[1].split('.')[0].split('_')[0])
+
+    def test_duplicates_share_one_blob_and_its_variants(self):
+        first = self.upload(png_bytes((1, 2, 3))).get_json()
+        digest = first['url'].rsplit('/', 1)[1].split('.')[0]
+        self.assertEqual(first['url'], f'/uploads/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        self.assertTrue(os.path.exists(self.disk_path(first['variants']['thumb']['webp'])))
+
+        # The same bytes as an avatar reuse the post image's files without a new job
+        second = self.upload(png_bytes((1, 2, 3)), path='/api/upload/avatar').get_json()
+        self.assertEqual(second['url'], first['url'])
+        self.assertIsNone(second['job_id'])
+        with self.app.app_context():
+            self.assertEqual(UploadBlob.query.count(), 1)
+        self.assertEqual(self.blob(first['url']).ref_count, 1)  # the avatar
+
+    def test_reference_counts_follow_the_rows(self):
+        image = self.upload(png_bytes((9, 9, 9))).get_json()
+        thumb = image['variants']['thumb']['url']
+        with self.app.app_context():
+            author = db.session.get(User, self.user_id)
+            post_id = create_post(author, 'Ảnh bìa', featured_image=image['url']).id
+            create_post(author, 'Ảnh trong bài', content=f'<p><img src="http://localhost:5000{thumb}"></p>')
+        self.assertEqual(self.blob(image['url']).ref_count, 2)
+
+        with self.app.app_context():
+            post = db.session.get(Post, post_id)
+            post.featured_image = 'https://example.com/cover.jpg'
+            db.session.commit()
+        self.assertEqual(self.blob(image['url']).ref_count, 1)
+
+        with self.app.app_context():
+            db.session.delete(Post.query.filter_by(title='Ảnh trong bài').one())
+            db.session.commit()
+        self.assertEqual(self.blob(image['url']).ref_count, 0)
+
+    def test_gc_deletes_only_old_unreferenced_blobs(self):
+        kept = self.upload(png_bytes((1, 1, 1))).get_json()
+        dropped = self.upload(png_bytes((2, 2, 2))).get_json()
+        fresh = self.upload(png_bytes((3, 3, 3))).get_json()
+        with self.app.app_context():
+            create_post(db.session.get(User, self.user_id), 'Giữ lại', featured_image=kept['url'])
+            old = datetime.utcnow() - timedelta(days=2)
+            UploadBlob.query.filter(UploadBlob.digest != self.blob(fresh['url']).digest).update({'updated_at': old})
+            db.session.commit()
+
+            self.assertEqual(collect_garbage(grace_hours=24, dry_run=True)['blobs'], 1)
+            self.assertTrue(os.path.exists(self.disk_path(dropped['url'])))
+            stats = collect_garbage(grace_hours=24)
+            self.assertEqual((stats['blobs'], stats['files']), (1, 1 + 2 * 2 + 1))  # original, 2 variants x 2, manifest
+
+        self.assertFalse(os.path.exists(self.disk_path(dropped['url'])))
+        self.assertFalse(os.path.exists(self.disk_path(dropped['variants']['thumb']['webp'])))
+        for image in (kept, fresh):
+            self.assertTrue(os.path.exists(self.disk_path(image['url'])))
+        self.assertIsNone(self.blob(dropped['url']))
+
+    def test_videos_are_deduplicated(self):
+        payload = b'\x00\x00\x00\x18ftypmp42' + os.urandom(200000)
+        first = self.upload(payload, 'trip.mp4', '/api/upload/video')
+        second = self.upload(payload, 'copy.mp4', '/api/upload/video')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.get_json()['url'], second.get_json()['url'])
+        self.assertEqual(first.get_json()['size'], len(payload))
+        with open(self.disk_path(first.get_json()['url']), 'rb') as stored:
+            self.assertEqual(stored.read(), payload)
+        self.assertEqual(self.blob(first.get_json()['url']).kind, 'video')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import os
+import tracemalloc
+import unittest
+from unittest import mock
+
+from helpers import AppTestCase, auth_headers, create_user
+from models import db
+from models.user import User
+from utils.upload_stream import _multipart_events
+
+BOUNDARY = 'vIeGoBoUnDaRy'
+
+
+def multipart_body(*parts):
+    """parts: (name, filename or None, content bytes)"""
+    chunks = []
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else '')
+        chunks.append(f'--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + content + b'\r\n')
+    return b''.join(chunks) + f'--{BOUNDARY}--\r\n'.encode()
+
+
+class MultipartEventsTest(unittest.TestCase):
+    def parse(self, body, chunk_size):
+        stream = io.BytesIO(body)
+        parts, current = [], None
+        for event in _multipart_events(stream.read, BOUNDARY.encode(), chunk_size):
+            if event[0] == 'part':
+                current = [event[1], event[2], b'']
+                parts.append(current)
+            elif event[0] == 'data':
+                current[2] += event[1]
+            else:
+                return parts, event[1]
+
+    def test_content_survives_any_chunking(self):
+        # Line breaks and near-boundaries inside the file must come back untouched
+        video = b'\r\n--vIeGo\r\r\n\n--' + bytes(range(256)) * 40 + b'\r\n--vIeGoBoUnDaR'
+        body = multipart_body(('title', None, 'Hạ Long'.encode()), ('file', 'trip.mp4', video))
+        for chunk_size in (1, 7, 64, 65536):
+            parts, complete = self.parse(body, chunk_size)
+            self.assertTrue(complete)
+            self.assertEqual(parts, [['title', None, 'Hạ Long'.encode()], ['file', 'trip.mp4', video]])
+
+    def test_truncated_body(self):
+        body = multipart_body(('file', 'trip.mp4', b'x' * 1000))
+        parts, complete = self.parse(body[:600], 64)
+        self.assertFalse(complete)
+
+
+class StreamingUploadTest(AppTestCase):
+    def seed(self):
+        self.user_id = create_user('videographer').id
+
+    def post_video(self, body):
+        with self.app.app_context():
+            headers = auth_headers(db.session.get(User, self.user_id))
+        return self.client.post('/api/upload/video', headers=headers, data=body,
+                                content_type=f'multipart/form-data; boundary={BOUNDARY}')
+
+    def tmp_files(self):
+        tmp_folder = os.path.join(self.app.config['UPLOAD_FOLDER'], 'tmp')
+        return os.listdir(tmp_folder) if os.path.isdir(tmp_folder) else []
+
+    def test_video_above_max_content_length_at_constant_memory(self):
+        self.app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
+        video = os.urandom(8 * 1024 * 1024)
+        body = multipart_body(('file', 'trip.mp4', video))
+
+        tracemalloc.start()
+        try:
+            response = self.post_video(body)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['size'], len(video))
+        self.assertLess(peak, 2 * 1024 * 1024)
+        path = os.path.join(self.app.config['UPLOAD_FOLDER'], response.get_json()['url'][len('/uploads/'):])
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), video)
+        self.assertEqual(self.tmp_files(), [])
+
+    def test_oversized_video_is_refused_while_streaming(self):
+        with mock.patch('routes.upload.MAX_VIDEO_SIZE', 1024 * 1024):
+            # Declared too large: refused before reading
+            response = self.post_video(multipart_body(('file', 'big.mp4', b'x' * (2 * 1024 * 1024))))
+            self.assertEqual(response.status_code, 413)
+            # Within the body budget, but the file itself goes over the limit
+            response = self.post_video(multipart_body(('file', 'big.mp4', b'x' * (1024 * 1024 + 1000))))
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Video quá lớn', response.get_json()['error'])
+        self.assertEqual(self.tmp_files(), [])
+
+    def test_missing_and_wrong_type(self):
+        response = self.post_video(multipart_body(('title', None, b'no file')))
+        self.assertEqual(response.get_json()['error'], 'Không có file được upload')
+        response = self.post_video(multipart_body(('file', 'notes.txt', b'hello')))
+        self.assertIn('Định dạng file không hợp lệ', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
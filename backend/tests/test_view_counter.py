@@ -0,0 +1,104 @@
+import unittest
+
+from helpers import AppTestCase, create_user, create_post
+from models import db
+from models.post import Post
+from models.story import Story
+from utils.view_counter import ViewCounterBuffer, get_view_counter
+
+
+class RecordingBackend:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def apply(self, increments):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        self.batches.append(increments)
+
+
+class ViewCounterBufferTest(unittest.TestCase):
+    def test_aggregates_per_row(self):
+        backend = RecordingBackend()
+        buffer = ViewCounterBuffer(backend, flush_interval=0, max_pending=100)
+        for _ in range(3):
+            buffer.record('post', 1)
+        buffer.record('post', 2)
+        buffer.record('tour', 1)
+        self.assertEqual(buffer.pending('post', 1), 3)
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(backend.batches, [{'post': {1: 3, 2: 1}, 'tour': {1: 1}}])
+        self.assertEqual(buffer.stats()['pending_views'], 0)
+        self.assertEqual(buffer.stats()['flushes'], 1)
+
+    def test_size_threshold_triggers_flush(self):
+        backend = RecordingBackend()
+        buffer = ViewCounterBuffer(backend, flush_interval=0, max_pending=3)
+        buffer.record('post', 1)
+        buffer.record('post', 1)
+        self.assertEqual(backend.batches, [])
+        buffer.record('post', 2)
+        self.assertEqual(backend.batches, [{'post': {1: 2, 2: 1}}])
+
+    def test_failed_flush_keeps_views(self):
+        backend = RecordingBackend(fail=True)
+        buffer = ViewCounterBuffer(backend, flush_interval=0, max_pending=100)
+        buffer.record('story', 7)
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.pending('story', 7), 1)
+        self.assertEqual(buffer.stats()['flush_failures'], 1)
+
+        backend.fail = False
+        self.assertEqual(buffer.flush(), 1)
+
+    def test_unknown_entity_rejected(self):
+        buffer = ViewCounterBuffer(RecordingBackend(), flush_interval=0)
+        with self.assertRaises(ValueError):
+            buffer.record('comment', 1)
+
+
+class BufferedViewsRouteTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        post = create_post(author, title='Sa Pa')
+        post.views_count = 10
+        story = Story(user_id=author.id, content='hello')
+        db.session.add(story)
+        db.session.commit()
+        self.post_id = post.id
+        self.slug = post.slug
+        self.story_id = story.id
+
+    def test_get_post_is_read_only_until_flush(self):
+        statements = []
+        from sqlalchemy import event
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', capture)
+        try:
+            for _ in range(3):
+                self.assertEqual(self.client.get(f'/api/posts/{self.post_id}').status_code, 200)
+            self.assertEqual(self.client.get(f'/api/posts/{self.slug}').status_code, 200)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', capture)
+        self.assertFalse([s for s in statements if s.lstrip().upper().startswith('UPDATE')])
+
+        with self.app.app_context():
+            self.assertEqual(get_view_counter().flush(), 4)
+            self.assertEqual(db.session.get(Post, self.post_id).views_count, 14)
+
+    def test_story_view_reports_pending_views(self):
+        self.client.post(f'/api/stories/{self.story_id}/view')
+        response = self.client.post(f'/api/stories/{self.story_id}/view')
+        self.assertEqual(response.get_json()['view_count'], 2)
+        with self.app.app_context():
+            get_view_counter().flush()
+            self.assertEqual(db.session.get(Story, self.story_id).view_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from helpers import AppTestCase, create_user, create_post, auth_headers
+from models import db
+
+
+class ViewerContextTest(AppTestCase):
+    def seed(self):
+        author = create_user('author')
+        posts = [create_post(author, title=f'Post {i}') for i in range(6)]
+        self.post_ids = [p.id for p in posts]
+        self.slug = posts[2].slug
+        reader = create_user('reader')
+        reader.like_post(self.post_ids[0])
+        reader.like_post(self.post_ids[2])
+        reader.add_bookmark(self.post_ids[1])
+        reader.follow(author.id)
+        db.session.commit()
+        self.author_id = author.id
+        self.stranger_id = create_user('stranger').id
+        self.headers = auth_headers(reader)
+
+    def test_feed_flags_liked_and_bookmarked(self):
+        response = self.client.get('/api/posts/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        flags = {p['id']: (p['is_liked'], p['is_bookmarked']) for p in response.get_json()['posts']}
+        self.assertEqual(flags[self.post_ids[0]], (True, False))
+        self.assertEqual(flags[self.post_ids[1]], (False, True))
+        self.assertEqual(flags[self.post_ids[3]], (False, False))
+
+    def test_viewer_cost_independent_of_page_size(self):
+        with self.count_queries() as small:
+            self.client.get('/api/posts/?per_page=2', headers=self.headers)
+        with self.count_queries() as large:
+            self.client.get('/api/posts/?per_page=6', headers=self.headers)
+        self.assertEqual(small.count, large.count)
+
+    def test_anonymous_feed_has_no_flags(self):
+        posts = self.client.get('/api/posts/').get_json()['posts']
+        self.assertTrue(all('is_liked' not in p for p in posts))
+
+    def test_slug_detail_flags(self):
+        response = self.client.get(f'/api/posts/{self.slug}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['post']
+        self.assertTrue(data['is_liked'])
+        self.assertFalse(data['is_bookmarked'])
+
+
+    def test_batch_state_flags_posts_and_users(self):
+        response = self.client.post('/api/social/state', headers=self.headers, json={
+            'post_ids': self.post_ids[:3], 'user_ids': [self.author_id, self.stranger_id]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['posts'][str(self.post_ids[0])], {'is_liked': True, 'is_bookmarked': False})
+        self.assertEqual(data['posts'][str(self.post_ids[1])], {'is_liked': False, 'is_bookmarked': True})
+        self.assertEqual(data['users'], {str(self.author_id): {'is_following': True},
+                                         str(self.stranger_id): {'is_following': False}})
+
+    def test_batch_state_cost_independent_of_ids(self):
+        with self.count_queries() as small:
+            self.client.post('/api/social/state', headers=self.headers,
+                             json={'post_ids': self.post_ids[:1], 'user_ids': [self.author_id]})
+        with self.count_queries() as large:
+            self.client.post('/api/social/state', headers=self.headers,
+                             json={'post_ids': self.post_ids, 'user_ids': [self.author_id, self.stranger_id]})
+        self.assertEqual(small.count, large.count)
+
+        response = self.client.post('/api/social/state', headers=self.headers, json={'post_ids': 'all'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/social/state', headers=self.headers, json={'post_ids': list(range(201))})
+        self.assertEqual(response.status_code, 400)
+        for bad in ('²', '٣', 99999999999999999999999, '99999999999999999999999', 0, -1, True, 1.5):
+            response = self.client.post('/api/social/state', headers=self.headers, json={'user_ids': [bad]})
+            self.assertEqual(response.status_code, 400, bad)
+        response = self.client.post('/api/social/state', headers=self.headers,
+                                    json={'post_ids': [str(self.post_ids[0])]})
+        self.assertEqual(list(response.get_json()['posts']), [str(self.post_ids[0])])
+
+
+if __name__ == '__main__':
+    unittest.main()
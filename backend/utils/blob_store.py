@@ -0,0 +1,307 @@
+"""
+Content-addressed upload storage for VieGo Blog
+Uploads are hashed (SHA-256) while they are written to a temporary file and
+then moved to UPLOAD_FOLDER/ab/cd/<digest>.<ext>; an identical upload finds
+the file (and its image variants, <digest>_<variant>.<ext>) already there and
+stores nothing. Since a URL's bytes never change, the files can be cached
+forever.
+
+upload_blobs.ref_count counts the rows whose URL columns (REFERENCE_COLUMNS)
+mention a blob. A before_flush hook adjusts it in the same transaction as the
+change; `flask --app main uploads-gc` recounts and then deletes blobs that
+stayed unreferenced for longer than the grace period.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, event, inspect
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.upload import UploadBlob
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_GC_GRACE_HOURS = 24  # fresh uploads are not referenced until the post is saved
+BLOB_URL = re.compile(r'/uploads/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})')
+_BLOB_FILE = re.compile(r'^([0-9a-f]{64})(?:_[a-z]+)?\.[a-z0-9]+$')
+
+
+def blob_relative_path(digest, ext):
+    return f'{digest[:2]}/{digest[2:4]}/{digest}.{ext}'
+
+
+def blob_folder(digest):
+    """Absolute directory holding a blob and its variants"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], digest[:2], digest[2:4])
+
+
+def blob_url_prefix(digest):
+    return f'/uploads/{digest[:2]}/{digest[2:4]}'
+
+
+class HashingWriter:
+    """Temporary file that hashes what is written; commit() moves it into place"""
+
+    def __init__(self, upload_folder):
+        tmp_folder = os.path.join(upload_folder, 'tmp')
+        os.makedirs(tmp_folder, exist_ok=True)
+        self.upload_folder = upload_folder
+        self.hash = hashlib.sha256()
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_folder, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self.hash.update(chunk)
+        self.size += len(chunk)
+        self._file.write(chunk)
+
+    @property
+    def digest(self):
+        return self.hash.hexdigest()
+
+    def finish(self):
+        """Close the temporary file and return its path (to read it back before committing)"""
+        self._file.close()
+        return self.tmp_path
+
+    def commit(self, ext, digest=None):
+        """Store under the content address; returns (digest, relative path, created)"""
+        self._file.close()
+        digest = digest or self.hash.hexdigest()
+        relative = blob_relative_path(digest, ext)
+        path = os.path.join(self.upload_folder, relative)
+        if os.path.exists(path):
+            os.remove(self.tmp_path)
+            return digest, relative, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.tmp_path, path)
+        return digest, relative, True
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def save_bytes(data, ext, digest=None):
+    """Store bytes under `digest` (default: their own SHA-256); returns the relative path"""
+    writer = HashingWriter(current_app.config['UPLOAD_FOLDER'])
+    try:
+        writer.write(data)
+        _, relative, _ = writer.commit(ext, digest)
+    except Exception:
+        writer.discard()
+        raise
+    return relative
+
+
+def register_blob(digest, ext, size, kind):
+    """Record a stored upload (or touch it when it already exists) and commit"""
+    blob = db.session.get(UploadBlob, digest)
+    if blob is not None:
+        blob.updated_at = datetime.utcnow()
+        db.session.commit()
+        return blob
+    blob = UploadBlob(digest=digest, ext=ext, size=size, kind=kind)
+    db.session.add(blob)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same bytes were registered by a concurrent request
+        db.session.rollback()
+        blob = db.session.get(UploadBlob, digest)
+    return blob
+
+
+# ============ REFERENCE COUNTING ============
+
+def _reference_columns():
+    from models.location import Location
+    from models.post import Post
+    from models.story import Story
+    from models.tour import Tour
+    from models.user import User
+
+    return {
+        Post: ('featured_image', 'images', 'video_url', 'content'),
+        User: ('avatar_url', 'cover_image_url'),
+        Tour: ('featured_image', 'gallery_images', 'video_url'),
+        Location: ('featured_image', 'images'),
+        Story: ('media_url',),
+    }
+
+
+REFERENCE_COLUMNS = {}  # model -> URL-bearing column names, filled on first use
+
+
+def blob_digests(*values):
+    """Digests of the content-addressed uploads mentioned in some text values"""
+    found = set()
+    for value in values:
+        if value:
+            found.update(match.group(3) for match in BLOB_URL.finditer(str(value)))
+    return found
+
+
+def _reference_sets(instance, columns):
+    """(digests before, digests after) the pending change of one instance"""
+    state = inspect(instance)
+    before, after = [], []
+    for column in columns:
+        history = state.attrs[column].history
+        after.extend(history.added or history.unchanged)
+        before.extend(history.deleted or history.unchanged)
+    return blob_digests(*before), blob_digests(*after)
+
+
+def _count_references(session, flush_context, instances):
+    if not REFERENCE_COLUMNS:
+        REFERENCE_COLUMNS.update(_reference_columns())
+    deltas = {}
+    for instance in session.new:
+        columns = REFERENCE_COLUMNS.get(type(instance))
+        if columns:
+            for digest in blob_digests(*(getattr(instance, column) for column in columns)):
+                deltas[digest] = deltas.get(digest, 0) + 1
+    for instance in session.dirty:
+        columns = REFERENCE_COLUMNS.get(type(instance))
+        if columns and session.is_modified(instance):
+            before, after = _reference_sets(instance, columns)
+            for digest in after - before:
+                deltas[digest] = deltas.get(digest, 0) + 1
+            for digest in before - after:
+                deltas[digest] = deltas.get(digest, 0) - 1
+    for instance in session.deleted:
+        columns = REFERENCE_COLUMNS.get(type(instance))
+        if columns:
+            before, _ = _reference_sets(instance, columns)
+            for digest in before:
+                deltas[digest] = deltas.get(digest, 0) - 1
+
+    table = UploadBlob.__table__
+    connection = session.connection()
+    for digest, delta in deltas.items():
+        if not delta:
+            continue
+        values = {'ref_count': case((table.c.ref_count + delta < 0, 0), else_=table.c.ref_count + delta)}
+        if delta < 0:
+            values['updated_at'] = datetime.utcnow()
+        connection.execute(table.update().where(table.c.digest == digest).values(**values))
+
+
+def register_reference_hooks():
+    if not event.contains(db.session, 'before_flush', _count_references):
+        event.listen(db.session, 'before_flush', _count_references)
+
+
+# ============ GARBAGE COLLECTION ============
+
+def recount_references():
+    """Recompute every ref_count from the URL columns; returns how many rows changed"""
+    if not REFERENCE_COLUMNS:
+        REFERENCE_COLUMNS.update(_reference_columns())
+    counts = {}
+    for model, columns in REFERENCE_COLUMNS.items():
+        query = db.session.query(*(getattr(model, column) for column in columns))
+        for row in query.yield_per(1000):
+            for digest in blob_digests(*row):
+                counts[digest] = counts.get(digest, 0) + 1
+
+    changed = 0
+    for blob in UploadBlob.query.yield_per(1000):
+        count = counts.get(blob.digest, 0)
+        if blob.ref_count != count:
+            if count < blob.ref_count:
+                blob.updated_at = datetime.utcnow()
+            blob.ref_count = count
+            changed += 1
+    db.session.commit()
+    return changed
+
+
+def _remove_blob_files(folder, digest):
+    removed = 0
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            if name.startswith(digest):
+                os.remove(os.path.join(folder, name))
+                removed += 1
+    return removed
+
+
+def collect_garbage(grace_hours=DEFAULT_GC_GRACE_HOURS, dry_run=False):
+    """
+    Delete blobs (with their variants and manifest) unreferenced for grace_hours,
+    files in the store without a row, stale temporary files and expired
+    resumable upload sessions
+    """
+    from utils.images import forget_manifest
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    stats = {'recounted': recount_references(), 'blobs': 0, 'files': 0, 'bytes': 0, 'orphans': 0, 'sessions': 0}
+
+    expired = UploadBlob.query.filter(UploadBlob.ref_count == 0, UploadBlob.updated_at < cutoff).all()
+    for blob in expired:
+        stats['blobs'] += 1
+        stats['bytes'] += blob.size
+        if not dry_run:
+            stats['files'] += _remove_blob_files(blob_folder(blob.digest), blob.digest)
+            forget_manifest(blob.url)
+            db.session.delete(blob)
+    if not dry_run:
+        db.session.commit()
+
+    # Files left by crashes between writing and registering, and abandoned temporary files
+    cutoff_ts = time.time() - grace_hours * 3600
+    known = None
+    for level1 in os.listdir(upload_folder) if os.path.isdir(upload_folder) else ():
+        if not re.fullmatch(r'[0-9a-f]{2}', level1):
+            continue
+        for level2 in os.listdir(os.path.join(upload_folder, level1)):
+            folder = os.path.join(upload_folder, level1, level2)
+            for name in os.listdir(folder):
+                match = _BLOB_FILE.match(name)
+                path = os.path.join(folder, name)
+                if not match or os.path.getmtime(path) > cutoff_ts:
+                    continue
+                if known is None:
+                    known = {digest for digest, in db.session.query(UploadBlob.digest)}
+                if match.group(1) not in known:
+                    stats['orphans'] += 1
+                    if not dry_run:
+                        os.remove(path)
+    tmp_folder = os.path.join(upload_folder, 'tmp')
+    if os.path.isdir(tmp_folder) and not dry_run:
+        for name in os.listdir(tmp_folder):
+            path = os.path.join(tmp_folder, name)
+            if os.path.getmtime(path) < cutoff_ts:
+                os.remove(path) if os.path.isfile(path) else shutil.rmtree(path, ignore_errors=True)
+    if not dry_run:
+        from utils.resumable import expire_sessions
+        stats['sessions'] = expire_sessions()
+    return stats
+
+
+@click.command('uploads-gc')
+@click.option('--grace-hours', default=DEFAULT_GC_GRACE_HOURS, show_default=True,
+              help='Keep unreferenced uploads younger than this')
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted')
+@with_appcontext
+def uploads_gc_command(grace_hours, dry_run):
+    """Delete content-addressed uploads no longer referenced by any row"""
+    stats = collect_garbage(grace_hours, dry_run)
+    verb = 'Would delete' if dry_run else 'Deleted'
+    click.echo(f"🔁 {stats['recounted']} reference counts corrected")
+    click.echo(f"🗑️  {verb} {stats['blobs']} blobs ({stats['bytes'] / (1024 * 1024):.1f} MB, "
+               f"{stats['files']} files) and {stats['orphans']} orphan files")
+    click.echo(f"⏱️  {stats['sessions']} expired resumable uploads removed")
@@ -1,93 +1,334 @@
 """
 Caching utilities for VieGo Blog backend
-Provides simple in-memory caching with TTL support
+Provides a bounded, thread-safe in-memory LRU cache with TTL support and a
+route decorator that caches anonymous GET responses.
+
+Entries can be tagged with what they depend on (`post:12`, `posts:list`,
+`author:3`, ...) and invalidated by tag; `kind:*` tags depend on every
+entity of a kind, so invalidating `location:5` also drops `location:*`.
 """
+import sys
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+_MISSING = object()
+
+
+class _Flight:
+    """A cache rebuild in progress, other threads wait on it"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = _MISSING
+        self.generation = 0
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory used by a cached value"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
 
 class SimpleCache:
-    def __init__(self, default_ttl: int = 300):
+    def __init__(self, default_ttl: int = 300, max_entries: int = 1024,
+                 max_bytes: int = 32 * 1024 * 1024,
+                 sizeof: Callable[[Any], int] = _estimate_size):
         """
         Initialize cache with default TTL in seconds
         Args:
             default_ttl: Default time to live in seconds (5 minutes default)
+            max_entries: Least recently used entries are evicted above this count
+            max_bytes: Least recently used entries are evicted above this size
+            sizeof: Function estimating the size of a value in bytes
         """
-        self.cache: Dict[str, Dict] = {}
+        self.cache: 'OrderedDict[str, Dict]' = OrderedDict()
         self.default_ttl = default_ttl
-    
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Store value in cache with TTL"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        # Bumped on every invalidation so rebuilds started before it are not stored
+        self._generation = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def _remove(self, key: str) -> None:
+        item = self.cache.pop(key)
+        self.total_bytes -= item['size']
+        for tag in item['tags']:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _lookup(self, key: str) -> Any:
+        """Return the live value for key or _MISSING, caller holds the lock"""
+        item = self.cache.get(key)
+        if item is None:
+            return _MISSING
+        if time.time() > item['expires_at']:
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        self.cache.move_to_end(key)
+        return item['value']
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            tags: Iterable[str] = (), generation: Optional[int] = None) -> None:
+        """Store value in cache with TTL and dependency tags, evicting least recently used entries"""
         ttl = ttl or self.default_ttl
-        expires_at = time.time() + ttl
-        self.cache[key] = {
-            'value': value,
-            'expires_at': expires_at
-        }
-    
+        size = self.sizeof(value) + len(key)
+        if size > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Something was invalidated while the value was being built
+                return
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = {
+                'value': value,
+                'expires_at': time.time() + ttl,
+                'size': size,
+                'tags': tags
+            }
+            self.total_bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.cache)))
+                self.evictions += 1
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired"""
-        if key not in self.cache:
-            return None
-        
-        cache_item = self.cache[key]
-        if time.time() > cache_item['expires_at']:
-            del self.cache[key]
-            return None
-        
-        return cache_item['value']
-    
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def get_or_set(self, key: str, builder: Callable[[], Any], ttl: Optional[int] = None,
+                   cacheable: Callable[[Any], bool] = lambda value: True,
+                   wait_timeout: float = 30,
+                   tags: Callable[[], Iterable[str]] = lambda: ()) -> Any:
+        """
+        Return the cached value or build it, with single-flight protection:
+        only one caller rebuilds a missing key, concurrent callers wait for it
+        and share the result. `tags` is called after building the value.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                flight.generation = self._generation
+
+        if not leader:
+            if flight.event.wait(wait_timeout) and flight.value is not _MISSING:
+                with self._lock:
+                    self.coalesced += 1
+                return flight.value
+            # The rebuild failed or produced an uncacheable value: build our own
+            return builder()
+
+        try:
+            value = builder()
+            if cacheable(value):
+                self.set(key, value, ttl, tags=tags(), generation=flight.generation)
+                flight.value = value
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
     def delete(self, key: str) -> bool:
         """Delete specific cache entry"""
-        if key in self.cache:
-            del self.cache[key]
-            return True
-        return False
-    
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+                return True
+            return False
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Drop every entry depending on one of the tags, returns the number dropped"""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                kind, _, ident = tag.partition(':')
+                if ident == '*':
+                    matched = [t for t in self._tags if t.partition(':')[0] == kind]
+                else:
+                    matched = [tag, f'{kind}:*'] if ident else [tag]
+                for t in matched:
+                    keys.update(self._tags.get(t, ()))
+            for key in keys:
+                if key in self.cache:
+                    self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
     def clear(self) -> None:
         """Clear all cache entries"""
-        self.cache.clear()
-    
+        with self._lock:
+            self._generation += 1
+            self.cache.clear()
+            self._tags.clear()
+            self.total_bytes = 0
+
     def cleanup_expired(self) -> int:
         """Remove expired entries and return count"""
         current_time = time.time()
-        expired_keys = [
-            key for key, item in self.cache.items() 
-            if current_time > item['expires_at']
-        ]
-        
-        for key in expired_keys:
-            del self.cache[key]
-        
+        with self._lock:
+            expired_keys = [
+                key for key, item in self.cache.items()
+                if current_time > item['expires_at']
+            ]
+
+            for key in expired_keys:
+                self._remove(key)
+            self.expirations += len(expired_keys)
+
         return len(expired_keys)
 
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.cache),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+                'tags': len(self._tags),
+                'inflight': len(self._inflight)
+            }
+
+
+# Bounded LRU behaviour is the point of the class now
+LRUCache = SimpleCache
+
 # Global cache instance
 cache = SimpleCache()
 
-def cached_route(ttl: int = 300):
+
+def get_response_cache() -> SimpleCache:
+    """Response cache of the current app, created from config on first use"""
+    from flask import current_app
+
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is None:
+        config = current_app.config
+        response_cache = SimpleCache(
+            default_ttl=config.get('RESPONSE_CACHE_DEFAULT_TTL', 300),
+            max_entries=config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+            max_bytes=config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        )
+        current_app.extensions['response_cache'] = response_cache
+        # Model writes evict the entries that depend on them, here and in the other workers
+        from utils.cache_invalidation import init_cache_invalidation, init_invalidation_feed
+        init_cache_invalidation()
+        init_invalidation_feed(current_app, response_cache)
+    return response_cache
+
+
+def add_cache_tags(*tags: str) -> None:
+    """Tag the response being built by a cached route (e.g. authors on a page)"""
+    from flask import g
+
+    g.setdefault('cache_tags', set()).update(tags)
+
+
+def _is_anonymous(request) -> bool:
+    """Requests carrying credentials get per-user data and are never cached"""
+    return not request.headers.get('Authorization') and 'access_token_cookie' not in request.cookies
+
+
+def cached_route(ttl: int = 300, tags: Iterable[str] = ()):
     """
     Decorator for caching Flask route responses
+    Only anonymous GET requests answered with 200 are cached; the body is
+    stored once and a fresh Response is built for every hit.
     Args:
         ttl: Time to live in seconds
+        tags: Dependency tags, formatted with the route's path arguments
+              (e.g. 'post:{post_id}'); views can add more with add_cache_tags()
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            from flask import request
-            
-            # Generate cache key from route and query parameters
-            cache_key = f"{request.endpoint}:{request.args.to_dict()}"
-            
-            # Try to get from cache first
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl)
-            
-            return result
+            from flask import current_app, g, make_response, request
+
+            if (request.method != 'GET' or not _is_anonymous(request)
+                    or not current_app.config.get('RESPONSE_CACHE_ENABLED', True)):
+                return func(*args, **kwargs)
+
+            from utils.cache_invalidation import poll_invalidations
+
+            response_cache = get_response_cache()
+            poll_invalidations()
+
+            # Generate cache key from route, path arguments and query parameters
+            cache_key = f"{request.endpoint}:{sorted((request.view_args or {}).items())}:" \
+                        f"{sorted(request.args.items(multi=True))}"
+            built = []
+
+            def build():
+                response = make_response(func(*args, **kwargs))
+                built.append(response)
+                return (response.get_data(), response.status_code, response.mimetype)
+
+            def response_tags():
+                view_args = request.view_args or {}
+                return {tag.format(**view_args) for tag in tags} | g.get('cache_tags', set())
+
+            body, status, mimetype = response_cache.get_or_set(
+                cache_key, build, ttl,
+                cacheable=lambda value: value[1] == 200,
+                tags=response_tags
+            )
+
+            if built:
+                response = built[0]
+                response.headers['X-Cache'] = 'MISS'
+            else:
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+            return response
         return wrapper
     return decorator
 
@@ -95,4 +336,4 @@ def cache_key(*args, **kwargs) -> str:
     """Generate cache key from arguments"""
     key_parts = [str(arg) for arg in args]
     key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
-    return ":".join(key_parts)
\ No newline at end of file
+    return ":".join(key_parts)
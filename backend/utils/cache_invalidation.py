@@ -0,0 +1,198 @@
+"""
+Cache invalidation on model writes for VieGo Blog
+Session hooks collect the cache tags touched by each flush and evict them
+from the app's response cache once the transaction commits, so cached feeds
+can use long TTLs and still show an edit right after it is saved.
+
+Every worker process has its own response cache, so the tags are also added
+to the cache_invalidations table in the transaction of the write. Each worker
+reads the rows the others added at most every CACHE_INVALIDATION_POLL_INTERVAL
+seconds, on its next cached request, and evicts those tags too: an edit
+reaches every worker within that interval instead of the feed TTL.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+from models.cache_invalidation import CacheInvalidation
+from models.post import Post
+from models.comment import Comment
+from models.location import Location
+from models.tour import Tour
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 2  # seconds between reads of the other workers' invalidations
+LOOKBACK = 60  # seconds re-read on every poll: a row may commit after rows with later IDs
+RETENTION = 3600  # seconds a row is kept for the workers to read
+PRUNE_INTERVAL = 600  # seconds between deletions of expired rows by one worker
+
+
+def _post_tags(post):
+    return [f'post:{post.id}', 'posts:list', f'author:{post.author_id}']
+
+
+def _comment_tags(comment):
+    # Comment counts are shown on post cards and detail pages
+    return [f'post:{comment.post_id}', 'posts:list']
+
+
+def _location_tags(location):
+    return [f'location:{location.id}']
+
+
+def _tour_tags(tour):
+    return [f'tour:{tour.id}', 'tours:list']
+
+
+def _user_tags(user):
+    return [f'author:{user.id}']
+
+
+# model -> function returning the tags a write to one instance invalidates
+CACHE_TAGGERS = {
+    Post: _post_tags,
+    Comment: _comment_tags,
+    Location: _location_tags,
+    Tour: _tour_tags,
+    User: _user_tags,
+}
+
+
+def tags_for(instance):
+    tagger = CACHE_TAGGERS.get(type(instance))
+    return tagger(instance) if tagger else []
+
+
+def invalidate_on_commit(*tags):
+    """Evict tags when the current transaction commits (for writes made outside the ORM)"""
+    db.session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def worker_origin():
+    """This worker process in the cache_invalidations table"""
+    return f'{socket.gethostname()[:50]}-{os.getpid()}'
+
+
+def _share(session):
+    """Add the transaction's new tags to cache_invalidations, committed or rolled back with the write"""
+    tags = session.info.get('cache_tags', set())
+    shared = session.info.setdefault('cache_tags_shared', set())
+    new_tags = sorted(tags - shared)
+    if not new_tags or not has_app_context() or not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return
+    origin, now = worker_origin(), datetime.utcnow()
+    session.connection().execute(insert(CacheInvalidation.__table__),
+                                 [{'tag': tag, 'origin': origin, 'created_at': now} for tag in new_tags])
+    shared.update(new_tags)
+
+
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for instance in session.new:
+        tags.update(tags_for(instance))
+    for instance in session.dirty:
+        if session.is_modified(instance, include_collections=False):
+            tags.update(tags_for(instance))
+    for instance in session.deleted:
+        tags.update(tags_for(instance))
+    _share(session)
+
+
+def _share_before_commit(session):
+    # Tags of writes made outside the ORM; the commit's own flush shares the rest
+    _share(session)
+
+
+def _invalidate(session):
+    session.info.pop('cache_tags_shared', None)
+    tags = session.info.pop('cache_tags', None)
+    if not tags or not has_app_context():
+        return
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is not None:
+        response_cache.invalidate_tags(*tags)
+
+
+def _discard(session):
+    session.info.pop('cache_tags', None)
+    session.info.pop('cache_tags_shared', None)
+
+
+class InvalidationFeed:
+    """Evicts the tags other workers recorded from this worker's response cache"""
+
+    def __init__(self, response_cache, poll_interval=DEFAULT_POLL_INTERVAL, lookback=LOOKBACK):
+        self.response_cache = response_cache
+        self.poll_interval = poll_interval
+        self.lookback = lookback
+        self._seen = {}  # row ID -> created_at of rows already applied, within the lookback
+        self._polled_at = self._pruned_at = datetime.utcnow()
+        self._lock = threading.Lock()
+
+    def poll(self, force=False):
+        """Apply the rows added since the last poll once poll_interval has passed, returns the tags evicted"""
+        if not self._lock.acquire(blocking=False):
+            return 0  # another request thread is polling
+        try:
+            now = datetime.utcnow()
+            if not force and (now - self._polled_at).total_seconds() < self.poll_interval:
+                return 0
+            table = CacheInvalidation.__table__
+            since = self._polled_at - timedelta(seconds=self.lookback)
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    select(table.c.id, table.c.tag, table.c.created_at)
+                    .where(table.c.created_at >= since, table.c.origin != worker_origin())
+                ).all()
+            self._polled_at = now
+            tags = set()
+            for row in rows:
+                if row.id not in self._seen:
+                    self._seen[row.id] = row.created_at
+                    tags.add(row.tag)
+            self._seen = {row_id: created_at for row_id, created_at in self._seen.items() if created_at >= since}
+            if tags:
+                self.response_cache.invalidate_tags(*tags)
+            if (now - self._pruned_at).total_seconds() >= PRUNE_INTERVAL:
+                self._pruned_at = now
+                with db.engine.begin() as connection:
+                    connection.execute(delete(table).where(table.c.created_at < now - timedelta(seconds=RETENTION)))
+            return len(tags)
+        except SQLAlchemyError as e:
+            logger.warning('Reading cache invalidations failed: %s', e)
+            return 0
+        finally:
+            self._lock.release()
+
+
+def init_invalidation_feed(app, response_cache):
+    """Follow the other workers' invalidations for the app's response cache"""
+    feed = InvalidationFeed(response_cache, app.config.get('CACHE_INVALIDATION_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+    app.extensions['cache_invalidation_feed'] = feed
+    return feed
+
+
+def poll_invalidations():
+    """Catch up with the other workers before a cached response is served"""
+    feed = current_app.extensions.get('cache_invalidation_feed')
+    if feed is not None:
+        feed.poll()
+
+
+def init_cache_invalidation():
+    """Register the session hooks once per process"""
+    if event.contains(db.session, 'after_flush', _collect_tags):
+        return
+    event.listen(db.session, 'after_flush', _collect_tags)
+    event.listen(db.session, 'before_commit', _share_before_commit)
+    event.listen(db.session, 'after_commit', _invalidate)
+    event.listen(db.session, 'after_rollback', _discard)
@@ -0,0 +1,196 @@
+"""
+Map marker clustering for VieGo Blog
+Points are aggregated into Web Mercator grid cells at every zoom level from
+0 to CLUSTER_MAX_ZOOM; each cell keeps a count, coordinate sums (for the
+centroid) and per-category counts. Adding or removing a point touches one
+cell per level, so the hierarchy is updated incrementally by the spatial
+index commit hooks. Deeper zooms are clustered on the fly from the points of
+the finest precomputed cells, which are few inside a zoomed-in viewport;
+wider requests at those zooms are cut down to MAX_VIEWPORT_TILES around their
+centre.
+"""
+import threading
+from math import cos, log, pi, radians, tan
+
+from flask import current_app
+
+from utils.spatial_index import SPATIAL_SOURCES, register_spatial_hooks
+
+CLUSTER_MAX_ZOOM = 12  # deepest precomputed level; cells are ~2.4 km wide there
+CELL_SUBDIVISIONS = 4  # cells per tile side: a 256 px tile gives ~64 px clusters
+MAX_MERCATOR_LAT = 85.05112878
+MAX_ENUMERATED_CELLS = 4096  # larger viewports scan the level's cells instead
+MAX_VIEWPORT_TILES = 32  # widest viewport, in tiles, clustered past the precomputed levels
+
+
+def _world_xy(lat, lng):
+    """Web Mercator position of a point in [0, 1) x [0, 1)"""
+    lat = max(min(lat, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    x = (lng + 180.0) / 360.0
+    y = (1 - log(tan(radians(lat)) + 1 / cos(radians(lat))) / pi) / 2
+    return min(max(x, 0.0), 1 - 1e-12), min(max(y, 0.0), 1 - 1e-12)
+
+
+def _cells_per_side(zoom):
+    return (1 << zoom) * CELL_SUBDIVISIONS
+
+
+class ClusterIndex:
+    """Thread-safe per-zoom grid aggregates of (id, lat, lng, category) points"""
+
+    def __init__(self, max_zoom=CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        # One dict per zoom: (x, y) -> [count, lat_sum, lng_sum, id_sum, {category: count}]
+        self._levels = [{} for _ in range(max_zoom + 1)]
+        self._members = {}  # finest-level (x, y) -> set of ids
+        self._points = {}  # id -> (lat, lng, category)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _update(self, point_id, lat, lng, category, sign):
+        x, y = _world_xy(lat, lng)
+        side = _cells_per_side(self.max_zoom)
+        finest = (int(x * side), int(y * side))
+        # Each zoom level out halves the cells per side: its cell is the finest one shifted
+        for zoom, level in enumerate(self._levels):
+            shift = self.max_zoom - zoom
+            key = (finest[0] >> shift, finest[1] >> shift)
+            cell = level.get(key)
+            if cell is None:
+                cell = level[key] = [0, 0.0, 0.0, 0, {}]
+            cell[0] += sign
+            if not cell[0]:
+                del level[key]
+                continue
+            cell[1] += sign * lat
+            cell[2] += sign * lng
+            cell[3] += sign * point_id
+            categories = cell[4]
+            categories[category] = categories.get(category, 0) + sign
+            if not categories[category]:
+                del categories[category]
+        if sign > 0:
+            self._members.setdefault(finest, set()).add(point_id)
+        else:
+            members = self._members[finest]
+            members.discard(point_id)
+            if not members:
+                del self._members[finest]
+
+    def add(self, point_id, lat, lng, category=None):
+        with self._lock:
+            self.remove(point_id)
+            self._points[point_id] = (lat, lng, category)
+            self._update(point_id, lat, lng, category, 1)
+
+    def remove(self, point_id):
+        with self._lock:
+            point = self._points.pop(point_id, None)
+            if point is not None:
+                self._update(point_id, *point, -1)
+
+    def build(self, points):
+        """Replace every point with (id, lat, lng, category) tuples"""
+        with self._lock:
+            self._levels = [{} for _ in range(self.max_zoom + 1)]
+            self._members = {}
+            self._points = {}
+            for point_id, lat, lng, category in points:
+                if lat is not None and lng is not None:
+                    self.add(point_id, lat, lng, category)
+
+    @staticmethod
+    def _cluster(count, lat_sum, lng_sum, id_sum, categories):
+        cluster = {
+            'lat': round(lat_sum / count, 5),
+            'lng': round(lng_sum / count, 5),
+            'count': count,
+            'category': max(categories.items(), key=lambda item: (item[1], item[0] or ''))[0] if categories else None,
+        }
+        if count == 1:
+            # With a single member the ID sum is that member's ID
+            cluster['id'] = id_sum
+        return cluster
+
+    def _cell_range(self, zoom, bbox):
+        """Cell x and y ranges at this zoom covering bbox = (south, west, north, east)"""
+        south, west, north, east = bbox
+        side = _cells_per_side(zoom)
+        x0, y1 = _world_xy(south, west)
+        x1, y0 = _world_xy(north, east)
+        return range(int(x0 * side), int(x1 * side) + 1), range(int(y0 * side), int(y1 * side) + 1)
+
+    def _precomputed(self, zoom, bbox):
+        xs, ys = self._cell_range(zoom, bbox)
+        level = self._levels[zoom]
+        if len(xs) * len(ys) <= MAX_ENUMERATED_CELLS:
+            cells = ((key, level.get(key)) for key in ((x, y) for x in xs for y in ys))
+            return [self._cluster(*cell) for key, cell in cells if cell is not None]
+        return [self._cluster(*cell) for (x, y), cell in level.items() if x in xs and y in ys]
+
+    @staticmethod
+    def _viewport(zoom, bbox):
+        """bbox shrunk around its centre to at most MAX_VIEWPORT_TILES tiles per side"""
+        south, west, north, east = bbox
+        half_span = 360.0 * MAX_VIEWPORT_TILES / (1 << zoom) / 2
+        lat, lng = (south + north) / 2, (west + east) / 2
+        return (max(south, lat - half_span), max(west, lng - half_span),
+                min(north, lat + half_span), min(east, lng + half_span))
+
+    def _on_the_fly(self, zoom, bbox):
+        bbox = self._viewport(zoom, bbox)
+        xs, ys = self._cell_range(self.max_zoom, bbox)
+        south, west, north, east = bbox
+        if len(xs) * len(ys) <= MAX_ENUMERATED_CELLS:
+            keys = ((x, y) for x in xs for y in ys)
+            members = (self._members.get(key, ()) for key in keys)
+        else:
+            members = (ids for (x, y), ids in self._members.items() if x in xs and y in ys)
+        side = _cells_per_side(zoom)
+        cells = {}
+        for ids in members:
+            for point_id in ids:
+                lat, lng, category = self._points[point_id]
+                if not (south <= lat <= north and west <= lng <= east):
+                    continue
+                world_x, world_y = _world_xy(lat, lng)
+                key = (int(world_x * side), int(world_y * side))
+                cell = cells.get(key)
+                if cell is None:
+                    cell = cells[key] = [0, 0.0, 0.0, 0, {}]
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lng
+                cell[3] += point_id
+                cell[4][category] = cell[4].get(category, 0) + 1
+        return [self._cluster(*cell) for cell in cells.values()]
+
+    def clusters(self, bbox, zoom):
+        """Clusters overlapping bbox = (south, west, north, east) at a zoom level, largest first"""
+        south, west, north, east = bbox
+        if west > east:  # viewport crossing the antimeridian
+            return sorted(self.clusters((south, west, north, 180.0), zoom)
+                          + self.clusters((south, -180.0, north, east), zoom),
+                          key=lambda cluster: -cluster['count'])
+        zoom = max(int(zoom), 0)
+        with self._lock:
+            if zoom <= self.max_zoom:
+                found = self._precomputed(zoom, bbox)
+            else:
+                found = self._on_the_fly(zoom, bbox)
+        found.sort(key=lambda cluster: -cluster['count'])
+        return found
+
+
+def get_cluster_index(kind='location'):
+    """Cluster hierarchy of one kind of point for the current app, built on first use"""
+    indexes = current_app.extensions.setdefault('marker_clusters', {})
+    index = indexes.get(kind)
+    if index is None:
+        index = ClusterIndex(current_app.config.get('CLUSTER_MAX_ZOOM', CLUSTER_MAX_ZOOM))
+        index.build(SPATIAL_SOURCES[kind][2]())
+        indexes[kind] = index
+        register_spatial_hooks()
+    return index
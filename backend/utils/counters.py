@@ -0,0 +1,242 @@
+"""
+Atomic engagement counters for VieGo Blog
+Likes, shares, comment and reply counts are changed in SQL
+(UPDATE posts SET likes_count = likes_count + :d WHERE id = :id) instead of
+read-modify-write on ORM objects, so concurrent requests never lose updates
+and the row lock is only held for the single statement.
+
+The per-user counts (followers, following, published posts, approved
+comments) are adjusted the same way by a flush hook, whatever route wrote
+the follow, post or comment, and `flask --app main counters-reconcile`
+recomputes them in bulk.
+"""
+from contextlib import contextmanager
+
+import click
+from flask import g, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import case, event, func, inspect, select
+
+from models import db
+from models.comment import Comment
+from models.post import Post
+from models.social import UserFollow
+from models.user import User
+from utils.cache_invalidation import invalidate_on_commit
+from utils.trending import queue_engagement
+
+# entity name -> (table, counter columns that may be adjusted)
+COUNTER_COLUMNS = {
+    'post': ('posts', ('likes_count', 'shares_count', 'comments_count')),
+    'comment': ('comments', ('likes_count', 'replies_count')),
+    'user': ('users', ('followers_count', 'following_count', 'posts_count', 'comments_count')),
+}
+# Response cache tag of an entity when it differs from the entity name
+CACHE_TAG_PREFIXES = {'user': 'author'}
+
+
+def _counter_table(entity, columns):
+    if entity not in COUNTER_COLUMNS:
+        raise ValueError(f'Unknown counter entity: {entity}')
+    table_name, allowed = COUNTER_COLUMNS[entity]
+    for column in columns:
+        if column not in allowed:
+            raise ValueError(f'Unknown counter column for {entity}: {column}')
+    return db.metadata.tables[table_name]
+
+
+def _apply(entity, entity_id, deltas):
+    """One UPDATE for a row, adding each delta and clamping decrements at 0"""
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = _counter_table(entity, deltas)
+    values = {}
+    for column_name, delta in deltas.items():
+        new_value = func.coalesce(table.c[column_name], 0) + delta
+        values[column_name] = case((new_value < 0, 0), else_=new_value) if delta < 0 else new_value
+    # An engagement is not an edit: keep updated_at (and its onupdate hook) untouched
+    if 'updated_at' in table.c:
+        values['updated_at'] = table.c.updated_at
+    db.session.execute(table.update().where(table.c.id == entity_id).values(values))
+    # Core updates bypass the ORM flush hooks, so tag the row for the response cache
+    invalidate_on_commit(f'{CACHE_TAG_PREFIXES.get(entity, entity)}:{entity_id}')
+    if entity == 'post':
+        # Likes, comments and shares move the post's trending score once committed
+        for column_name, delta in deltas.items():
+            queue_engagement(entity_id, column_name, delta)
+
+
+class CounterBatch:
+    """Collects counter deltas and writes them with one UPDATE per row"""
+
+    def __init__(self):
+        self.deltas = {}
+
+    def add(self, entity, entity_id, column, delta):
+        _counter_table(entity, [column])
+        row = self.deltas.setdefault((entity, entity_id), {})
+        row[column] = row.get(column, 0) + delta
+
+    def apply(self):
+        deltas, self.deltas = self.deltas, {}
+        for (entity, entity_id), columns in deltas.items():
+            _apply(entity, entity_id, columns)
+
+
+def _current_batch():
+    return g.get('counter_batch') if has_app_context() else None
+
+
+@contextmanager
+def batched_counters():
+    """Group every counter change made inside the block for the current request
+
+    The batch is written when the block exits, so commit after it.
+    """
+    outer = _current_batch()
+    if outer is not None:
+        # Already batching: let the outermost block write everything
+        yield outer
+        return
+    batch = CounterBatch()
+    g.counter_batch = batch
+    try:
+        yield batch
+        batch.apply()
+    finally:
+        g.pop('counter_batch', None)
+
+
+def adjust_counter(entity, entity_id, column, delta):
+    """Add `delta` to a counter column, part of the current transaction"""
+    batch = _current_batch()
+    if batch is not None:
+        batch.add(entity, entity_id, column, delta)
+    else:
+        _apply(entity, entity_id, {column: delta})
+
+
+def increment_counter(entity, entity_id, column, amount=1):
+    adjust_counter(entity, entity_id, column, amount)
+
+
+def decrement_counter(entity, entity_id, column, amount=1):
+    """Decrement a counter, never going below 0"""
+    adjust_counter(entity, entity_id, column, -amount)
+
+
+def read_counter(entity, entity_id, column):
+    """Current value of a counter straight from the database"""
+    table = _counter_table(entity, [column])
+    value = db.session.execute(
+        select(table.c[column]).where(table.c.id == entity_id)
+    ).scalar()
+    return int(value or 0)
+
+
+# ============ USER COUNTS ============
+
+def _value(instance, key, committed):
+    """Attribute value before (committed=True) or after the pending changes"""
+    if not committed:
+        return getattr(instance, key)
+    state = inspect(instance)
+    history = state.attrs[key].history
+    if history.deleted or history.unchanged:
+        return (history.deleted or history.unchanged)[0]
+    if not history.added:
+        return getattr(instance, key)  # expired: loads the stored value
+    # Overwritten before it was ever loaded: ask the database
+    column = state.mapper.columns[key]
+    return db.session.execute(select(column).where(state.mapper.primary_key[0] == state.identity[0])).scalar()
+
+
+def _user_counts(instance, committed):
+    """[(user id, counter column)] a row contributes to in one of its states"""
+    if isinstance(instance, UserFollow):
+        return [(_value(instance, 'followed_id', committed), 'followers_count'),
+                (_value(instance, 'follower_id', committed), 'following_count')]
+    if isinstance(instance, Post):
+        if _value(instance, 'status', committed) == 'published':
+            return [(_value(instance, 'author_id', committed), 'posts_count')]
+    elif isinstance(instance, Comment):
+        # Comments are soft-deleted by leaving 'approved' (the column default)
+        if _value(instance, 'status', committed) in ('approved', None):
+            return [(_value(instance, 'author_id', committed), 'comments_count')]
+    return []
+
+
+def _count_users(session, flush_context, instances):
+    deltas = {}
+
+    def add(counts, delta):
+        for user_id, column in counts:
+            if user_id is not None:
+                row = deltas.setdefault(user_id, {})
+                row[column] = row.get(column, 0) + delta
+
+    for instance in session.new:
+        add(_user_counts(instance, committed=False), 1)
+    for instance in session.dirty:
+        if isinstance(instance, (Post, Comment)) and session.is_modified(instance, include_collections=False):
+            add(_user_counts(instance, committed=True), -1)
+            add(_user_counts(instance, committed=False), 1)
+    for instance in session.deleted:
+        add(_user_counts(instance, committed=True), -1)
+
+    for user_id, columns in deltas.items():
+        _apply('user', user_id, columns)
+
+
+def register_user_counter_hooks():
+    # before_flush: deleted rows can still be read, and the UPDATEs join the same transaction
+    if not event.contains(db.session, 'before_flush', _count_users):
+        event.listen(db.session, 'before_flush', _count_users)
+
+
+def _grouped_counts(column, user_ids, *criteria):
+    rows = db.session.query(column, func.count()).filter(column.in_(user_ids), *criteria).group_by(column)
+    return dict(rows.all())
+
+
+def reconcile_user_counters(batch_size=1000):
+    """Recompute every user's counts from the source tables; returns how many users changed"""
+    counters = {
+        'followers_count': lambda ids: _grouped_counts(UserFollow.followed_id, ids),
+        'following_count': lambda ids: _grouped_counts(UserFollow.follower_id, ids),
+        'posts_count': lambda ids: _grouped_counts(Post.author_id, ids, Post.status == 'published'),
+        'comments_count': lambda ids: _grouped_counts(Comment.author_id, ids, Comment.status == 'approved'),
+    }
+    table = db.metadata.tables['users']
+    changed = 0
+    last_id = 0
+    while True:
+        # One id range at a time: a few indexed GROUP BYs, short row locks
+        rows = db.session.execute(
+            select(table.c.id, *(table.c[column] for column in counters))
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        actual = {column: count(ids) for column, count in counters.items()}
+        for row in rows:
+            values = {column: actual[column].get(row.id, 0) for column in counters}
+            if any(getattr(row, column) != value for column, value in values.items()):
+                values['updated_at'] = table.c.updated_at
+                db.session.execute(table.update().where(table.c.id == row.id).values(values))
+                invalidate_on_commit(f'author:{row.id}')
+                changed += 1
+        db.session.commit()
+        last_id = ids[-1]
+    return changed
+
+
+@click.command('counters-reconcile')
+@click.option('--batch-size', default=1000, show_default=True, help='Users recomputed per transaction')
+@with_appcontext
+def counters_reconcile_command(batch_size):
+    """Recompute followers/following/posts/comments counts of every user"""
+    changed = reconcile_user_counters(batch_size)
+    click.echo(f"🔁 {changed} users had drifted counts and were corrected")
@@ -0,0 +1,96 @@
+"""
+Geographic helpers for VieGo Blog
+Great-circle distance, radius bounding boxes and geohash encoding used by
+the nearby search (utils/spatial_index.py) and the locations.geohash column.
+"""
+from math import radians, sin, cos, sqrt, atan2, floor, pi
+
+EARTH_RADIUS_KM = 6371
+# Must match EARTH_RADIUS_KM or radius boxes would cut off points near their edge
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * pi / 180
+
+GEOHASH_PRECISION = 9  # ~5 m cells, stored in locations.geohash
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance in km between two points using the Haversine formula"""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) containing every point within radius_km"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    max_abs_lat = abs(lat) + dlat
+    if max_abs_lat >= 90:
+        # The circle reaches a pole, where every longitude is within the radius
+        return max(lat - dlat, -90.0), -180.0, min(lat + dlat, 90.0), 180.0
+    dlng = radius_km / (KM_PER_DEGREE_LAT * cos(radians(max_abs_lat)))
+    if dlng >= 180:
+        return lat - dlat, -180.0, lat + dlat, 180.0
+    return lat - dlat, max(lng - dlng, -180.0), lat + dlat, min(lng + dlng, 180.0)
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Standard base-32 geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            bounds[0] = middle
+        else:
+            bits = bits * 2
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(lat degrees, lng degrees) covered by one geohash cell"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def geohash_cover(box, max_cells=16):
+    """
+    Geohash prefixes whose cells together cover a bounding box
+    Uses the longest precision that needs at most `max_cells` prefixes.
+    """
+    min_lat, min_lng, max_lat, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = geohash_cell_size(precision)
+        rows = floor(max_lat / lat_size) - floor(min_lat / lat_size) + 1
+        cols = floor(max_lng / lng_size) - floor(min_lng / lng_size) + 1
+        if rows * cols <= max_cells:
+            break
+    prefixes = set()
+    for row in range(rows):
+        lat = min(min_lat + row * lat_size, max_lat)
+        for col in range(cols):
+            lng = min(min_lng + col * lng_size, max_lng)
+            prefixes.add(geohash_encode(lat, lng, precision))
+    # Floating point stepping can stop just short of the far edge's cells
+    prefixes.add(geohash_encode(max_lat, max_lng, precision))
+    prefixes.add(geohash_encode(min_lat, max_lng, precision))
+    prefixes.add(geohash_encode(max_lat, min_lng, precision))
+    return sorted(prefixes)
@@ -0,0 +1,230 @@
+"""
+Vectorized geo computations for VieGo Blog
+Coordinates live in contiguous float64 NumPy arrays and distances for all
+candidates are computed in one pass instead of one math call per row.
+NumPy is optional: without it HAS_NUMPY is False, haversine_many falls
+back to plain Python and the spatial index uses its pure-Python grid.
+"""
+import threading
+
+from utils.geo import EARTH_RADIUS_KM, bounding_box, haversine_km
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover - exercised only without numpy installed
+    np = None
+    HAS_NUMPY = False
+
+MAX_SEARCH_RADIUS_KM = 20038  # half the earth's circumference: every point is within it
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """
+    Distances in km from one point (or paired points) to many points
+    Arguments broadcast like NumPy arrays. Returns an ndarray, or a list without NumPy.
+    """
+    if not HAS_NUMPY:
+        if isinstance(lat, (int, float)):
+            return [haversine_km(lat, lng, la, ln) for la, ln in zip(lats, lngs)]
+        return [haversine_km(a, b, c, d) for a, b, c, d in zip(lat, lng, lats, lngs)]
+
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64)) - np.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def path_legs(lats, lngs):
+    """Length in km of each leg of a path, 0 for the first stop"""
+    if len(lats) < 2:
+        return [0.0] * len(lats)
+    legs = haversine_many(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    return [0.0] + [float(leg) for leg in legs]
+
+
+def unit_vectors(lats, lngs):
+    """(x, y, z) of points on the unit sphere: chord length grows with great-circle distance"""
+    lat = np.radians(lats)
+    lng = np.radians(lngs)
+    cos_lat = np.cos(lat)
+    return cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)
+
+
+def chord_squared(radius_km):
+    """Squared unit-sphere chord of a great-circle distance"""
+    return (2 * np.sin(min(radius_km, MAX_SEARCH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))) ** 2
+
+
+class PointArrays:
+    """
+    Points in parallel contiguous arrays (id, lat, lng, category code, and
+    the unit vector x, y, z used to rank k-nearest candidates without trig)
+    Rows are updated in place; a removed row is filled with the last row,
+    so the arrays never need compacting. Requires NumPy.
+    """
+
+    COLUMNS = ('_ids', '_lats', '_lngs', '_categories', '_xs', '_ys', '_zs')
+
+    def __init__(self, capacity=1024):
+        if not HAS_NUMPY:
+            raise RuntimeError('PointArrays requires numpy')
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._lats = np.empty(capacity, dtype=np.float64)
+        self._lngs = np.empty(capacity, dtype=np.float64)
+        self._categories = np.empty(capacity, dtype=np.int16)
+        self._xs = np.empty(capacity, dtype=np.float64)
+        self._ys = np.empty(capacity, dtype=np.float64)
+        self._zs = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._rows = {}  # id -> row
+        self._category_codes = {None: 0}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def _category_code(self, category):
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._category_codes)
+        return code
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, point_id, lat, lng, category=None):
+        with self._lock:
+            row = self._rows.get(point_id)
+            if row is None:
+                self._grow(self._size + 1)
+                row = self._rows[point_id] = self._size
+                self._size += 1
+            self._ids[row] = point_id
+            self._lats[row] = lat
+            self._lngs[row] = lng
+            self._categories[row] = self._category_code(category)
+            self._xs[row], self._ys[row], self._zs[row] = unit_vectors(lat, lng)
+
+    def remove(self, point_id):
+        with self._lock:
+            row = self._rows.pop(point_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                for name in self.COLUMNS:
+                    values = getattr(self, name)
+                    values[row] = values[last]
+                self._rows[moved_id] = row
+            self._size = last
+
+    def build(self, points):
+        """Replace every point with (id, lat, lng, category) tuples in one go"""
+        points = [point for point in points if point[1] is not None and point[2] is not None]
+        with self._lock:
+            self._size = 0
+            self._rows = {}
+            self._grow(max(len(points), 1))
+            if points:
+                ids, lats, lngs, categories = zip(*points)
+                size = len(points)
+                self._ids[:size] = ids
+                self._lats[:size] = lats
+                self._lngs[:size] = lngs
+                self._categories[:size] = [self._category_code(category) for category in categories]
+                self._xs[:size], self._ys[:size], self._zs[:size] = unit_vectors(
+                    self._lats[:size], self._lngs[:size])
+                self._rows = {point_id: row for row, point_id in enumerate(ids)}
+                self._size = size
+
+    def within(self, lat, lng, radius_km, category=None):
+        """All (distance_km, id) within radius_km, nearest first"""
+        min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_km)
+        with self._lock:
+            size = self._size
+            lats = self._lats[:size]
+            lngs = self._lngs[:size]
+            mask = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+            if category:
+                code = self._category_codes.get(category)
+                if code is None:
+                    return []
+                mask &= self._categories[:size] == code
+            rows = np.flatnonzero(mask)
+            distances = haversine_many(lat, lng, lats[rows], lngs[rows])
+            ids = self._ids[rows]
+        keep = distances <= radius_km
+        distances = distances[keep]
+        ids = ids[keep]
+        order = np.lexsort((ids, distances))
+        return list(zip(distances[order].tolist(), ids[order].tolist()))
+
+    def _chords(self, point, lat, lng, radius_km, code):
+        """(rows, squared chords to point) of the rows in the radius' bounding box (all for None)"""
+        size = self._size
+        mask = None if code is None else self._categories[:size] == code
+        if radius_km is not None:
+            lats = self._lats[:size]
+            lngs = self._lngs[:size]
+            min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_km)
+            box = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+            mask = box if mask is None else mask & box
+        rows = np.arange(size) if mask is None else np.flatnonzero(mask)
+        x, y, z = point
+        chords = (self._xs[rows] - x) ** 2 + (self._ys[rows] - y) ** 2 + (self._zs[rows] - z) ** 2
+        return rows, chords
+
+    def nearest(self, lat, lng, k, max_radius_km=None, category=None, start_radius_km=5):
+        """
+        The k nearest (distance_km, id) within max_radius_km
+        Points in a start_radius_km box usually hold the answer (dense areas);
+        otherwise a single pass over every candidate (the max radius' box, or
+        all points). Candidates are ranked by chord length from the stored
+        unit vectors and only the k closest get a haversine distance.
+        """
+        limit = min(max_radius_km, MAX_SEARCH_RADIUS_KM) if max_radius_km is not None else MAX_SEARCH_RADIUS_KM
+        point = unit_vectors(lat, lng)
+        with self._lock:
+            if k <= 0 or not self._size:
+                return []
+            code = None
+            if category:
+                code = self._category_codes.get(category)
+                if code is None:
+                    return []
+            start = min(start_radius_km, limit)
+            rows, chords = self._chords(point, lat, lng, start, code)
+            if start < limit and np.count_nonzero(chords <= chord_squared(start)) < k:
+                rows, chords = self._chords(point, lat, lng, limit if limit < MAX_SEARCH_RADIUS_KM else None, code)
+            if len(rows) > k:
+                # Everything as close as the k-th point, so ties still break by ID
+                rows = rows[chords <= np.partition(chords, k - 1)[k - 1]]
+            distances = haversine_many(lat, lng, self._lats[rows], self._lngs[rows])
+            ids = self._ids[rows]
+        keep = distances <= limit
+        distances = distances[keep]
+        ids = ids[keep]
+        order = np.lexsort((ids, distances))[:k]
+        return list(zip(distances[order].tolist(), ids[order].tolist()))
+
+    def coordinates(self, point_ids):
+        """{id: (lat, lng)} for the given IDs that are present"""
+        with self._lock:
+            return {
+                point_id: (float(self._lats[row]), float(self._lngs[row]))
+                for point_id, row in ((point_id, self._rows.get(point_id)) for point_id in point_ids)
+                if row is not None
+            }
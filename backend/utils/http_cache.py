@@ -0,0 +1,80 @@
+"""
+HTTP conditional GET helpers for VieGo Blog
+Detail endpoints send a weak ETag and answer revalidation (If-None-Match)
+with an empty 304, so repeat visits and the frontend's revalidation skip
+serializing and sending the full body. Last-Modified is only for bodies
+that cannot change without their timestamp moving: counters and viewer
+flags (likes, ratings, is_liked) do not touch updated_at, so the post,
+tour and location details validate by ETag alone.
+"""
+import hashlib
+from datetime import timezone
+
+from flask import current_app, jsonify, request
+
+# Shared caches (CDN) may keep public detail pages this long, browsers always revalidate
+DEFAULT_SHARED_MAX_AGE = 60
+DEFAULT_STALE_WHILE_REVALIDATE = 300
+
+
+def weak_etag(*parts):
+    """Opaque ETag value derived from the given version parts"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    # HTTP dates have one second resolution
+    return value.replace(microsecond=0)
+
+
+def _not_modified(etag, last_modified):
+    """Evaluate the request's validators; If-None-Match wins over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _set_cache_headers(response, etag, last_modified, public):
+    config = current_app.config
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = config.get('DETAIL_CACHE_SHARED_MAX_AGE', DEFAULT_SHARED_MAX_AGE)
+        response.cache_control['stale-while-revalidate'] = str(config.get(
+            'DETAIL_CACHE_STALE_WHILE_REVALIDATE', DEFAULT_STALE_WHILE_REVALIDATE))
+    else:
+        # Personalised (is_liked, drafts...): only the user's browser may keep it
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    response.vary.add('Authorization')
+    return response
+
+
+def conditional_json(build_payload, etag_parts, last_modified=None, public=True):
+    """
+    Return a 304 when the client's copy is current, otherwise the JSON body
+    Args:
+        build_payload: Callable returning the response dict (not called on a 304)
+        etag_parts: Values that change whenever the body meaningfully changes
+        last_modified: Naive UTC datetime of the last content change; leave it
+            out when etag_parts cover anything that changes without it
+        public: Whether shared caches may store the response
+    """
+    etag = weak_etag(*etag_parts)
+    last_modified = _as_utc(last_modified)
+
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    return _set_cache_headers(response, etag, last_modified, public)
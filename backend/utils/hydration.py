@@ -0,0 +1,47 @@
+"""
+Author hydration helpers for VieGo Blog
+Loads the authors of a page of rows with a single IN query instead of
+one User.query.get per row
+"""
+from models.user import User
+from utils.images import responsive_image, small_image_url
+
+
+def load_users_by_id(user_ids):
+    """Load users for the given IDs with one query, returns {id: User}"""
+    ids = {user_id for user_id in user_ids if user_id is not None}
+    if not ids:
+        return {}
+    users = User.query.filter(User.id.in_(ids)).all()
+    return {user.id: user for user in users}
+
+
+def load_authors(rows, attr='author_id'):
+    """Load the authors referenced by `attr` on every row of a page"""
+    return load_users_by_id(getattr(row, attr) for row in rows)
+
+
+def compact_author(user):
+    """Compact author dict embedded in post listings"""
+    if not user:
+        return None
+    return {
+        'id': user.id,
+        'username': user.username,
+        'full_name': user.full_name,
+        # Uploaded avatars are listed through their small variant once it is built
+        'avatar_url': small_image_url(user.avatar_url, 'small')
+    }
+
+
+def serialize_posts(posts, include_content=False):
+    """Serialize a page of posts with their authors attached"""
+    authors = load_authors(posts)
+    posts_data = []
+    for post in posts:
+        post_dict = post.to_dict(include_content=include_content)
+        post_dict['author'] = compact_author(authors.get(post.author_id))
+        # Thumbnail + srcset for uploaded featured images, so lists skip the originals
+        post_dict['featured_image_variants'] = responsive_image(post.featured_image)
+        posts_data.append(post_dict)
+    return posts_data
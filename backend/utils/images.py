@@ -0,0 +1,302 @@
+"""
+Image pipeline for VieGo Blog uploads
+An upload is stored in two steps:
+- store_original() only reads the header: it validates the file, drops the
+  EXIF/XMP/IPTC metadata (camera, GPS...) losslessly at the byte level and
+  writes the original, so its URL works as soon as the request returns
+- build_variants() decodes it once, applies the orientation and downscales
+  step by step into the configured variants; every variant is written in its
+  family (JPEG, or PNG when it has transparency) and as WebP, then a small
+  JSON manifest next to the original records them for srcset lookups
+build_variants() is CPU-bound and runs in the upload job pool (utils/jobs.py).
+Originals live in the content-addressed store (utils/blob_store.py) under the
+SHA-256 of the uploaded bytes, with their variants next to them, so the same
+bytes always map to the same files whoever uploads them and wherever they are
+used (post image, avatar, ...).
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils.blob_store import blob_folder, blob_url_prefix, save_bytes
+
+# name -> longest edge in pixels; one set for every image so duplicates share them
+IMAGE_VARIANTS = {'small': 96, 'thumb': 320, 'medium': 800, 'large': 1600}
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Pillow format -> extension of the stored original
+ORIGINAL_EXTENSIONS = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+_SAVE_OPTIONS = {
+    'JPEG': {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': WEBP_QUALITY, 'method': 4},
+}
+EXIF_ORIENTATION = 0x0112
+
+MANIFEST_CACHE_SIZE = 10000
+_manifests = {}  # manifest path -> manifest; manifests never change once written
+
+
+def content_stem(data):
+    """Content address of uploaded bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+# ============ LOSSLESS METADATA STRIPPING ============
+
+def _strip_jpeg(data, orientation):
+    """Drop APP1 (EXIF/XMP), APP13 (IPTC) and comments; keep a bare orientation tag"""
+    kept = []
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # start of scan: the rest is image data
+            break
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker not in (0xE1, 0xED, 0xFE):
+            kept.append(data[pos:pos + 2 + length])
+        pos += 2 + length
+    if orientation and orientation != 1:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        payload = exif.tobytes()
+        app1 = b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+        # JFIF wants its APP0 segment first
+        kept.insert(1 if kept and kept[0][1] == 0xE0 else 0, app1)
+    return b'\xff\xd8' + b''.join(kept) + data[pos:]
+
+
+def _strip_png(data):
+    """Drop the eXIf, text and timestamp chunks"""
+    kept = [data[:8]]
+    pos = 8
+    while pos + 8 <= len(data):
+        length = struct.unpack('>I', data[pos:pos + 4])[0]
+        chunk_type = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if chunk_type not in (b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'):
+            kept.append(data[pos:end])
+        pos = end
+    return b''.join(kept)
+
+
+def _strip_webp(data):
+    """Drop the EXIF and XMP chunks and clear their VP8X flags"""
+    kept = []
+    pos = 12
+    while pos + 8 <= len(data):
+        fourcc = data[pos:pos + 4]
+        size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        end = pos + 8 + size + (size & 1)
+        chunk = data[pos:end]
+        if fourcc == b'VP8X':
+            chunk = chunk[:8] + bytes([chunk[8] & ~0x0C]) + chunk[9:]
+        if fourcc not in (b'EXIF', b'XMP '):
+            kept.append(chunk)
+        pos = end
+    body = b'WEBP' + b''.join(kept)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def _strip_metadata(data, image_format, orientation):
+    if image_format in ('JPEG', 'MPO'):
+        return _strip_jpeg(data, orientation)
+    if image_format == 'PNG':
+        return _strip_png(data)
+    if image_format == 'WEBP':
+        return _strip_webp(data)
+    return data
+
+
+# ============ PIPELINE ============
+
+def _write_bytes(path, data):
+    """
+    Write to a temporary file and rename, so readers never see half a file
+    The temp name is unique: two jobs for the same digest (the same bytes
+    uploaded twice at once) write the same variants side by side.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_image(image, path, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **_SAVE_OPTIONS[image_format])
+    _write_bytes(path, buffer.getvalue())
+    return buffer.tell()
+
+
+def store_original(data, digest=None):
+    """
+    Validate uploaded image bytes from their header and store them without metadata
+    `digest` is the SHA-256 of data when the caller already hashed it while streaming.
+    Returns {url, filename, digest, ext, size, width, height}; raises
+    UnidentifiedImageError for anything that is not a JPEG, PNG, GIF or WebP image.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image_format = source.format
+        if image_format not in ORIGINAL_EXTENSIONS:
+            raise UnidentifiedImageError(f'Unsupported image format {image_format}')
+        width, height = source.size
+        orientation = source.getexif().get(EXIF_ORIENTATION) if image_format in ('JPEG', 'MPO') else None
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+
+    # Addressed by the bytes as uploaded, so a re-upload is found before stripping
+    digest = digest or content_stem(data)
+    ext = ORIGINAL_EXTENSIONS[image_format]
+    path = os.path.join(blob_folder(digest), f'{digest}.{ext}')
+    if not os.path.exists(path):
+        save_bytes(_strip_metadata(data, image_format, orientation), ext, digest)
+    return {
+        'url': f'{blob_url_prefix(digest)}/{digest}.{ext}',
+        'filename': f'{digest}.{ext}',
+        'digest': digest,
+        'ext': ext,
+        'size': os.path.getsize(path),
+        'width': width,
+        'height': height,
+    }
+
+
+def build_variants(folder, url_prefix, filename, variants=IMAGE_VARIANTS):
+    """
+    Decode a stored original once and write its resized JPEG/PNG + WebP variants
+    Returns the manifest (original fields, variants, srcset, webp_srcset).
+    Runs in a worker process: arguments and result are plain picklable values.
+    """
+    stem = filename.rsplit('.', 1)[0]
+    manifest_path = _manifest_path(folder, stem)
+    existing = _read_manifest(manifest_path)
+    if existing is not None:
+        return existing
+
+    path = os.path.join(folder, filename)
+    with Image.open(path) as source:
+        animated = getattr(source, 'is_animated', False) and source.format != 'MPO'
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    manifest = {
+        'url': f'{url_prefix}/{filename}',
+        'filename': filename,
+        'size': os.path.getsize(path),
+        'width': image.width,
+        'height': image.height,
+        'variants': {},
+    }
+
+    # Animated GIF/WebP keep every frame as uploaded, without variants
+    if not animated:
+        alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if alpha else 'RGB')
+        family, family_ext = ('PNG', 'png') if alpha else ('JPEG', 'jpg')
+        # Largest first, each variant resized from the previous one instead of the full image
+        current = image
+        for name, edge in sorted(variants.items(), key=lambda item: -item[1]):
+            if max(image.size) <= edge:
+                continue
+            current = current.copy()
+            current.thumbnail((edge, edge), Image.LANCZOS)
+            manifest['variants'][name] = {
+                'url': f'{url_prefix}/{stem}_{name}.{family_ext}',
+                'webp': f'{url_prefix}/{stem}_{name}.webp',
+                'width': current.width,
+                'height': current.height,
+                'size': _write_image(current, os.path.join(folder, f'{stem}_{name}.{family_ext}'), family),
+                'webp_size': _write_image(current, os.path.join(folder, f'{stem}_{name}.webp'), 'WEBP'),
+            }
+
+    manifest.update(srcset_for(manifest))
+    _write_bytes(manifest_path, json.dumps(manifest).encode())
+    return manifest
+
+
+def srcset_for(manifest):
+    """srcset strings (original format and WebP) for a manifest, smallest first"""
+    variants = sorted(manifest['variants'].values(), key=lambda variant: variant['width'])
+    srcset = [f"{variant['url']} {variant['width']}w" for variant in variants]
+    webp_srcset = [f"{variant['webp']} {variant['width']}w" for variant in variants]
+    srcset.append(f"{manifest['url']} {manifest['width']}w")
+    return {'srcset': ', '.join(srcset), 'webp_srcset': ', '.join(webp_srcset) or None}
+
+
+# ============ LOOKUPS ============
+
+def _manifest_path(folder, stem):
+    return os.path.join(folder, f'{stem}.json')
+
+
+def _read_manifest(path):
+    manifest = _manifests.get(path)
+    if manifest is None and os.path.exists(path):
+        with open(path) as source:
+            manifest = json.load(source)
+        if len(_manifests) >= MANIFEST_CACHE_SIZE:
+            _manifests.clear()
+        _manifests[path] = manifest
+    return manifest
+
+
+def forget_manifest(url):
+    """Drop the cached manifest of a deleted upload"""
+    relative = url[len('/uploads/'):]
+    folder, _, filename = relative.rpartition('/')
+    stem = filename.rsplit('.', 1)[0]
+    _manifests.pop(_manifest_path(os.path.join(current_app.config['UPLOAD_FOLDER'], folder), stem), None)
+
+
+def image_variants(url):
+    """
+    Manifest of an uploaded image URL (/uploads/<folder>/<stem>.<ext>), or None
+    External images and images whose variants are still being built have none.
+    """
+    if not url or not url.startswith('/uploads/'):
+        return None
+    relative = url[len('/uploads/'):]
+    folder, _, filename = relative.rpartition('/')
+    stem = filename.rsplit('.', 1)[0]
+    if not folder or not stem or '..' in relative:
+        return None
+    return _read_manifest(_manifest_path(os.path.join(current_app.config['UPLOAD_FOLDER'], folder), stem))
+
+
+def responsive_image(url):
+    """Compact srcset payload for list views: {url, thumb, width, height, srcset, webp_srcset} or None"""
+    manifest = image_variants(url)
+    if manifest is None:
+        return None
+    thumb = manifest['variants'].get('thumb')
+    return {
+        'url': manifest['url'],
+        'thumb': thumb['webp'] if thumb else manifest['url'],
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'srcset': manifest['srcset'],
+        'webp_srcset': manifest['webp_srcset'],
+    }
+
+
+def small_image_url(url, variant='thumb'):
+    """URL of a built variant of an uploaded image, else the URL itself"""
+    manifest = image_variants(url)
+    found = manifest and manifest['variants'].get(variant)
+    return found['url'] if found else url
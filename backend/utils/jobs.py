@@ -0,0 +1,226 @@
+"""
+Background jobs for VieGo Blog
+CPU-bound work (image decoding/encoding for uploads) runs in a
+concurrent.futures process pool so it never blocks a request thread. Jobs are
+tracked in memory with their status, attempts and result; a failed attempt is
+retried with a growing delay, and the number of unfinished jobs is bounded:
+submit() raises JobQueueFull so routes can answer 429 instead of queueing
+without limit. With UPLOAD_JOB_WORKERS=0 jobs run inline (tests, debugging).
+"""
+import atexit
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 100
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_DELAY = 1.0  # seconds, doubled on every retry
+FINISHED_JOB_TTL = 3600  # finished jobs are forgotten after an hour
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds max_pending unfinished jobs"""
+
+
+class Job:
+    __slots__ = ('id', 'kind', 'owner', 'status', 'attempts', 'result', 'error',
+                 'created_at', 'finished_at', 'fn', 'args', 'future')
+
+    def __init__(self, kind, owner, fn, args):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = 'queued'  # queued (running once a worker has it) -> done | failed
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.fn = fn
+        self.args = args
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        status = self.status
+        if status == 'queued' and self.future is not None and self.future.running():
+            status = 'running'
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': status,
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """Bounded job queue over a process pool (or inline when workers is 0)"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 max_retries=DEFAULT_MAX_RETRIES, retry_delay=DEFAULT_RETRY_DELAY):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._executor = None
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.RLock()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def free_slots(self):
+        with self._lock:
+            return self.max_pending - self._pending
+
+    def submit(self, kind, fn, *args, owner=None):
+        """Queue fn(*args); fn and args must be picklable when a process pool is used"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f'{self._pending} jobs pending')
+            self._prune()
+            job = Job(kind, owner, fn, args)
+            self._jobs[job.id] = job
+            self._pending += 1
+        self._start(job)
+        return job
+
+    def _start(self, job):
+        job.attempts += 1
+        if not self.workers:
+            job.status = 'running'
+            try:
+                result = job.fn(*job.args)
+            except Exception as e:
+                self._failed(job, e)
+            else:
+                self._succeeded(job, result)
+            return
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(job.fn, *job.args)
+        except Exception as e:
+            # A broken or shut down pool: never leak the slot, and never raise
+            # from a retry timer's thread where nothing would see it
+            if executor is not None:
+                self._discard_executor(executor)
+            self._failed(job, e)
+            return
+        job.future = future
+        future.add_done_callback(lambda done: self._on_done(job, done, executor))
+
+    def _discard_executor(self, executor):
+        """A worker died (e.g. out of memory) or the pool was shut down: the next submit starts a fresh pool"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _on_done(self, job, future, executor):
+        error = future.exception()
+        if error is None:
+            self._succeeded(job, future.result())
+        else:
+            if isinstance(error, BrokenProcessPool):
+                self._discard_executor(executor)
+            self._failed(job, error)
+
+    def _succeeded(self, job, result):
+        with self._lock:
+            job.future = None
+            job.status = 'done'
+            job.result = result
+            job.error = None
+            job.finished_at = time.time()
+            self._pending -= 1
+            self.completed += 1
+
+    def _failed(self, job, error):
+        job.future = None
+        job.error = f'{type(error).__name__}: {error}'
+        if job.attempts <= self.max_retries:
+            with self._lock:
+                self.retried += 1
+            job.status = 'queued'
+            delay = self.retry_delay * 2 ** (job.attempts - 1) if self.workers else 0
+            if delay > 0:
+                timer = threading.Timer(delay, self._start, args=(job,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._start(job)
+            return
+        with self._lock:
+            job.status = 'failed'
+            job.finished_at = time.time()
+            self._pending -= 1
+            self.failed += 1
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_TTL
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'workers': self.workers,
+                'completed': self.completed,
+                'failed': self.failed,
+                'retried': self.retried
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def init_job_queue(app):
+    """Create the app's upload job queue; worker processes start with the first job"""
+    queue = JobQueue(
+        workers=app.config.get('UPLOAD_JOB_WORKERS', DEFAULT_WORKERS),
+        max_pending=app.config.get('UPLOAD_JOB_MAX_PENDING', DEFAULT_MAX_PENDING),
+        max_retries=app.config.get('UPLOAD_JOB_MAX_RETRIES', DEFAULT_MAX_RETRIES),
+        retry_delay=app.config.get('UPLOAD_JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    )
+    app.extensions['job_queue'] = queue
+    atexit.register(queue.shutdown)
+    return queue
+
+
+def get_job_queue():
+    """Job queue of the current app, created on first use"""
+    queue = current_app.extensions.get('job_queue')
+    if queue is None:
+        queue = init_job_queue(current_app._get_current_object())
+    return queue
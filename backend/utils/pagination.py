@@ -0,0 +1,82 @@
+"""
+Keyset (cursor) pagination for VieGo Blog
+Pages are fetched with WHERE (sort_key, id) < (last_sort_key, last_id)
+ORDER BY sort_key DESC, id DESC LIMIT n+1 instead of COUNT(*) + OFFSET,
+so every page of an infinite scroll costs the same no matter how deep it is.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque, URL-safe cursor for the position after a row"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, row_id) from a cursor (sort keys are datetimes or NULL)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        if not isinstance(row_id, int):
+            raise TypeError(row_id)
+        return sort_value, row_id
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def wants_cursor(args):
+    """Cursor mode is opt-in: any request carrying ?cursor= (even empty) uses it"""
+    return 'cursor' in args
+
+
+class KeysetPage:
+    """One page of a keyset query"""
+
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def keyset_paginate(query, sort_column, id_column, cursor, per_page):
+    """
+    Newest-first page of `query` after `cursor` (None or '' for the first page)
+    NULL sort keys sort last, as they do for DESC on MySQL and SQLite.
+    """
+    per_page = max(1, per_page)
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if sort_value is None:
+            query = query.filter(sort_column.is_(None), id_column < row_id)
+        else:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+
+    query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return KeysetPage(items, next_cursor, per_page)
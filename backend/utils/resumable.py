@@ -0,0 +1,253 @@
+"""
+Resumable video uploads for VieGo Blog (tus-style)
+A client creates an upload session with the final size, sends the file as
+PATCH requests of at most RESUMABLE_MAX_CHUNK bytes at the offset the server
+reports, asks for that offset again (HEAD) after a dropped connection, and
+finalizes once every byte arrived. No request holds a worker for longer than
+one chunk takes to arrive.
+
+Sessions live under UPLOAD_FOLDER/videos/resumable as <id>.part (the bytes,
+written in place at their offset) and <id>.json (owner, size, confirmed
+offset). A chunk may carry an `Upload-Checksum: sha256 <base64>` header; a
+mismatch cuts the file back to the previous offset. Finalizing renames the
+.part file into the content-addressed store (utils/blob_store.py), so the
+video is never copied. Sessions untouched for RESUMABLE_UPLOAD_TTL hours are
+deleted.
+"""
+import base64
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask import current_app
+
+from utils.blob_store import CHUNK_SIZE, blob_relative_path
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_CHUNK = 8 * 1024 * 1024
+EXPIRY_SWEEP_INTERVAL = 600  # seconds between sweeps triggered by new sessions
+CHECKSUM_ALGORITHMS = {'sha256': hashlib.sha256, 'sha1': hashlib.sha1, 'md5': hashlib.md5}
+
+_locks = {}  # upload id -> lock serialising its PATCH/finalize requests
+_locks_guard = threading.Lock()
+_hashes = {}  # upload id -> (offset, running SHA-256 of the bytes before it)
+_last_sweep = [0.0]
+
+
+class UploadSessionError(Exception):
+    """Request that does not fit the session; `status` is the HTTP status to answer"""
+
+    def __init__(self, message, status, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def sessions_folder():
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', 'resumable')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _paths(upload_id):
+    base = os.path.join(sessions_folder(), upload_id)
+    return f'{base}.part', f'{base}.json'
+
+
+def _lock(upload_id):
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _ttl_seconds():
+    return current_app.config.get('RESUMABLE_UPLOAD_TTL', DEFAULT_TTL_HOURS) * 3600
+
+
+def _save(session):
+    _, meta_path = _paths(session['id'])
+    tmp_path = f'{meta_path}.tmp'
+    with open(tmp_path, 'w') as out:
+        json.dump(session, out)
+    os.replace(tmp_path, meta_path)
+
+
+def expires_at(session):
+    return session['updated_at'] + _ttl_seconds()
+
+
+def create_session(owner, filename, ext, size):
+    """Start an upload of `size` bytes; returns the session"""
+    if time.time() - _last_sweep[0] > EXPIRY_SWEEP_INTERVAL:
+        expire_sessions()
+    now = time.time()
+    session = {
+        'id': secrets.token_hex(16),
+        'owner': str(owner),
+        'filename': filename,
+        'ext': ext,
+        'size': size,
+        'offset': 0,
+        'created_at': now,
+        'updated_at': now,
+    }
+    part_path, _ = _paths(session['id'])
+    open(part_path, 'wb').close()
+    _save(session)
+    return session
+
+
+def _load(upload_id):
+    _, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def get_session(upload_id, owner):
+    """Session of `owner`, or None when unknown, someone else's or expired"""
+    session = _load(upload_id) if upload_id.isalnum() else None
+    if session is None or session['owner'] != str(owner):
+        return None
+    if expires_at(session) < time.time():
+        delete_session(upload_id)
+        return None
+    return session
+
+
+def delete_session(upload_id):
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+    _hashes.pop(upload_id, None)
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+
+
+def _parse_checksum(header):
+    """'sha256 <base64 digest>' -> (hash constructor, digest bytes)"""
+    algorithm, _, encoded = header.strip().partition(' ')
+    constructor = CHECKSUM_ALGORITHMS.get(algorithm.lower())
+    if constructor is None:
+        raise UploadSessionError('Thuật toán checksum không được hỗ trợ', 400)
+    try:
+        return constructor, base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise UploadSessionError('Checksum không hợp lệ', 400)
+
+
+def append_chunk(session, offset, stream, length, checksum=None):
+    """
+    Write one PATCH body at `offset`; returns the updated session
+    Raises UploadSessionError: 409 when offset is not the session's, 413 when
+    the chunk is too large or runs past the declared size, 460 on a checksum
+    mismatch (the chunk is dropped) and 400 when the body was cut short.
+    """
+    max_chunk = current_app.config.get('RESUMABLE_MAX_CHUNK', DEFAULT_MAX_CHUNK)
+    expected = _parse_checksum(checksum) if checksum else None
+    with _lock(session['id']):
+        # Another request may have moved the offset while this one waited
+        session = _load(session['id'])
+        if session is None:
+            raise UploadSessionError('Không tìm thấy phiên upload', 404)
+        part_path, _ = _paths(session['id'])
+        if offset != session['offset']:
+            raise UploadSessionError('Upload-Offset không khớp', 409, session['offset'])
+        if length > max_chunk:
+            raise UploadSessionError(f'Mỗi phần tối đa {max_chunk} bytes', 413, session['offset'])
+        if offset + length > session['size']:
+            raise UploadSessionError('Dữ liệu vượt quá kích thước đã khai báo', 413, session['offset'])
+
+        chunk_hash = expected[0]() if expected else None
+        running = _hashes.get(session['id'])
+        if offset == 0:
+            file_hash = hashlib.sha256()
+        else:
+            file_hash = running[1].copy() if running and running[0] == offset else None
+        received = 0
+        with open(part_path, 'r+b') as out:
+            # Bytes past the confirmed offset come from an interrupted request
+            out.truncate(offset)
+            out.seek(offset)
+            while received < length:
+                chunk = stream.read(min(CHUNK_SIZE, length - received))
+                if not chunk:
+                    break
+                out.write(chunk)
+                received += len(chunk)
+                if chunk_hash is not None:
+                    chunk_hash.update(chunk)
+                if file_hash is not None:
+                    file_hash.update(chunk)
+            if received < length:
+                out.truncate(offset)
+                raise UploadSessionError('Phần dữ liệu bị gián đoạn', 400, offset)
+            if chunk_hash is not None and chunk_hash.digest() != expected[1]:
+                out.truncate(offset)
+                raise UploadSessionError('Checksum không khớp', 460, offset)
+
+        session['offset'] = offset + received
+        session['updated_at'] = time.time()
+        _save(session)
+        if file_hash is not None:
+            _hashes[session['id']] = (session['offset'], file_hash)
+        else:
+            _hashes.pop(session['id'], None)
+        return session
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+
+def finalize_session(session, checksum=None):
+    """
+    Move a complete upload into the content-addressed store without copying it
+    `checksum` is the client's SHA-256 (hex) of the whole file, checked when given.
+    Returns (digest, relative path, size); the session is gone afterwards.
+    """
+    with _lock(session['id']):
+        session = _load(session['id'])
+        if session is None:
+            raise UploadSessionError('Không tìm thấy phiên upload', 404)
+        if session['offset'] != session['size']:
+            raise UploadSessionError('Upload chưa hoàn tất', 409, session['offset'])
+        part_path, _ = _paths(session['id'])
+        running = _hashes.get(session['id'])
+        # Hashed while the chunks arrived, unless the process restarted in between
+        file_hash = running[1] if running and running[0] == session['size'] else _hash_file(part_path)
+        digest = file_hash.hexdigest()
+        if checksum and checksum.lower() != digest:
+            raise UploadSessionError('Checksum không khớp', 460, session['offset'])
+        relative = blob_relative_path(digest, session['ext'])
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(part_path, path)
+    delete_session(session['id'])
+    return digest, relative, session['size']
+
+
+def expire_sessions():
+    """Delete sessions idle for longer than RESUMABLE_UPLOAD_TTL; returns how many"""
+    _last_sweep[0] = time.time()
+    folder = sessions_folder()
+    cutoff = time.time() - _ttl_seconds()
+    expired = set()
+    for name in os.listdir(folder):
+        upload_id, _, ext = name.partition('.')
+        # The metadata is rewritten by every chunk; a .part without one is left over
+        if ext == 'json' or (ext == 'part' and not os.path.exists(os.path.join(folder, f'{upload_id}.json'))):
+            if os.path.getmtime(os.path.join(folder, name)) < cutoff:
+                expired.add(upload_id)
+    for upload_id in expired:
+        delete_session(upload_id)
+    return len(expired)
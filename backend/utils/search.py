@@ -0,0 +1,117 @@
+"""
+Full-text search service for VieGo Blog
+Builds search filters for posts, locations, tours, users and comments.
+On MySQL it uses the FULLTEXT indexes from schema.sql with
+MATCH ... AGAINST (natural-language or boolean mode) and ranks by relevance;
+elsewhere (SQLite in tests) or for terms too short to be indexed it falls
+back to an escaped LIKE scan.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.dialects.mysql import match
+
+from models import db
+from models.post import Post
+from models.location import Location
+from models.tour import Tour
+from models.user import User
+from models.comment import Comment
+
+# InnoDB ignores tokens shorter than innodb_ft_min_token_size (3 by default)
+DEFAULT_MIN_TOKEN_SIZE = 3
+
+# Characters that make a query a boolean-mode query (+required -excluded "phrase" prefix*)
+BOOLEAN_OPERATORS = re.compile(r'(^|\s)[+\-~<>]|["*()]')
+
+
+class SearchSpec:
+    """Columns searched for one entity"""
+
+    def __init__(self, model, fulltext_columns, like_columns):
+        self.model = model
+        # Must match a FULLTEXT index definition exactly (None: no index, always LIKE)
+        self.fulltext_columns = fulltext_columns
+        self.like_columns = like_columns
+
+
+SEARCHABLE = {
+    # schema.sql: FULLTEXT idx_content (title, content, excerpt)
+    'post': SearchSpec(Post, (Post.title, Post.content, Post.excerpt),
+                       (Post.title, Post.content, Post.excerpt)),
+    # schema.sql: idx_locations_search (name, description, address)
+    'location': SearchSpec(Location, (Location.name, Location.description, Location.address),
+                           (Location.name, Location.description, Location.address)),
+    # schema.sql: idx_tours_search (title, description, starting_location)
+    'tour': SearchSpec(Tour, (Tour.title, Tour.description, Tour.starting_location),
+                       (Tour.title, Tour.description, Tour.starting_location)),
+    'user': SearchSpec(User, None, (User.username, User.email, User.full_name)),
+    'comment': SearchSpec(Comment, None, (Comment.content,)),
+}
+
+
+def _fulltext_enabled():
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'like':
+        return False
+    if backend == 'fulltext':
+        return True
+    return db.engine.dialect.name in ('mysql', 'mariadb')
+
+
+def _indexable(terms):
+    """True when at least one word is long enough to be in the FULLTEXT index"""
+    min_size = current_app.config.get('SEARCH_FULLTEXT_MIN_TOKEN_SIZE', DEFAULT_MIN_TOKEN_SIZE)
+    return any(len(word.strip('+-~<>"*()')) >= min_size for word in terms.split())
+
+
+def resolve_mode(terms, mode=None):
+    """'boolean' when asked for or when the query uses boolean operators, else 'natural'"""
+    if mode in ('natural', 'boolean'):
+        return mode
+    return 'boolean' if BOOLEAN_OPERATORS.search(terms) else 'natural'
+
+
+class SearchClause:
+    """Filter for a search plus its relevance score (None for LIKE scans)"""
+
+    def __init__(self, criterion, relevance=None, mode='like'):
+        self.criterion = criterion
+        self.relevance = relevance
+        self.mode = mode
+
+    @property
+    def ranked(self):
+        return self.relevance is not None
+
+
+def build_search(entity, terms, mode=None):
+    """Return the SearchClause matching `terms` for an entity ('post', 'location', ...)"""
+    spec = SEARCHABLE[entity]
+    terms = (terms or '').strip()
+
+    if spec.fulltext_columns and _fulltext_enabled() and _indexable(terms):
+        mode = resolve_mode(terms, mode)
+        expression = match(*spec.fulltext_columns, against=terms)
+        if mode == 'boolean':
+            expression = expression.in_boolean_mode()
+        else:
+            expression = expression.in_natural_language_mode()
+        # MATCH in WHERE uses the index; the same expression in ORDER BY is the score
+        return SearchClause(expression, relevance=expression, mode=mode)
+
+    criterion = or_(*(column.contains(terms, autoescape=True) for column in spec.like_columns))
+    return SearchClause(criterion)
+
+
+def apply_search(query, entity, terms, mode=None, rank=True):
+    """
+    Filter `query` by a search and, when ranked, order it by relevance
+    Callers add their own ordering afterwards as a tie-breaker.
+    """
+    clause = build_search(entity, terms, mode)
+    query = query.filter(clause.criterion)
+    if rank and clause.ranked:
+        query = query.order_by(clause.relevance.desc())
+    return query
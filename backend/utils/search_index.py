@@ -0,0 +1,613 @@
+"""
+In-process search index for VieGo Blog
+An inverted index over posts, locations and tours, ranked with BM25.
+Tokens are accent-folded the same way slugs are, so "ha long" finds
+"Hạ Long". The index is updated incrementally from session commit hooks,
+saved as a compressed snapshot, and loaded and reconciled with the
+database by a background thread, never by a request.
+"""
+import atexit
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db
+from models.post import Post
+from models.location import Location
+from models.tour import Tour
+from utils.text import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'VGSI'
+SNAPSHOT_VERSION = 3  # bumped whenever tokenization or the layout changes
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Matches in a title count more than matches deep in the body
+FIELD_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'excerpt': 1.5, 'body': 1.0}
+
+DEFAULT_REFRESH_INTERVAL = 300  # seconds between reconciliations with the database
+TOMBSTONE = -1  # doc ID of a removed posting
+COMPACT_RATIO = 0.125  # share of tombstones at which a term's postings are rewritten
+
+
+def tokenize(text):
+    """Accent-folded lowercase word tokens"""
+    return TOKEN_PATTERN.findall(fold_vietnamese(text))
+
+
+# ============ DOCUMENT SOURCES ============
+
+def _post_fields(post):
+    if post.status != 'published':
+        return None
+    try:
+        tags = ' '.join(post.get_tags())
+    except (TypeError, ValueError):
+        tags = ''
+    return {'title': post.title, 'tags': tags, 'excerpt': post.excerpt, 'body': post.content}
+
+
+def _location_fields(location):
+    if location.status not in (None, 'active'):
+        return None
+    return {'title': location.name, 'body': location.description}
+
+
+def _tour_fields(tour):
+    if tour.status not in ('published', 'active'):
+        return None
+    return {'title': tour.title, 'body': tour.description}
+
+
+# entity name -> (model, function returning indexed fields or None to drop the document)
+INDEXED_MODELS = {
+    'post': (Post, _post_fields),
+    'location': (Location, _location_fields),
+    'tour': (Tour, _tour_fields),
+}
+_ENTITY_BY_MODEL = {model: entity for entity, (model, _) in INDEXED_MODELS.items()}
+
+
+def document_for(instance, deleted=False):
+    """(entity, id, fields or None) for an indexed model instance, else None"""
+    entity = _ENTITY_BY_MODEL.get(type(instance))
+    if entity is None:
+        return None
+    fields = None if deleted else INDEXED_MODELS[entity][1](instance)
+    return entity, instance.id, fields
+
+
+# ============ INDEX ============
+
+class _EntityIndex:
+    """
+    Postings and document lengths for one entity type (BM25 statistics are per entity)
+    Postings are parallel array('i') / array('f') per term rather than dicts:
+    100k posts produce ~20M postings, which only fit in memory this way.
+    Removing a document overwrites its postings with a tombstone (-1) at
+    positions remembered per document, so re-indexing a post costs O(its
+    terms) however common they are; compact() squeezes tombstones out later.
+    """
+
+    def __init__(self):
+        self.term_ids = {}  # term -> ordinal
+        self.terms = []  # ordinal -> term
+        self.posting_ids = []  # ordinal -> array of doc IDs (TOMBSTONE for removed entries)
+        self.posting_tfs = []  # ordinal -> array of weighted term frequencies
+        self.dead = array('i')  # ordinal -> tombstones in its postings
+        self.lengths = {}  # doc_id -> weighted document length
+        self.doc_terms = {}  # doc_id -> sorted array of term ordinals
+        self.doc_positions = {}  # doc_id -> position of the doc in each of those postings
+        self.total_length = 0.0
+
+    def _ordinal(self, term):
+        ordinal = self.term_ids.get(term)
+        if ordinal is None:
+            ordinal = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+            self.posting_ids.append(array('i'))
+            self.posting_tfs.append(array('f'))
+            self.dead.append(0)
+        return ordinal
+
+    def add(self, doc_id, fields):
+        self.remove(doc_id)
+        frequencies = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for token, count in Counter(tokenize(text)).items():
+                frequencies[token] = frequencies.get(token, 0) + count * weight
+        if not frequencies:
+            return
+        ordinals = array('i')
+        positions = array('i')
+        # Sorted by ordinal so compact() finds a term's slot with bisect
+        for ordinal, frequency in sorted((self._ordinal(term), f) for term, f in frequencies.items()):
+            ids = self.posting_ids[ordinal]
+            positions.append(len(ids))
+            ids.append(doc_id)
+            self.posting_tfs[ordinal].append(frequency)
+            ordinals.append(ordinal)
+        length = sum(frequencies.values())
+        self.lengths[doc_id] = length
+        self.doc_terms[doc_id] = ordinals
+        self.doc_positions[doc_id] = positions
+        self.total_length += length
+
+    def remove(self, doc_id):
+        ordinals = self.doc_terms.pop(doc_id, None)
+        if ordinals is None:
+            return
+        for ordinal, position in zip(ordinals, self.doc_positions.pop(doc_id)):
+            self.posting_ids[ordinal][position] = TOMBSTONE
+            self.dead[ordinal] += 1
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def frequency(self, ordinal):
+        """Documents containing a term"""
+        return len(self.posting_ids[ordinal]) - self.dead[ordinal]
+
+    def term_count(self):
+        return sum(1 for ordinal in range(len(self.terms)) if self.frequency(ordinal))
+
+    def compactable(self, ratio=COMPACT_RATIO):
+        """Ordinals whose postings are at least `ratio` tombstones"""
+        return [ordinal for ordinal, dead in enumerate(self.dead)
+                if dead and dead >= ratio * len(self.posting_ids[ordinal])]
+
+    def compact_term(self, ordinal):
+        """Drop the tombstones of one term and move its live postings up"""
+        ids = array('i')
+        tfs = array('f')
+        for doc_id, frequency in zip(self.posting_ids[ordinal], self.posting_tfs[ordinal]):
+            if doc_id == TOMBSTONE:
+                continue
+            slot = bisect_left(self.doc_terms[doc_id], ordinal)
+            self.doc_positions[doc_id][slot] = len(ids)
+            ids.append(doc_id)
+            tfs.append(frequency)
+        self.posting_ids[ordinal] = ids
+        self.posting_tfs[ordinal] = tfs
+        self.dead[ordinal] = 0
+
+    def compact(self, ratio=COMPACT_RATIO):
+        for ordinal in self.compactable(ratio):
+            self.compact_term(ordinal)
+
+    def search(self, terms, limit, k1, b):
+        count = len(self.lengths)
+        if not count:
+            return []
+        average_length = self.total_length / count
+        lengths = self.lengths
+        scores = {}
+        get = scores.get
+        for term in terms:
+            ordinal = self.term_ids.get(term)
+            matches = 0 if ordinal is None else self.frequency(ordinal)
+            if not matches:
+                continue
+            ids = self.posting_ids[ordinal]
+            idf = math.log(1 + (count - matches + 0.5) / (matches + 0.5))
+            boost = idf * (k1 + 1)
+            base = k1 * (1 - b)
+            slope = k1 * b / average_length
+            for doc_id, frequency in zip(ids, self.posting_tfs[ordinal]):
+                if doc_id != TOMBSTONE:
+                    scores[doc_id] = get(doc_id, 0.0) + boost * frequency / (frequency + base + slope * lengths[doc_id])
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def to_snapshot(self):
+        """(header, arrays): terms as JSON, everything else as flat binary arrays (no tombstones)"""
+        self.compact(ratio=0)
+        doc_ids = array('i', self.doc_terms)
+        lengths = array('f', (self.lengths[doc_id] for doc_id in doc_ids))
+        doc_term_counts = array('i', (len(self.doc_terms[doc_id]) for doc_id in doc_ids))
+        doc_term_ordinals = array('i')
+        doc_term_positions = array('i')
+        for doc_id in doc_ids:
+            doc_term_ordinals.extend(self.doc_terms[doc_id])
+            doc_term_positions.extend(self.doc_positions[doc_id])
+        posting_counts = array('i', (len(ids) for ids in self.posting_ids))
+        posting_ids = array('i')
+        posting_tfs = array('f')
+        for ids, tfs in zip(self.posting_ids, self.posting_tfs):
+            posting_ids.extend(ids)
+            posting_tfs.extend(tfs)
+        arrays = [doc_ids, lengths, doc_term_counts, doc_term_ordinals, doc_term_positions,
+                  posting_counts, posting_ids, posting_tfs]
+        return {'terms': self.terms}, arrays
+
+    @classmethod
+    def from_snapshot(cls, header, arrays):
+        (doc_ids, lengths, doc_term_counts, doc_term_ordinals, doc_term_positions,
+         posting_counts, posting_ids, posting_tfs) = arrays
+        index = cls()
+        index.terms = header['terms']
+        index.term_ids = {term: ordinal for ordinal, term in enumerate(index.terms)}
+        index.dead = array('i', bytes(len(index.terms) * array('i').itemsize))
+        index.lengths = dict(zip(doc_ids, lengths))
+        index.total_length = sum(lengths)
+        offset = 0
+        for doc_id, count in zip(doc_ids, doc_term_counts):
+            index.doc_terms[doc_id] = doc_term_ordinals[offset:offset + count]
+            index.doc_positions[doc_id] = doc_term_positions[offset:offset + count]
+            offset += count
+        offset = 0
+        for count in posting_counts:
+            index.posting_ids.append(posting_ids[offset:offset + count])
+            index.posting_tfs.append(posting_tfs[offset:offset + count])
+            offset += count
+        return index
+
+
+class SearchIndex:
+    """Thread-safe BM25 inverted index over every indexed entity"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.entities = {entity: _EntityIndex() for entity in INDEXED_MODELS}
+        self.synced_at = None  # database changes up to this time are in the index
+        self.last_refresh = 0.0
+        self.ready = False  # built or loaded at least once
+        self._sync_lock = threading.Lock()  # one build or refresh at a time
+        self._journal = None  # commit hook changes applied while a sync reads the database
+
+    def add(self, entity, doc_id, fields):
+        """Index or re-index a document (fields None removes it)"""
+        with self._lock:
+            if fields is None:
+                self.entities[entity].remove(doc_id)
+            else:
+                self.entities[entity].add(doc_id, fields)
+
+    def remove(self, entity, doc_id):
+        with self._lock:
+            self.entities[entity].remove(doc_id)
+
+    def apply(self, documents):
+        """Apply (entity, id, fields or None) changes"""
+        with self._lock:
+            for entity, doc_id, fields in documents:
+                self.add(entity, doc_id, fields)
+            if self._journal is not None:
+                self._journal.extend(documents)
+
+    def search(self, query, entities=None, limit=20):
+        """Best matches as (entity, id, score), highest score first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        results = []
+        with self._lock:
+            for entity in entities or self.entities:
+                for doc_id, score in self.entities[entity].search(terms, limit, self.k1, self.b):
+                    results.append((entity, doc_id, round(score, 4)))
+        results.sort(key=lambda result: result[2], reverse=True)
+        return results[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                entity: {'documents': len(index.lengths), 'terms': index.term_count()}
+                for entity, index in self.entities.items()
+            }
+
+    # ---- Persistence ----
+
+    def save(self, path):
+        """
+        Write a compressed snapshot atomically
+        Layout: magic, then zlib(header length, JSON header, little-endian arrays).
+        """
+        with self._lock:
+            header = {
+                'version': SNAPSHOT_VERSION,
+                'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+                'entities': {}
+            }
+            blobs = []
+            for entity, index in self.entities.items():
+                entity_header, arrays = index.to_snapshot()
+                entity_header['sizes'] = [len(a) for a in arrays]
+                header['entities'][entity] = entity_header
+                for a in arrays:
+                    if sys.byteorder != 'little':
+                        a.byteswap()
+                    blobs.append(a.tobytes())
+        encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        payload = struct.pack('<I', len(encoded)) + encoded + b''.join(blobs)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A temp file of our own: several workers may save at the same time on exit
+        fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC + zlib.compress(payload, 6))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        index = cls(**kwargs)
+        index.restore(path)
+        return index
+
+    def restore(self, path):
+        """Replace the contents with a snapshot (the file is parsed outside the lock)"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError('Not a search index snapshot')
+        payload = zlib.decompress(data[len(SNAPSHOT_MAGIC):])
+        (header_size,) = struct.unpack_from('<I', payload)
+        header = json.loads(payload[4:4 + header_size].decode('utf-8'))
+        if header.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported search index snapshot version: {header.get('version')}")
+
+        entities = {entity: _EntityIndex() for entity in INDEXED_MODELS}
+        offset = 4 + header_size
+        for entity, entity_header in header['entities'].items():
+            arrays = []
+            for typecode, size in zip('ifiiiiif', entity_header['sizes']):
+                a = array(typecode)
+                end = offset + size * a.itemsize
+                a.frombytes(payload[offset:end])
+                if sys.byteorder != 'little':
+                    a.byteswap()
+                arrays.append(a)
+                offset = end
+            if entity in entities:
+                entities[entity] = _EntityIndex.from_snapshot(entity_header, arrays)
+        with self._lock:
+            self.entities = entities
+            self.synced_at = datetime.fromisoformat(header['synced_at']) if header['synced_at'] else None
+            self.ready = True
+
+    # ---- Database sync ----
+
+    def _start_journal(self):
+        with self._lock:
+            self._journal = []
+
+    def _stop_journal(self):
+        with self._lock:
+            self._journal = None
+
+    def build(self, batch_size=1000):
+        """
+        (Re)index every row from the database
+        Rows are read into a new index without holding the lock; searches use
+        the old contents until it is swapped in.
+        """
+        with self._sync_lock:
+            started = datetime.utcnow()
+            self._start_journal()
+            try:
+                entities = {entity: _EntityIndex() for entity in INDEXED_MODELS}
+                for entity, (model, fields_for) in INDEXED_MODELS.items():
+                    for instance in model.query.order_by(model.id).yield_per(batch_size):
+                        fields = fields_for(instance)
+                        if fields is not None:
+                            entities[entity].add(instance.id, fields)
+            except BaseException:
+                self._stop_journal()
+                raise
+            with self._lock:
+                # Commits seen while reading are at least as new as what was read
+                for entity, doc_id, fields in self._journal:
+                    entities[entity].remove(doc_id)
+                    if fields is not None:
+                        entities[entity].add(doc_id, fields)
+                self._journal = None
+                self.entities = entities
+                self.synced_at = started
+                self.last_refresh = time.monotonic()
+                self.ready = True
+
+    def refresh(self, batch_size=1000):
+        """
+        Pick up rows changed since the last sync (other workers, restarts) and drop deleted rows
+        The database is read without holding the lock; only applying the
+        changes and compacting one term at a time block searches.
+        """
+        with self._sync_lock:
+            started = datetime.utcnow()
+            with self._lock:
+                # Small overlap so rows committed while the last sync ran are not missed
+                since = self.synced_at - timedelta(seconds=5) if self.synced_at else None
+                indexed = {entity: set(index.lengths) for entity, index in self.entities.items()}
+                self._journal = []
+            try:
+                changes = []
+                for entity, (model, fields_for) in INDEXED_MODELS.items():
+                    live_ids = {row.id for row in db.session.query(model.id)}
+                    changes.extend((entity, doc_id, None) for doc_id in indexed[entity] - live_ids)
+                    query = model.query
+                    if since is not None:
+                        query = query.filter(model.updated_at >= since)
+                    for instance in query.order_by(model.id).yield_per(batch_size):
+                        changes.append((entity, instance.id, fields_for(instance)))
+            except BaseException:
+                self._stop_journal()
+                raise
+            with self._lock:
+                # Documents committed in this process meanwhile are newer than what was read
+                touched = {(entity, doc_id) for entity, doc_id, _ in self._journal}
+                self._journal = None
+                for entity, doc_id, fields in changes:
+                    if (entity, doc_id) not in touched:
+                        self.add(entity, doc_id, fields)
+                self.synced_at = started
+                self.last_refresh = time.monotonic()
+                self.ready = True
+            self.compact()
+
+    def compact(self):
+        """Rewrite the postings that are mostly tombstones, one term per lock hold"""
+        for index in list(self.entities.values()):
+            with self._lock:
+                ordinals = index.compactable()
+            for ordinal in ordinals:
+                with self._lock:
+                    index.compact_term(ordinal)
+
+
+class SearchIndexRefresher:
+    """Background thread loading the index at start, then catching up with the database every interval"""
+
+    def __init__(self, app, index, path, interval):
+        self.app = app
+        self.index = index
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0:
+            self.load()  # no thread: load now, refresh only when asked (tests)
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='search-index-refresher', daemon=True)
+        self._thread.start()
+
+    def load(self):
+        """Snapshot if there is a readable one, else a full build; then catch up with the database"""
+        index = self.index
+        if self.path and os.path.exists(self.path):
+            try:
+                index.restore(self.path)
+            except (OSError, ValueError, KeyError, zlib.error, struct.error) as e:
+                logger.warning('Ignoring unreadable search index snapshot %s: %s', self.path, e)
+        if index.ready:
+            index.refresh()
+        else:
+            index.build()
+            if self.path:
+                index.save(self.path)
+
+    def _run(self):
+        delay = 0  # load right away, then refresh every interval
+        while not self._stopped.wait(delay):
+            delay = self.interval
+            try:
+                with self.app.app_context():
+                    if self.index.ready:
+                        self.index.refresh()
+                    else:
+                        self.load()
+                    db.session.remove()
+            except Exception as e:
+                logger.warning('Search index refresh failed: %s', e)
+
+    def shutdown(self):
+        self._stopped.set()
+
+
+# ============ COMMIT HOOKS ============
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault('search_index_changes', [])
+    for instance in list(session.new) + list(session.dirty):
+        document = document_for(instance)
+        if document is not None:
+            changes.append(document)
+    for instance in session.deleted:
+        document = document_for(instance, deleted=True)
+        if document is not None:
+            changes.append(document)
+
+
+def _apply_changes(session):
+    changes = session.info.pop('search_index_changes', None)
+    if not changes or not has_app_context():
+        return
+    index = current_app.extensions.get('search_index')
+    if index is not None:
+        index.apply(changes)
+
+
+def _discard_changes(session):
+    session.info.pop('search_index_changes', None)
+
+
+def _register_hooks():
+    if event.contains(db.session, 'after_flush', _collect_changes):
+        return
+    event.listen(db.session, 'after_flush', _collect_changes)
+    event.listen(db.session, 'after_commit', _apply_changes)
+    event.listen(db.session, 'after_rollback', _discard_changes)
+
+
+# ============ APP INTEGRATION ============
+
+def _snapshot_path(app):
+    path = app.config.get('SEARCH_INDEX_SNAPSHOT', os.path.join(app.instance_path, 'search_index.bin'))
+    return path or None
+
+
+def _save_on_exit(index, path):
+    # An index still loading would overwrite a good snapshot with a partial one
+    if index.ready:
+        index.save(path)
+
+
+def init_search_index(app):
+    """
+    Create the app's search index and start loading it off the request path
+    The refresher thread loads the snapshot (or builds from the database),
+    then catches up every SEARCH_INDEX_REFRESH_INTERVAL seconds; the index
+    is saved again on exit. Until it is ready, /api/search reads the database.
+    """
+    index = SearchIndex()
+    app.extensions['search_index'] = index
+    _register_hooks()
+    path = _snapshot_path(app)
+    refresher = SearchIndexRefresher(
+        app, index, path, app.config.get('SEARCH_INDEX_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+    )
+    if path:
+        atexit.register(_save_on_exit, index, path)
+    atexit.register(refresher.shutdown)
+    refresher.start()
+    return index
+
+
+_init_lock = threading.Lock()
+
+
+def get_search_index():
+    """Search index of the current app (apps other than main.app get theirs on first use)"""
+    index = current_app.extensions.get('search_index')
+    if index is None:
+        with _init_lock:
+            index = current_app.extensions.get('search_index')
+            if index is None:
+                index = init_search_index(current_app._get_current_object())
+    return index
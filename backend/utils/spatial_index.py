@@ -0,0 +1,267 @@
+"""
+Spatial index for nearby searches in VieGo Blog
+Points of locations and of geotagged posts, one index per kind. With NumPy
+installed the points live in contiguous arrays (utils/geo_vector.py) and a
+query filters and measures every candidate in one vectorized pass;
+otherwise an in-memory uniform grid only visits the cells overlapping the
+radius and k-nearest queries search outward ring by ring.
+Indexes (and the marker clusters of utils/clusters.py) are built on first
+use and kept current by session commit hooks.
+"""
+import heapq
+import threading
+from math import cos, floor, radians
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db
+from models.location import Location
+from models.post import Post
+from utils.geo import KM_PER_DEGREE_LAT, bounding_box, geohash_cover, haversine_km
+from utils.geo_vector import HAS_NUMPY, PointArrays, haversine_many
+
+DEFAULT_CELL_DEGREES = 0.1  # ~11 km cells
+
+
+class SpatialGrid:
+    """Thread-safe grid of (id, lat, lng, category) points"""
+
+    def __init__(self, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells = {}  # (row, col) -> {id: (lat, lng, category)}
+        self._cell_of = {}  # id -> (row, col)
+        self._bounds = None  # (min_row, min_col, max_row, max_col) of cells ever used
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _cell(self, lat, lng):
+        return floor(lat / self.cell_degrees), floor(lng / self.cell_degrees)
+
+    def add(self, point_id, lat, lng, category=None):
+        with self._lock:
+            self.remove(point_id)
+            cell = self._cell(lat, lng)
+            self._cells.setdefault(cell, {})[point_id] = (lat, lng, category)
+            self._cell_of[point_id] = cell
+            if self._bounds is None:
+                self._bounds = cell + cell
+            else:
+                min_row, min_col, max_row, max_col = self._bounds
+                self._bounds = (min(min_row, cell[0]), min(min_col, cell[1]),
+                                max(max_row, cell[0]), max(max_col, cell[1]))
+
+    def remove(self, point_id):
+        with self._lock:
+            cell = self._cell_of.pop(point_id, None)
+            if cell is not None:
+                points = self._cells[cell]
+                del points[point_id]
+                if not points:
+                    del self._cells[cell]
+
+    def _scan(self, rows, cols, lat, lng, category, box=None):
+        """Exact distances for the points of the given cells, optionally clipped to a box"""
+        for row in rows:
+            for col in cols:
+                points = self._cells.get((row, col))
+                if not points:
+                    continue
+                for point_id, (point_lat, point_lng, point_category) in points.items():
+                    if category and point_category != category:
+                        continue
+                    if box and not (box[0] <= point_lat <= box[2] and box[1] <= point_lng <= box[3]):
+                        continue
+                    yield haversine_km(lat, lng, point_lat, point_lng), point_id
+
+    def within(self, lat, lng, radius_km, category=None):
+        """All (distance_km, id) within radius_km, nearest first"""
+        box = bounding_box(lat, lng, radius_km)
+        min_row, min_col = self._cell(box[0], box[1])
+        max_row, max_col = self._cell(box[2], box[3])
+        with self._lock:
+            hits = [
+                hit for hit in self._scan(range(min_row, max_row + 1), range(min_col, max_col + 1),
+                                          lat, lng, category, box)
+                if hit[0] <= radius_km
+            ]
+        hits.sort()
+        return hits
+
+    def nearest(self, lat, lng, k, max_radius_km=None, category=None):
+        """The k nearest (distance_km, id), searching rings of cells outward from the point"""
+        if k <= 0:
+            return []
+        center_row, center_col = self._cell(lat, lng)
+        best = []  # max-heap of (-distance, id) holding the k nearest so far
+        limit = max_radius_km if max_radius_km is not None else float('inf')
+        bound = limit  # distance a point must beat to enter `best`
+        with self._lock:
+            if not self._cells:
+                return []
+            min_row, min_col, max_row, max_col = self._bounds
+            max_ring = max(abs(center_row - min_row), abs(center_row - max_row),
+                           abs(center_col - min_col), abs(center_col - max_col))
+            for ring in range(max_ring + 1):
+                # Points in this ring or beyond are at least this far away
+                ring_distance = max(ring - 1, 0) * self.cell_degrees * KM_PER_DEGREE_LAT * min(
+                    1.0, cos(radians(min(abs(lat) + ring * self.cell_degrees, 89.9))))
+                if len(best) == k and -best[0][0] <= ring_distance:
+                    break
+                if max_radius_km is not None and ring_distance > max_radius_km:
+                    break
+                for row in range(center_row - ring, center_row + ring + 1):
+                    edge = abs(row - center_row) == ring
+                    cols = range(center_col - ring, center_col + ring + 1) if edge \
+                        else (center_col - ring, center_col + ring)
+                    for col in cols:
+                        points = self._cells.get((row, col))
+                        if not points:
+                            continue
+                        for point_id, (point_lat, point_lng, point_category) in points.items():
+                            if category and point_category != category:
+                                continue
+                            # The latitude gap alone is a lower bound on the distance
+                            if abs(point_lat - lat) * KM_PER_DEGREE_LAT > bound:
+                                continue
+                            distance = haversine_km(lat, lng, point_lat, point_lng)
+                            if distance > bound:
+                                continue
+                            if len(best) < k:
+                                heapq.heappush(best, (-distance, point_id))
+                            else:
+                                heapq.heapreplace(best, (-distance, point_id))
+                            if len(best) == k:
+                                bound = min(-best[0][0], limit)
+        return sorted((-negative, point_id) for negative, point_id in best)
+
+    def build(self, points):
+        """Replace every point with (id, lat, lng, category) tuples"""
+        with self._lock:
+            self._cells = {}
+            self._cell_of = {}
+            self._bounds = None
+            for point_id, lat, lng, category in points:
+                if lat is not None and lng is not None:
+                    self.add(point_id, lat, lng, category)
+
+    def coordinates(self, point_ids):
+        """{id: (lat, lng)} for the given IDs that are present"""
+        with self._lock:
+            found = {}
+            for point_id in point_ids:
+                cell = self._cell_of.get(point_id)
+                if cell is not None:
+                    found[point_id] = self._cells[cell][point_id][:2]
+            return found
+
+
+def nearby_from_database(lat, lng, radius_km, category=None):
+    """
+    Same result as SpatialGrid.within() straight from the database
+    Prefilters with the geohash prefixes covering the radius, then the exact box.
+    """
+    box = bounding_box(lat, lng, radius_km)
+    query = db.session.query(Location.id, Location.latitude, Location.longitude).filter(
+        db.or_(*(Location.geohash.startswith(prefix) for prefix in geohash_cover(box))),
+        Location.latitude.between(box[0], box[2]),
+        Location.longitude.between(box[1], box[3])
+    )
+    if category:
+        query = query.filter(Location.category == category)
+    rows = query.all()
+    if not rows:
+        return []
+    ids, lats, lngs = zip(*rows)
+    distances = haversine_many(lat, lng, lats, lngs)
+    hits = [(float(distance), point_id) for distance, point_id in zip(distances, ids) if distance <= radius_km]
+    hits.sort()
+    return hits
+
+
+# ============ POINT SOURCES ============
+
+def _location_point(location):
+    return location.latitude, location.longitude, location.category
+
+
+def _post_point(post):
+    if post.status != 'published':
+        return None, None, None
+    return post.location_lat, post.location_lng, post.category
+
+
+# kind -> (model, function returning (lat, lng, category), query loading every point)
+SPATIAL_SOURCES = {
+    'location': (Location, _location_point, lambda: db.session.query(
+        Location.id, Location.latitude, Location.longitude, Location.category)),
+    'post': (Post, _post_point, lambda: db.session.query(
+        Post.id, Post.location_lat, Post.location_lng, Post.category).filter(
+        Post.status == 'published', Post.location_lat.isnot(None), Post.location_lng.isnot(None))),
+}
+_KIND_BY_MODEL = {model: kind for kind, (model, _, _) in SPATIAL_SOURCES.items()}
+# app.extensions entries ({kind: index}) that the commit hooks keep current
+SPATIAL_EXTENSIONS = ('spatial_index', 'marker_clusters')
+
+
+# ============ COMMIT HOOKS ============
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault('spatial_changes', [])
+    for instance in list(session.new) + list(session.dirty):
+        kind = _KIND_BY_MODEL.get(type(instance))
+        if kind is not None:
+            changes.append((kind, instance.id) + SPATIAL_SOURCES[kind][1](instance))
+    for instance in session.deleted:
+        kind = _KIND_BY_MODEL.get(type(instance))
+        if kind is not None:
+            changes.append((kind, instance.id, None, None, None))
+
+
+def _apply_changes(session):
+    changes = session.info.pop('spatial_changes', None)
+    if not changes or not has_app_context():
+        return
+    indexes = [current_app.extensions.get(name, {}) for name in SPATIAL_EXTENSIONS]
+    for kind, point_id, lat, lng, category in changes:
+        for index in (by_kind[kind] for by_kind in indexes if kind in by_kind):
+            if lat is None or lng is None:
+                index.remove(point_id)
+            else:
+                index.add(point_id, lat, lng, category)
+
+
+def _discard_changes(session):
+    session.info.pop('spatial_changes', None)
+
+
+def register_spatial_hooks():
+    if event.contains(db.session, 'after_flush', _collect_changes):
+        return
+    event.listen(db.session, 'after_flush', _collect_changes)
+    event.listen(db.session, 'after_commit', _apply_changes)
+    event.listen(db.session, 'after_rollback', _discard_changes)
+
+
+# ============ APP INTEGRATION ============
+
+def create_spatial_index(config):
+    """PointArrays when NumPy is available (NEARBY_INDEX=auto/arrays), else the Python grid"""
+    choice = config.get('NEARBY_INDEX', 'auto')
+    if choice == 'arrays' or (choice == 'auto' and HAS_NUMPY):
+        return PointArrays()
+    return SpatialGrid(config.get('NEARBY_GRID_CELL_DEGREES', DEFAULT_CELL_DEGREES))
+
+
+def get_spatial_index(kind='location'):
+    """Spatial index of one kind ('location' or 'post') for the current app, built on first use"""
+    indexes = current_app.extensions.setdefault('spatial_index', {})
+    index = indexes.get(kind)
+    if index is None:
+        index = create_spatial_index(current_app.config)
+        index.build(SPATIAL_SOURCES[kind][2]())
+        indexes[kind] = index
+        register_spatial_hooks()
+    return index
@@ -0,0 +1,430 @@
+"""
+Search-as-you-type suggestions for VieGo Blog
+A sorted array of accent-folded keys searched with bisect, covering post
+titles, location names, provinces, tour titles and popular tags. Every
+word start of a title is a key, so "long" and "ha lo" both reach
+"Vịnh Hạ Long". Answers come from memory only: everything is loaded when
+the app starts, rows are kept current by session commit hooks, popularity
+and aggregates by a background refresh.
+"""
+import atexit
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from operator import itemgetter
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+
+from models import db
+from models.post import Post
+from models.location import Location
+from models.tour import Tour
+from utils.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_TYPES = ('post', 'location', 'province', 'tour', 'tag')
+
+MAX_WORD_STARTS = 6  # keys per suggestion: the full text and its next few word starts
+MAX_LIMIT = 20
+DEFAULT_REFRESH_INTERVAL = 300
+PREFIX_END = '~'  # sorts after every character a folded key can contain
+WIDE_RANGE = 2000  # key range above which suggestions are found in popularity order
+
+
+class Suggestion:
+    """One suggestion; `ref` is the row ID, or the folded name for tags and provinces"""
+    __slots__ = ('kind', 'ref', 'text', 'slug', 'weight', 'keys')
+
+    def __init__(self, kind, ref, text, popularity=0, slug=None):
+        self.kind = kind
+        self.ref = ref
+        self.text = text
+        self.slug = slug
+        self.weight = math.log1p(max(popularity or 0, 0))
+        words = tokenize(text)
+        self.keys = [' '.join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS))]
+
+    def to_dict(self):
+        data = {'type': self.kind, 'text': self.text, 'score': round(self.weight, 3)}
+        if self.kind in ('post', 'location', 'tour'):
+            data['id'] = self.ref
+        if self.slug:
+            data['slug'] = self.slug
+        return data
+
+
+# ============ SOURCES ============
+
+def post_suggestion(post):
+    if post.status != 'published':
+        return None
+    popularity = (post.views_count or 0) + 5 * (post.likes_count or 0) + 3 * (post.comments_count or 0)
+    return Suggestion('post', post.id, post.title, popularity, slug=post.slug)
+
+
+def location_is_active(status):
+    """Locations without a status predate the column and count as active"""
+    return status in (None, 'active')
+
+
+def location_suggestion(location):
+    if not location_is_active(location.status):
+        return None
+    popularity = (location.reviews_count or 0) + 10 * (location.rating or 0)
+    return Suggestion('location', location.id, location.name, popularity)
+
+
+def tour_suggestion(tour):
+    if tour.status not in ('published', 'active'):
+        return None
+    popularity = (tour.views_count or 0) + 5 * (tour.bookings_count or 0) + 10 * (tour.rating or 0)
+    return Suggestion('tour', tour.id, tour.title, popularity)
+
+
+# Model -> (kind, function building its suggestion or None to remove it), used by the commit hooks
+ROW_SOURCES = {
+    Post: ('post', post_suggestion),
+    Location: ('location', location_suggestion),
+    Tour: ('tour', tour_suggestion),
+}
+
+
+def _load_rows():
+    """Suggestions for every row, loading only the columns they need"""
+    rows = db.session.query(
+        Post.id, Post.title, Post.slug, Post.status,
+        Post.views_count, Post.likes_count, Post.comments_count
+    ).filter(Post.status == 'published')
+    yield from (post_suggestion(row) for row in rows)
+
+    # Filtered by location_suggestion, like the commit hooks do
+    rows = db.session.query(
+        Location.id, Location.name, Location.status, Location.reviews_count, Location.rating
+    )
+    yield from (location_suggestion(row) for row in rows)
+
+    rows = db.session.query(
+        Tour.id, Tour.title, Tour.status, Tour.views_count, Tour.bookings_count, Tour.rating
+    ).filter(Tour.status.in_(('published', 'active')))
+    yield from (tour_suggestion(row) for row in rows)
+
+
+def _load_aggregates():
+    """Suggestions for provinces (by location count) and tags (by published post count)"""
+    province_counts = Counter()
+    rows = db.session.query(Location.province, Location.status, func.count(Location.id)).filter(
+        Location.province.isnot(None),
+        Location.province != ''
+    ).group_by(Location.province, Location.status)
+    for province, status, count in rows:
+        if location_is_active(status):
+            province_counts[province] += count
+    for province, count in province_counts.items():
+        yield Suggestion('province', ' '.join(tokenize(province)), province, 5 * count)
+
+    tag_counts = Counter()
+    spellings = {}
+    for (raw,) in db.session.query(Post.tags).filter(Post.status == 'published', Post.tags.isnot(None)):
+        try:
+            tags = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        for tag in tags if isinstance(tags, list) else []:
+            folded = ' '.join(tokenize(str(tag)))
+            if folded:
+                tag_counts[folded] += 1
+                spellings.setdefault(folded, Counter())[str(tag).strip()] += 1
+    for folded, count in tag_counts.items():
+        yield Suggestion('tag', folded, spellings[folded].most_common(1)[0][0], 5 * count)
+
+
+# ============ INDEX ============
+
+class SuggestIndex:
+    """
+    Thread-safe prefix index: sorted keys + bisect, with a cache of top results per prefix
+    Suggestions are also kept in popularity order. A short prefix such as "h"
+    matches a large share of the keys; walking that order and stopping at the
+    first matches is then much cheaper than ranking the whole key range.
+    """
+
+    def __init__(self, cache_size=4096):
+        self._items = {}  # (kind, ref) -> Suggestion
+        self._keys = []  # sorted folded keys
+        self._owners = []  # Suggestion owning the key at the same position
+        self._ranks = []  # sorted rank tuples, most popular first
+        self._ranked = []  # Suggestion at the same position
+        self._cache = {}  # (prefix, kinds) -> top MAX_LIMIT suggestions
+        self._cache_size = cache_size
+        self._lock = threading.RLock()
+        self._changes_during_sync = None  # hook changes to replay once a sync swaps its arrays in
+        self.last_sync = None
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _rank(item):
+        return (-item.weight, len(item.text))
+
+    def _invalidate(self, item):
+        # Only cached prefixes that can see this suggestion are affected
+        stale = [
+            cache_key for cache_key in self._cache
+            if any(key.startswith(cache_key[0]) for key in item.keys)
+        ]
+        for cache_key in stale:
+            del self._cache[cache_key]
+
+    def _link_rank(self, item):
+        rank = self._rank(item)
+        position = bisect_right(self._ranks, rank)
+        self._ranks.insert(position, rank)
+        self._ranked.insert(position, item)
+
+    def _unlink_rank(self, item):
+        position = bisect_left(self._ranks, self._rank(item))
+        while self._ranked[position] is not item:
+            position += 1
+        del self._ranks[position]
+        del self._ranked[position]
+
+    def _unlink(self, item):
+        for key in item.keys:
+            position = bisect_left(self._keys, key)
+            while self._owners[position] is not item:
+                position += 1
+            del self._keys[position]
+            del self._owners[position]
+        self._unlink_rank(item)
+        self._invalidate(item)
+
+    def put(self, item):
+        """Add or replace a suggestion"""
+        with self._lock:
+            if self._changes_during_sync is not None:
+                self._changes_during_sync.append(('put', item))
+            current = self._items.get((item.kind, item.ref))
+            if current is not None:
+                if current.text == item.text:
+                    if current.weight != item.weight or current.slug != item.slug:
+                        self._unlink_rank(current)
+                        current.weight = item.weight
+                        current.slug = item.slug
+                        self._link_rank(current)
+                        self._invalidate(current)
+                    return
+                self._unlink(current)
+            self._items[(item.kind, item.ref)] = item
+            for key in item.keys:
+                position = bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+                self._owners.insert(position, item)
+            self._link_rank(item)
+            self._invalidate(item)
+
+    def discard(self, kind, ref):
+        with self._lock:
+            if self._changes_during_sync is not None:
+                self._changes_during_sync.append(('discard', (kind, ref)))
+            item = self._items.pop((kind, ref), None)
+            if item is not None:
+                self._unlink(item)
+
+    def replace_all(self, items):
+        """Swap in a complete set of suggestions (sorting happens outside the lock)"""
+        items = {(item.kind, item.ref): item for item in items}
+        pairs = sorted(((key, item) for item in items.values() for key in item.keys), key=itemgetter(0))
+        keys = [key for key, _ in pairs]
+        owners = [item for _, item in pairs]
+        ranked = sorted(items.values(), key=self._rank)
+        ranks = [self._rank(item) for item in ranked]
+        with self._lock:
+            self._items, self._keys, self._owners = items, keys, owners
+            self._ranks, self._ranked = ranks, ranked
+            self._cache.clear()
+
+    def _top(self, prefix, kinds):
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + PREFIX_END, start)
+        if end - start > WIDE_RANGE:
+            top = []
+            for item in self._ranked:
+                if (not kinds or item.kind in kinds) and any(key.startswith(prefix) for key in item.keys):
+                    top.append(item)
+                    if len(top) == MAX_LIMIT:
+                        return top
+            return top
+        candidates = set(self._owners[start:end])
+        if kinds:
+            candidates = [item for item in candidates if item.kind in kinds]
+        return heapq.nsmallest(MAX_LIMIT, candidates, key=self._rank)
+
+    def suggest(self, query, limit=8, kinds=None):
+        """Most popular suggestions with a key starting with the folded query"""
+        prefix = ' '.join(tokenize(query))
+        if not prefix:
+            return []
+        kinds = tuple(sorted(kinds)) if kinds else None
+        cache_key = (prefix, kinds)
+        with self._lock:
+            top = self._cache.get(cache_key)
+            if top is None:
+                top = self._top(prefix, kinds)
+                if len(self._cache) >= self._cache_size:
+                    self._cache.clear()
+                self._cache[cache_key] = top
+        return [item.to_dict() for item in top[:limit]]
+
+    def sync(self):
+        """Reload rows, popularity and aggregates from the database and swap them in"""
+        with self._lock:
+            self._changes_during_sync = []
+        try:
+            fresh = [item for item in _load_rows() if item is not None]
+            fresh.extend(_load_aggregates())
+            self.replace_all(fresh)
+        finally:
+            with self._lock:
+                # Commits that landed while the database was being read win over the reload
+                changes, self._changes_during_sync = self._changes_during_sync, None
+                for action, value in changes:
+                    if action == 'put':
+                        self.put(value)
+                    else:
+                        self.discard(*value)
+                self.last_sync = time.time()
+
+    def stats(self):
+        with self._lock:
+            counts = Counter(kind for kind, _ in self._items)
+            return {
+                'suggestions': dict(counts),
+                'keys': len(self._keys),
+                'cached_prefixes': len(self._cache),
+                'last_sync': self.last_sync
+            }
+
+
+class SuggestRefresher:
+    """Background thread re-syncing the index so requests never wait on the database"""
+
+    def __init__(self, app, index, interval):
+        self.app = app
+        self.index = index
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load rows, popularity and aggregates now, then refresh them every interval"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        first_delay = self.interval
+        try:
+            with self.app.app_context():
+                self.index.sync()
+                db.session.remove()
+        except Exception as e:
+            logger.warning('Suggestion index load failed, retrying in the background: %s', e)
+            first_delay = 0
+        if self.interval <= 0:
+            return  # no thread: re-sync only when asked (tests)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(first_delay,), name='suggest-refresher',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, delay):
+        while not self._stopped.wait(delay):
+            delay = self.interval
+            try:
+                with self.app.app_context():
+                    self.index.sync()
+                    db.session.remove()
+            except Exception as e:
+                logger.warning('Suggestion refresh failed: %s', e)
+
+    def shutdown(self):
+        self._stopped.set()
+
+
+# ============ COMMIT HOOKS ============
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault('suggest_changes', [])
+    for instance in list(session.new) + list(session.dirty):
+        source = ROW_SOURCES.get(type(instance))
+        if source is not None:
+            changes.append((source[0], instance.id, source[1](instance)))
+    for instance in session.deleted:
+        source = ROW_SOURCES.get(type(instance))
+        if source is not None:
+            changes.append((source[0], instance.id, None))
+
+
+def _apply_changes(session):
+    changes = session.info.pop('suggest_changes', None)
+    if not changes or not has_app_context():
+        return
+    index = current_app.extensions.get('suggest_index')
+    if index is None:
+        return
+    for kind, row_id, item in changes:
+        if item is None:
+            index.discard(kind, row_id)
+        else:
+            index.put(item)
+
+
+def _discard_changes(session):
+    session.info.pop('suggest_changes', None)
+
+
+def _register_hooks():
+    if event.contains(db.session, 'after_flush', _collect_changes):
+        return
+    event.listen(db.session, 'after_flush', _collect_changes)
+    event.listen(db.session, 'after_commit', _apply_changes)
+    event.listen(db.session, 'after_rollback', _discard_changes)
+
+
+# ============ APP INTEGRATION ============
+
+def init_suggest_index(app):
+    """
+    Create the app's suggestion index, load it and start its background refresh
+    Runs at startup, so the first requests already get popular suggestions,
+    tags and provinces; if the database is unreachable then, the refresher
+    thread retries right away.
+    """
+    index = SuggestIndex()
+    app.extensions['suggest_index'] = index
+    _register_hooks()
+    refresher = SuggestRefresher(
+        app, index, app.config.get('SUGGEST_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+    )
+    refresher.start()
+    atexit.register(refresher.shutdown)
+    return index
+
+
+_init_lock = threading.Lock()
+
+
+def get_suggest_index():
+    """Suggestion index of the current app (apps other than main.app get theirs on first use)"""
+    index = current_app.extensions.get('suggest_index')
+    if index is None:
+        with _init_lock:
+            index = current_app.extensions.get('suggest_index')
+            if index is None:
+                index = init_suggest_index(current_app._get_current_object())
+    return index
@@ -0,0 +1,19 @@
+"""
+Text helpers for VieGo Blog
+Vietnamese accent folding shared by slugs and search, so "ha long",
+"Hạ Long" and "HẠ LONG" all reduce to the same form
+"""
+import unicodedata
+
+
+def fold_vietnamese(text):
+    """
+    Lowercase and remove Vietnamese accents ("Đà Lạt" -> "da lat")
+    Accents are split off with NFD and dropped; any other non-ASCII character
+    (dashes, "×", curly quotes) becomes a space so it still separates words.
+    """
+    text = unicodedata.normalize('NFD', (text or '').lower()).replace('đ', 'd')
+    return ''.join(
+        char if char.isascii() else ('' if unicodedata.category(char) == 'Mn' else ' ')
+        for char in text
+    )
@@ -0,0 +1,263 @@
+"""
+Home timeline for VieGo Blog (/api/social/timeline)
+Fan-out-on-write: when a post becomes published, one INSERT ... SELECT over
+user_follows copies its ID into the timeline_entries of every follower of
+its author, in the same transaction as the publish. Reading a page is then a
+range scan of the reader's own entries on (user_id, published_at, post_id),
+no matter how many accounts they follow.
+
+Authors with more than TIMELINE_FANOUT_LIMIT followers are not fanned out
+(one post would write that many rows); their posts are merged in at read
+time (fan-out-on-read) with one keyset query over the large accounts the
+reader follows.
+
+Each list keeps its newest TIMELINE_MAX_ENTRIES posts: a fan-out or backfill
+deletes the entries that no longer fit for the followers it wrote to, with
+one DELETE per TRIM_BATCH followers. `flask --app main timeline-trim` does the
+same over every list, for lists filled before a lower limit was configured.
+"""
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, event, exists, func, inspect, literal, or_, select, true, tuple_
+
+from models import db
+from models.post import Post
+from models.social import TimelineEntry, UserFollow
+from models.user import User
+from utils.pagination import KeysetPage, decode_cursor, encode_cursor
+
+DEFAULT_FANOUT_LIMIT = 5000
+DEFAULT_MAX_ENTRIES = 800
+DEFAULT_BACKFILL = 20
+DEFAULT_LARGE_REFRESH = 300  # seconds between reloads of the large-account set
+TRIM_BATCH = 500  # timelines trimmed by one DELETE
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def fanout_limit():
+    return _config('TIMELINE_FANOUT_LIMIT', DEFAULT_FANOUT_LIMIT)
+
+
+def entries_limit():
+    return _config('TIMELINE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def has_many_followers(author_id, connection=None):
+    """True when more than TIMELINE_FANOUT_LIMIT users follow the author (stops counting there)"""
+    limit = fanout_limit()
+    capped = select(literal(1)).where(UserFollow.followed_id == author_id).limit(limit + 1).subquery()
+    return (connection or db.session).execute(select(func.count()).select_from(capped)).scalar() > limit
+
+
+class LargeAuthors:
+    """
+    IDs of accounts read with fan-out-on-read, reloaded every few minutes
+    The set keeps authors above half the fan-out limit, so posts published
+    while an account was large stay visible if it loses a few followers.
+    """
+
+    def __init__(self, refresh_interval=DEFAULT_LARGE_REFRESH):
+        self.refresh_interval = refresh_interval
+        self.ids = frozenset()
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval:
+            with self._lock:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval:
+                    self.reload()
+        return self.ids
+
+    def reload(self):
+        rows = db.session.query(User.id).filter(User.followers_count > fanout_limit() // 2)
+        self.ids = frozenset(row.id for row in rows)
+        self.loaded_at = time.monotonic()
+
+    def add(self, author_id):
+        """Seen over the limit at publish time: read it from now on in this process"""
+        self.ids = self.ids | {author_id}
+
+
+def get_large_authors():
+    large_authors = current_app.extensions.get('timeline_large_authors')
+    if large_authors is None:
+        large_authors = LargeAuthors(_config('TIMELINE_LARGE_REFRESH', DEFAULT_LARGE_REFRESH))
+        current_app.extensions['timeline_large_authors'] = large_authors
+    return large_authors
+
+
+# ============ WRITES ============
+
+def fan_out(connection, post):
+    """Put a published post into its author's followers' timelines; False for large accounts"""
+    table = TimelineEntry.__table__
+    connection.execute(delete(table).where(table.c.post_id == post.id))
+    if has_many_followers(post.author_id, connection):
+        if has_app_context():
+            get_large_authors().add(post.author_id)
+        return False
+    published_at = post.published_at or datetime.utcnow()
+    followers = select(UserFollow.follower_id, literal(post.id), literal(post.author_id), literal(published_at)).where(
+        UserFollow.followed_id == post.author_id)
+    connection.execute(table.insert().from_select(
+        ['user_id', 'post_id', 'author_id', 'published_at'], followers))
+    follower_ids = connection.execute(
+        select(UserFollow.follower_id).where(UserFollow.followed_id == post.author_id)).scalars().all()
+    for start in range(0, len(follower_ids), TRIM_BATCH):
+        trim(connection, follower_ids[start:start + TRIM_BATCH])
+    return True
+
+
+def backfill(connection, follower_id, author_id):
+    """Copy the author's latest posts into a new follower's timeline"""
+    if has_many_followers(author_id, connection):
+        return
+    table = TimelineEntry.__table__
+    already = exists().where(table.c.user_id == follower_id, table.c.post_id == Post.id)
+    recent = select(literal(follower_id), Post.id, Post.author_id, Post.published_at).where(
+        Post.author_id == author_id, Post.status == 'published', Post.published_at.isnot(None), ~already
+    ).order_by(Post.published_at.desc(), Post.id.desc()).limit(_config('TIMELINE_BACKFILL', DEFAULT_BACKFILL))
+    connection.execute(table.insert().from_select(
+        ['user_id', 'post_id', 'author_id', 'published_at'], recent))
+    trim(connection, [follower_id])
+
+
+def trim(connection, user_ids, limit=None):
+    """Delete the entries beyond the newest `limit` (TIMELINE_MAX_ENTRIES) of these users' timelines"""
+    limit = entries_limit() if limit is None else limit
+    table = TimelineEntry.__table__
+    position = func.row_number().over(partition_by=table.c.user_id,
+                                      order_by=(table.c.published_at.desc(), table.c.post_id.desc()))
+    ranked = select(table.c.user_id, table.c.post_id, position.label('position')).where(
+        table.c.user_id.in_(user_ids)).subquery()
+    # A derived table, so MySQL accepts it in a DELETE from the same table
+    overflow = select(ranked.c.user_id, ranked.c.post_id).where(ranked.c.position > limit)
+    return connection.execute(delete(table).where(
+        tuple_(table.c.user_id, table.c.post_id).in_(overflow))).rowcount
+
+
+def _changed(instance, *keys):
+    state = inspect(instance)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def _was_published(instance):
+    history = inspect(instance).attrs.status.history
+    return 'published' in (history.deleted or history.unchanged or ())
+
+
+def _update_timelines(session, flush_context):
+    table = TimelineEntry.__table__
+    connection = session.connection()
+    for instance in session.new:
+        if isinstance(instance, Post) and instance.status == 'published':
+            fan_out(connection, instance)
+    for instance in session.dirty:
+        if isinstance(instance, Post) and _changed(instance, 'status', 'published_at', 'author_id'):
+            if instance.status == 'published':
+                fan_out(connection, instance)
+            elif _was_published(instance):
+                connection.execute(delete(table).where(table.c.post_id == instance.id))
+    for instance in session.deleted:
+        if isinstance(instance, Post):
+            connection.execute(delete(table).where(table.c.post_id == instance.id))
+
+    for instance in session.new:
+        if isinstance(instance, UserFollow):
+            backfill(connection, instance.follower_id, instance.followed_id)
+    for instance in session.deleted:
+        if isinstance(instance, UserFollow):
+            connection.execute(delete(table).where(
+                table.c.user_id == instance.follower_id, table.c.author_id == instance.followed_id))
+
+
+def register_timeline_hooks():
+    # after_flush: new posts have their IDs, and the entries commit with the post
+    if not event.contains(db.session, 'after_flush', _update_timelines):
+        event.listen(db.session, 'after_flush', _update_timelines)
+
+
+# ============ READS ============
+
+def _after(sort_column, id_column, position):
+    if position is None:
+        return true()
+    sort_value, row_id = position
+    return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+
+
+def timeline_page(user_id, cursor, per_page):
+    """
+    Newest-first page of the posts of the accounts `user_id` follows
+    Raises InvalidCursor for a cursor we did not issue.
+    """
+    per_page = max(1, per_page)
+    position = decode_cursor(cursor) if cursor else None
+
+    # Fanned-out posts: the reader's own entries (unpublished posts are skipped by the join)
+    rows = db.session.query(TimelineEntry.post_id, TimelineEntry.published_at).join(
+        Post, Post.id == TimelineEntry.post_id
+    ).filter(
+        TimelineEntry.user_id == user_id,
+        Post.status == 'published',
+        _after(TimelineEntry.published_at, TimelineEntry.post_id, position)
+    ).order_by(TimelineEntry.published_at.desc(), TimelineEntry.post_id.desc()).limit(per_page + 1).all()
+    candidates = {row.post_id: row.published_at for row in rows}
+
+    # Large accounts: their posts are read from posts directly
+    large_ids = get_large_authors().get()
+    if large_ids:
+        followed = [row.followed_id for row in db.session.query(UserFollow.followed_id).filter(
+            UserFollow.follower_id == user_id, UserFollow.followed_id.in_(large_ids))]
+        if followed:
+            rows = db.session.query(Post.id, Post.published_at).filter(
+                Post.author_id.in_(followed),
+                Post.status == 'published',
+                Post.published_at.isnot(None),
+                _after(Post.published_at, Post.id, position)
+            ).order_by(Post.published_at.desc(), Post.id.desc()).limit(per_page + 1).all()
+            candidates.update((row.id, row.published_at) for row in rows)
+
+    ordered = sorted(candidates.items(), key=lambda item: (item[1], item[0]), reverse=True)[:per_page + 1]
+    page_ids = [post_id for post_id, _ in ordered[:per_page]]
+    posts = {post.id: post for post in Post.query.filter(Post.id.in_(page_ids))} if page_ids else {}
+    items = [posts[post_id] for post_id in page_ids if post_id in posts]
+
+    next_cursor = None
+    if len(ordered) > per_page:
+        post_id, published_at = ordered[per_page - 1]
+        next_cursor = encode_cursor(published_at, post_id)
+    return KeysetPage(items, next_cursor, per_page)
+
+
+# ============ MAINTENANCE ============
+
+def trim_timelines(max_entries=None):
+    """Cut every timeline back to its newest `max_entries` posts; returns rows deleted"""
+    max_entries = entries_limit() if max_entries is None else max_entries
+    oversized = [row.user_id for row in db.session.query(TimelineEntry.user_id).group_by(
+        TimelineEntry.user_id).having(func.count() > max_entries)]
+    deleted = 0
+    for start in range(0, len(oversized), TRIM_BATCH):
+        deleted += trim(db.session.connection(), oversized[start:start + TRIM_BATCH], max_entries)
+        db.session.commit()
+    return deleted
+
+
+@click.command('timeline-trim')
+@click.option('--max-entries', type=int, default=None,
+              help=f'Posts kept per timeline (default TIMELINE_MAX_ENTRIES, {DEFAULT_MAX_ENTRIES})')
+@with_appcontext
+def timeline_trim_command(max_entries):
+    """Delete home timeline entries beyond the newest TIMELINE_MAX_ENTRIES per user"""
+    deleted = trim_timelines(max_entries)
+    click.echo(f"✂️  Deleted {deleted} timeline entries")
@@ -0,0 +1,420 @@
+"""
+Trending posts for VieGo Blog (/api/posts/trending)
+Views, likes, comments and shares add their weight to a post's score and
+the score decays exponentially, Reddit/Hacker News style: an event counts
+half as much after a quarter of the window (6 hours for 24h, 42 hours for
+7d).
+
+Scores are stored relative to a fixed epoch (weight * 2^((t - epoch) / half
+life)), so decay never reorders posts: an event is one bisect insertion into
+a sorted array per window and category, and the top k is a slice of it, with
+no scan of the posts table. Every TRENDING_SNAPSHOT_INTERVAL seconds each
+worker adds the events it saw to post_scores (rows locked, decayed to now)
+and reloads its rankings from that table, so workers converge on the same
+list and a restart picks up where the last snapshot left off.
+"""
+import atexit
+import calendar
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db
+from models.post import Post
+from models.post_score import PostScore
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {'24h': 24 * 3600, '7d': 7 * 24 * 3600}
+HALF_LIVES_PER_WINDOW = 4
+EVENT_WEIGHTS = {'view': 1, 'like': 3, 'comment': 5, 'share': 10}
+# Post counter column (utils/counters.py) -> engagement event
+COUNTER_EVENTS = {'likes_count': 'like', 'comments_count': 'comment', 'shares_count': 'share'}
+PRUNE_BELOW = 0.05  # decayed score under which a post leaves post_scores
+REBASE_AFTER = 256  # half-lives before scores move to a newer epoch (keeps floats finite)
+DEFAULT_SNAPSHOT_INTERVAL = 60
+MAX_LIMIT = 50
+ID_BATCH = 500
+
+
+def _timestamp(value):
+    """Naive UTC datetime -> Unix time"""
+    return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+
+
+class Ranking:
+    """Posts of one window by score, highest first, overall and per category"""
+
+    def __init__(self, half_life, epoch):
+        self.half_life = half_life
+        self.epoch = epoch
+        self.scores = {}  # post_id -> score relative to epoch
+        self.categories = {}  # post_id -> category
+        self.pending = {}  # post_id -> score not written to post_scores yet
+        self._ranked = {None: []}  # category (None: all posts) -> sorted (-score, -post_id)
+
+    def relative(self, value, at):
+        """Score worth `value` at Unix time `at`, relative to the epoch"""
+        return value * 2.0 ** ((at - self.epoch) / self.half_life)
+
+    def decayed(self, score, at):
+        """Value at Unix time `at` of a score relative to the epoch"""
+        return score * 2.0 ** ((self.epoch - at) / self.half_life)
+
+    def _lists(self, post_id):
+        category = self.categories.get(post_id)
+        return [self._ranked[None]] + ([self._ranked.setdefault(category, [])] if category else [])
+
+    def _unlink(self, post_id):
+        key = (-self.scores[post_id], -post_id)
+        for ranked in self._lists(post_id):
+            position = bisect_left(ranked, key)
+            if position < len(ranked) and ranked[position] == key:
+                del ranked[position]
+
+    def _link(self, post_id):
+        key = (-self.scores[post_id], -post_id)
+        for ranked in self._lists(post_id):
+            insort(ranked, key)
+
+    def add(self, post_id, amount, category=None):
+        """Add an epoch-relative amount (negative for an undone like), clamped at 0"""
+        if post_id in self.scores:
+            self._unlink(post_id)
+        if category is not None:
+            self.categories[post_id] = category
+        self.scores[post_id] = max(self.scores.get(post_id, 0.0) + amount, 0.0)
+        self._link(post_id)
+
+    def categorize(self, post_id, category):
+        """Put a post recorded without its category into that category's list"""
+        if post_id in self.categories or not category:
+            return
+        if post_id in self.scores:
+            self._unlink(post_id)
+            self.categories[post_id] = category
+            self._link(post_id)
+        else:
+            self.categories[post_id] = category
+
+    def discard(self, post_id):
+        if post_id in self.scores:
+            self._unlink(post_id)
+            del self.scores[post_id]
+        self.categories.pop(post_id, None)
+        self.pending.pop(post_id, None)
+
+    def load(self, entries):
+        """Replace every score with (post_id, score relative to the epoch, category) entries"""
+        self.scores = {post_id: score for post_id, score, _ in entries}
+        self.categories = {post_id: category for post_id, _, category in entries if category}
+        self._ranked = {None: sorted((-score, -post_id) for post_id, score in self.scores.items())}
+        for post_id, category in self.categories.items():
+            self._ranked.setdefault(category, []).append((-self.scores[post_id], -post_id))
+        for category, ranked in self._ranked.items():
+            if category is not None:
+                ranked.sort()
+
+    def rebase(self, now):
+        """Move the epoch to `now` once scores have grown by REBASE_AFTER half-lives"""
+        if (now - self.epoch) / self.half_life < REBASE_AFTER:
+            return
+        factor = 2.0 ** ((self.epoch - now) / self.half_life)
+        self.epoch = now
+        self.scores = {post_id: score * factor for post_id, score in self.scores.items()}
+        self.pending = {post_id: score * factor for post_id, score in self.pending.items()}
+        # Scaling by a positive factor keeps every array in order
+        self._ranked = {
+            category: [(score * factor, post_id) for score, post_id in ranked]
+            for category, ranked in self._ranked.items()
+        }
+
+    def top(self, limit, category=None):
+        """[(post_id, score relative to the epoch)] of the `limit` best posts"""
+        return [(-post_id, -score) for score, post_id in self._ranked.get(category, [])[:limit]]
+
+
+class TrendingEngine:
+    """Decayed engagement scores of every window, fed by events and post_scores"""
+
+    def __init__(self):
+        now = time.time()
+        self.rankings = {
+            window: Ranking(seconds / HALF_LIVES_PER_WINDOW, now) for window, seconds in WINDOWS.items()
+        }
+        self.loaded = False
+        self.uncategorized = set()  # posts recorded from counters, category not looked up yet
+        self.last_snapshot = None
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+
+    def record(self, post_id, kind, count=1, at=None, category=None):
+        """Count `count` engagement events of `kind` ('view', 'like', 'comment', 'share')"""
+        weight = EVENT_WEIGHTS[kind] * count
+        at = at or time.time()
+        with self._lock:
+            for ranking in self.rankings.values():
+                ranking.rebase(at)
+                amount = ranking.relative(weight, at)
+                ranking.add(post_id, amount, category)
+                ranking.pending[post_id] = ranking.pending.get(post_id, 0.0) + amount
+            if category is None and post_id not in self.rankings['24h'].categories:
+                self.uncategorized.add(post_id)
+
+    def _categorize(self):
+        """Look up the categories of posts whose events came without one (by primary key)"""
+        with self._lock:
+            post_ids = sorted(self.uncategorized)
+            self.uncategorized = set()
+        for start in range(0, len(post_ids), ID_BATCH):
+            rows = db.session.query(Post.id, Post.category).filter(
+                Post.id.in_(post_ids[start:start + ID_BATCH])).all()
+            with self._lock:
+                for row in rows:
+                    for ranking in self.rankings.values():
+                        ranking.categorize(row.id, row.category)
+
+    def top(self, window, limit, category=None):
+        """[(post_id, current decayed score)] of the best `limit` posts of a window"""
+        if not self.loaded:
+            self.reload()
+        if category and self.uncategorized:
+            self._categorize()
+        now = time.time()
+        with self._lock:
+            ranking = self.rankings[window]
+            return [(post_id, ranking.decayed(score, now)) for post_id, score in ranking.top(limit, category)]
+
+    def forget(self, post_ids):
+        """Drop posts that are no longer published"""
+        with self._lock:
+            for ranking in self.rankings.values():
+                for post_id in post_ids:
+                    ranking.discard(post_id)
+
+    def reload(self):
+        """Rebuild the rankings from post_scores plus the events not written yet"""
+        now = time.time()
+        # Category and status come from the post's primary key, never from a posts scan
+        rows = db.session.query(
+            PostScore.period, PostScore.post_id, PostScore.score, PostScore.updated_at, Post.category, Post.status
+        ).outerjoin(Post, Post.id == PostScore.post_id).all()
+        expired = {}
+        with self._lock:
+            for window, ranking in self.rankings.items():
+                pending = {post_id: ranking.decayed(amount, now) for post_id, amount in ranking.pending.items()}
+                categories = dict(ranking.categories)
+                entries = []
+                for row in rows:
+                    if row.period != window:
+                        continue
+                    score = row.score * 2.0 ** ((_timestamp(row.updated_at) - now) / ranking.half_life)
+                    if row.status != 'published' or score < PRUNE_BELOW:
+                        expired.setdefault(window, []).append(row.post_id)
+                    else:
+                        entries.append((row.post_id, score, row.category))
+                ranking.epoch = now
+                ranking.load(entries)
+                ranking.pending = {}
+                for post_id, amount in pending.items():
+                    ranking.add(post_id, amount, None if post_id in ranking.categories else categories.get(post_id))
+                    ranking.pending[post_id] = amount
+            self.loaded = True
+        if expired:
+            for window, post_ids in expired.items():
+                for start in range(0, len(post_ids), ID_BATCH):
+                    PostScore.query.filter(
+                        PostScore.period == window, PostScore.post_id.in_(post_ids[start:start + ID_BATCH])
+                    ).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _take_pending(self):
+        with self._lock:
+            batches = {}
+            for window, ranking in self.rankings.items():
+                if ranking.pending:
+                    batches[window] = (ranking, ranking.pending)
+                    ranking.pending = {}
+            return batches
+
+    def _restore_pending(self, batches):
+        with self._lock:
+            for ranking, pending in batches.values():
+                for post_id, amount in pending.items():
+                    ranking.pending[post_id] = ranking.pending.get(post_id, 0.0) + amount
+
+    def _write(self, batches):
+        now = time.time()
+        updated_at = datetime.utcfromtimestamp(now)
+        post_ids = sorted({post_id for _, pending in batches.values() for post_id in pending})
+        posts, existing = {}, {}
+        for start in range(0, len(post_ids), ID_BATCH):
+            chunk = post_ids[start:start + ID_BATCH]
+            posts.update((row.id, row) for row in db.session.query(
+                Post.id, Post.status).filter(Post.id.in_(chunk)))
+            # Locked: another worker adding to the same rows waits for this commit
+            existing.update(((row.period, row.post_id), row) for row in PostScore.query.filter(
+                PostScore.post_id.in_(chunk)).with_for_update())
+
+        gone = set()
+        for window, (ranking, pending) in batches.items():
+            for post_id, amount in pending.items():
+                post = posts.get(post_id)
+                row = existing.get((window, post_id))
+                if post is None or post.status != 'published':
+                    gone.add(post_id)
+                    if row is not None:
+                        db.session.delete(row)
+                    continue
+                # The epoch may have moved since the event; decay from the epoch it was recorded in
+                amount_now = amount * 2.0 ** ((ranking.epoch - now) / ranking.half_life)
+                if row is None:
+                    db.session.add(PostScore(period=window, post_id=post_id, score=max(amount_now, 0.0),
+                                             updated_at=updated_at))
+                else:
+                    elapsed = now - _timestamp(row.updated_at)
+                    row.score = max(row.score * 2.0 ** (-elapsed / ranking.half_life) + amount_now, 0.0)
+                    row.updated_at = updated_at
+        db.session.commit()
+        return gone
+
+    def snapshot(self):
+        """Add the events seen since the last snapshot to post_scores and reload; returns posts written"""
+        with self._snapshot_lock:
+            batches = self._take_pending()
+            if not batches and not self.loaded:
+                return 0  # nothing recorded and nobody has asked for the rankings yet
+            written = len({post_id for _, pending in batches.values() for post_id in pending})
+            if batches:
+                try:
+                    gone = self._write(batches)
+                except Exception:
+                    db.session.rollback()
+                    self._restore_pending(batches)
+                    raise
+                self.forget(gone)
+            self.reload()
+            self.last_snapshot = time.time()
+            return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                'windows': {window: len(ranking.scores) for window, ranking in self.rankings.items()},
+                'pending': {window: len(ranking.pending) for window, ranking in self.rankings.items()},
+                'last_snapshot': self.last_snapshot
+            }
+
+
+class TrendingSnapshotter:
+    """Background thread writing and reloading the scores every interval"""
+
+    def __init__(self, app, engine, interval):
+        self.app = app
+        self.engine = engine
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='trending-snapshotter', daemon=True)
+        self._thread.start()
+
+    def _snapshot(self):
+        try:
+            with self.app.app_context():
+                self.engine.snapshot()
+                db.session.remove()
+        except Exception as e:
+            logger.warning('Trending snapshot failed: %s', e)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._snapshot()
+
+    def shutdown(self):
+        """Stop the thread and write the events still in memory"""
+        if self._thread is None:
+            return  # snapshots disabled (TRENDING_SNAPSHOT_INTERVAL=0)
+        self._stopped.set()
+        if any(ranking.pending for ranking in self.engine.rankings.values()):
+            self._snapshot()
+
+
+# ============ COMMIT HOOKS ============
+
+def queue_engagement(post_id, column, delta):
+    """Count a post counter change (utils/counters.py) once the transaction commits"""
+    kind = COUNTER_EVENTS.get(column)
+    if kind is not None and delta:
+        db.session.info.setdefault('trending_events', []).append((post_id, kind, delta, time.time()))
+
+
+def _apply_events(session):
+    events = session.info.pop('trending_events', None)
+    if not events or not has_app_context():
+        return
+    engine = get_trending()
+    for post_id, kind, count, at in events:
+        engine.record(post_id, kind, count, at)
+
+
+def _discard_events(session):
+    session.info.pop('trending_events', None)
+
+
+def register_trending_hooks():
+    if event.contains(db.session, 'after_commit', _apply_events):
+        return
+    event.listen(db.session, 'after_commit', _apply_events)
+    event.listen(db.session, 'after_rollback', _discard_events)
+
+
+# ============ APP INTEGRATION ============
+
+def init_trending(app):
+    """Create the app's trending engine and start its snapshot thread"""
+    engine = TrendingEngine()
+    app.extensions['trending'] = engine
+    register_trending_hooks()
+    snapshotter = TrendingSnapshotter(
+        app, engine, app.config.get('TRENDING_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)
+    )
+    snapshotter.start()
+    atexit.register(snapshotter.shutdown)
+    return engine
+
+
+def get_trending():
+    """Trending engine of the current app, created on first use"""
+    engine = current_app.extensions.get('trending')
+    if engine is None:
+        engine = init_trending(current_app._get_current_object())
+    return engine
+
+
+def record_engagement(post_id, kind, count=1, category=None):
+    """Count an engagement event that is not part of a transaction (page views)"""
+    get_trending().record(post_id, kind, count, category=category)
+
+
+def trending_posts(window, limit, category=None):
+    """[(post, score)] of the top posts of a window, published only"""
+    engine = get_trending()
+    # A few extra candidates cover posts unpublished since their last event
+    candidates = engine.top(window, limit + 10, category)
+    ids = [post_id for post_id, _ in candidates]
+    posts = {post.id: post for post in Post.query.filter(Post.id.in_(ids), Post.status == 'published')} if ids else {}
+    engine.forget([post_id for post_id in ids if post_id not in posts])
+    ranked = [(posts[post_id], score) for post_id, score in candidates if post_id in posts]
+    if category:
+        ranked = [(post, score) for post, score in ranked if post.category == category]
+    return ranked[:limit]
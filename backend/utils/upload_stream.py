@@ -0,0 +1,180 @@
+"""
+Streaming multipart uploads for VieGo Blog
+request.files makes Werkzeug spool the whole body (in memory, then a temp
+file) before the route can look at it, and caps it at MAX_CONTENT_LENGTH for
+every route. receive_files() parses the body itself, chunk by chunk, and
+writes each file part straight into a HashingWriter (utils/blob_store.py), so:
+- memory per request stays at one chunk whatever the file size
+- the limit is the route's own (per file type), checked while streaming: an
+  oversized single upload stops reading at the first byte over the limit, and
+  a Content-Length above the route's budget is refused before reading at all
+- the SHA-256 content address is known when the last chunk arrives
+"""
+from flask import current_app, request
+from werkzeug.http import parse_options_header
+from werkzeug.wsgi import get_input_stream
+
+from utils.blob_store import CHUNK_SIZE, HashingWriter
+
+MULTIPART_OVERHEAD = 64 * 1024  # boundaries, part headers and small form fields, per file
+MAX_FORM_FIELD_SIZE = 64 * 1024
+MAX_PART_HEADER_SIZE = 16 * 1024
+
+
+class StreamedFile:
+    """One file part of a streamed upload; `error` says why it was refused (empty, extension, size, incomplete)"""
+
+    __slots__ = ('name', 'filename', 'writer', 'error')
+
+    def __init__(self, name, filename):
+        self.name = name
+        self.filename = filename
+        self.writer = None
+        self.error = None
+
+    @property
+    def ext(self):
+        return self.filename.rsplit('.', 1)[1].lower() if '.' in self.filename else ''
+
+    @property
+    def size(self):
+        return self.writer.size if self.writer else 0
+
+    def refuse(self, error):
+        self.error = error
+        if self.writer is not None:
+            self.writer.discard()
+            self.writer = None
+
+    def read(self):
+        """Whole content, for files small enough to be decoded in memory (images)"""
+        with open(self.writer.finish(), 'rb') as source:
+            return source.read()
+
+    def commit(self):
+        """Move into the content-addressed store; returns (digest, relative path)"""
+        digest, relative, _ = self.writer.commit(self.ext)
+        return digest, relative
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.discard()
+
+
+def allowed_file(filename, allowed_extensions):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+
+
+def _multipart_events(read, boundary, chunk_size):
+    """
+    Yield ('part', name, filename), ('data', bytes) and finally ('end', complete)
+    The buffer never holds more than a chunk plus the boundary (or the part headers).
+    """
+    delimiter = b'\r\n--' + boundary
+    keep = len(delimiter) - 1  # a delimiter may start in the last bytes of the buffer
+    buffer = bytearray(b'\r\n')  # the first delimiter has no line break before it
+    in_body = False  # False: preamble or between parts
+    eof = False
+    while True:
+        index = buffer.find(delimiter)
+        if index == -1:
+            if len(buffer) > keep:
+                if in_body:
+                    yield ('data', bytes(buffer[:-keep]))
+                del buffer[:-keep]
+        else:
+            if in_body and index:
+                yield ('data', bytes(buffer[:index]))
+            del buffer[:index + len(delimiter)]
+            in_body = False
+            # Rest of the delimiter line ('--' after the last part), then the part headers
+            while len(buffer) < 2 or (buffer[:2] != b'--' and b'\r\n\r\n' not in buffer):
+                if eof or len(buffer) > MAX_PART_HEADER_SIZE:
+                    yield ('end', False)
+                    return
+                chunk = read(chunk_size)
+                eof = not chunk
+                buffer.extend(chunk)
+            if buffer[:2] == b'--':
+                yield ('end', True)
+                return
+            header_end = buffer.find(b'\r\n\r\n')
+            disposition = None
+            for line in bytes(buffer[:header_end]).decode('utf-8', 'replace').split('\r\n'):
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'content-disposition':
+                    disposition = parse_options_header(value.strip())[1]
+            del buffer[:header_end + 4]
+            if disposition is None:
+                yield ('end', False)
+                return
+            yield ('part', disposition.get('name'), disposition.get('filename'))
+            in_body = True
+            continue
+        if eof:
+            yield ('end', False)
+            return
+        chunk = read(chunk_size)
+        eof = not chunk
+        buffer.extend(chunk)
+
+
+def receive_files(field, max_size, allowed_extensions, max_files=1, chunk_size=CHUNK_SIZE):
+    """
+    Stream the `field` file parts of the current multipart request to temporary files
+    Returns (files, form): at most max_files StreamedFile (refused ones carry an
+    error and no data) and the small text fields. Raises RequestEntityTooLarge
+    when the declared body is larger than max_files files can be. Callers
+    commit() or discard() every accepted file.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary', '').encode('latin-1')
+    if mimetype != 'multipart/form-data' or not boundary:
+        return [], {}
+
+    stream = get_input_stream(request.environ,
+                              max_content_length=max_files * (max_size + MULTIPART_OVERHEAD))
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    files, form = [], {}
+    part = value = None
+    try:
+        for event in _multipart_events(stream.read, boundary, chunk_size):
+            if event[0] == 'data':
+                if isinstance(part, StreamedFile) and part.writer is not None:
+                    part.writer.write(event[1])
+                    if part.writer.size > max_size:
+                        part.refuse('size')
+                        if max_files == 1:
+                            # Nothing else in the body is worth reading
+                            return files, form
+                elif part is not None and value is not None and len(value) <= MAX_FORM_FIELD_SIZE:
+                    value.extend(event[1])
+                continue
+            # A part ends where the next one (or the body) does
+            if value is not None and part is not None:
+                form[part] = value[:MAX_FORM_FIELD_SIZE].decode('utf-8', 'replace')
+            part = value = None
+            if event[0] == 'end':
+                # A truncated body leaves its last file incomplete
+                if not event[1] and files and files[-1].writer is not None:
+                    files[-1].refuse('incomplete')
+                break
+            _, name, filename = event
+            if filename is None:
+                part, value = name, bytearray()
+            elif name == field and len(files) < max_files:
+                part = StreamedFile(name, filename)
+                files.append(part)
+                if not part.filename:
+                    part.refuse('empty')
+                elif not allowed_file(part.filename, allowed_extensions):
+                    part.refuse('extension')
+                else:
+                    part.writer = HashingWriter(upload_folder)
+    except Exception:
+        # Including RequestEntityTooLarge from a chunked body going past the budget
+        for streamed in files:
+            streamed.discard()
+        raise
+    return files, form
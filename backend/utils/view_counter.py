@@ -0,0 +1,227 @@
+"""
+Buffered view counters for VieGo Blog
+Page views are aggregated in memory per (entity, id) and written back in
+batches, one UPDATE ... SET views_count = views_count + CASE ... per table,
+so GET handlers no longer open a write transaction on every view.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import case, func
+
+logger = logging.getLogger(__name__)
+
+# entity name -> (table, counter column)
+VIEW_COUNTED_ENTITIES = {
+    'post': ('posts', 'views_count'),
+    'tour': ('tours', 'views_count'),
+    'story': ('stories', 'view_count'),
+}
+
+DEFAULT_FLUSH_INTERVAL = 10  # seconds, 0 disables the background flusher
+DEFAULT_MAX_PENDING = 500  # buffered increments before an early flush
+
+
+class SQLAlchemyViewBackend:
+    """Applies buffered increments with one CASE update per table"""
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+
+    def apply(self, increments):
+        """increments: {entity: {id: count}}"""
+        with self.app.app_context():
+            try:
+                for entity, counts in increments.items():
+                    table_name, column_name = VIEW_COUNTED_ENTITIES[entity]
+                    table = self.db.metadata.tables[table_name]
+                    column = table.c[column_name]
+                    values = {column_name: func.coalesce(column, 0) + case(counts, value=table.c.id, else_=0)}
+                    # A view is not an edit: keep updated_at (and the onupdate hook) untouched
+                    if 'updated_at' in table.c:
+                        values['updated_at'] = table.c.updated_at
+                    self.db.session.execute(
+                        table.update()
+                        .where(table.c.id.in_(list(counts)))
+                        .values(values)
+                    )
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+            finally:
+                self.db.session.remove()
+
+
+class ViewCounterBuffer:
+    """Thread-safe in-process buffer of pending view increments"""
+
+    def __init__(self, backend, flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._pending_total = 0
+        self._oldest_pending_at = None
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flushed_views = 0
+        self.last_flush_at = None
+        self.last_flush_duration = 0.0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+    def record(self, entity, entity_id, count=1):
+        """Buffer `count` views for one row"""
+        if entity not in VIEW_COUNTED_ENTITIES:
+            raise ValueError(f'Unknown view counted entity: {entity}')
+        with self._lock:
+            key = (entity, entity_id)
+            self._pending[key] = self._pending.get(key, 0) + count
+            self._pending_total += count
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+            over_threshold = self._pending_total >= self.max_pending
+
+        if over_threshold:
+            if self._thread is not None and self._thread.is_alive():
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def pending(self, entity, entity_id):
+        """Views buffered for a row but not yet written"""
+        with self._lock:
+            return self._pending.get((entity, entity_id), 0)
+
+    def flush(self):
+        """Write all buffered increments, returns the number of views flushed"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                total = self._pending_total
+                oldest = self._oldest_pending_at
+                self._pending = {}
+                self._pending_total = 0
+                self._oldest_pending_at = None
+
+            if not batch:
+                return 0
+
+            increments = {}
+            for (entity, entity_id), count in batch.items():
+                increments.setdefault(entity, {})[entity_id] = count
+
+            started = time.monotonic()
+            try:
+                self.backend.apply(increments)
+            except Exception:
+                self.flush_failures += 1
+                logger.exception('View counter flush failed, keeping %s views buffered', total)
+                self._restore(batch, oldest)
+                return 0
+
+            finished = time.monotonic()
+            self.flushes += 1
+            self.flushed_views += total
+            self.last_flush_at = time.time()
+            self.last_flush_duration = finished - started
+            self.last_flush_lag = finished - oldest
+            self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+            return total
+
+    def _restore(self, batch, oldest):
+        """Put a failed batch back so the views are retried on the next flush"""
+        with self._lock:
+            for key, count in batch.items():
+                self._pending[key] = self._pending.get(key, 0) + count
+                self._pending_total += count
+            if self._oldest_pending_at is None or oldest < self._oldest_pending_at:
+                self._oldest_pending_at = oldest
+
+    def start(self):
+        """Start the background flusher thread (no-op when interval is 0)"""
+        if self.flush_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='view-counter-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def shutdown(self):
+        """Stop the flusher and write whatever is still buffered"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        """Buffer and flush metrics"""
+        with self._lock:
+            pending_views = self._pending_total
+            pending_rows = len(self._pending)
+            oldest = self._oldest_pending_at
+        return {
+            'pending_views': pending_views,
+            'pending_rows': pending_rows,
+            'current_lag': round(time.monotonic() - oldest, 3) if oldest else 0.0,
+            'flushes': self.flushes,
+            'flush_failures': self.flush_failures,
+            'flushed_views': self.flushed_views,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_duration': round(self.last_flush_duration, 4),
+            'last_flush_lag': round(self.last_flush_lag, 3),
+            'max_flush_lag': round(self.max_flush_lag, 3),
+            'flush_interval': self.flush_interval,
+            'max_pending': self.max_pending
+        }
+
+
+def init_view_counter(app, backend=None):
+    """Create the app's view counter buffer, start its flusher and flush on exit"""
+    from models import db
+
+    buffer = ViewCounterBuffer(
+        backend or SQLAlchemyViewBackend(app, db),
+        flush_interval=app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+        max_pending=app.config.get('VIEW_COUNTER_MAX_PENDING', DEFAULT_MAX_PENDING)
+    )
+    app.extensions['view_counter'] = buffer
+    buffer.start()
+    atexit.register(buffer.shutdown)
+    return buffer
+
+
+def get_view_counter():
+    """View counter buffer of the current app, created on first use"""
+    buffer = current_app.extensions.get('view_counter')
+    if buffer is None:
+        buffer = init_view_counter(current_app._get_current_object())
+    return buffer
+
+
+def record_view(entity, entity_id):
+    """Buffer one view and return how many views are pending for the row"""
+    buffer = get_view_counter()
+    buffer.record(entity, entity_id)
+    return buffer.pending(entity, entity_id)
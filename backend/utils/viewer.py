@@ -0,0 +1,106 @@
+"""
+Request-scoped viewer context for VieGo Blog
+Resolves the (optional) JWT user once per request and keeps their liked and
+bookmarked post IDs (and followed user IDs) as sets, so listings can flag
+each row in O(1)
+"""
+from flask import g
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from models import db
+from models.user import User
+from models.social import PostLike, PostBookmark, UserFollow
+
+
+class ViewerContext:
+    """Who is looking at the page and what they have liked/bookmarked/followed"""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.user_id = user.id if user else None
+        self.liked_post_ids = set()
+        self.bookmarked_post_ids = set()
+        self._loaded_post_ids = set()
+        self.followed_user_ids = set()
+        self._loaded_user_ids = set()
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None
+
+    def load(self, post_ids):
+        """Fetch like/bookmark flags for the given posts with one indexed query each"""
+        missing = {post_id for post_id in post_ids if post_id is not None} - self._loaded_post_ids
+        if not self.is_authenticated or not missing:
+            return
+        liked = db.session.query(PostLike.post_id).filter(
+            PostLike.user_id == self.user_id,
+            PostLike.post_id.in_(missing)
+        ).all()
+        bookmarked = db.session.query(PostBookmark.post_id).filter(
+            PostBookmark.user_id == self.user_id,
+            PostBookmark.post_id.in_(missing)
+        ).all()
+        self.liked_post_ids.update(row.post_id for row in liked)
+        self.bookmarked_post_ids.update(row.post_id for row in bookmarked)
+        self._loaded_post_ids.update(missing)
+
+    def load_follows(self, user_ids):
+        """Fetch follow flags for the given users with one primary-key range query"""
+        missing = {user_id for user_id in user_ids if user_id is not None} - self._loaded_user_ids
+        if not self.is_authenticated or not missing:
+            return
+        followed = db.session.query(UserFollow.followed_id).filter(
+            UserFollow.follower_id == self.user_id,
+            UserFollow.followed_id.in_(missing)
+        ).all()
+        self.followed_user_ids.update(row.followed_id for row in followed)
+        self._loaded_user_ids.update(missing)
+
+    def has_liked(self, post_id):
+        self.load([post_id])
+        return post_id in self.liked_post_ids
+
+    def has_bookmarked(self, post_id):
+        self.load([post_id])
+        return post_id in self.bookmarked_post_ids
+
+    def is_following(self, user_id):
+        self.load_follows([user_id])
+        return user_id in self.followed_user_ids
+
+    def annotate(self, post_dict):
+        """Set is_liked/is_bookmarked on a serialized post (logged-in viewers only)"""
+        if self.is_authenticated:
+            post_dict['is_liked'] = self.has_liked(post_dict['id'])
+            post_dict['is_bookmarked'] = self.has_bookmarked(post_dict['id'])
+        return post_dict
+
+    def annotate_all(self, post_dicts):
+        self.load(post_dict['id'] for post_dict in post_dicts)
+        for post_dict in post_dicts:
+            self.annotate(post_dict)
+        return post_dicts
+
+
+def _current_user_id():
+    """Identity from an optional JWT, or None for anonymous requests"""
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+        if isinstance(user_id, str):
+            user_id = int(user_id)
+        return user_id
+    except Exception:
+        return None
+
+
+def get_viewer():
+    """Get the viewer context for the current request, loading it on first use"""
+    viewer = g.get('viewer')
+    if viewer is None:
+        user_id = _current_user_id()
+        user = User.query.get(user_id) if user_id else None
+        viewer = ViewerContext(user)
+        g.viewer = viewer
+    return viewer
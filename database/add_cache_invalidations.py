@@ -0,0 +1,71 @@
+"""
+Database Migration: cache_invalidations
+- creates the table the workers share response cache evictions through
+
+A commit that changes a post, comment, location, tour or user evicts the
+cached responses depending on it in the worker that made it, and adds the
+evicted tags here; the other workers read new rows every
+CACHE_INVALIDATION_POLL_INTERVAL seconds (backend/utils/cache_invalidation.py)
+and evict them too. Rows older than an hour are deleted by the workers, so
+the table stays small. Safe to re-run.
+"""
+import sys
+
+import pymysql
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+CREATE_CACHE_INVALIDATIONS = """
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tag VARCHAR(100) NOT NULL,
+    origin VARCHAR(64) NOT NULL,
+    created_at DATETIME NOT NULL,
+    INDEX idx_cache_invalidations_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def run_migration():
+    """Create the cache_invalidations table"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+
+        print("   Creating cache_invalidations...")
+        cursor.execute(CREATE_CACHE_INVALIDATIONS)
+        connection.commit()
+        print("   ✅ cache_invalidations ready")
+
+        print("\n✅ Shared cache invalidation ready!")
+        print("   Every worker now drops cached feeds right after an edit in another worker")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Shared Cache Invalidation")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
@@ -0,0 +1,96 @@
+"""
+Database Migration: FULLTEXT search indexes
+- posts:     idx_content (title, content, excerpt)
+- locations: idx_locations_search (name, description, address)
+- tours:     idx_tours_search (title, description, starting_location)
+
+backend/utils/search.py issues MATCH ... AGAINST on exactly these column
+lists. Older dumps (viego_blog.sql) only have the posts index.
+Safe to re-run: an index covering the same columns is left alone, and one
+of the same name over other columns (before address and starting_location
+were added) is replaced.
+
+Vietnamese has many two-letter syllables (Hà, Lý, Mũi...). To index them set
+    innodb_ft_min_token_size = 2
+in my.ini, restart MySQL, then re-run this script with --rebuild.
+"""
+import sys
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+FULLTEXT_INDEXES = [
+    ('posts', 'idx_content', ('title', 'content', 'excerpt')),
+    ('locations', 'idx_locations_search', ('name', 'description', 'address')),
+    ('tours', 'idx_tours_search', ('title', 'description', 'starting_location')),
+]
+
+
+def fulltext_indexes(cursor, table):
+    """{index name: set of columns} for the FULLTEXT indexes of a table"""
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Index_type = 'FULLTEXT'")
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row['Key_name'], set()).add(row['Column_name'])
+    return indexes
+
+
+def run_migration(rebuild=False):
+    """Create missing FULLTEXT indexes (and rebuild them when asked)"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG, cursorclass=DictCursor)
+        cursor = connection.cursor()
+
+        for table, index_name, columns in FULLTEXT_INDEXES:
+            existing = fulltext_indexes(cursor, table)
+            same_columns = [name for name, cols in existing.items() if cols == set(columns)]
+
+            if same_columns and not rebuild:
+                print(f"   ℹ️  {table}: FULLTEXT {same_columns[0]} {columns} already exists")
+                continue
+
+            for name in same_columns:
+                print(f"   Dropping {table}.{name} for rebuild...")
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}")
+            if index_name in existing and index_name not in same_columns:
+                print(f"   Replacing {table}.{index_name} {tuple(sorted(existing[index_name]))}...")
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {index_name}")
+
+            print(f"   Creating FULLTEXT {table}.{index_name} {columns}...")
+            cursor.execute(f"CREATE FULLTEXT INDEX {index_name} ON {table} ({', '.join(columns)})")
+            print(f"   ✅ {table}.{index_name} created")
+
+        connection.commit()
+        print("\n✅ FULLTEXT search indexes ready!")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - FULLTEXT Search Indexes")
+    print("=" * 60)
+
+    run_migration(rebuild='--rebuild' in sys.argv)
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
@@ -0,0 +1,68 @@
+"""
+Database Migration: Keyset pagination indexes
+- posts:    idx_posts_feed (status, published_at, id)
+- comments: idx_comments_thread (post_id, parent_id, created_at, id)
+
+Cursor pages (?cursor=) seek straight to (sort key, id) in these indexes
+instead of counting and skipping rows. Safe to re-run: existing indexes are skipped.
+"""
+import sys
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+INDEXES = [
+    ('posts', 'idx_posts_feed', '(status, published_at, id)'),
+    ('comments', 'idx_comments_thread', '(post_id, parent_id, created_at, id)'),
+]
+
+
+def run_migration():
+    """Create the keyset pagination indexes if they are missing"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG, cursorclass=DictCursor)
+        cursor = connection.cursor()
+
+        for table, index_name, columns in INDEXES:
+            cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+            if cursor.fetchone():
+                print(f"   ℹ️  {table}.{index_name} already exists")
+                continue
+            print(f"   Creating {table}.{index_name} {columns}...")
+            cursor.execute(f"CREATE INDEX {index_name} ON {table} {columns}")
+            print(f"   ✅ {table}.{index_name} created")
+
+        connection.commit()
+        print("\n✅ Keyset pagination indexes ready!")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Keyset Pagination Indexes")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
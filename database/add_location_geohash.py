@@ -0,0 +1,98 @@
+"""
+Database Migration: locations.geohash
+- adds geohash VARCHAR(12) + idx_geohash to locations
+- backfills it from latitude/longitude in batches
+
+/api/maps/nearby (NEARBY_BACKEND=database) narrows the search to the
+geohash prefixes covering the radius before computing exact distances.
+The Location model keeps the column current on insert/update.
+Safe to re-run: only rows without a geohash are backfilled.
+"""
+import os
+import sys
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.geo import geohash_encode
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+BATCH_SIZE = 1000
+
+
+def run_migration():
+    """Add and backfill locations.geohash"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG, cursorclass=DictCursor)
+        cursor = connection.cursor()
+
+        cursor.execute("SHOW COLUMNS FROM locations LIKE 'geohash'")
+        if cursor.fetchone():
+            print("   ℹ️  locations.geohash already exists")
+        else:
+            print("   Adding locations.geohash...")
+            cursor.execute("ALTER TABLE locations ADD COLUMN geohash VARCHAR(12) AFTER longitude")
+            print("   ✅ Column added")
+
+        cursor.execute("SHOW INDEX FROM locations WHERE Key_name = 'idx_geohash'")
+        if cursor.fetchone():
+            print("   ℹ️  locations.idx_geohash already exists")
+        else:
+            print("   Creating locations.idx_geohash...")
+            cursor.execute("CREATE INDEX idx_geohash ON locations (geohash)")
+            print("   ✅ Index created")
+
+        print("   Backfilling geohashes...")
+        updated = 0
+        while True:
+            cursor.execute(
+                "SELECT id, latitude, longitude FROM locations "
+                "WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL LIMIT %s",
+                (BATCH_SIZE,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE locations SET geohash = %s, updated_at = updated_at WHERE id = %s",
+                [(geohash_encode(row['latitude'], row['longitude']), row['id']) for row in rows]
+            )
+            connection.commit()
+            updated += len(rows)
+        print(f"   ✅ {updated} locations backfilled")
+
+        connection.commit()
+        print("\n✅ Location geohashes ready!")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Location Geohashes")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
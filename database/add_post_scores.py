@@ -0,0 +1,72 @@
+"""
+Database Migration: post_scores
+- creates the post_scores table behind /api/posts/trending
+
+Each row is a post's decayed engagement score for one window ('24h' or
+'7d') as of updated_at. The workers add the views, likes, comments and
+shares they counted every TRENDING_SNAPSHOT_INTERVAL seconds
+(backend/utils/trending.py) and drop rows that have decayed to nothing, so
+the table starts empty and only holds recently active posts. Safe to re-run.
+"""
+import sys
+
+import pymysql
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+CREATE_POST_SCORES = """
+CREATE TABLE IF NOT EXISTS post_scores (
+    period VARCHAR(8) NOT NULL,
+    post_id INT NOT NULL,
+    score DOUBLE NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (period, post_id),
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    INDEX idx_post_scores_post (post_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def run_migration():
+    """Create the post_scores table"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+
+        print("   Creating post_scores...")
+        cursor.execute(CREATE_POST_SCORES)
+        connection.commit()
+        print("   ✅ post_scores ready")
+
+        print("\n✅ Trending scores ready!")
+        print("   Rankings fill up as posts are viewed, liked, commented and shared")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Trending Posts")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
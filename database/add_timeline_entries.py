@@ -0,0 +1,99 @@
+"""
+Database Migration: timeline_entries
+- creates the timeline_entries table behind /api/social/timeline
+- fills it with the latest published posts of every followed author
+
+From now on a post is copied into its followers' timelines when it is
+published (backend/utils/timeline.py). Authors with more than
+TIMELINE_FANOUT_LIMIT followers are read on demand and are not backfilled
+here. Safe to re-run.
+"""
+import sys
+
+import pymysql
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+FANOUT_LIMIT = 5000  # keep in sync with TIMELINE_FANOUT_LIMIT
+MAX_ENTRIES = 800  # keep in sync with TIMELINE_MAX_ENTRIES
+
+CREATE_TIMELINE_ENTRIES = """
+CREATE TABLE IF NOT EXISTS timeline_entries (
+    user_id INT NOT NULL,
+    post_id INT NOT NULL,
+    author_id INT NOT NULL,
+    published_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, post_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_timeline_entries_feed (user_id, published_at, post_id),
+    INDEX idx_timeline_entries_author (user_id, author_id),
+    INDEX idx_timeline_entries_post (post_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# Newest MAX_ENTRIES posts per follower, from authors small enough to fan out
+BACKFILL_TIMELINE_ENTRIES = """
+INSERT IGNORE INTO timeline_entries (user_id, post_id, author_id, published_at)
+SELECT user_id, post_id, author_id, published_at FROM (
+    SELECT f.follower_id AS user_id, p.id AS post_id, p.author_id, p.published_at,
+           ROW_NUMBER() OVER (PARTITION BY f.follower_id ORDER BY p.published_at DESC, p.id DESC) AS position
+    FROM user_follows f
+    JOIN posts p ON p.author_id = f.followed_id
+    WHERE p.status = 'published' AND p.published_at IS NOT NULL
+      AND f.followed_id NOT IN (
+          SELECT followed_id FROM user_follows GROUP BY followed_id HAVING COUNT(*) > %s
+      )
+) ranked
+WHERE position <= %s
+"""
+
+
+def run_migration():
+    """Create and backfill the timeline_entries table"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+
+        print("   Creating timeline_entries...")
+        cursor.execute(CREATE_TIMELINE_ENTRIES)
+        print("   ✅ timeline_entries ready")
+
+        print("   Backfilling timelines from user_follows...")
+        cursor.execute(BACKFILL_TIMELINE_ENTRIES, (FANOUT_LIMIT, MAX_ENTRIES))
+        print(f"   ✅ {cursor.rowcount} timeline entries added")
+        connection.commit()
+
+        print("\n✅ Home timelines ready!")
+        print("   Lists are capped at TIMELINE_MAX_ENTRIES as posts fan out (`flask --app main timeline-trim` re-checks them all)")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Home Timelines")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
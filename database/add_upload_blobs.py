@@ -0,0 +1,73 @@
+"""
+Database Migration: upload_blobs
+- creates the upload_blobs table of the content-addressed upload store
+
+Uploads are stored once per SHA-256 under uploads/ab/cd/<digest>.<ext>;
+ref_count tracks the rows whose URL columns use a blob and
+`flask --app main uploads-gc` deletes the unreferenced ones. Files uploaded
+before this migration keep their old URLs and are left alone by the GC.
+Safe to re-run.
+"""
+import sys
+
+import pymysql
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+CREATE_UPLOAD_BLOBS = """
+CREATE TABLE IF NOT EXISTS upload_blobs (
+    digest CHAR(64) PRIMARY KEY,
+    ext VARCHAR(10) NOT NULL,
+    kind ENUM('image', 'video') NOT NULL DEFAULT 'image',
+    size BIGINT NOT NULL DEFAULT 0,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_upload_blobs_unreferenced (ref_count, updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def run_migration():
+    """Create the upload_blobs table"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG)
+        cursor = connection.cursor()
+
+        print("   Creating upload_blobs...")
+        cursor.execute(CREATE_UPLOAD_BLOBS)
+        connection.commit()
+        print("   ✅ upload_blobs ready")
+
+        print("\n✅ Content-addressed upload storage ready!")
+        print("   Run `flask --app main uploads-gc` from backend/ to delete unreferenced uploads")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Upload Blobs")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
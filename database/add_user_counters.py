@@ -0,0 +1,94 @@
+"""
+Database Migration: users.followers_count / following_count / posts_count / comments_count
+- adds the four denormalized count columns + idx_users_followers_count
+- fills them from user_follows, posts (published) and comments (approved)
+
+Profile pages and follower lists read these columns instead of counting
+rows. The backend keeps them current on every follow, post and comment
+write; `flask --app main counters-reconcile` (from backend/) recomputes them
+if they ever drift. Safe to re-run: the backfill recomputes every row.
+"""
+import sys
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+COLUMNS = [
+    ('followers_count', "SELECT COUNT(*) FROM user_follows f WHERE f.followed_id = users.id"),
+    ('following_count', "SELECT COUNT(*) FROM user_follows f WHERE f.follower_id = users.id"),
+    ('posts_count', "SELECT COUNT(*) FROM posts p WHERE p.author_id = users.id AND p.status = 'published'"),
+    ('comments_count', "SELECT COUNT(*) FROM comments c WHERE c.author_id = users.id AND c.status = 'approved'"),
+]
+
+BATCH_SIZE = 1000
+
+
+def run_migration():
+    """Add and backfill the per-user count columns"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG, cursorclass=DictCursor)
+        cursor = connection.cursor()
+
+        for column, _ in COLUMNS:
+            cursor.execute("SHOW COLUMNS FROM users LIKE %s", (column,))
+            if cursor.fetchone():
+                print(f"   ℹ️  users.{column} already exists")
+                continue
+            print(f"   Adding users.{column}...")
+            cursor.execute(f"ALTER TABLE users ADD COLUMN {column} INT NOT NULL DEFAULT 0")
+            print("   ✅ Column added")
+
+        cursor.execute("SHOW INDEX FROM users WHERE Key_name = 'idx_users_followers_count'")
+        if cursor.fetchone():
+            print("   ℹ️  users.idx_users_followers_count already exists")
+        else:
+            print("   Creating users.idx_users_followers_count...")
+            cursor.execute("CREATE INDEX idx_users_followers_count ON users (followers_count)")
+            print("   ✅ Index created")
+
+        print("   Backfilling counts...")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM users")
+        max_id = cursor.fetchone()['max_id']
+        assignments = ', '.join(f"{column} = ({subquery})" for column, subquery in COLUMNS)
+        for start in range(0, max_id, BATCH_SIZE):
+            # updated_at = updated_at: a recount is not a profile edit
+            cursor.execute(
+                f"UPDATE users SET {assignments}, updated_at = updated_at WHERE id > %s AND id <= %s",
+                (start, start + BATCH_SIZE)
+            )
+            connection.commit()
+        print(f"   ✅ Counts filled for users up to id {max_id}")
+
+        print("\n✅ User counters ready!")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - User Counters")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete")
+    print("=" * 60)
@@ -0,0 +1,155 @@
+"""
+Database Migration: Normalized social tables
+- Create post_likes, post_bookmarks and user_follows association tables
+- Backfill them from the legacy JSON arrays on users
+  (liked_posts, bookmarks, following, followers)
+
+Safe to re-run: tables use IF NOT EXISTS and rows are inserted with INSERT IGNORE.
+"""
+import json
+import sys
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',  # Default WAMP MySQL password
+    'database': 'viego_blog',
+    'charset': 'utf8mb4'
+}
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS post_likes (
+        user_id INT NOT NULL,
+        post_id INT NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, post_id),
+        INDEX idx_post_likes_post (post_id, user_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_bookmarks (
+        user_id INT NOT NULL,
+        post_id INT NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, post_id),
+        INDEX idx_post_bookmarks_post (post_id, user_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_follows (
+        follower_id INT NOT NULL,
+        followed_id INT NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (follower_id, followed_id),
+        INDEX idx_user_follows_followed (followed_id, follower_id),
+        FOREIGN KEY (follower_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (followed_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+
+def parse_ids(raw):
+    """Parse a legacy JSON array column into a set of ints"""
+    if not raw:
+        return set()
+    try:
+        values = json.loads(raw)
+    except (TypeError, ValueError):
+        return set()
+    ids = set()
+    for value in values if isinstance(values, list) else []:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def collect_rows(users, existing_posts, existing_users):
+    """Turn the JSON arrays of every user into association rows"""
+    likes, bookmarks, follows = set(), set(), set()
+    for user in users:
+        user_id = user['id']
+        likes.update((user_id, post_id) for post_id in parse_ids(user.get('liked_posts')) if post_id in existing_posts)
+        bookmarks.update((user_id, post_id) for post_id in parse_ids(user.get('bookmarks')) if post_id in existing_posts)
+        # Both sides of a follow were stored; take the union so neither list loses edges
+        follows.update((user_id, other) for other in parse_ids(user.get('following')) if other in existing_users)
+        follows.update((other, user_id) for other in parse_ids(user.get('followers')) if other in existing_users)
+    follows = {(a, b) for a, b in follows if a != b}
+    return likes, bookmarks, follows
+
+
+def run_migration():
+    """Create the association tables and backfill them"""
+    connection = None
+    try:
+        print("🔌 Connecting to database...")
+        connection = pymysql.connect(**DB_CONFIG, cursorclass=DictCursor)
+        cursor = connection.cursor()
+
+        print("\n1. Creating association tables...")
+        for statement in CREATE_TABLES:
+            cursor.execute(statement)
+        connection.commit()
+        print("   ✅ post_likes, post_bookmarks, user_follows ready")
+
+        print("\n2. Reading legacy JSON columns...")
+        cursor.execute("DESCRIBE users")
+        columns = {col['Field'] for col in cursor.fetchall()}
+        legacy = [col for col in ('liked_posts', 'bookmarks', 'following', 'followers') if col in columns]
+        if not legacy:
+            print("   ℹ️  No legacy social columns found, nothing to backfill")
+            return
+
+        cursor.execute(f"SELECT id, {', '.join(legacy)} FROM users")
+        users = cursor.fetchall()
+        cursor.execute("SELECT id FROM posts")
+        existing_posts = {row['id'] for row in cursor.fetchall()}
+        existing_users = {user['id'] for user in users}
+
+        likes, bookmarks, follows = collect_rows(users, existing_posts, existing_users)
+        print(f"   Found {len(likes)} likes, {len(bookmarks)} bookmarks, {len(follows)} follows")
+
+        print("\n3. Backfilling...")
+        cursor.executemany("INSERT IGNORE INTO post_likes (user_id, post_id) VALUES (%s, %s)", sorted(likes))
+        cursor.executemany("INSERT IGNORE INTO post_bookmarks (user_id, post_id) VALUES (%s, %s)", sorted(bookmarks))
+        cursor.executemany("INSERT IGNORE INTO user_follows (follower_id, followed_id) VALUES (%s, %s)", sorted(follows))
+        connection.commit()
+
+        for table in ('post_likes', 'post_bookmarks', 'user_follows'):
+            cursor.execute(f"SELECT COUNT(*) AS total FROM {table}")
+            print(f"   ✅ {table}: {cursor.fetchone()['total']} rows")
+
+        print("\n✅ Social tables migration completed successfully!")
+        print("📌 The JSON columns on users are no longer written and can be dropped later.")
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        print(f"\n❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  VieGo Blog - Normalized Social Tables Migration")
+    print("=" * 60)
+
+    run_migration()
+
+    print("\n" + "=" * 60)
+    print("  Migration Complete - You can now restart the backend")
+    print("=" * 60)
@@ -22,6 +22,10 @@ CREATE TABLE users (
     points INT DEFAULT 0,
     level INT DEFAULT 1,
     badges TEXT, -- JSON string of earned badges
+    followers_count INT NOT NULL DEFAULT 0, -- denormalized, see backend/utils/counters.py
+    following_count INT NOT NULL DEFAULT 0,
+    posts_count INT NOT NULL DEFAULT 0, -- published posts
+    comments_count INT NOT NULL DEFAULT 0, -- approved comments
     location VARCHAR(255),
     language VARCHAR(10) DEFAULT 'vi',
     timezone VARCHAR(50) DEFAULT 'Asia/Ho_Chi_Minh',
@@ -31,7 +35,8 @@ CREATE TABLE users (
     last_login DATETIME,
     INDEX idx_username (username),
     INDEX idx_email (email),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_users_followers_count (followers_count)
 );
 
 -- Posts table
@@ -78,6 +83,7 @@ CREATE TABLE posts (
     INDEX idx_published_at (published_at),
     INDEX idx_created_at (created_at),
     INDEX idx_author_id (author_id),
+    INDEX idx_posts_feed (status, published_at, id),
     FULLTEXT idx_content (title, content, excerpt)
 );
 
@@ -88,6 +94,7 @@ CREATE TABLE locations (
     description TEXT,
     latitude FLOAT NOT NULL,
     longitude FLOAT NOT NULL,
+    geohash VARCHAR(12), -- derived from latitude/longitude, prefilters nearby searches
     address VARCHAR(500),
     city VARCHAR(100),
     province VARCHAR(100),
@@ -115,6 +122,7 @@ CREATE TABLE locations (
     INDEX idx_name (name),
     INDEX idx_latitude (latitude),
     INDEX idx_longitude (longitude),
+    INDEX idx_geohash (geohash),
     INDEX idx_created_at (created_at)
 );
 
@@ -141,7 +149,8 @@ CREATE TABLE comments (
     INDEX idx_post_id (post_id),
     INDEX idx_author_id (author_id),
     INDEX idx_parent_id (parent_id),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_comments_thread (post_id, parent_id, created_at, id)
 );
 
 -- Chats table
@@ -274,6 +283,86 @@ CREATE TABLE tours (
     INDEX idx_created_at (created_at)
 );
 
+-- Post likes (one row per user/post)
+CREATE TABLE post_likes (
+    user_id INT NOT NULL,
+    post_id INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, post_id),
+    INDEX idx_post_likes_post (post_id, user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+);
+
+-- Post bookmarks (one row per user/post)
+CREATE TABLE post_bookmarks (
+    user_id INT NOT NULL,
+    post_id INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, post_id),
+    INDEX idx_post_bookmarks_post (post_id, user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+);
+
+-- User follows (one row per follow edge)
+CREATE TABLE user_follows (
+    follower_id INT NOT NULL,
+    followed_id INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (follower_id, followed_id),
+    INDEX idx_user_follows_followed (followed_id, follower_id),
+    FOREIGN KEY (follower_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (followed_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Content-addressed upload files (uploads/ab/cd/<digest>.<ext>) and how many rows use them
+CREATE TABLE upload_blobs (
+    digest CHAR(64) PRIMARY KEY,
+    ext VARCHAR(10) NOT NULL,
+    kind ENUM('image', 'video') NOT NULL DEFAULT 'image',
+    size BIGINT NOT NULL DEFAULT 0,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_upload_blobs_unreferenced (ref_count, updated_at)
+);
+
+-- Home timelines: one row per (follower, post), written when the post is published
+CREATE TABLE timeline_entries (
+    user_id INT NOT NULL,
+    post_id INT NOT NULL,
+    author_id INT NOT NULL,
+    published_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, post_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_timeline_entries_feed (user_id, published_at, post_id),
+    INDEX idx_timeline_entries_author (user_id, author_id),
+    INDEX idx_timeline_entries_post (post_id)
+);
+
+-- Trending scores (decayed engagement per window, written by the workers)
+CREATE TABLE post_scores (
+    period VARCHAR(8) NOT NULL,
+    post_id INT NOT NULL,
+    score DOUBLE NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (period, post_id),
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    INDEX idx_post_scores_post (post_id)
+);
+
+-- Response cache tags evicted by one worker, for the other workers to evict too
+CREATE TABLE cache_invalidations (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tag VARCHAR(100) NOT NULL,
+    origin VARCHAR(64) NOT NULL,
+    created_at DATETIME NOT NULL,
+    INDEX idx_cache_invalidations_created (created_at)
+);
+
 -- Insert sample data
 INSERT INTO users (username, email, password_hash, full_name, role) VALUES
 ('admin', 'admin@viego.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/lewf1/2xDETnh4ArW', 'VieGo Admin', 'admin'),
@@ -298,8 +387,8 @@ INSERT INTO tours (title, description, duration_days, starting_location, price_p
 -- Create indexes for better performance
 CREATE INDEX idx_posts_location ON posts(location_lat, location_lng);
 CREATE INDEX idx_locations_coords ON locations(latitude, longitude);
-CREATE FULLTEXT INDEX idx_locations_search ON locations(name, description);
-CREATE FULLTEXT INDEX idx_tours_search ON tours(title, description);
+CREATE FULLTEXT INDEX idx_locations_search ON locations(name, description, address);
+CREATE FULLTEXT INDEX idx_tours_search ON tours(title, description, starting_location);
 
 -- Grant permissions (adjust as needed for your WAMP setup)
 -- GRANT ALL PRIVILEGES ON viego_blog.* TO 'root'@'localhost';